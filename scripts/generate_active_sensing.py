@@ -58,14 +58,48 @@ Usage::
 If ``--audio-dir`` is omitted (or contains no ``*.wav`` files), a linear
 chirp from ``f_start`` to ``f_end`` is synthesised per sample so the
 pipeline remains end-to-end runnable without external assets.
+
+``--ir-cache DIR`` renders each pose from a cached impulse response by
+FFT convolution with the source (``simulation/impulse.py``) instead of
+simulating the source itself; geometries already in ``DIR`` cost no
+simulation at all.
+
+``--reciprocal`` keeps one mic pair per room and moves only the driver
+over its K poses (the mic pair repeats in ``sensor_positions``). By
+acoustic reciprocity an impulse at each mic, recorded at the K driver
+cells, gives all K impulse responses, so a room costs ``n_mics``
+simulations instead of K; each pose is then rendered as with
+``--ir-cache`` (in memory unless that is given too). Drivers are drawn
+from every ``--reciprocal-stride``-th free interior cell.
+
+``--mic-poses-per-driver N`` runs each driver once and records every
+``--receiver-stride``-th cell into a preallocated (``--receiver-dtype``)
+memmap under ``--receiver-dir`` (a temporary directory by default); the
+N stereo pairs of that driver are then drawn on the receiver lattice
+(``pick_mic_pairs``) and read out of the recording. A room's K poses
+are K / N driver runs; ``driver_positions`` repeats each driver N times.
+
+``--d4-augment`` writes every simulated room eight times, once per
+symmetry of the square (``simulation/dataset.py``): the obstacles and
+every position rotated / flipped, the recording unchanged except that
+reflections reverse the stereo channels. Room ``s`` becomes samples
+``8 s .. 8 s + 7`` with attrs ``d4_room = s`` and ``d4_variant = k``
+(keys widened past four digits as needed, so they sort in that order).
+All eight variants of a room must stay on the same side of the
+train / held-out split: ``train.py`` splits such an archive by room,
+and a separate held-out archive must come from a different seed.
 """
 
 from __future__ import annotations
 
 import argparse
+import contextlib
+import dataclasses
 import pathlib
 import sys
+import tempfile
 import time
+from dataclasses import dataclass
 from typing import Optional
 
 import h5py
@@ -77,15 +111,24 @@ _SRC = _REPO_ROOT / "src"
 if str(_SRC) not in sys.path:
     sys.path.insert(0, str(_SRC))
 
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
 from acoustic_system.simulation.dataset import (  # noqa: E402
+    D4_VARIANTS,
+    d4_channel_order,
+    d4_mask,
+    d4_positions,
+    free_positions,
     generate_diverse_obstacles,
     generate_random_obstacles,
+    pick_mic_pairs,
     pick_mic_positions,
     random_free_position,
-    run_with_sensors,
+    receiver_series,
+    record_receiver_grid,
     synthetic_chirp,
 )
-from acoustic_system.simulation.setup import Driver, Sensor  # noqa: E402
+from acoustic_system.simulation.impulse import ImpulseResponseCache  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
 from acoustic_system.simulation.simulate import Simulate  # noqa: E402
 from acoustic_system.simulation.waveforms import AudioFileWaveform  # noqa: E402
 
@@ -178,6 +221,284 @@ def build_source(
     return wf, samples, float(args.synth_sample_rate), "synthetic"
 
 
+@dataclass
+class Room:
+    """One room's random draws: geometry, K poses and the shared source."""
+
+    obstacle_mask: np.ndarray
+    driver_positions: list[tuple[int, ...]]
+    mic_positions: list[list[tuple[int, ...]]]
+    waveform: AudioFileWaveform
+    source_samples: np.ndarray
+    source_fs: float
+    source_label: str
+
+
+def draw_room(
+    args: argparse.Namespace,
+    rng: np.random.Generator,
+    audio_files: list[pathlib.Path],
+    dt: float,
+) -> Room:
+    """Draw one room: obstacles, then K (driver, mic-pair) poses, then the source."""
+    grid_shape = (args.grid, args.grid)
+    if args.room_style == "mixed":
+        obstacle_mask = generate_diverse_obstacles(
+            grid_shape=grid_shape,
+            min_size=args.obstacle_min,
+            max_size=args.obstacle_max,
+            rng=rng,
+        )
+    else:
+        obstacle_mask = generate_random_obstacles(
+            grid_shape=grid_shape,
+            n_obstacles=args.n_obstacles,
+            min_size=args.obstacle_min,
+            max_size=args.obstacle_max,
+            rng=rng,
+        )
+    # Per-pose placements. The RNG draw order (driver, then mics, pose by
+    # pose, THEN source) reduces exactly to the original order at K=1, so
+    # seeded single-pose archives reproduce the pre-multi-pose files
+    # bit-for-bit.
+    driver_positions = []
+    mic_positions_per_pose = []
+    if args.reciprocal:
+        # One mic pair for the room, then K drivers from the candidate
+        # lattice, then the source.
+        mics = pick_mic_positions(
+            grid_shape=grid_shape,
+            obstacle_mask=obstacle_mask,
+            n_mics=args.n_mics,
+            spacing=args.mic_spacing,
+            rng=rng,
+        )
+        candidates = free_positions(grid_shape, obstacle_mask, stride=args.reciprocal_stride)
+        if not candidates:
+            raise RuntimeError("no free candidate driver cells on the --reciprocal-stride lattice")
+        for _ in range(int(args.poses_per_room)):
+            driver_positions.append(candidates[int(rng.integers(len(candidates)))])
+            mic_positions_per_pose.append(list(mics))
+    elif args.mic_poses_per_driver > 1:
+        # Per driver run: the driver, then its N pairs on the receiver
+        # lattice; then the source.
+        for _ in range(int(args.poses_per_room) // args.mic_poses_per_driver):
+            driver = random_free_position(
+                grid_shape=grid_shape, obstacle_mask=obstacle_mask, rng=rng
+            )
+            for pair in pick_mic_pairs(
+                grid_shape,
+                obstacle_mask,
+                n_pairs=args.mic_poses_per_driver,
+                spacing=args.mic_spacing,
+                stride=args.receiver_stride,
+                rng=rng,
+            ):
+                driver_positions.append(driver)
+                mic_positions_per_pose.append(pair)
+    dense = args.reciprocal or args.mic_poses_per_driver > 1
+    for _ in range(0 if dense else int(args.poses_per_room)):
+        driver_positions.append(
+            random_free_position(grid_shape=grid_shape, obstacle_mask=obstacle_mask, rng=rng)
+        )
+        mic_positions_per_pose.append(
+            pick_mic_positions(
+                grid_shape=grid_shape,
+                obstacle_mask=obstacle_mask,
+                n_mics=args.n_mics,
+                spacing=args.mic_spacing,
+                rng=rng,
+            )
+        )
+    # One source per room, shared by all poses: the physical story is one
+    # device playing the same excitation at K spots.
+    wf, source_samples, source_fs, source_label = build_source(
+        audio_files=audio_files,
+        rng=rng,
+        sim_dt=dt,
+        sim_duration_steps=args.duration,
+        args=args,
+    )
+    return Room(
+        obstacle_mask=obstacle_mask,
+        driver_positions=driver_positions,
+        mic_positions=mic_positions_per_pose,
+        waveform=wf,
+        source_samples=source_samples,
+        source_fs=source_fs,
+        source_label=source_label,
+    )
+
+
+def simulate_rooms(
+    rooms: list[Room],
+    args: argparse.Namespace,
+    ir_cache: Optional[ImpulseResponseCache] = None,
+    receiver_dir: Optional[str] = None,
+) -> list[np.ndarray]:
+    """Record every pose of every room in one ``BatchSimulate`` launch.
+
+    Each (room, pose) pair is one batch member with its own obstacle mask,
+    driver and mic pair, so the batch kernel's prange over members keeps
+    all worker threads busy even on 64x64 grids. Returns, per room, the
+    ``sensor`` dataset: ``(T_rec, n_mics)`` at K=1, else
+    ``(K, T_rec, n_mics)``.
+
+    With ``ir_cache`` (``--ir-cache``) each pose is instead its cached
+    impulse response convolved with the room's source; only poses not
+    yet in the cache are simulated (as impulses, batched the same way).
+    With ``--reciprocal`` the impulses are injected at the mics instead,
+    one simulation per mic recording every driver of the room. With
+    ``--mic-poses-per-driver N`` each member is one driver run recorded
+    on the receiver lattice (a memmap in ``receiver_dir``), and its N
+    poses are read out of that recording.
+    """
+    n_poses = int(args.poses_per_room)
+    if args.reciprocal:
+        blocks = ir_cache.reciprocal_many(
+            [(room.obstacle_mask, room.mic_positions[0], room.driver_positions) for room in rooms]
+        )
+        rec = np.stack(
+            [
+                ir_cache.render(block[k], room.waveform, args.record_step)
+                for room, block in zip(rooms, blocks)
+                for k in range(n_poses)
+            ]
+        )
+    elif args.mic_poses_per_driver > 1:
+        per_driver = args.mic_poses_per_driver
+        batch = BatchSimulate(
+            grid_shape=(args.grid, args.grid),
+            batch_size=len(rooms) * n_poses // per_driver,
+            wavespeed=args.wavespeed,
+            gridstep=args.gridstep,
+            courant=args.courant,
+        )
+        for r, room in enumerate(rooms):
+            for d, driver in enumerate(room.driver_positions[::per_driver]):
+                member = r * (n_poses // per_driver) + d
+                batch.set_obstacle_mask(member, room.obstacle_mask)
+                batch.set_drivers(member, [Driver(position=driver, waveform=room.waveform)])
+        grid = record_receiver_grid(
+            batch,
+            args.duration,
+            stride=args.receiver_stride,
+            record_step=args.record_step,
+            dtype=np.dtype(args.receiver_dtype),
+            directory=receiver_dir,
+        )
+        rec = np.stack(
+            [
+                receiver_series(
+                    grid[(r * n_poses + k) // per_driver],
+                    room.mic_positions[k],
+                    args.receiver_stride,
+                )
+                for r, room in enumerate(rooms)
+                for k in range(n_poses)
+            ]
+        )
+        del grid
+    elif ir_cache is not None:
+        irs = ir_cache.get_many(
+            [
+                (room.obstacle_mask, room.driver_positions[k], room.mic_positions[k])
+                for room in rooms
+                for k in range(n_poses)
+            ]
+        )
+        rec = np.stack(
+            [
+                ir_cache.render(ir, rooms[member // n_poses].waveform, args.record_step)
+                for member, ir in enumerate(irs)
+            ]
+        )
+    else:
+        batch = BatchSimulate(
+            grid_shape=(args.grid, args.grid),
+            batch_size=len(rooms) * n_poses,
+            wavespeed=args.wavespeed,
+            gridstep=args.gridstep,
+            courant=args.courant,
+        )
+        for r, room in enumerate(rooms):
+            for k in range(n_poses):
+                member = r * n_poses + k
+                batch.set_obstacle_mask(member, room.obstacle_mask)
+                batch.set_drivers(
+                    member, [Driver(position=room.driver_positions[k], waveform=room.waveform)]
+                )
+                batch.set_sensors(member, room.mic_positions[k])
+        rec = batch.run(args.duration, record_step=args.record_step)  # (B, T_rec, n_mics)
+    per_room = rec.reshape(len(rooms), n_poses, rec.shape[1], rec.shape[2])
+    # Channel-last: sensor[..., t, m] = pressure at mic m, step t;
+    # multi-pose archives carry a leading pose axis.
+    return [per_room[r, 0] if n_poses == 1 else per_room[r] for r in range(len(rooms))]
+
+
+def d4_room(room: Room, sensor_out: np.ndarray, k: int) -> tuple[Room, np.ndarray]:
+    """``room`` and its ``sensor`` dataset under D4 variant ``k``; no simulation.
+
+    The recording of the transformed room equals the original's (to
+    float32 rounding); only reflections reorder the channels, and the
+    mic positions with them.
+    """
+    shape = room.obstacle_mask.shape
+    order = d4_channel_order(sensor_out.shape[-1], k)
+    drivers = d4_positions(room.driver_positions, shape, k)
+    mics = d4_positions(room.mic_positions, shape, k)[:, order]
+    return (
+        dataclasses.replace(
+            room,
+            obstacle_mask=d4_mask(room.obstacle_mask, k),
+            driver_positions=[tuple(int(c) for c in p) for p in drivers],
+            mic_positions=[[tuple(int(c) for c in p) for p in pose] for pose in mics],
+        ),
+        np.ascontiguousarray(sensor_out[..., order]),
+    )
+
+
+def write_room(
+    grp: h5py.Group,
+    room: Room,
+    sensor_out: np.ndarray,
+    dt: float,
+    args: argparse.Namespace,
+) -> None:
+    """Write one room's attrs and datasets into ``grp``."""
+    n_poses = int(args.poses_per_room)
+    grp.attrs["grid_shape"] = (args.grid, args.grid)
+    grp.attrs["wavespeed"] = float(args.wavespeed)
+    grp.attrs["gridstep"] = float(args.gridstep)
+    grp.attrs["timestep"] = float(dt)
+    grp.attrs["courant"] = float(args.courant)
+    if n_poses == 1:
+        # Original single-pose layout, byte-for-byte.
+        grp.attrs["driver_position"] = list(room.driver_positions[0])
+        # Sensor positions: one row per mic, columns are spatial dims.
+        grp.attrs["sensor_positions"] = np.asarray(room.mic_positions[0], dtype=np.int32)
+    else:
+        grp.attrs["poses_per_room"] = n_poses
+        grp.attrs["driver_positions"] = np.asarray(room.driver_positions, dtype=np.int32)
+        # (K, n_mics, dims): pose-major stack of the per-pose mic rows.
+        grp.attrs["sensor_positions"] = np.asarray(room.mic_positions, dtype=np.int32)
+    grp.attrs["n_mics"] = int(args.n_mics)
+    grp.attrs["mic_spacing"] = float(args.mic_spacing)
+    grp.attrs["audio_path"] = room.source_label
+    grp.attrs["audio_native_fs"] = float(room.source_fs)
+    grp.attrs["sim_time_per_second"] = float(args.sim_time_per_second)
+    grp.attrs["audio_amplitude"] = float(args.audio_amplitude)
+    grp.attrs["sim_duration_steps"] = int(args.duration)
+    grp.attrs["record_step"] = int(args.record_step)
+    grp.create_dataset("sensor", data=sensor_out, compression="gzip")
+    grp.create_dataset("source", data=room.source_samples, compression="gzip")
+    grp.create_dataset(
+        "obstacles",
+        data=room.obstacle_mask.astype(np.uint8),
+        compression="gzip",
+    )
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
@@ -290,6 +611,78 @@ def main() -> None:
             "of shape (K, T_rec, n_mics) with plural position attrs."
         ),
     )
+    parser.add_argument(
+        "--room-batch",
+        type=int,
+        default=16,
+        help=(
+            "Rooms simulated per BatchSimulate launch. All poses of these rooms "
+            "run as one batch (prange over members), which keeps every thread "
+            "busy on small grids. The archive is the same for every value."
+        ),
+    )
+    parser.add_argument(
+        "--ir-cache",
+        default=None,
+        help=(
+            "Directory of cached impulse responses (simulation/impulse.py). Each "
+            "pose is rendered by convolving its impulse response with the source; "
+            "only geometries not yet cached are simulated. Same archive up to "
+            "float32 rounding (~1e-6 of the peak), so swapping sources over the "
+            "same rooms (e.g. --randomize-source) costs milliseconds per sample."
+        ),
+    )
+    parser.add_argument(
+        "--reciprocal",
+        action="store_true",
+        help=(
+            "Fixed mic pair per room, K driver poses, simulated by reciprocity: "
+            "one impulse simulation per mic records all K drivers, and each pose "
+            "is rendered by convolution. Uses --ir-cache if given."
+        ),
+    )
+    parser.add_argument(
+        "--reciprocal-stride",
+        type=int,
+        default=1,
+        help="With --reciprocal, draw drivers from every Nth free interior cell per axis.",
+    )
+    parser.add_argument(
+        "--mic-poses-per-driver",
+        type=int,
+        default=1,
+        help=(
+            "Stereo poses drawn from each driver run. Above 1, every --receiver-stride-th "
+            "cell is recorded and the pairs are drawn from that recording afterwards; "
+            "--poses-per-room must be a multiple."
+        ),
+    )
+    parser.add_argument(
+        "--receiver-stride",
+        type=int,
+        default=2,
+        help="Receiver lattice spacing (cells) for --mic-poses-per-driver.",
+    )
+    parser.add_argument(
+        "--receiver-dtype",
+        choices=["float16", "float32"],
+        default="float16",
+        help="Storage dtype of the receiver-lattice recording.",
+    )
+    parser.add_argument(
+        "--receiver-dir",
+        default=None,
+        help="Directory of the receiver-lattice memmap (default: a temporary directory).",
+    )
+    parser.add_argument(
+        "--d4-augment",
+        action="store_true",
+        help=(
+            "Write each simulated room 8 times, rotated and flipped with its driver and "
+            "mic positions (stereo channels reversed for flips). Exact, and no extra "
+            "simulation; --num-samples counts simulated rooms."
+        ),
+    )
     parser.add_argument("--seed", type=int, default=0, help="RNG seed.")
     parser.add_argument("--verbose", action="store_true", help="Print per-sample status to stderr.")
     args = parser.parse_args()
@@ -316,9 +709,28 @@ def main() -> None:
         courant=args.courant,
     )
     dt = probe.timestep
+    ir_cache = None
+    if args.ir_cache or args.reciprocal:
+        ir_cache = ImpulseResponseCache(
+            args.ir_cache or None,
+            grid_shape=(args.grid, args.grid),
+            duration=args.duration,
+            wavespeed=args.wavespeed,
+            gridstep=args.gridstep,
+            courant=args.courant,
+        )
+
+    # Each launch overwrites one receiver memmap, so the directory holds
+    # a single room batch at a time. A temporary one is removed however
+    # the run ends (error or Ctrl-C included): the memmap can be GBs.
+    receivers = (
+        tempfile.TemporaryDirectory(prefix="receivers-")
+        if args.mic_poses_per_driver > 1 and args.receiver_dir is None
+        else contextlib.nullcontext(args.receiver_dir)
+    )
 
     t0 = time.perf_counter()
-    with h5py.File(out_path, "w") as hf:
+    with receivers as receiver_dir, h5py.File(out_path, "w") as hf:
         hf.attrs["save_type"] = "active_sensing"
         hf.attrs["created_at"] = time.strftime("%Y-%m-%d_%H-%M-%S")
         hf.attrs["seed"] = int(args.seed)
@@ -328,6 +740,18 @@ def main() -> None:
         n_poses = int(args.poses_per_room)
         if n_poses < 1:
             raise SystemExit("--poses-per-room must be >= 1")
+        if args.mic_poses_per_driver < 1:
+            raise SystemExit("--mic-poses-per-driver must be >= 1")
+        if args.mic_poses_per_driver > 1:
+            if n_poses % args.mic_poses_per_driver:
+                raise SystemExit("--poses-per-room must be a multiple of --mic-poses-per-driver")
+            if args.reciprocal or args.ir_cache or args.n_mics != 2:
+                raise SystemExit(
+                    "--mic-poses-per-driver needs --n-mics 2 and no --reciprocal / --ir-cache"
+                )
+            hf.attrs["mic_poses_per_driver"] = int(args.mic_poses_per_driver)
+            hf.attrs["receiver_stride"] = int(args.receiver_stride)
+            hf.attrs["receiver_dtype"] = str(args.receiver_dtype)
         hf.attrs["poses_per_room"] = n_poses
         # File-level acquisition protocol (Task 2.3): consumers that run
         # live inference (learning/sensing.py) must reproduce EXACTLY the
@@ -348,138 +772,52 @@ def main() -> None:
         hf.attrs["synth_f_end"] = float(args.synth_f_end)
         hf.attrs["randomize_source"] = bool(args.randomize_source)
         hf.attrs["room_style"] = str(args.room_style)
+        if args.d4_augment:
+            hf.attrs["d4_augment"] = True
+        if ir_cache is not None:
+            # Rendered by convolution rather than simulated per source.
+            hf.attrs["ir_rendered"] = True
+        if args.reciprocal:
+            # One mic pair per room; driver_positions vary per pose.
+            hf.attrs["reciprocal"] = True
+            hf.attrs["reciprocal_stride"] = int(args.reciprocal_stride)
 
         occupancy_sum = 0.0
-        for s in range(int(args.num_samples)):
-            if args.room_style == "mixed":
-                obstacle_mask = generate_diverse_obstacles(
-                    grid_shape=(args.grid, args.grid),
-                    min_size=args.obstacle_min,
-                    max_size=args.obstacle_max,
-                    rng=rng,
-                )
-            else:
-                obstacle_mask = generate_random_obstacles(
-                    grid_shape=(args.grid, args.grid),
-                    n_obstacles=args.n_obstacles,
-                    min_size=args.obstacle_min,
-                    max_size=args.obstacle_max,
-                    rng=rng,
-                )
-            occupancy_sum += float(obstacle_mask.mean())
-            # Per-pose placements. The RNG draw order (driver, then mics,
-            # pose by pose, THEN source) reduces exactly to the original
-            # order at K=1, so seeded single-pose archives reproduce the
-            # pre-multi-pose files bit-for-bit.
-            driver_positions = []
-            mic_positions_per_pose = []
-            for _ in range(n_poses):
-                driver_positions.append(
-                    random_free_position(
-                        grid_shape=(args.grid, args.grid),
-                        obstacle_mask=obstacle_mask,
-                        rng=rng,
-                    )
-                )
-                mic_positions_per_pose.append(
-                    pick_mic_positions(
-                        grid_shape=(args.grid, args.grid),
-                        obstacle_mask=obstacle_mask,
-                        n_mics=args.n_mics,
-                        spacing=args.mic_spacing,
-                        rng=rng,
-                    )
-                )
-            # One source per room, shared by all poses: the physical story
-            # is one device playing the same excitation at K spots.
-            wf, source_samples, source_fs, source_label = build_source(
-                audio_files=audio_files,
-                rng=rng,
-                sim_dt=dt,
-                sim_duration_steps=args.duration,
-                args=args,
-            )
-            # One Simulate per room, reset between poses. reset() zeroes
-            # the fields and the clock but keeps geometry, so each pose
-            # sees a numerically fresh run in the same room without paying
-            # obstacle re-upload.
-            sim = Simulate(
-                grid_shape=(args.grid, args.grid),
-                drivers=[],
-                wavespeed=args.wavespeed,
-                gridstep=args.gridstep,
-                courant=args.courant,
-            )
-            # Push obstacles in batch — the engine's set_obstacle accepts
-            # an iterable of (i, j) tuples and updates the hot-loop guard
-            # once.
-            mask_idx = np.argwhere(obstacle_mask)
-            if mask_idx.size:
-                sim.set_obstacle([tuple(int(c) for c in row) for row in mask_idx])
-
-            recordings_per_pose = []
-            for k in range(n_poses):
-                sim.reset()
-                sim.set_drivers([Driver(position=driver_positions[k], waveform=wf)])
-                sensors = [Sensor(position=p) for p in mic_positions_per_pose[k]]
-                recordings_per_pose.append(
-                    run_with_sensors(
-                        sim=sim,
-                        duration=args.duration,
-                        sensors=sensors,
-                        record_step=args.record_step,
+        # Zero-padded wide enough that sorted keys keep a room's variants adjacent.
+        key_width = max(4, len(str(D4_VARIANTS * int(args.num_samples) - 1)))
+        room_batch = int(args.room_batch)
+        if room_batch < 1:
+            raise SystemExit("--room-batch must be >= 1")
+        for first in range(0, int(args.num_samples), room_batch):
+            # Draw every room of the batch first, in sample order. The
+            # simulation consumes no randomness, so the RNG stream (and
+            # hence the archive) is identical for every --room-batch.
+            rooms = [
+                draw_room(args, rng, audio_files, dt)
+                for _ in range(min(room_batch, int(args.num_samples) - first))
+            ]
+            recordings = simulate_rooms(rooms, args, ir_cache, receiver_dir)
+            for offset, (room, sensor_out) in enumerate(zip(rooms, recordings)):
+                s = first + offset
+                occupancy_sum += float(room.obstacle_mask.mean())
+                if not args.d4_augment:
+                    write_room(hf.create_group(f"sample_{s:04d}"), room, sensor_out, dt, args)
+                for k in range(D4_VARIANTS if args.d4_augment else 0):
+                    grp = hf.create_group(f"sample_{D4_VARIANTS * s + k:0{key_width}d}")
+                    write_room(grp, *d4_room(room, sensor_out, k), dt, args)
+                    grp.attrs["d4_room"] = s
+                    grp.attrs["d4_variant"] = k
+                if args.verbose:
+                    elapsed = time.perf_counter() - t0
+                    mic_str = ", ".join(str(tuple(p)) for p in room.mic_positions[0])
+                    print(
+                        f"[active-sensing] sample {s + 1:4d}/{args.num_samples} "
+                        f"poses={n_poses} driver0={room.driver_positions[0]} mics0=[{mic_str}] "
+                        f"obstacles={int(room.obstacle_mask.sum())} "
+                        f"peak_rec={float(np.max(np.abs(sensor_out))):.3e} "
+                        f"elapsed={elapsed:.1f}s",
+                        file=sys.stderr,
                     )
-                )
-
-            grp = hf.create_group(f"sample_{s:04d}")
-            grp.attrs["grid_shape"] = (args.grid, args.grid)
-            grp.attrs["wavespeed"] = float(args.wavespeed)
-            grp.attrs["gridstep"] = float(args.gridstep)
-            grp.attrs["timestep"] = float(sim.timestep)
-            grp.attrs["courant"] = float(args.courant)
-            if n_poses == 1:
-                # Original single-pose layout, byte-for-byte.
-                grp.attrs["driver_position"] = list(driver_positions[0])
-                # Sensor positions: one row per mic, columns are spatial dims.
-                grp.attrs["sensor_positions"] = np.asarray(
-                    mic_positions_per_pose[0], dtype=np.int32
-                )
-            else:
-                grp.attrs["poses_per_room"] = n_poses
-                grp.attrs["driver_positions"] = np.asarray(driver_positions, dtype=np.int32)
-                # (K, n_mics, dims): pose-major stack of the per-pose mic rows.
-                grp.attrs["sensor_positions"] = np.asarray(mic_positions_per_pose, dtype=np.int32)
-            grp.attrs["n_mics"] = int(args.n_mics)
-            grp.attrs["mic_spacing"] = float(args.mic_spacing)
-            grp.attrs["audio_path"] = source_label
-            grp.attrs["audio_native_fs"] = float(source_fs)
-            grp.attrs["sim_time_per_second"] = float(args.sim_time_per_second)
-            grp.attrs["audio_amplitude"] = float(args.audio_amplitude)
-            grp.attrs["sim_duration_steps"] = int(args.duration)
-            grp.attrs["record_step"] = int(args.record_step)
-            # Channel-last: sensor[..., t, m] = pressure at mic m, step t;
-            # multi-pose archives carry a leading pose axis.
-            sensor_out = (
-                recordings_per_pose[0] if n_poses == 1 else np.stack(recordings_per_pose, axis=0)
-            )
-            grp.create_dataset("sensor", data=sensor_out, compression="gzip")
-            grp.create_dataset("source", data=source_samples, compression="gzip")
-            grp.create_dataset(
-                "obstacles",
-                data=obstacle_mask.astype(np.uint8),
-                compression="gzip",
-            )
-            if args.verbose:
-                elapsed = time.perf_counter() - t0
-                mic_str = ", ".join(str(tuple(p)) for p in mic_positions_per_pose[0])
-                print(
-                    f"[active-sensing] sample {s + 1:4d}/{args.num_samples} "
-                    f"poses={n_poses} driver0={driver_positions[0]} mics0=[{mic_str}] "
-                    f"obstacles={int(obstacle_mask.sum())} "
-                    f"peak_rec={float(np.max(np.abs(sensor_out))):.3e} "
-                    f"elapsed={elapsed:.1f}s",
-                    file=sys.stderr,
-                )
 
         # Realised marginal obstacle prior of THIS archive — the pi-hat
         # the Bayes fusion rule needs. Written after the loop so it is
@@ -487,8 +825,9 @@ def main() -> None:
         hf.attrs["mean_obstacle_fraction"] = occupancy_sum / max(int(args.num_samples), 1)
 
     total_s = time.perf_counter() - t0
+    n_written = int(args.num_samples) * (D4_VARIANTS if args.d4_augment else 1)
     print(
-        f"[active-sensing] wrote {args.num_samples} samples to {out_path} "
+        f"[active-sensing] wrote {n_written} samples to {out_path} "
         f"({total_s:.1f}s, {total_s / max(args.num_samples, 1):.2f}s/sample, "
         f"mean occupancy {100 * occupancy_sum / max(int(args.num_samples), 1):.1f}%)"
     )
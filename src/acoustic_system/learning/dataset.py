@@ -26,6 +26,14 @@ reading modes:
   sample per room, with ``sensor`` of shape ``(K, n_mics, T_rec)`` for
   ``JointPoseCNN``. Single-pose archives yield ``(1, n_mics, T_rec)``
   in this mode.
+
+``symmetry=True`` draws one of the eight symmetries of the square per
+sample (``simulation/dataset.py``, D4) and applies it on the fly: the
+mask is rotated / flipped at native resolution, and the recording is
+kept as is, since the transformed room with its transformed driver and
+mics records the same signal exactly. Reflections reverse the mic
+channels to keep a stereo pair's handedness. ``generate_active_sensing.py
+--d4-augment`` writes the same variants to disk instead.
 """
 
 from __future__ import annotations
@@ -38,6 +46,8 @@ import numpy as np
 import torch
 from torch.utils.data import Dataset
 
+from acoustic_system.simulation.dataset import D4_VARIANTS, d4_channel_order, d4_mask
+
 
 class ActiveSensingDataset(Dataset):
     """HDF5-backed dataset for the active-sensing CNN.
@@ -52,6 +62,10 @@ class ActiveSensingDataset(Dataset):
         native shape; in that case all samples in the dataset must have
         identical mask shape (typical, since the script writes a fixed
         ``--grid``-by-``--grid`` mask per run).
+    symmetry
+        Apply a uniformly drawn D4 variant to every sample (see the
+        module docstring). Exact, so unlike ``augment`` it may also be
+        used on validation views; it is off by default for both.
     """
 
     def __init__(
@@ -62,6 +76,7 @@ class ActiveSensingDataset(Dataset):
         gain_range: Tuple[float, float] = (0.7, 1.3),
         noise_std: float = 0.02,
         flatten_poses: bool = True,
+        symmetry: bool = False,
     ) -> None:
         self.hdf5_path = str(hdf5_path)
         self.target_mask_size = target_mask_size
@@ -73,6 +88,7 @@ class ActiveSensingDataset(Dataset):
         self.augment = bool(augment)
         self.gain_range = gain_range
         self.noise_std = float(noise_std)
+        self.symmetry = bool(symmetry)
 
         # Inventory the archive in __init__ so __len__ is cheap and the
         # sample order is deterministic. We do NOT cache an open file
@@ -136,6 +152,18 @@ class ActiveSensingDataset(Dataset):
             source_np = np.asarray(grp["source"], dtype=np.float32)  # (T_audio,)
             mask_np = np.asarray(grp["obstacles"], dtype=np.float32)  # (H, W)
 
+        if self.symmetry:
+            # Torch's RNG, like the jitter below, so DataLoader workers
+            # draw independent variants. Native resolution first: the
+            # resize is not equivariant at every size.
+            k = int(torch.randint(D4_VARIANTS, ()))
+            mask_np = d4_mask(mask_np, k)
+            # Channels are the last axis in flat mode ((T_rec, n_mics))
+            # and axis 1 in joint mode ((K, n_mics, T_rec)).
+            channel_axis = -1 if self.flatten_poses else 1
+            order = d4_channel_order(sensor_np.shape[channel_axis], k)
+            sensor_np = np.take(sensor_np, order, axis=channel_axis)
+
         # Channel-first for PyTorch convolutions. Joint mode is already
         # transposed above ((K, n_mics, T_rec)); flat mode transposes here.
         sensor = torch.from_numpy(
@@ -6,8 +6,9 @@ This module packages the **recommended Phase 2 sensing recipe**
 1. Given a room's obstacle mask, place K independent (driver, mic-pair)
    poses — the physical picture is a laptop carried to K spots, playing
    a chirp and recording at each.
-2. Run the FDTD forward simulation per pose and record the stereo
-   sensor timeseries (same parameters as the training distribution).
+2. Run the FDTD forward simulation for all K poses as one
+   ``BatchSimulate`` launch and record the stereo sensor timeseries
+   (same parameters as the training distribution).
 3. Run the joint-trained encoder on each pose *separately* (K=1 input).
 4. Fuse the per-pose logit maps with the prior-corrected Bayes product
    rule:
@@ -42,13 +43,14 @@ from numpy.typing import NDArray
 
 from acoustic_system.learning.calibration import calibrated_bayes_fuse, load_calibration
 from acoustic_system.learning.model import build_model
+from acoustic_system.simulation.batch import BatchSimulate
 from acoustic_system.simulation.dataset import (
     pick_mic_positions,
     random_free_position,
-    run_with_sensors,
     synthetic_chirp,
 )
-from acoustic_system.simulation.setup import Driver, Sensor
+from acoustic_system.simulation.impulse import ImpulseResponseCache
+from acoustic_system.simulation.setup import Driver
 from acoustic_system.simulation.simulate import Simulate
 from acoustic_system.simulation.waveforms import AudioFileWaveform
 
@@ -188,6 +190,8 @@ def sense_room(
     seed: int = 0,
     prior: Optional[float] = None,
     rng: Optional[np.random.Generator] = None,
+    ir_cache: Optional[ImpulseResponseCache] = None,
+    reciprocal: bool = False,
 ) -> SenseResult:
     """Run the full sense -> infer -> fuse pipeline on one room.
 
@@ -204,6 +208,17 @@ def sense_room(
         Number of (driver, mic-pair) poses to acquire.
     seed / rng
         Reproducibility. ``rng`` wins if provided.
+    ir_cache
+        Optional impulse-response cache built for the checkpoint's
+        protocol (grid, duration, courant). Poses are then rendered by
+        convolving their cached impulse responses with the chirp, and
+        only geometries new to the cache are simulated. Same recordings
+        up to float32 rounding.
+    reciprocal
+        Keep one mic pair for the room and move only the driver: the
+        K poses then cost two impulse simulations (one per mic, by
+        reciprocity) rather than K. Uses ``ir_cache`` if given, else an
+        in-memory one. Draws a different pose set than the default.
 
     Notes
     -----
@@ -234,41 +249,63 @@ def sense_room(
     )
     source_t = torch.from_numpy(chirp.copy())[None, None]  # (1, 1, T_audio)
 
-    # One engine per room; reset() between poses (keeps geometry).
-    sim = Simulate(grid_shape=(grid, grid), drivers=[], courant=cfg.courant)
-    cells = np.argwhere(mask_bool)
-    if cells.size:
-        sim.set_obstacle([tuple(int(c) for c in row) for row in cells])
-
-    logits_list: list[NDArray[np.float32]] = []
+    # All K poses are drawn up front (same RNG order as drawing them one
+    # at a time: the simulation consumes no randomness) and simulated as
+    # one batch — every member shares the room's geometry and the chirp,
+    # but has its own driver and mic pair.
     drivers: list[tuple[int, ...]] = []
     mics: list[list[tuple[int, ...]]] = []
-    with torch.no_grad():
+    if reciprocal:
+        pair = pick_mic_positions(
+            (grid, grid), mask_bool, n_mics=2, spacing=cfg.mic_spacing, rng=rng
+        )
         for _ in range(int(n_poses)):
-            driver_pos = random_free_position((grid, grid), mask_bool, rng=rng)
-            mic_pos = pick_mic_positions(
-                (grid, grid), mask_bool, n_mics=2, spacing=cfg.mic_spacing, rng=rng
-            )
-            wf = AudioFileWaveform.from_samples(
-                samples=chirp,
-                sample_rate=cfg.sample_rate,
-                amplitude=cfg.amplitude,
-                delay=0.0,
-                sim_time_per_second=1.0,
-            )
-            sim.reset()
-            sim.set_drivers([Driver(position=driver_pos, waveform=wf)])
-            rec = run_with_sensors(
-                sim=sim,
-                duration=cfg.duration,
-                sensors=[Sensor(position=p) for p in mic_pos],
-                record_step=1,
-            )  # (T_rec, 2)
-            sensor_t = torch.from_numpy(rec.T.copy())[None]  # (1, 2, T_rec)
+            drivers.append(random_free_position((grid, grid), mask_bool, rng=rng))
+            mics.append(list(pair))
+    for _ in range(0 if reciprocal else int(n_poses)):
+        drivers.append(random_free_position((grid, grid), mask_bool, rng=rng))
+        mics.append(
+            pick_mic_positions((grid, grid), mask_bool, n_mics=2, spacing=cfg.mic_spacing, rng=rng)
+        )
+    wf = AudioFileWaveform.from_samples(
+        samples=chirp,
+        sample_rate=cfg.sample_rate,
+        amplitude=cfg.amplitude,
+        delay=0.0,
+        sim_time_per_second=1.0,
+    )
+    if reciprocal and ir_cache is None:
+        ir_cache = ImpulseResponseCache(
+            None, (grid, grid), cfg.duration, timestep=dt, courant=cfg.courant
+        )
+    if ir_cache is not None:
+        if (
+            ir_cache.grid_shape != (grid, grid)
+            or ir_cache.duration != cfg.duration
+            or ir_cache.timestep != dt
+        ):
+            raise ValueError("ir_cache was built for another acquisition protocol")
+        if reciprocal:
+            irs = list(ir_cache.reciprocal(mask_bool, mics[0], drivers)) if drivers else []
+        else:
+            irs = ir_cache.get_many([(mask_bool, d, m) for d, m in zip(drivers, mics)])
+        recordings = np.stack([ir_cache.render(ir, wf) for ir in irs])  # (K, T_rec, 2)
+    else:
+        batch = BatchSimulate(
+            grid_shape=(grid, grid), batch_size=max(len(drivers), 1), courant=cfg.courant
+        )
+        for k, (driver_pos, mic_pos) in enumerate(zip(drivers, mics)):
+            batch.set_obstacle_mask(k, mask_bool)
+            batch.set_drivers(k, [Driver(position=driver_pos, waveform=wf)])
+            batch.set_sensors(k, mic_pos)
+        recordings = batch.run(cfg.duration, record_step=1)  # (K, T_rec, 2)
+
+    logits_list: list[NDArray[np.float32]] = []
+    with torch.no_grad():
+        for k in range(len(drivers)):
+            sensor_t = torch.from_numpy(recordings[k].T.copy())[None]  # (1, 2, T_rec)
             logits = model(sensor_t, source_t)[0, 0].numpy().astype(np.float32)
             logits_list.append(logits)
-            drivers.append(driver_pos)
-            mics.append(mic_pos)
 
     logits_arr = np.stack(logits_list, axis=0)  # (K, H, W)
 
@@ -43,6 +43,7 @@ from torch.utils.data import DataLoader
 from acoustic_system.learning.dataset import ActiveSensingDataset
 from acoustic_system.learning.losses import bce_dice_loss, iou_score
 from acoustic_system.learning.model import build_model
+from acoustic_system.simulation.dataset import D4_VARIANTS
 
 if isinstance(sys.stdout, _io.TextIOWrapper):
     sys.stdout.reconfigure(line_buffering=True)
@@ -84,6 +85,17 @@ def parse_args() -> argparse.Namespace:
             "not robustness to the augmentation distribution."
         ),
     )
+    p.add_argument(
+        "--symmetry",
+        action="store_true",
+        help=(
+            "Train-only D4 symmetry augmentation: each sample's room is rotated / "
+            "flipped by one of the 8 symmetries of the square, stereo channels "
+            "reversed for flips. The recording is unchanged and mic / driver "
+            "placement is drawn D4-invariantly, so a variant is as likely a "
+            "sample as a freshly simulated room."
+        ),
+    )
     p.add_argument(
         "--model",
         choices=["dual", "passive", "joint", "skip"],
@@ -144,6 +156,7 @@ def main() -> None:
         target_mask_size=args.target_size,
         augment=args.augment,
         flatten_poses=flatten,
+        symmetry=args.symmetry,
     )
     val_dataset = ActiveSensingDataset(
         args.dataset,
@@ -152,9 +165,16 @@ def main() -> None:
         flatten_poses=flatten,
     )
     n_total = len(train_dataset)
-    n_val = max(1, int(args.val_frac * n_total))
+    # A --d4-augment archive stores each room as D4_VARIANTS consecutive
+    # samples. Split whole groups, so no room has variants on both sides.
+    group = 1
+    if train_dataset.file_attrs.get("d4_augment"):
+        group = D4_VARIANTS * (train_dataset.poses_per_room if flatten else 1)
+    n_groups = n_total // group
+    n_val = max(1, int(args.val_frac * n_groups)) * group
     n_train = n_total - n_val
-    indices = torch.randperm(n_total, generator=torch.Generator().manual_seed(args.seed)).tolist()
+    perm = torch.randperm(n_groups, generator=torch.Generator().manual_seed(args.seed)).tolist()
+    indices = [g * group + i for g in perm for i in range(group)]
     train_indices = indices[:n_train]
     val_indices = indices[n_train:]
     train_ds = torch.utils.data.Subset(train_dataset, train_indices)
@@ -0,0 +1,494 @@
+"""Per-machine kernel autotuner for the compiled run loops.
+
+The fastest way to run ``Simulate.run()`` depends on the machine and the
+grid: how many numba threads to use before the memory bus saturates,
+whether a small grid is better off without the prange fork/join at all,
+and whether temporal blocking (``fused_leapfrog_run_tiled_*``) beats the
+plain loop, with which block length and slab budget. These used to be
+hard-coded (a ``cpu_count - 3`` thread cap measured on one 16-thread
+desktop). Now they are measured.
+
+Tuning is explicit: ``python -m acoustic_system.simulation.autotune``
+(``main``), ``tune_simulate`` / ``tune_batch``, or a
+``Simulate(autotune=True)`` / ``BatchSimulate(autotune=True)`` whose
+bucket is not cached yet. It benchmarks a handful of candidate
+``KernelConfig`` values on a proxy engine for a (dimensionality,
+memory mode, storage dtype, grid-size bucket) — or, for the batched
+kernels, a (dimensionality, member-size bucket, batch-size bucket) —
+and keeps the fastest. Buckets are powers of two in cell count, so a
+201x199 grid reuses the 200x200 result. The proxy is a fresh grid of
+the bucket's size, never a copy of the caller's, and buckets stop at
+``_MAX_PROXY_CELLS``: every larger grid shares the top bucket, tuned at
+that size, so tuning a large 3D grid does not double its memory.
+
+By default (``autotune=None``) engines only read the cache: a tuned
+bucket is used, an untuned one runs ``default_config()``, and nothing
+is measured or written. Winners are stored in a JSON file keyed by a
+machine fingerprint (CPU model, core and thread counts, numba version),
+so a cache copied to another machine is ignored rather than
+misapplied.
+
+Every candidate gives the same field values; only the time differs.
+(The serial build may zero an obstacle cell as -0.0 where the parallel
+one writes +0.0.)
+
+Environment:
+
+* ``ACOUSTIC_AUTOTUNE=0`` disables tuning and cached configurations;
+  ``kernel_config`` then returns ``default_config()`` without touching
+  the cache.
+* ``ACOUSTIC_AUTOTUNE_CACHE`` overrides the cache file location
+  (default ``$XDG_CACHE_HOME/acoustic_system/autotune.json``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import hashlib
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numba
+import numpy as np
+from numba import njit
+
+# Bump when the candidate set or the meaning of a stored field changes,
+# so stale cache entries are re-measured instead of reused.
+_CACHE_VERSION = 2
+
+# Wall time one timed measurement should take, and the number of
+# measurements per candidate (the best one counts).
+_TARGET_SECONDS = 0.01
+_TRIALS = 3
+
+# A candidate must beat the incumbent by this fraction to replace it, so
+# timer noise does not flip the choice between near-equal configurations.
+_MIN_GAIN = 0.05
+
+_TIME_BLOCKS = (2, 4, 8)
+_TILE_BYTES = (512 << 10, 2 << 20, 8 << 20)
+
+# Largest proxy a tuning run allocates, in cells (for a batch, over all
+# members): 48 MiB of float32 fields. Grids past it are memory-bound
+# like it, so they share its bucket instead of being timed at size.
+_MAX_PROXY_CELLS = 1 << 22
+
+
+@dataclasses.dataclass(frozen=True)
+class KernelConfig:
+    """How the compiled run loop is launched.
+
+    ``threads`` is the numba thread count during the call. ``parallel``
+    False selects a serial compile of the same kernel (no prange
+    fork/join). ``time_block`` > 1 routes ``run()`` through the
+    temporally blocked kernel with slabs sized to ``tile_bytes``.
+    """
+
+    threads: int
+    parallel: bool = True
+    time_block: int = 1
+    tile_bytes: int = 2 << 20
+
+
+def default_threads() -> int:
+    """Untuned thread count: the old hand-measured heuristic.
+
+    On a 16-thread desktop the fused 2D kernel was fastest at 13 threads
+    (memory bus saturated beyond that), so machines with 8 or more
+    logical cores leave about three free, never dropping under four;
+    smaller machines use every core.
+    """
+    cpu = int(os.cpu_count() or 1)
+    threads = max(min(cpu - 3, 13), 4) if cpu >= 8 else cpu
+    return max(1, min(threads, numba.config.NUMBA_NUM_THREADS))
+
+
+def set_default_threads() -> None:
+    """Set numba's thread count to ``default_threads()``.
+
+    Called when a CPU ``Simulate`` binds its step kernels, which run
+    outside ``kernel_config``'s reach. A count numba rejects as out of
+    range (``ValueError``) leaves the current count in place.
+    """
+    try:
+        numba.set_num_threads(default_threads())
+    except ValueError:
+        pass
+
+
+def default_config() -> KernelConfig:
+    """Configuration used before (or without) tuning."""
+    return KernelConfig(threads=default_threads())
+
+
+def tuning_enabled() -> bool:
+    flag = os.environ.get("ACOUSTIC_AUTOTUNE", "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def cache_path() -> Path:
+    override = os.environ.get("ACOUSTIC_AUTOTUNE_CACHE")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "acoustic_system" / "autotune.json"
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def machine_fingerprint() -> str:
+    """Short hash of what the timings depend on besides the grid."""
+    parts = [
+        platform.machine(),
+        _cpu_model(),
+        str(os.cpu_count()),
+        str(numba.config.NUMBA_NUM_THREADS),
+        numba.__version__,
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def _log2_cells(cells: int) -> int:
+    """Bucket exponent of ``cells``: log2 rounded, capped at the largest proxy."""
+    top = round(math.log2(_MAX_PROXY_CELLS))
+    return min(round(math.log2(max(1, int(cells)))), top)
+
+
+def bucket_key(dims: int, memory_mode: str, storage_dtype: str, grid_shape: tuple) -> str:
+    """Cache key of a grid: its kind plus log2 of its cell count, rounded and capped."""
+    cells = _log2_cells(int(np.prod(grid_shape)))
+    return f"{dims}d/{memory_mode}/{storage_dtype}/2^{cells}"
+
+
+def batch_key(dims: int, grid_shape: tuple, batch_size: int) -> str:
+    """Cache key of a ``BatchSimulate``: member size and batch size, log2 buckets."""
+    cells = _log2_cells(int(np.prod(grid_shape)))
+    return f"batch/{dims}d/2^{cells}/b2^{round(math.log2(max(1, int(batch_size))))}"
+
+
+# In-process view of the cache file's entries for this machine; None
+# until first read.
+_CONFIGS: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+def _read_cache(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"version": _CACHE_VERSION, "machines": {}}
+    if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+        return {"version": _CACHE_VERSION, "machines": {}}
+    data.setdefault("machines", {})
+    return data
+
+
+def _machine_entries() -> Dict[str, Dict[str, Any]]:
+    global _CONFIGS
+    if _CONFIGS is None:
+        _CONFIGS = dict(_read_cache(cache_path())["machines"].get(machine_fingerprint(), {}))
+    return _CONFIGS
+
+
+def _store(key: str, entry: Dict[str, Any]) -> None:
+    """Add one entry to the cache file, merging with whatever is there now."""
+    _machine_entries()[key] = entry
+    path = cache_path()
+    data = _read_cache(path)
+    data["machines"].setdefault(machine_fingerprint(), {})[key] = entry
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError:
+        # A read-only home is not an error: the result still holds for
+        # this process, and the next one tunes again.
+        pass
+
+
+def clear_memory_cache() -> None:
+    """Forget entries read from disk (the next lookup re-reads the file)."""
+    global _CONFIGS
+    _CONFIGS = None
+
+
+def _config_from(entry: Dict[str, Any]) -> KernelConfig:
+    fields = {f.name for f in dataclasses.fields(KernelConfig)}
+    return KernelConfig(**{k: v for k, v in entry.items() if k in fields})
+
+
+@contextlib.contextmanager
+def threads(n: int) -> Iterator[None]:
+    """Run the body with ``n`` numba threads, then restore the old count."""
+    n = max(1, min(int(n), numba.config.NUMBA_NUM_THREADS))
+    old = numba.get_num_threads()
+    if n == old:
+        yield
+        return
+    numba.set_num_threads(n)
+    try:
+        yield
+    finally:
+        numba.set_num_threads(old)
+
+
+_SERIAL: Dict[Any, Any] = {}
+
+
+def serial_twin(kernel: Any) -> Any:
+    """Serial compile of a ``parallel=True`` kernel (prange runs as range).
+
+    Compiled in-process on first use and not cached on disk: numba's
+    cache index does not tell a serial build from the parallel one of
+    the same function, so they would overwrite each other's entries.
+    """
+    twin = _SERIAL.get(kernel)
+    if twin is None:
+        twin = njit(fastmath=True, boundscheck=False, error_model="numpy")(kernel.py_func)
+        _SERIAL[kernel] = twin
+    return twin
+
+
+def _lookup(key: str, measure: Optional[Callable[[], Dict[str, Any]]]) -> KernelConfig:
+    """Cached configuration of ``key``; on a miss, ``measure()`` it if given."""
+    if not tuning_enabled():
+        return default_config()
+    entry = _machine_entries().get(key)
+    if entry is None:
+        if measure is None:
+            return default_config()
+        entry = measure()
+        _store(key, entry)
+    return _config_from(entry)
+
+
+def kernel_config(sim: Any, measure: bool = False) -> KernelConfig:
+    """Configuration for ``sim``'s bucket: cached, else measured if ``measure``, else default."""
+    key = bucket_key(sim.dims, sim.memory_mode, sim.storage_dtype, sim.grid_shape)
+    return _lookup(
+        key,
+        (lambda: tune_simulate(sim.dims, sim.memory_mode, sim.storage_dtype, sim.grid_shape))
+        if measure
+        else None,
+    )
+
+
+def batch_config(batch: Any, measure: bool = False) -> KernelConfig:
+    """``kernel_config`` of a ``BatchSimulate`` (threads and serial build only)."""
+    key = batch_key(batch.dims, batch.grid_shape, batch.batch_size)
+    return _lookup(
+        key,
+        (lambda: tune_batch(batch.dims, batch.grid_shape, batch.batch_size)) if measure else None,
+    )
+
+
+def proxy_shape(dims: int, cells: int) -> Tuple[int, ...]:
+    """A cube of ``dims`` axes with about ``cells`` cells (capped), at least 3 per axis."""
+    side = max(3, round(2.0 ** (_log2_cells(cells) / dims)))
+    return (side,) * dims
+
+
+def _fill(fields: Sequence[np.ndarray], lut: Optional[np.ndarray]) -> None:
+    """Nonzero values everywhere, so no candidate is timed on zeros
+    (or on the denormals a pulse leaves in its tail). float32 throughout."""
+    rng = np.random.default_rng(0)
+    for buf in fields:
+        values = rng.random(buf.shape, dtype=np.float32)
+        values *= 2.0
+        values -= 1.0
+        if lut is None:
+            buf[...] = values
+        elif buf.dtype == np.float16:
+            buf[...] = values.astype(np.float16)
+        else:
+            buf[...] = (values.view(np.uint32) >> 16).astype(np.uint16)
+
+
+def _proxy_simulate(
+    dims: int, memory_mode: str, storage_dtype: str, grid_shape: Tuple[int, ...]
+) -> Any:
+    """A fresh ``Simulate`` of the bucket's size: one centred driver, busy fields."""
+    from .setup import Driver
+    from .simulate import Simulate
+    from .waveforms import RickerWavelet
+
+    shape = proxy_shape(dims, int(np.prod(grid_shape)))
+    centre = tuple(s // 2 for s in shape)
+    proxy = Simulate(
+        grid_shape=shape,
+        drivers=[Driver(centre, RickerWavelet(amplitude=1.0, frequency=0.1, delay=10.0))],
+        memory_mode=memory_mode,
+        storage_dtype=storage_dtype,
+        autotune=False,
+    )
+    _fill((proxy.p, proxy.p_prev), proxy._storage_lut)
+    return proxy
+
+
+def _proxy_batch(dims: int, grid_shape: Tuple[int, ...], batch_size: int) -> Any:
+    """A fresh ``BatchSimulate`` of the bucket's size, one driver and sensor per member."""
+    from .batch import BatchSimulate
+    from .setup import Driver
+    from .waveforms import RickerWavelet
+
+    shape = proxy_shape(dims, int(np.prod(grid_shape)))
+    members = max(1, min(int(batch_size), _MAX_PROXY_CELLS // int(np.prod(shape))))
+    proxy = BatchSimulate(shape, members, autotune=False)
+    centre = tuple(s // 2 for s in shape)
+    for b in range(members):
+        proxy.set_drivers(b, [Driver(centre, RickerWavelet(amplitude=1.0, frequency=0.1))])
+        proxy.set_sensors(b, [centre])
+    _fill((proxy.p, proxy.p_prev), None)
+    return proxy
+
+
+def _seconds_per_step(proxy: Any, config: KernelConfig, n_steps: int) -> float:
+    proxy._config = config
+    proxy.run(1)  # compile and warm up outside the timed window
+    best = math.inf
+    for _ in range(_TRIALS):
+        t0 = time.perf_counter()
+        proxy.run(n_steps)
+        best = min(best, time.perf_counter() - t0)
+    return best / n_steps
+
+
+def _thread_counts() -> List[int]:
+    limit = numba.config.NUMBA_NUM_THREADS
+    counts = {limit, default_threads()}
+    n = 1
+    while n < limit:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def tune_simulate(
+    dims: int, memory_mode: str, storage_dtype: str, grid_shape: Tuple[int, ...]
+) -> Dict[str, Any]:
+    """Benchmark ``Simulate`` candidates for ``grid_shape``'s bucket; return the winner's entry."""
+    return tune(_proxy_simulate(dims, memory_mode, storage_dtype, grid_shape))
+
+
+def tune_batch(dims: int, grid_shape: Tuple[int, ...], batch_size: int) -> Dict[str, Any]:
+    """Benchmark ``BatchSimulate`` candidates for its bucket; return the winner's entry."""
+    return tune(_proxy_batch(dims, grid_shape, batch_size))
+
+
+def tune(proxy: Any) -> Dict[str, Any]:
+    """Benchmark the candidates on the engine ``proxy``; return the winning entry.
+
+    Greedy, one axis at a time: thread count (parallel kernel), then the
+    serial kernel, then, if ``proxy`` has a temporally blocked kernel,
+    its blocking depth and slab budget on the winner so far. ``proxy``
+    is overwritten. Returns the config's fields plus ``ms_per_step``,
+    the grid it was measured on and the tuning wall time.
+    """
+    started = time.perf_counter()
+    best = default_config()
+
+    # Steps per measurement: enough for _TARGET_SECONDS on the default.
+    n_steps = 1
+    while n_steps < 1024:
+        if _seconds_per_step(proxy, best, n_steps) * n_steps >= _TARGET_SECONDS:
+            break
+        n_steps *= 2
+    best_time = _seconds_per_step(proxy, best, n_steps)
+
+    def consider(candidate: KernelConfig) -> None:
+        nonlocal best, best_time
+        t = _seconds_per_step(proxy, candidate, n_steps)
+        if t < best_time * (1.0 - _MIN_GAIN):
+            best, best_time = candidate, t
+
+    for n in _thread_counts():
+        if n != best.threads:
+            consider(dataclasses.replace(best, threads=n))
+    consider(dataclasses.replace(best, threads=1, parallel=False))
+    if getattr(proxy, "_tiled_kernel", None) is not None:
+        untiled = best
+        for block in _TIME_BLOCKS:
+            consider(dataclasses.replace(untiled, time_block=block))
+        if best.time_block > 1:
+            for tile in _TILE_BYTES:
+                if tile != best.tile_bytes:
+                    consider(dataclasses.replace(best, tile_bytes=tile))
+
+    entry: Dict[str, Any] = dataclasses.asdict(best)
+    entry["ms_per_step"] = best_time * 1000.0
+    entry["grid"] = list(proxy.grid_shape)
+    if hasattr(proxy, "batch_size"):
+        entry["batch"] = proxy.batch_size
+    entry["tune_seconds"] = time.perf_counter() - started
+    return entry
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Tune the buckets of the given grids into the cache, ahead of the runs that use them."""
+    parser = argparse.ArgumentParser(
+        prog="python -m acoustic_system.simulation.autotune",
+        description="Measure and cache kernel launch configurations for this machine.",
+    )
+    parser.add_argument("grids", nargs="+", help="grid shapes such as 64x64 or 128x128x128")
+    parser.add_argument("--memory-mode", default=None, choices=("three_buffer", "two_buffer"))
+    parser.add_argument(
+        "--storage-dtype", default="float32", choices=("float32", "float16", "bfloat16")
+    )
+    parser.add_argument(
+        "--batch", type=int, default=0, help="also tune BatchSimulate at this batch size"
+    )
+    parser.add_argument("--force", action="store_true", help="re-measure cached buckets")
+    args = parser.parse_args(argv)
+    memory_mode = args.memory_mode
+    if memory_mode is None:
+        memory_mode = "three_buffer" if args.storage_dtype == "float32" else "two_buffer"
+
+    for text in args.grids:
+        shape = tuple(int(s) for s in text.lower().split("x"))
+        jobs: List[Tuple[str, Callable[[], Dict[str, Any]]]] = [
+            (
+                bucket_key(len(shape), memory_mode, args.storage_dtype, shape),
+                lambda: tune_simulate(len(shape), memory_mode, args.storage_dtype, shape),
+            )
+        ]
+        if args.batch:
+            jobs.append(
+                (
+                    batch_key(len(shape), shape, args.batch),
+                    lambda: tune_batch(len(shape), shape, args.batch),
+                )
+            )
+        for key, measure in jobs:
+            entry = None if args.force else _machine_entries().get(key)
+            if entry is None:
+                entry = measure()
+                _store(key, entry)
+            config = _config_from(entry)
+            print(
+                f"{key}: threads={config.threads} parallel={config.parallel} "
+                f"time_block={config.time_block} tile_kb={config.tile_bytes >> 10} "
+                f"ms_per_step={entry['ms_per_step']:.3f}"
+            )
+    print(f"cache: {cache_path()}")
+
+
+if __name__ == "__main__":
+    main()
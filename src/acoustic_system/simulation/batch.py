@@ -0,0 +1,244 @@
+"""Batched FDTD engine: B independent rooms advanced by one kernel launch.
+
+The dataset generator and the K-pose sensing loop run thousands of
+tiny (64x64, 200-step) simulations. One such room is far too small to
+keep a dozen numba threads busy — the prange over its rows is mostly
+fork/join overhead — so running them one at a time through a single
+``Simulate`` leaves most of the machine idle.
+
+``BatchSimulate`` holds the fields of B rooms in arrays of shape
+``(B, *grid_shape)`` and advances all of them with
+``fused_leapfrog_run_batch_{2d,3d}`` (``calculate.py``), whose prange is
+over the batch axis: each worker thread owns whole rooms and runs their
+entire time loop with the room's buffers resident in cache. Throughput
+therefore scales with B up to the thread count, instead of being capped
+by the parallel efficiency of a single small grid.
+
+Every member has its own obstacle mask, driver list and sensor
+positions; the grid shape, wavespeed and timestep are shared. The
+numerics are those of ``Simulate.step()`` — same stencil, same
+walls -> obstacles -> drivers ordering — so member ``b`` of a batch
+records what ``run_with_sensors`` would record for the same room.
+
+Launch configuration (numba thread count, serial or prange build) comes
+from the tuning cache as for ``Simulate``: ``autotune=None`` uses a
+cached result for the (member size, batch size) bucket, ``True`` also
+measures a missing one on a proxy batch (``autotune.tune_batch``), and
+``False`` keeps the default.
+
+CPU backend, 2D and 3D only.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .autotune import KernelConfig, batch_config, default_config, serial_twin, threads
+from .calculate import fused_leapfrog_run_batch_2d, fused_leapfrog_run_batch_3d
+from .setup import Driver
+from .simulate import resolve_timestep
+
+
+class BatchSimulate:
+    """B independent rooms of one grid shape, stepped together.
+
+    Parameters
+    ----------
+    grid_shape
+        Spatial shape of every member (2D or 3D).
+    batch_size
+        Number of members B.
+    wavespeed, timestep, gridstep, courant
+        As for ``Simulate``; shared by all members.
+    autotune
+        As for ``Simulate``: None uses a cached launch configuration,
+        True also tunes a missing one, False uses the default.
+
+    Attributes
+    ----------
+    p, p_prev
+        ``(B, *grid_shape)`` float32 fields. ``p[b]`` is member b's
+        current pressure.
+    obstacle_mask
+        ``(B, *grid_shape)`` bool.
+    drivers
+        ``drivers[b]`` is member b's driver list.
+    sensor_positions
+        ``sensor_positions[b]`` is member b's list of sensor cells.
+    """
+
+    def __init__(
+        self,
+        grid_shape: Tuple[int, ...],
+        batch_size: int,
+        wavespeed: float = 1.0,
+        timestep: Optional[float] = None,
+        gridstep: float = 1.0,
+        courant: float = 0.5,
+        autotune: Optional[bool] = None,
+    ) -> None:
+        self.grid_shape: Tuple[int, ...] = tuple(int(s) for s in grid_shape)
+        self.dims: int = len(self.grid_shape)
+        if self.dims not in (2, 3):
+            raise ValueError("BatchSimulate supports 2D and 3D grids only")
+        self.batch_size: int = int(batch_size)
+        if self.batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        self.wavespeed: float = float(wavespeed)
+        self.gridstep: float = float(gridstep)
+        self.timestep: float = resolve_timestep(
+            self.dims, self.wavespeed, self.gridstep, timestep, courant
+        )
+        self._coeff: np.float32 = np.float32((self.wavespeed * self.timestep / self.gridstep) ** 2)
+
+        shape = (self.batch_size,) + self.grid_shape
+        self.p: np.ndarray = np.zeros(shape, dtype=np.float32)
+        self.p_prev: np.ndarray = np.zeros(shape, dtype=np.float32)
+        self._p_next: np.ndarray = np.zeros(shape, dtype=np.float32)
+        self.obstacle_mask: np.ndarray = np.zeros(shape, dtype=bool)
+        # Kernel-side geometry: 1 on fluid cells, 0 on obstacles. Kept in
+        # sync with obstacle_mask by the mutation methods below.
+        self._fluid: np.ndarray = np.ones(shape, dtype=np.uint8)
+
+        self.drivers: List[List[Driver]] = [[] for _ in range(self.batch_size)]
+        self.sensor_positions: List[List[Tuple[int, ...]]] = [[] for _ in range(self.batch_size)]
+
+        self.time: float = 0.0
+        self.step_count: int = 0
+        self._kernel = (
+            fused_leapfrog_run_batch_2d if self.dims == 2 else fused_leapfrog_run_batch_3d
+        )
+        # Launch configuration, resolved on the first run() (see above).
+        self._autotune: Optional[bool] = None if autotune is None else bool(autotune)
+        self._config: Optional[KernelConfig] = default_config() if self._autotune is False else None
+
+    # ----- Per-member configuration ------------------------------------- #
+
+    def _check_position(self, pos: Sequence[int]) -> Tuple[int, ...]:
+        tpos = tuple(int(c) for c in pos)
+        if len(tpos) != self.dims or not all(0 <= c < s for c, s in zip(tpos, self.grid_shape)):
+            raise ValueError(f"position {tpos} outside grid {self.grid_shape}")
+        return tpos
+
+    def set_obstacle_mask(self, member: int, mask: np.ndarray) -> None:
+        """Replace member ``member``'s obstacle mask.
+
+        Field values at masked cells are zeroed in all three buffers, for
+        the stale-pressure reason documented on ``Simulate.set_obstacle``.
+        """
+        m = np.asarray(mask, dtype=bool)
+        if m.shape != self.grid_shape:
+            raise ValueError(f"mask shape {m.shape} != grid shape {self.grid_shape}")
+        self.obstacle_mask[member] = m
+        self._fluid[member] = ~m
+        for buf in (self.p, self.p_prev, self._p_next):
+            buf[member][m] = 0.0
+
+    def set_drivers(self, member: int, drivers: Sequence[Driver]) -> None:
+        """Replace member ``member``'s driver list.
+
+        Out-of-bounds drivers are dropped, as ``Simulate.step()`` skips them.
+        """
+        self.drivers[member] = [
+            d
+            for d in drivers
+            if len(d.position) == self.dims
+            and all(0 <= c < s for c, s in zip(d.position, self.grid_shape))
+        ]
+
+    def set_sensors(self, member: int, positions: Sequence[Sequence[int]]) -> None:
+        """Replace member ``member``'s sensor cells (must be in-bounds)."""
+        self.sensor_positions[member] = [self._check_position(p) for p in positions]
+
+    def reset(self) -> None:
+        """Zero every member's fields and the shared clock; keep geometry."""
+        self.p.fill(0.0)
+        self.p_prev.fill(0.0)
+        self._p_next.fill(0.0)
+        self.time = 0.0
+        self.step_count = 0
+
+    # ----- Time stepping ------------------------------------------------- #
+
+    def _step_times(self, n_steps: int) -> np.ndarray:
+        """Clock values of the next ``n_steps`` steps plus the final time.
+
+        Sequential float64 accumulation, identical to ``Simulate``.
+        """
+        increments = np.full(n_steps + 1, self.timestep, dtype=np.float64)
+        increments[0] = self.time
+        return np.cumsum(increments)
+
+    def run(self, n_steps: int, record_step: int = 1) -> np.ndarray:
+        """Advance every member ``n_steps`` steps and return sensor recordings.
+
+        Returns a float32 array of shape
+        ``(B, ceil(n_steps / record_step), S_max)`` where ``S_max`` is the
+        largest sensor count in the batch; ``out[b, :, m]`` is member b's
+        sensor m (columns past a member's own sensor count stay zero). The
+        recording convention matches ``run_with_sensors``: sample ``p``
+        after every step whose index is a multiple of ``record_step``.
+        """
+        n = int(n_steps)
+        record_step = int(record_step)
+        if record_step < 1:
+            raise ValueError("record_step must be >= 1")
+        nb, dims = self.batch_size, self.dims
+        s_max = max((len(s) for s in self.sensor_positions), default=0)
+        if n <= 0:
+            return np.zeros((nb, 0, s_max), dtype=np.float32)
+
+        times = self._step_times(n)
+        d_max = max((len(d) for d in self.drivers), default=0)
+        driver_idx = np.zeros((nb, d_max, dims), dtype=np.int64)
+        n_drv = np.zeros(nb, dtype=np.int64)
+        source = np.zeros((n, nb, d_max), dtype=np.float32)
+        for b, drivers in enumerate(self.drivers):
+            n_drv[b] = len(drivers)
+            for d_idx, driver in enumerate(drivers):
+                driver_idx[b, d_idx] = driver.position
+                source[:, b, d_idx] = driver.sample(times[:n])
+
+        sensor_idx = np.zeros((nb, s_max, dims), dtype=np.int64)
+        n_sen = np.zeros(nb, dtype=np.int64)
+        for b, positions in enumerate(self.sensor_positions):
+            n_sen[b] = len(positions)
+            if len(positions):
+                sensor_idx[b, : len(positions)] = positions
+
+        n_recorded = (n + record_step - 1) // record_step
+        out = np.zeros((n_recorded, nb, s_max), dtype=np.float32)
+        config = self._config
+        if config is None:
+            config = self._config = batch_config(self, measure=bool(self._autotune))
+        kernel = self._kernel if config.parallel else serial_twin(self._kernel)
+        with threads(config.threads):
+            kernel(
+                self.p,
+                self.p_prev,
+                self._p_next,
+                self._coeff,
+                self._fluid,
+                driver_idx,
+                n_drv,
+                source,
+                sensor_idx,
+                n_sen,
+                record_step,
+                out,
+            )
+        # Every member rotated its local buffers n times; replay n % 3.
+        for _ in range(n % 3):
+            self.p_prev, self.p, self._p_next = self.p, self._p_next, self.p_prev
+        self.time = float(times[n])
+        self.step_count += n
+        return np.ascontiguousarray(out.transpose(1, 0, 2))
+
+    def step(self) -> None:
+        """Advance every member by a single timestep."""
+        self.run(1)
+
+
+__all__ = ["BatchSimulate"]
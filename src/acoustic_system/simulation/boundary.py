@@ -1,3 +1,31 @@
+"""Boundary conditions for the outer faces of the simulation grid.
+
+``Simulate(boundary=...)`` selects one of ``BOUNDARIES``. The kernels
+live in ``calculate.py`` ("Absorbing boundaries"); this module holds
+the coefficients and damping profiles they take (and those of
+``"sponge"``, the absorbing layer of the pseudo-spectral backend,
+``pstd.py``), and the table of
+partially reflective walls (``Simulate.set_wall_reflection``, see
+"Impedance walls" in ``calculate.py``). ``Boundary`` is the original,
+unused scaffold, kept for external users.
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+BOUNDARIES = ("dirichlet", "mur", "pml", "sponge")
+
+# Default PML thickness (cells), the normal-incidence reflection the
+# damping profile is designed for, and the frequency shift (alpha dx / c)
+# that damps the static fields an unshifted CPML would freeze in the
+# layer. Measured reflections are in docs/boundary.md.
+PML_WIDTH = 16
+PML_REFLECTION = 1e-4
+PML_ALPHA = 0.02
+
+
 class Boundary:
     def __init__(self, gridsize):
         self.gridsize = gridsize
@@ -13,3 +41,137 @@ class Boundary:
     def apply_boundary_condition(self, grid):
         grid[self.boundary] = self.boundary_coefficient * grid[self.boundary]
         return grid
+
+
+def mur_coefficient(courant: float) -> float:
+    """First-order Mur coefficient ``(C - 1) / (C + 1)`` for Courant number ``C``."""
+    return (courant - 1.0) / (courant + 1.0)
+
+
+def pml_coefficients(
+    n: int,
+    width: int,
+    courant: float,
+    reflection: float = PML_REFLECTION,
+    alpha: float = PML_ALPHA,
+) -> np.ndarray:
+    """Convolutional-PML coefficients along one axis of ``n`` cells, shape ``(4, n)``.
+
+    Rows are ``b`` and ``a`` at cell ``i`` and at face ``i + 1/2`` of
+    the recursive convolution ``psi <- b psi + a g`` (complex-frequency-
+    shifted stretch ``1 + sigma / (alpha + i omega)``, ``kappa = 1``):
+    ``b = exp(-(sigma + alpha) dt)`` and ``a = sigma (b - 1) / (sigma + alpha)``.
+    ``sigma dt`` is zero in the interior and rises quadratically over
+    ``width`` cells to ``s_max`` at the wall, where
+    ``s_max = 3 C ln(1 / reflection) / (2 width)`` — the standard
+    ``sigma_max = (m + 1) c ln(1 / R) / (2 L)`` for grading ``m = 2`` and
+    layer thickness ``L = width * dx``, times ``dt``. ``alpha`` is
+    ``alpha dx / c``, constant inside the layer.
+    """
+    s_max = 3.0 * courant * math.log(1.0 / reflection) / (2.0 * width)
+    out = np.empty((4, n), dtype=np.float32)
+    for row, x in ((0, np.arange(n, dtype=np.float64)), (2, np.arange(n) + 0.5)):
+        depth = np.maximum(np.maximum(width - x, x - (n - 1 - width)), 0.0) / width
+        sigma = s_max * depth**2
+        shift = np.where(depth > 0.0, alpha * courant, 0.0)
+        b = np.exp(-(sigma + shift))
+        out[row] = b
+        ratio = np.divide(sigma, sigma + shift, out=np.zeros_like(sigma), where=depth > 0.0)
+        out[row + 1] = ratio * (b - 1.0)
+    return out
+
+
+def sponge_coefficients(
+    n: int, width: int, courant: float, reflection: float = PML_REFLECTION
+) -> np.ndarray:
+    """Sponge damping ``s = sigma dt / 2`` along one axis of ``n`` cells, float64.
+
+    The absorbing layer of the pseudo-spectral backend (``pstd.py``):
+    ``sigma dt`` follows the PML's quadratic profile and ``s_max`` of
+    ``pml_coefficients`` over ``width`` cells in front of each wall, and
+    is zero in the interior. A sponge has no matched stretch, so this
+    reflects more than the PML at equal width (docs/simulate.md, §22).
+    """
+    s_max = 3.0 * courant * math.log(1.0 / reflection) / (2.0 * width)
+    x = np.arange(n, dtype=np.float64)
+    depth = np.maximum(np.maximum(width - x, x - (n - 1 - width)), 0.0) / width
+    return 0.5 * s_max * depth**2
+
+
+# Planes of axis 0 per block in ``impedance_walls``, sized like the
+# span encoder's blocks so the temporaries stay small next to the field.
+_WALL_BLOCK_CELLS = 1 << 22
+
+
+def wall_admittance(reflection: np.ndarray) -> np.ndarray:
+    """Normalised admittance ``(1 - R) / (1 + R)`` of walls with reflection ``R``.
+
+    ``R = 1`` is rigid (admittance 0) and ``R = 0`` matched (1). NaN
+    (pressure-release) stays NaN.
+    """
+    r = np.asarray(reflection, dtype=np.float64)
+    return (1.0 - r) / (1.0 + r)
+
+
+def impedance_walls(
+    fluid: np.ndarray,
+    code: np.ndarray,
+    reflection: np.ndarray,
+    courant: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Impedance-wall table ``(wall_ptr, wall_pos, wall_coef)`` of a room.
+
+    ``fluid`` is the uint8 geometry (nonzero on fluid cells), ``code`` a
+    uint8 grid of indices into the float32 ``reflection`` table (NaN for
+    pressure-release) and ``courant`` the Courant number ``c dt / dx``.
+    Reflections are read on solid cells only: obstacles and the outer
+    layer. Every interior fluid cell with a reflective solid neighbour
+    gets one entry, in C order; the layout and the coefficients are
+    described under "Impedance walls" in ``calculate.py``.
+    """
+    shape = fluid.shape
+    dims = len(shape)
+    admittance = wall_admittance(reflection)
+    block = max(1, _WALL_BLOCK_CELLS // max(int(np.prod(shape[1:])), 1))
+    cells, counts, sums = [], [], []
+    for a in range(1, shape[0] - 1, block):
+        b = min(a + block, shape[0] - 1)
+        # Planes a - 1 .. b of the block, and its solid cells' admittance.
+        solid = fluid[a - 1 : b + 1] == 0
+        for axis in range(1, dims):
+            edge = [slice(None)] * dims
+            edge[axis] = np.s_[[0, -1]]
+            solid[tuple(edge)] = True
+        if a == 1:
+            solid[0] = True
+        if b == shape[0] - 1:
+            solid[-1] = True
+        beta = np.where(solid, admittance[code[a - 1 : b + 1]], np.nan)
+        reflective = ~np.isnan(beta)
+        beta[~reflective] = 0.0
+        inner = (slice(1, -1),) * dims
+        count = np.zeros(solid[inner].shape, dtype=np.int64)
+        total = np.zeros(solid[inner].shape, dtype=np.float64)
+        for axis in range(dims):
+            for shift in (-1, 1):
+                nb = list(inner)
+                nb[axis] = slice(1 + shift, solid.shape[axis] - 1 + shift)
+                count += reflective[tuple(nb)]
+                total += beta[tuple(nb)]
+        hit = np.nonzero((fluid[a:b][(slice(None),) + inner[1:]] != 0) & (count > 0))
+        cells.append(np.stack(hit, axis=1) + np.asarray([a] + [1] * (dims - 1)))
+        counts.append(count[hit])
+        sums.append(total[hit])
+    cell = np.concatenate(cells) if cells else np.zeros((0, dims), dtype=np.int64)
+    n = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+    total = np.concatenate(sums) if sums else np.zeros(0)
+    pencil = np.ravel_multi_index(tuple(cell[:, :-1].T), shape[:-1])
+    n_pencils = int(np.prod(shape[:-1]))
+    wall_ptr = np.zeros(n_pencils + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pencil, minlength=n_pencils), out=wall_ptr[1:])
+    loss = 0.5 * courant * total
+    wall_coef = np.empty((len(n), 3), dtype=np.float32)
+    wall_coef[:, 0] = courant**2 * n
+    wall_coef[:, 1] = loss
+    wall_coef[:, 2] = 1.0 / (1.0 + loss)
+    return wall_ptr, cell[:, -1].astype(np.int64), wall_coef
@@ -1,15 +1,56 @@
 """Stencil and Laplacian utilities used by the FDTD time-stepping kernel.
 
-Two code paths are exposed:
+Thirteen code paths are exposed:
 
 1. ``Calculate.laplacian_operator`` -- the legacy ``scipy.ndimage.laplace``
-   based path, used as a fallback for 1D and 3D simulations and kept on the
-   public surface for any external users that imported it.
+   based path, no longer used by ``Simulate`` and kept on the public
+   surface for any external users that imported it.
 2. ``fused_leapfrog_step_2d`` -- a numba ``@njit`` kernel that performs the
    2D five-point Laplacian, the leap-frog combine, and the Dirichlet
    hard-wall edge zeroing in a single fused pass over the interior.
    Numerically equivalent to the legacy path within the 1e-5 / 1e-4
    correctness tolerance.
+3. ``fused_leapfrog_step_masked_2d`` / ``_3d`` -- the same step kernels
+   with interior-obstacle zeroing fused into the stencil pass.
+4. ``fused_leapfrog_step_spans_2d`` / ``_3d`` -- step kernels that visit
+   only the precomputed fluid spans (``fluid_spans``) of each row/pencil,
+   clipped to an active-region box outside which the field is still zero,
+   and apply partially reflective (impedance) walls from a per-pencil
+   table in the same pass.
+5. ``fused_leapfrog_run_2d`` / ``_3d`` -- multi-step loops behind
+   ``Simulate.run(n_steps)`` that also perform the obstacle zeroing,
+   driver injection, box growth and buffer rotation in compiled code.
+6. ``fused_leapfrog_step_inplace_*`` / ``fused_leapfrog_run_inplace_*``
+   -- two-buffer twins of 4 and 5 that write the new field over
+   ``p_prev`` (``Simulate(memory_mode="two_buffer")``).
+7. ``fused_leapfrog_run_u16_2d`` / ``_3d`` -- the two-buffer run loops
+   on float16 / bfloat16 storage with float32 arithmetic
+   (``Simulate(storage_dtype=...)``).
+8. ``fused_leapfrog_run_tiled_2d`` / ``_3d`` -- the run loops of 5 and 6,
+   temporally blocked: several steps per pass over memory
+   (``Simulate.run_blocked``).
+9. ``leapfrog_step_kernel(dims, order, masked, isotropic)`` -- a factory
+   returning the fused step kernel (plain or masked) for any
+   dimensionality and stencil (even-order central differences or the
+   compact isotropic 9/27-point Laplacian): the hand-written kernels of
+   2-3 where they apply, generated and compiled on first request
+   otherwise (1D and 4D+ ``Simulate``, ``Simulate(stencil=...)``).
+10. ``fused_leapfrog_step_mur_2d`` / ``_3d`` and
+    ``fused_leapfrog_step_pml_2d`` / ``_3d`` -- step kernels with a
+    first-order Mur or a convolutional-PML absorbing boundary in place
+    of the Dirichlet walls (``Simulate(boundary=...)``).
+11. ``fused_leapfrog_step_media_2d`` / ``_3d`` and
+    ``fused_leapfrog_step_media_u8_2d`` / ``_3d`` -- step kernels with a
+    per-cell coefficient (float32, or uint8 codes into a table) for a
+    heterogeneous wavespeed (``Simulate(wavespeed_field=...)``).
+12. ``fused_leapfrog_step_slab_3d`` -- the 3D span step restricted to
+    one slab of i-rows, writing nothing outside it, for the worker
+    processes of a decomposed grid (``Simulate(workers=...)``) and the
+    tiles of an out-of-core one (``Simulate(out_of_core=...)``).
+13. ``first_touch_array`` / ``first_touch_fill`` -- allocation and
+    filling of field-sized arrays by the kernels' own prange partition
+    of axis 0, so that each page is placed on the NUMA node of the
+    thread that streams it (``Simulate(first_touch=True)``).
 
 Mathematical formulation of the fused 2D kernel
 -----------------------------------------------
@@ -38,7 +79,8 @@ core desktop. The dominant contributions, in order of magnitude:
 
 * numba ``@njit`` JIT compilation of the fused interior pass (~6x)
 * parallelization of the outer i loop with ``prange`` (~1.7x on top)
-* tuning the worker thread count to ``cpu_count - 3`` (~1.4x on top)
+* tuning the worker thread count to ``cpu_count - 3`` (~1.4x on top;
+  now measured per machine by ``autotune.py``)
 * per-step Python overhead minimization: pre-bound kernel reference,
   cached coefficient, single-driver fast path (~1.4x on top)
 * enabling ``fastmath=True`` for FMA fusion in the inner update (~1.1x
@@ -48,44 +90,28 @@ See the candidate commit log under ``evolve/fdtd-runtime/round-*`` for
 the per-step measurements that drove each decision.
 """
 
-import os
+import itertools
+import math
+import mmap
+from typing import Any, Dict, List, Tuple
 
-import numba
 import numpy as np
 import scipy as sp
 from numba import njit, prange
 
-# Cap numba's parallel-region thread count for the FDTD stencil. The
-# 5-point leap-frog kernel mixes memory-bandwidth pressure (4 MB of
-# read/write per step at 512x512 float32) with FMA-fused arithmetic —
-# at the default thread count == os.cpu_count() on a wide-SMT machine
-# the kernel oversubscribes the memory bus and OS scheduler. Empirical
-# sweep on a 16-logical-core / 8-physical-core workstation with the
-# fastmath=True FMA-fused kernel:
+# Thread counts are not fixed here. The 5-point leap-frog kernel mixes
+# memory-bandwidth pressure (4 MB of read/write per step at 512x512
+# float32) with FMA-fused arithmetic, so the best count is below the
+# logical-core count on wide-SMT machines. On a 16-logical-core /
+# 8-physical-core workstation with the fastmath=True kernel:
 #
 #     threads:   4    5    6    7    8    9   10   11   12   13   14   15   16
 #     ms median:184  167  146  129  115  105   97   93   90   88  118  120  130
 #
-# 13 threads is the sweet spot — close to but below the logical-core
-# count, leaving 3 cores' worth of slack for the OS scheduler and the
-# foreground GUI / IO. Beyond 13 the kernel starts thrashing the memory
-# subsystem and the median jumps. For machines smaller than 16 cores we
-# back off proportionally: leave ~3 logical cores free, but never drop
-# below 4 worker threads.
-#
-# The user can override at runtime with ``numba.set_num_threads(n)``
-# after importing this module — set_num_threads only adjusts the
-# active count, not the maximum.
-_cpu = int(os.cpu_count() or 1)
-_FDTD_THREAD_CAP = max(min(_cpu - 3, 13), 4) if _cpu >= 8 else _cpu
-try:
-    numba.set_num_threads(_FDTD_THREAD_CAP)
-except Exception:
-    # set_num_threads can fail if numba's threading layer has not been
-    # initialised yet; the first @njit(parallel=True) call lazily initializes
-    # it, so we re-attempt below after the kernel is registered. Failures here
-    # are non-fatal — we fall back to numba's default.
-    pass
+# That sweep used to be baked in as a ``cpu_count - 3`` cap. It is now
+# the untuned default in ``autotune.py``, which measures the thread
+# count (and serial vs prange, and temporal blocking) per machine and
+# grid size and applies it around each compiled run.
 
 
 class Calculate:
@@ -108,6 +134,14 @@ class Calculate:
 #
 # - explicit signature: avoids first-call type inference; the function is
 #   AOT-specialised for the float32 path, eliminating runtime dispatch.
+#   Field arguments are declared C-contiguous (``float32[:, ::1]``).
+#   With the generic ``[:, :]`` ("any layout") type numba must honour a
+#   runtime inner stride, and LLVM leaves the j loop scalar; with a unit
+#   inner stride it vectorises, which is ~3-4x on the stencil alone and
+#   is what makes the fused obstacle select below cheaper than the old
+#   separate boolean-index pass. Every caller passes buffers allocated
+#   by np.zeros / rotated in place, so the contract costs nothing;
+#   a non-contiguous view is rejected with a TypeError at dispatch.
 # - cache=True: writes the compiled object to __pycache__ so subsequent
 #   process launches reload without recompiling.
 # - fastmath=True: enables LLVM FMA fusion (multiply-add merged into a
@@ -123,10 +157,10 @@ class Calculate:
 #   p[i±1, :] reads from the current p (never p_next), so there are no
 #   cross-iteration hazards. j stays serial for unit-stride contiguous
 #   access of the C-order float32 arrays, giving the best per-thread
-#   cache and SIMD behaviour. The active thread count is throttled by
-#   _FDTD_THREAD_CAP above.
+#   cache and SIMD behaviour. The active thread count is chosen by
+#   autotune.py (see above).
 @njit(
-    "void(float32[:, :], float32[:, :], float32[:, :], float32)",
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32)",
     cache=True,
     fastmath=True,
     boundscheck=False,
@@ -215,7 +249,7 @@ def fused_leapfrog_step_2d(
 # Simulate constructor already enforces this whenever timestep is
 # auto-derived, and emits a RuntimeWarning otherwise.
 @njit(
-    "void(float32[:, :, :], float32[:, :, :], float32[:, :, :], float32)",
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32)",
     cache=True,
     fastmath=True,
     boundscheck=False,
@@ -264,12 +298,2852 @@ def fused_leapfrog_step_3d(
             p_next[i, j, nk - 1] = 0.0
 
 
-# Re-apply the thread cap after kernel registration. The first @njit(parallel=True)
-# decoration lazily initializes numba's threading runtime; calling
-# ``set_num_threads`` before that initialisation is harmless but its effect
-# may be reset. Re-asserting the cap here makes the desired thread count the
-# steady-state value seen by both kernels.
-try:
-    numba.set_num_threads(_FDTD_THREAD_CAP)
-except Exception:
-    pass
+# =====================================================================
+# Obstacle-aware step kernels
+# =====================================================================
+#
+# Rooms with interior obstacles used to pay a second full-grid pass per
+# step after the kernel: ``p_next[obstacle_mask] = 0``, a boolean
+# fancy-index write that also allocates index arrays every call. The
+# masked variants take a uint8 ``fluid`` grid (1 = fluid, 0 = rigid
+# obstacle, maintained by ``Simulate``) and apply the rigid-wall zero in
+# the same prange sweep: each row (2D) / pencil (3D) gets the plain
+# stencil, then its obstacle cells are zeroed while the row is still in
+# L1. The stencil loop itself is textually that of the unmasked kernels,
+# so both vectorise identically and agree bit for bit with the old
+# kernel-then-scrub sequence; the ordering contract (walls, then
+# obstacles, then drivers injected by the caller) is preserved.
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32, uint8[:, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_masked_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+) -> None:
+    """:func:`fused_leapfrog_step_2d` plus interior obstacle zeroing.
+
+    Cells with ``fluid[i, j] == 0`` are written as 0 in the same pass.
+    """
+    ni, nj = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            lap = p[i + 1, j] + p[i - 1, j] + p[i, j + 1] + p[i, j - 1] - 4.0 * p[i, j]
+            p_next[i, j] = 2.0 * p[i, j] - p_prev[i, j] + coeff * lap
+        for j in range(1, nj - 1):
+            if fluid[i, j] == 0:
+                p_next[i, j] = 0.0
+
+    for j in range(nj):
+        p_next[0, j] = 0.0
+        p_next[ni - 1, j] = 0.0
+    for i in range(ni):
+        p_next[i, 0] = 0.0
+        p_next[i, nj - 1] = 0.0
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, uint8[:, :, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_masked_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_masked_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            for k in range(1, nk - 1):
+                lap = (
+                    p[i + 1, j, k]
+                    + p[i - 1, j, k]
+                    + p[i, j + 1, k]
+                    + p[i, j - 1, k]
+                    + p[i, j, k + 1]
+                    + p[i, j, k - 1]
+                    - 6.0 * p[i, j, k]
+                )
+                p_next[i, j, k] = 2.0 * p[i, j, k] - p_prev[i, j, k] + coeff * lap
+            for k in range(1, nk - 1):
+                if fluid[i, j, k] == 0:
+                    p_next[i, j, k] = 0.0
+
+    for j in range(nj):
+        for k in range(nk):
+            p_next[0, j, k] = 0.0
+            p_next[ni - 1, j, k] = 0.0
+    for i in range(ni):
+        for k in range(nk):
+            p_next[i, 0, k] = 0.0
+            p_next[i, nj - 1, k] = 0.0
+    for i in range(ni):
+        for j in range(nj):
+            p_next[i, j, 0] = 0.0
+            p_next[i, j, nk - 1] = 0.0
+
+
+# =====================================================================
+# Generated N-dimensional step kernels
+# =====================================================================
+#
+# The kernels above are written out by hand for 2D and 3D with the
+# second-order stencil. ``leapfrog_step_kernel`` produces the same
+# fused step (stencil, leap-frog combine, wall zeroing, optionally the
+# obstacle zeroing of the masked twins) for any dimensionality and
+# stencil, by generating the loop nest as source text and compiling it
+# with the same decorator flags. Results are memoised; the hand-written
+# kernels are returned for the cases they cover, so the second-order
+# 2D/3D paths are unchanged. The loop nest mirrors the hand-written
+# kernels: prange over axis 0 (serial in 1D, where a line is too short
+# to split), unit stride innermost, obstacle cells of a pencil zeroed
+# right after its stencil pass.
+#
+# Stencils (``STENCILS``, ``Simulate(stencil=...)``):
+#
+#   second_order  the (2d+1)-point Laplacian of the kernels above.
+#   fourth_order  fourth-order central differences along each axis
+#                 ((4d+1) points); ``order`` generalises to any even
+#                 order through ``central_difference_weights``.
+#   isotropic     the compact 9-point (2D) / 27-point (3D) Laplacian
+#                     2D: (4 faces + corners - 20 centre) / 6
+#                     3D: (14 faces + 3 edges + corners - 128 centre) / 30
+#                 still second order, but its leading error term is a
+#                 multiple of the biharmonic, so numerical dispersion
+#                 no longer depends on the propagation direction.
+#
+# Walls. A stencil reaching m > 1 cells would read past the outer wall
+# from the m - 1 layers next to it. Those band cells read through an
+# odd reflection about the wall node, p[-j] = -p[j], the image of a
+# Dirichlet wall, so the wall stays one cell thick. The band (O(surface)
+# cells) has its own serial loop nest with the mirrored reads, so the
+# bulk loop stays as plain as the second-order one; obstacles are then
+# zeroed in a separate pass. Interior obstacles are zero cells with no reflection:
+# one thinner than m cells is partly read through.
+#
+# Generated code has no source file, so numba cannot cache it on disk:
+# each kernel compiles once per process (well under a second for 1D).
+
+STENCILS: Dict[str, Tuple[int, bool]] = {
+    "second_order": (2, False),
+    "fourth_order": (4, False),
+    "isotropic": (2, True),
+}
+
+
+def central_difference_weights(order: int) -> Tuple[float, ...]:
+    """Weights ``(w_0, w_1, ..., w_m)`` of the order-``2m`` central second derivative.
+
+    ``f''(x) ~ (w_0 f(x) + sum_k w_k (f(x + k) + f(x - k))) / h^2`` with
+    ``w_k = 2 (-1)^(k+1) (m!)^2 / (k^2 (m-k)! (m+k)!)`` and ``w_0`` fixed
+    by the weights summing to zero. Order 2 gives ``(-2, 1)``.
+    """
+    if order < 2 or order % 2:
+        raise ValueError(f"stencil order must be an even integer >= 2, got {order!r}")
+    m = order // 2
+    fm = math.factorial(m)
+    w = [
+        2.0 * (-1) ** (k + 1) * fm * fm / (k * k * math.factorial(m - k) * math.factorial(m + k))
+        for k in range(1, m + 1)
+    ]
+    return (-2.0 * sum(w), *w)
+
+
+def stencil_terms(
+    dims: int, order: int = 2, isotropic: bool = False
+) -> Tuple[float, List[Tuple[float, List[Tuple[int, ...]]]]]:
+    """The Laplacian stencil at unit spacing as ``(centre, [(weight, offsets), ...])``.
+
+    Offsets of equal weight are grouped, in the order the kernels sum
+    them: axis by axis, ``+k`` before ``-k``.
+    """
+    if isotropic:
+        if order != 2 or dims not in (2, 3):
+            raise ValueError("the isotropic stencil is second order, 2D or 3D only")
+        shells: Dict[int, List[Tuple[int, ...]]] = {}
+        for offset in itertools.product((1, -1, 0), repeat=dims):
+            if any(offset):
+                shells.setdefault(sum(map(abs, offset)), []).append(offset)
+        weights = (2.0 / 3.0, 1.0 / 6.0) if dims == 2 else (14.0 / 30.0, 3.0 / 30.0, 1.0 / 30.0)
+        centre = -10.0 / 3.0 if dims == 2 else -128.0 / 30.0
+        return centre, [(w, shells[r + 1]) for r, w in enumerate(weights)]
+    w = central_difference_weights(order)
+    groups = []
+    for k in range(1, len(w)):
+        offsets = []
+        for a in range(dims):
+            for s in (k, -k):
+                offsets.append(tuple(s if b == a else 0 for b in range(dims)))
+        groups.append((w[k], offsets))
+    return dims * w[0], groups
+
+
+def stencil_cfl_limit(dims: int, order: int = 2, isotropic: bool = False) -> float:
+    """Largest stable Courant number ``c dt / dx`` for leap-frog with this stencil.
+
+    Leap-frog is stable while ``C^2 |L(theta)| <= 4`` for every Fourier
+    mode, where ``L(theta)`` is the stencil's symbol; so the limit is
+    ``2 / sqrt(max |L|)``, found on a grid of wavenumbers that includes
+    0 and pi on every axis. ``1/sqrt(d)`` for the second-order stencil,
+    ``sqrt(3/4)/sqrt(d)`` for fourth order, ``sqrt(3)/2`` for the 9-point
+    and about 0.808 for the 27-point isotropic stencil.
+    """
+    centre, groups = stencil_terms(dims, order, isotropic)
+    theta = np.linspace(0.0, np.pi, 33 if dims <= 3 else 9)
+    mesh = np.meshgrid(*([theta] * dims), indexing="ij")
+    symbol = np.full(mesh[0].shape, centre)
+    for w, offsets in groups:
+        for offset in offsets:
+            symbol += w * np.cos(sum(o * t for o, t in zip(offset, mesh)))
+    return float(2.0 / np.sqrt(np.max(np.abs(symbol))))
+
+
+@njit(cache=True, inline="always")
+def _odd_index(j: int, n: int) -> int:
+    """Index ``j`` reflected into ``[0, n)`` about the wall nodes 0 and n - 1."""
+    if j < 0:
+        return -j
+    if j > n - 1:
+        return 2 * (n - 1) - j
+    return j
+
+
+@njit(cache=True, inline="always")
+def _odd_sign(j: int, n: int) -> float:
+    """-1 where ``_odd_index`` reflected ``j`` (odd image of a Dirichlet wall)."""
+    return -1.0 if j < 0 or j > n - 1 else 1.0
+
+
+def _step_kernel_source(dims: int, order: int, masked: bool, isotropic: bool = False) -> str:
+    """Source text of the fused step kernel (see ``leapfrog_step_kernel``)."""
+    centre_w, groups = stencil_terms(dims, order, isotropic)
+    m = order // 2
+    idx = [f"i{a}" for a in range(dims)]
+    centre = ", ".join(idx)
+
+    last = dims - 1
+
+    def read(offset: Tuple[int, ...]) -> str:
+        shifted = [f"{v} {'+' if o > 0 else '-'} {abs(o)}" if o else v for v, o in zip(idx, offset)]
+        if m > 1 and offset[last]:
+            # Innermost reads as a non-negative offset from the pencil
+            # base: ``i - 2`` makes numba emit a negative-index wrap that
+            # stops LLVM vectorising the loop (about 4x slower in 2D).
+            o = m + offset[last]
+            shifted[last] = f"b + {o}" if o else "b"
+        return f"p[{', '.join(shifted)}]"
+
+    def mirrored(axis: int, sign: str) -> str:
+        j = f"i{axis} {sign} k"
+        at = ", ".join(f"_odd_index({j}, n{axis})" if a == axis else v for a, v in enumerate(idx))
+        return f"_odd_sign({j}, n{axis}) * p[{at}]"
+
+    def laplacian() -> str:
+        parts = []
+        for w, offsets in groups:
+            ring = " + ".join(read(o) for o in offsets)
+            if not parts:
+                parts.append(ring if w == 1.0 else f"{w!r} * ({ring})")
+            else:
+                parts.append(f"{'-' if w < 0 else '+'} {abs(w)!r} * ({ring})")
+        # Same operand order as the hand-written kernels for order 2.
+        parts.append(f"{'-' if centre_w < 0 else '+'} {abs(centre_w)!r} * p[{centre}]")
+        return " ".join(parts)
+
+    lines = [
+        "def kernel(p, p_prev, p_next, coeff" + (", fluid" if masked else "") + "):",
+        f"    ({', '.join(f'n{a}' for a in range(dims))},) = p.shape",
+    ]
+
+    # Bulk: every cell whose whole stencil lies inside the grid. Masked
+    # one-reach kernels zero each pencil's obstacles right after it.
+    pad = "    "
+    for a in range(dims - 1):
+        loop = "prange" if a == 0 else "range"
+        lines.append(f"{pad}for i{a} in {loop}({m}, n{a} - {m}):")
+        pad += "    "
+    inner = f"for i{last} in range({m}, n{last} - {m}):"
+    if m == 1:
+        lines.append(pad + inner)
+    else:
+        lines += [f"{pad}for b in range(n{last} - {2 * m}):", f"{pad}    i{last} = b + {m}"]
+    lines += [
+        f"{pad}    lap = {laplacian()}",
+        f"{pad}    p_next[{centre}] = 2.0 * p[{centre}] - p_prev[{centre}] + coeff * lap",
+    ]
+    if masked and m == 1:
+        lines += [
+            pad + inner,
+            f"{pad}    if fluid[{centre}] == 0:",
+            f"{pad}        p_next[{centre}] = 0.0",
+        ]
+
+    if m > 1:
+        # Band next to the walls: one serial nest over the cells inside
+        # the walls, jumping over the bulk run of each pencil that
+        # crosses it, with the reach summed at run time (one mirrored
+        # read per axis and direction in the source, not m).
+        pad = "    "
+        for a in range(last):
+            lines.append(f"{pad}for i{a} in range(1, n{a} - 1):")
+            pad += "    "
+        bulk = " and ".join(f"{m} <= i{a} < n{a} - {m}" for a in range(last)) or "True"
+        reads = " + ".join(mirrored(a, s) for a in range(dims) for s in "+-")
+        lines += [
+            f"{pad}bulk = {bulk}",
+            f"{pad}i{last} = 1",
+            f"{pad}while i{last} < n{last} - 1:",
+            f"{pad}    if bulk and i{last} == {m}:",
+            f"{pad}        i{last} = n{last} - {m}",
+            f"{pad}        continue",
+            f"{pad}    lap = {centre_w!r} * p[{centre}]",
+            f"{pad}    for k in range(1, {m + 1}):",
+            f"{pad}        lap += _WEIGHTS[k] * ({reads})",
+            f"{pad}    p_next[{centre}] = 2.0 * p[{centre}] - p_prev[{centre}] + coeff * lap",
+            f"{pad}    i{last} += 1",
+        ]
+        if masked:
+            pad = "    "
+            for a in range(dims):
+                loop = "prange" if a == 0 and dims > 1 else "range"
+                lines.append(f"{pad}for i{a} in {loop}(1, n{a} - 1):")
+                pad += "    "
+            lines += [f"{pad}if fluid[{centre}] == 0:", f"{pad}    p_next[{centre}] = 0.0"]
+
+    # Walls: the outermost layer of every face, serial like the
+    # hand-written kernels (O(surface) next to the O(volume) stencil).
+    for a in range(dims):
+        near = ", ".join("0" if b == a else ":" for b in range(dims))
+        far = ", ".join(f"n{a} - 1" if b == a else ":" for b in range(dims))
+        lines += [f"    p_next[{near}] = 0.0", f"    p_next[{far}] = 0.0"]
+    return "\n".join(lines) + "\n"
+
+
+_STEP_KERNELS: Dict[Tuple[int, int, bool, bool], Any] = {}
+
+
+def leapfrog_step_kernel(
+    dims: int, order: int = 2, masked: bool = False, isotropic: bool = False
+) -> Any:
+    """Fused leap-frog step kernel for a ``dims``-D grid and stencil.
+
+    ``order`` is the even order of the axis-aligned central-difference
+    stencil; ``isotropic=True`` selects the compact isotropic stencil
+    instead (second order, 2D/3D). Call signature
+    ``(p, p_prev, p_next, coeff)``, plus a trailing uint8 ``fluid`` grid
+    when ``masked`` — those of :func:`fused_leapfrog_step_2d` /
+    :func:`fused_leapfrog_step_masked_2d`. Second-order 2D/3D requests
+    return those hand-written kernels; anything else is generated on
+    first request and memoised.
+    """
+    dims, order, masked, isotropic = int(dims), int(order), bool(masked), bool(isotropic)
+    if dims < 1:
+        raise ValueError(f"dims must be >= 1, got {dims!r}")
+    stencil_terms(dims, order, isotropic)  # validates the stencil
+    if order == 2 and not isotropic and dims in (2, 3):
+        return {
+            (2, False): fused_leapfrog_step_2d,
+            (2, True): fused_leapfrog_step_masked_2d,
+            (3, False): fused_leapfrog_step_3d,
+            (3, True): fused_leapfrog_step_masked_3d,
+        }[(dims, masked)]
+    key = (dims, order, masked, isotropic)
+    kernel = _STEP_KERNELS.get(key)
+    if kernel is None:
+        kernel = _STEP_KERNELS[key] = _generate_step_kernel(dims, order, masked, isotropic)
+    return kernel
+
+
+def _generate_step_kernel(dims: int, order: int, masked: bool, isotropic: bool = False) -> Any:
+    """Compile ``_step_kernel_source`` (no memoisation; see ``leapfrog_step_kernel``)."""
+    source = _step_kernel_source(dims, order, masked, isotropic)
+    name = (
+        f"<leapfrog_step_{dims}d_{'isotropic' if isotropic else f'order{order}'}"
+        f"{'_masked' if masked else ''}>"
+    )
+    namespace: Dict[str, Any] = {
+        "prange": prange,
+        "_WEIGHTS": central_difference_weights(order),
+        "_odd_index": _odd_index,
+        "_odd_sign": _odd_sign,
+    }
+    exec(compile(source, name, "exec"), namespace)
+    field = "float32[" + ", ".join([":"] * (dims - 1) + ["::1"]) + "]"
+    fluid = ", uint8[" + ", ".join([":"] * (dims - 1) + ["::1"]) + "]" if masked else ""
+    return njit(
+        f"void({field}, {field}, {field}, float32{fluid})",
+        fastmath=True,
+        boundscheck=False,
+        error_model="numpy",
+        parallel=dims > 1,
+    )(namespace["kernel"])
+
+
+# =====================================================================
+# Fluid-span kernels
+# =====================================================================
+#
+# The masked kernels above still evaluate the stencil inside solid
+# blocks and then discard it. For the rooms ``generate_random_obstacles``
+# / ``generate_diverse_obstacles`` produce — a handful of large
+# rectangles — a run-length encoding of the fluid is cheaper: per
+# pencil (a row in 2D, an (i, j) line along k in 3D) store the
+# half-open column ranges [start, end) of interior fluid cells, and let
+# the kernel iterate only over those. Cost then scales with the fluid
+# volume, not the bounding box.
+#
+# Table layout (built by ``fluid_spans`` below):
+#   spans    int64 (n_pencils, max_spans, 2)   pencil id = i (2D), i*nj + j (3D)
+#   n_spans  int64 (n_pencils,)
+#
+# Obstacle cells are never written, so they must already hold 0 in all
+# three buffers: ``Simulate`` zeroes them whenever geometry changes and
+# every kernel path either skips or zeroes them afterwards. The one
+# exception is a driver placed on an obstacle — its injection leaves a
+# value behind — so the caller zeroes such driver cells before
+# injecting. Walls are still zeroed by the kernel, and the walls ->
+# obstacles -> drivers ordering is unchanged.
+#
+# The span loops run zero-based over row slices rather than over
+# ``range(lo, hi)``: an index with a data-dependent start cannot be
+# proven non-negative, so numba keeps a wraparound select on every
+# access and the loop stays scalar (~3x slower than the masked kernel).
+
+
+_SPAN_BLOCK_CELLS = 1 << 22
+
+
+def fluid_spans(pencils: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Run-length encode the interior fluid of each pencil.
+
+    ``pencils`` is a ``(n_pencils, n)`` array, nonzero on fluid cells;
+    only the interior columns ``1 .. n - 2`` are encoded (the first and
+    last are walls). Returns ``(spans, n_spans)`` as described above,
+    with ``max_spans >= 1`` so the table is never zero-width.
+
+    Large inputs are encoded in blocks of about ``_SPAN_BLOCK_CELLS``
+    cells, so the temporaries stay small next to the field buffers.
+    """
+    pencils = np.asarray(pencils)
+    m, n = pencils.shape
+    block = max(1, _SPAN_BLOCK_CELLS // max(n, 1))
+    if m > block:
+        parts = [fluid_spans(pencils[a : a + block]) for a in range(0, m, block)]
+        width = max(part.shape[1] for part, _ in parts)
+        spans = np.zeros((m, width, 2), dtype=np.int64)
+        for a, (part, _) in zip(range(0, m, block), parts):
+            spans[a : a + part.shape[0], : part.shape[1]] = part
+        return spans, np.concatenate([counts for _, counts in parts])
+    rows = pencils[:, 1:-1] != 0
+    zero = np.int8(0)
+    edges = np.diff(rows.astype(np.int8), axis=1, prepend=zero, append=zero)
+    r_start, c_start = np.nonzero(edges == 1)
+    c_end = np.nonzero(edges == -1)[1]
+    n_spans = np.bincount(r_start, minlength=m).astype(np.int64)
+    spans = np.zeros((m, max(int(n_spans.max(initial=0)), 1), 2), dtype=np.int64)
+    rank = np.arange(r_start.size) - (np.cumsum(n_spans) - n_spans)[r_start]
+    spans[r_start, rank, 0] = c_start + 1
+    spans[r_start, rank, 1] = c_end + 1
+    return spans, n_spans
+
+
+# =====================================================================
+# Active-region box
+# =====================================================================
+#
+# With the default 5/7-point stencil, information moves at most one
+# cell per step. A field that starts at rest is therefore exactly zero
+# outside the light cones of its drivers, and the span and run kernels
+# accept a ``box`` that limits the sweep to the part of the grid that
+# can have become nonzero:
+#
+#   box  int64 (dims, 2)   half-open [lo, hi) per axis, covering every
+#                          cell that may be nonzero in p or p_prev
+#
+# A step computes p_next over ``box`` grown by one cell (clipped to the
+# interior), zeroes the wall cells in that window, and then grows
+# ``box`` in place by one cell (clipped to the grid). Cells outside the
+# window are left alone: they are zero in all three buffers, because
+# every buffer's nonzero region lies inside an earlier, smaller box.
+# An empty box (``hi <= lo`` on any axis) skips the sweep and does not
+# grow. The run kernels also add each driver cell to ``box`` at the
+# first step that injects a nonzero value. A full-grid box
+# (``[[0, n0], [0, n1], ...]``) reproduces the unrestricted sweep, and
+# it stays full under growth.
+
+
+@njit(cache=True, boundscheck=False)
+def _box_is_empty(box: np.ndarray) -> bool:
+    for a in range(box.shape[0]):
+        if box[a, 1] <= box[a, 0]:
+            return True
+    return False
+
+
+@njit(cache=True, boundscheck=False)
+def _box_window(box: np.ndarray, a: int, n: int) -> Tuple[int, int]:
+    """``box`` axis ``a`` grown by one cell and clipped to ``[0, n)``."""
+    return max(box[a, 0] - 1, 0), min(box[a, 1] + 1, n)
+
+
+@njit(cache=True, boundscheck=False)
+def _box_grow(box: np.ndarray, shape: Tuple[int, ...]) -> None:
+    if _box_is_empty(box):
+        return
+    for a in range(box.shape[0]):
+        box[a, 0] = max(box[a, 0] - 1, 0)
+        box[a, 1] = min(box[a, 1] + 1, shape[a])
+
+
+@njit(cache=True, boundscheck=False)
+def _box_include(box: np.ndarray, cell: np.ndarray) -> None:
+    if _box_is_empty(box):
+        for a in range(box.shape[0]):
+            box[a, 0] = cell[a]
+            box[a, 1] = cell[a] + 1
+        return
+    for a in range(box.shape[0]):
+        box[a, 0] = min(box[a, 0], cell[a])
+        box[a, 1] = max(box[a, 1], cell[a] + 1)
+
+
+# =====================================================================
+# Impedance walls
+# =====================================================================
+#
+# By default solid cells (obstacles and the outer layer) are held at
+# p = 0: pressure-release walls, reflection -1. A locally reacting
+# wall of normalised admittance beta = (1 - R) / (1 + R) (R its
+# normal-incidence reflection) instead imposes dp/dn = -(beta / c) dp/dt
+# on the face between a fluid cell x and a solid neighbour. With the
+# ghost value g = p[x] - (beta / 2 lambda) (p_next[x] - p_prev[x])
+# across that face (lambda = c dt / dx, the time derivative centred at
+# x), the stencil term lambda^2 (g - 0) that the zero-valued solid cell
+# left out is added back. Summed over the reflective solid neighbours
+# of x (n of them, admittances summing to B):
+#
+#   p_next[x] = (p_next[x] + lambda^2 n p[x] + (lambda B / 2) p_prev[x])
+#               / (1 + lambda B / 2)
+#
+# where the p_next[x] on the right is the plain kernel's value. R = 1
+# (beta = 0) is a rigid Neumann wall, R = 0 absorbs at normal
+# incidence. Only fluid cells touching a reflective wall need this, so
+# the span, run and blocked kernels take them as a compact table,
+# built by ``boundary.impedance_walls``:
+#
+#   wall_ptr   int64 (n_pencils + 1,)   entries of pencil r: wall_ptr[r] .. wall_ptr[r + 1]
+#   wall_pos   int64 (n_walls,)         column (2D) / k (3D) of the cell
+#   wall_coef  float32 (n_walls, 3)     lambda^2 n, lambda B / 2, 1 / (1 + lambda B / 2)
+#
+# A pencil's entries are applied right after its spans, while the row
+# is still in cache, so the walls cost no extra pass over the grid. The
+# correction reads p_prev at the cell it writes, so it needs the
+# three-buffer kernels. With no reflective walls the table is empty and
+# the kernels run exactly as before.
+
+
+@njit(cache=True, fastmath=True, boundscheck=False, error_model="numpy", inline="always")
+def _wall_row(
+    nxt: np.ndarray,
+    cur: np.ndarray,
+    prev: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+    c0: int,
+    c1: int,
+) -> None:
+    """Apply wall-table entries ``c0 .. c1`` to one pencil ``nxt`` (``cur``, ``prev`` alike)."""
+    for c in range(c0, c1):
+        x = wall_pos[c]
+        nxt[x] = (nxt[x] + wall_coef[c, 0] * cur[x] + wall_coef[c, 1] * prev[x]) * wall_coef[c, 2]
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32, int64[:, :, ::1], "
+    "int64[::1], int64[:, ::1], int64[::1], int64[::1], float32[:, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_spans_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    wall_ptr: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+) -> None:
+    """:func:`fused_leapfrog_step_2d` restricted to the fluid spans inside ``box``.
+
+    ``box`` is the active-region box described above; it is grown in
+    place by one cell. Pass a full-grid box to sweep every fluid cell.
+    ``wall_ptr`` / ``wall_pos`` / ``wall_coef`` is the impedance-wall
+    table (empty for pressure-release walls everywhere).
+    """
+    ni, nj = p.shape
+    if _box_is_empty(box):
+        return
+    i_lo, i_hi = _box_window(box, 0, ni)
+    j_lo, j_hi = _box_window(box, 1, nj)
+    for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+        for q in range(n_spans[i]):
+            lo = max(spans[i, q, 0], j_lo)
+            hi = min(spans[i, q, 1], j_hi)
+            if hi <= lo:
+                continue
+            up = p[i + 1, lo:hi]
+            down = p[i - 1, lo:hi]
+            row = p[i, lo - 1 : hi + 1]
+            prev = p_prev[i, lo:hi]
+            nxt = p_next[i, lo:hi]
+            for j in range(hi - lo):
+                lap = up[j] + down[j] + row[j + 2] + row[j] - 4.0 * row[j + 1]
+                nxt[j] = 2.0 * row[j + 1] - prev[j] + coeff * lap
+        _wall_row(p_next[i], p[i], p_prev[i], wall_pos, wall_coef, wall_ptr[i], wall_ptr[i + 1])
+
+    for j in range(j_lo, j_hi):
+        p_next[0, j] = 0.0
+        p_next[ni - 1, j] = 0.0
+    for i in range(i_lo, i_hi):
+        p_next[i, 0] = 0.0
+        p_next[i, nj - 1] = 0.0
+    _box_grow(box, p.shape)
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, "
+    "int64[:, :, ::1], int64[::1], int64[:, ::1], int64[::1], int64[::1], float32[:, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_spans_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    wall_ptr: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_spans_2d` (spans along k)."""
+    ni, nj, nk = p.shape
+    if _box_is_empty(box):
+        return
+    i_lo, i_hi = _box_window(box, 0, ni)
+    j_lo, j_hi = _box_window(box, 1, nj)
+    k_lo, k_hi = _box_window(box, 2, nk)
+    for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+        for j in range(max(j_lo, 1), min(j_hi, nj - 1)):
+            pencil = i * nj + j
+            for q in range(n_spans[pencil]):
+                lo = max(spans[pencil, q, 0], k_lo)
+                hi = min(spans[pencil, q, 1], k_hi)
+                if hi <= lo:
+                    continue
+                north = p[i + 1, j, lo:hi]
+                south = p[i - 1, j, lo:hi]
+                east = p[i, j + 1, lo:hi]
+                west = p[i, j - 1, lo:hi]
+                row = p[i, j, lo - 1 : hi + 1]
+                prev = p_prev[i, j, lo:hi]
+                nxt = p_next[i, j, lo:hi]
+                for k in range(hi - lo):
+                    lap = (
+                        north[k]
+                        + south[k]
+                        + east[k]
+                        + west[k]
+                        + row[k + 2]
+                        + row[k]
+                        - 6.0 * row[k + 1]
+                    )
+                    nxt[k] = 2.0 * row[k + 1] - prev[k] + coeff * lap
+            _wall_row(
+                p_next[i, j],
+                p[i, j],
+                p_prev[i, j],
+                wall_pos,
+                wall_coef,
+                wall_ptr[pencil],
+                wall_ptr[pencil + 1],
+            )
+
+    for j in range(j_lo, j_hi):
+        for k in range(k_lo, k_hi):
+            p_next[0, j, k] = 0.0
+            p_next[ni - 1, j, k] = 0.0
+    for i in range(i_lo, i_hi):
+        for k in range(k_lo, k_hi):
+            p_next[i, 0, k] = 0.0
+            p_next[i, nj - 1, k] = 0.0
+    for i in range(i_lo, i_hi):
+        for j in range(j_lo, j_hi):
+            p_next[i, j, 0] = 0.0
+            p_next[i, j, nk - 1] = 0.0
+    _box_grow(box, p.shape)
+
+
+# =====================================================================
+# Compiled multi-step loops (Simulate.run)
+# =====================================================================
+#
+# ``Simulate.step()`` pays a Python round-trip per timestep: kernel
+# dispatch, driver injection and
+# the three-way buffer rotation. On the 64x64 / 200-step sensing grids
+# that overhead is larger than the stencil itself. The kernels below
+# keep the whole leap-frog loop inside one compiled call:
+#
+#   for every step s:
+#       stencil over the fluid spans in box + walls   (same body as span kernel,
+#                                                  impedance walls included)
+#       p_next[drivers on obstacles] = 0         (see "Fluid-span kernels")
+#       p_next[driver d] += source[s, d]         (precomputed value table)
+#       grow box; add drivers that injected a nonzero value
+#       rotate (p_prev, p, p_next) <- (p, p_next, p_prev)
+#       every record_step-th step: out[w] = p.flat[sensor_idx]
+#
+# The per-step ordering contract (walls, then obstacles, then drivers)
+# is identical to ``Simulate.step()``. The rotation happens on local
+# array references only; the caller re-applies ``n_steps % 3`` rotations
+# to its own attributes afterwards, so the buffers end up exactly where
+# n calls to ``step()`` would have left them.
+#
+# The prange region is re-entered every step (a barrier per timestep
+# is inherent to the leap-frog dependency), but nothing returns to the
+# interpreter between steps.
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32, int64[:, :, ::1], "
+    "int64[::1], int64[:, ::1], int64[::1], int64[::1], float32[:, ::1], int64[:, :], uint8[:], "
+    "float32[:, :], int64[:], int64, float32[:, :])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    wall_ptr: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+) -> None:
+    """Advance ``source.shape[0]`` 2D leap-frog steps in one compiled call.
+
+    ``spans`` / ``n_spans`` is the fluid-span table of the room (one full
+    span per row when there are no obstacles) and ``box`` the
+    active-region box, updated in place; ``wall_ptr`` / ``wall_pos`` /
+    ``wall_coef`` is the impedance-wall table. ``driver_idx`` is an
+    ``(n_drivers, 2)`` list of in-bounds driver cells, ``driver_solid``
+    flags the drivers that sit on an obstacle (their cell is zeroed before
+    injection) and ``source`` is the ``(n_steps, n_drivers)`` table of
+    values injected at each step. ``sensor_idx`` holds flat (C-order)
+    sensor cells; after every step ``s`` with ``s % record_step == 0`` the
+    new ``p`` at those cells is written to the next row of ``out``
+    (``(ceil(n_steps / record_step), n_sensors)``). Pass an empty
+    ``sensor_idx`` to record nothing.
+    """
+    ni, nj = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    w = 0
+    for s in range(n_steps):
+        if not _box_is_empty(box):
+            i_lo, i_hi = _box_window(box, 0, ni)
+            j_lo, j_hi = _box_window(box, 1, nj)
+            for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+                for q in range(n_spans[i]):
+                    lo = max(spans[i, q, 0], j_lo)
+                    hi = min(spans[i, q, 1], j_hi)
+                    if hi <= lo:
+                        continue
+                    up = p[i + 1, lo:hi]
+                    down = p[i - 1, lo:hi]
+                    row = p[i, lo - 1 : hi + 1]
+                    prev = p_prev[i, lo:hi]
+                    nxt = p_next[i, lo:hi]
+                    for j in range(hi - lo):
+                        lap = up[j] + down[j] + row[j + 2] + row[j] - 4.0 * row[j + 1]
+                        nxt[j] = 2.0 * row[j + 1] - prev[j] + coeff * lap
+                _wall_row(
+                    p_next[i], p[i], p_prev[i], wall_pos, wall_coef, wall_ptr[i], wall_ptr[i + 1]
+                )
+            for j in range(j_lo, j_hi):
+                p_next[0, j] = 0.0
+                p_next[ni - 1, j] = 0.0
+            for i in range(i_lo, i_hi):
+                p_next[i, 0] = 0.0
+                p_next[i, nj - 1] = 0.0
+            _box_grow(box, p.shape)
+        for d in range(n_drv):
+            if driver_solid[d]:
+                p_next[driver_idx[d, 0], driver_idx[d, 1]] = 0.0
+        for d in range(n_drv):
+            p_next[driver_idx[d, 0], driver_idx[d, 1]] += source[s, d]
+            if source[s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+        tmp = p_prev
+        p_prev = p
+        p = p_next
+        p_next = tmp
+        if n_sen > 0 and s % record_step == 0:
+            for m in range(n_sen):
+                f = sensor_idx[m]
+                out[w, m] = p[f // nj, f % nj]
+            w += 1
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, int64[:, :, ::1], "
+    "int64[::1], int64[:, ::1], int64[::1], int64[::1], float32[:, ::1], int64[:, :], uint8[:], "
+    "float32[:, :], int64[:], int64, float32[:, :])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    wall_ptr: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_run_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    njk = nj * nk
+    w = 0
+    for s in range(n_steps):
+        if not _box_is_empty(box):
+            i_lo, i_hi = _box_window(box, 0, ni)
+            j_lo, j_hi = _box_window(box, 1, nj)
+            k_lo, k_hi = _box_window(box, 2, nk)
+            for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+                for j in range(max(j_lo, 1), min(j_hi, nj - 1)):
+                    pencil = i * nj + j
+                    for q in range(n_spans[pencil]):
+                        lo = max(spans[pencil, q, 0], k_lo)
+                        hi = min(spans[pencil, q, 1], k_hi)
+                        if hi <= lo:
+                            continue
+                        north = p[i + 1, j, lo:hi]
+                        south = p[i - 1, j, lo:hi]
+                        east = p[i, j + 1, lo:hi]
+                        west = p[i, j - 1, lo:hi]
+                        row = p[i, j, lo - 1 : hi + 1]
+                        prev = p_prev[i, j, lo:hi]
+                        nxt = p_next[i, j, lo:hi]
+                        for k in range(hi - lo):
+                            lap = (
+                                north[k]
+                                + south[k]
+                                + east[k]
+                                + west[k]
+                                + row[k + 2]
+                                + row[k]
+                                - 6.0 * row[k + 1]
+                            )
+                            nxt[k] = 2.0 * row[k + 1] - prev[k] + coeff * lap
+                    _wall_row(
+                        p_next[i, j],
+                        p[i, j],
+                        p_prev[i, j],
+                        wall_pos,
+                        wall_coef,
+                        wall_ptr[pencil],
+                        wall_ptr[pencil + 1],
+                    )
+            for j in range(j_lo, j_hi):
+                for k in range(k_lo, k_hi):
+                    p_next[0, j, k] = 0.0
+                    p_next[ni - 1, j, k] = 0.0
+            for i in range(i_lo, i_hi):
+                for k in range(k_lo, k_hi):
+                    p_next[i, 0, k] = 0.0
+                    p_next[i, nj - 1, k] = 0.0
+            for i in range(i_lo, i_hi):
+                for j in range(j_lo, j_hi):
+                    p_next[i, j, 0] = 0.0
+                    p_next[i, j, nk - 1] = 0.0
+            _box_grow(box, p.shape)
+        for d in range(n_drv):
+            if driver_solid[d]:
+                p_next[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] = 0.0
+        for d in range(n_drv):
+            p_next[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] += source[s, d]
+            if source[s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+        tmp = p_prev
+        p_prev = p
+        p = p_next
+        p_next = tmp
+        if n_sen > 0 and s % record_step == 0:
+            for m in range(n_sen):
+                f = sensor_idx[m]
+                r = f % njk
+                out[w, m] = p[f // njk, r // nk, r % nk]
+            w += 1
+
+
+# =====================================================================
+# In-place (two-buffer) kernels
+# =====================================================================
+#
+# The leap-frog update reads ``p_prev`` only at the cell it writes:
+#
+#   p_next[x] = 2 p[x] - p_prev[x] + coeff * lap(p)[x]
+#
+# so ``p_next`` can overwrite ``p_prev`` in place, and the rotation
+# becomes a two-way swap (p_prev, p) <- (p, p_prev). The field then
+# needs two buffers instead of three. On a 512^3 grid that saves 512 MB.
+# The sweep also gets cheaper. The three-buffer kernels stream three
+# arrays in and one out, and the store to a third array costs a
+# read-for-ownership. Here the store goes to a line that was just read.
+#
+# The loop nests match the span / run kernels, including the box
+# clipping. Only the destination changes, so results are bit-identical
+# to the three-buffer path. Cells the sweep skips keep their
+# ``p_prev`` value instead of a stale ``p_next`` one. By the invariants
+# of those kernels that value is zero on obstacles and outside the box.
+# Drivers on walls or obstacles are zeroed before injection, as before.
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32, int64[:, :, ::1], int64[::1], int64[:, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_inplace_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+) -> None:
+    """:func:`fused_leapfrog_step_spans_2d` writing the new field into ``p_prev``."""
+    ni, nj = p.shape
+    if _box_is_empty(box):
+        return
+    i_lo, i_hi = _box_window(box, 0, ni)
+    j_lo, j_hi = _box_window(box, 1, nj)
+    for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+        for q in range(n_spans[i]):
+            lo = max(spans[i, q, 0], j_lo)
+            hi = min(spans[i, q, 1], j_hi)
+            if hi <= lo:
+                continue
+            up = p[i + 1, lo:hi]
+            down = p[i - 1, lo:hi]
+            row = p[i, lo - 1 : hi + 1]
+            prev = p_prev[i, lo:hi]
+            for j in range(hi - lo):
+                lap = up[j] + down[j] + row[j + 2] + row[j] - 4.0 * row[j + 1]
+                prev[j] = 2.0 * row[j + 1] - prev[j] + coeff * lap
+
+    for j in range(j_lo, j_hi):
+        p_prev[0, j] = 0.0
+        p_prev[ni - 1, j] = 0.0
+    for i in range(i_lo, i_hi):
+        p_prev[i, 0] = 0.0
+        p_prev[i, nj - 1] = 0.0
+    _box_grow(box, p.shape)
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32, int64[:, :, ::1], int64[::1], "
+    "int64[:, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_inplace_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_inplace_2d` (spans along k)."""
+    ni, nj, nk = p.shape
+    if _box_is_empty(box):
+        return
+    i_lo, i_hi = _box_window(box, 0, ni)
+    j_lo, j_hi = _box_window(box, 1, nj)
+    k_lo, k_hi = _box_window(box, 2, nk)
+    for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+        for j in range(max(j_lo, 1), min(j_hi, nj - 1)):
+            pencil = i * nj + j
+            for q in range(n_spans[pencil]):
+                lo = max(spans[pencil, q, 0], k_lo)
+                hi = min(spans[pencil, q, 1], k_hi)
+                if hi <= lo:
+                    continue
+                north = p[i + 1, j, lo:hi]
+                south = p[i - 1, j, lo:hi]
+                east = p[i, j + 1, lo:hi]
+                west = p[i, j - 1, lo:hi]
+                row = p[i, j, lo - 1 : hi + 1]
+                prev = p_prev[i, j, lo:hi]
+                for k in range(hi - lo):
+                    lap = (
+                        north[k]
+                        + south[k]
+                        + east[k]
+                        + west[k]
+                        + row[k + 2]
+                        + row[k]
+                        - 6.0 * row[k + 1]
+                    )
+                    prev[k] = 2.0 * row[k + 1] - prev[k] + coeff * lap
+
+    for j in range(j_lo, j_hi):
+        for k in range(k_lo, k_hi):
+            p_prev[0, j, k] = 0.0
+            p_prev[ni - 1, j, k] = 0.0
+    for i in range(i_lo, i_hi):
+        for k in range(k_lo, k_hi):
+            p_prev[i, 0, k] = 0.0
+            p_prev[i, nj - 1, k] = 0.0
+    for i in range(i_lo, i_hi):
+        for j in range(j_lo, j_hi):
+            p_prev[i, j, 0] = 0.0
+            p_prev[i, j, nk - 1] = 0.0
+    _box_grow(box, p.shape)
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32, int64[:, :, ::1], int64[::1], "
+    "int64[:, ::1], int64[:, :], uint8[:], float32[:, :], int64[:], int64, float32[:, :])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_inplace_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+) -> None:
+    """Two-buffer :func:`fused_leapfrog_run_2d`; the caller replays ``n_steps % 2`` swaps."""
+    ni, nj = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    w = 0
+    for s in range(n_steps):
+        if not _box_is_empty(box):
+            i_lo, i_hi = _box_window(box, 0, ni)
+            j_lo, j_hi = _box_window(box, 1, nj)
+            for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+                for q in range(n_spans[i]):
+                    lo = max(spans[i, q, 0], j_lo)
+                    hi = min(spans[i, q, 1], j_hi)
+                    if hi <= lo:
+                        continue
+                    up = p[i + 1, lo:hi]
+                    down = p[i - 1, lo:hi]
+                    row = p[i, lo - 1 : hi + 1]
+                    prev = p_prev[i, lo:hi]
+                    for j in range(hi - lo):
+                        lap = up[j] + down[j] + row[j + 2] + row[j] - 4.0 * row[j + 1]
+                        prev[j] = 2.0 * row[j + 1] - prev[j] + coeff * lap
+            for j in range(j_lo, j_hi):
+                p_prev[0, j] = 0.0
+                p_prev[ni - 1, j] = 0.0
+            for i in range(i_lo, i_hi):
+                p_prev[i, 0] = 0.0
+                p_prev[i, nj - 1] = 0.0
+            _box_grow(box, p.shape)
+        for d in range(n_drv):
+            if driver_solid[d]:
+                p_prev[driver_idx[d, 0], driver_idx[d, 1]] = 0.0
+        for d in range(n_drv):
+            p_prev[driver_idx[d, 0], driver_idx[d, 1]] += source[s, d]
+            if source[s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+        tmp = p_prev
+        p_prev = p
+        p = tmp
+        if n_sen > 0 and s % record_step == 0:
+            for m in range(n_sen):
+                f = sensor_idx[m]
+                out[w, m] = p[f // nj, f % nj]
+            w += 1
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32, int64[:, :, ::1], int64[::1], "
+    "int64[:, ::1], int64[:, :], uint8[:], float32[:, :], int64[:], int64, float32[:, :])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_inplace_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_run_inplace_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    njk = nj * nk
+    w = 0
+    for s in range(n_steps):
+        if not _box_is_empty(box):
+            i_lo, i_hi = _box_window(box, 0, ni)
+            j_lo, j_hi = _box_window(box, 1, nj)
+            k_lo, k_hi = _box_window(box, 2, nk)
+            for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+                for j in range(max(j_lo, 1), min(j_hi, nj - 1)):
+                    pencil = i * nj + j
+                    for q in range(n_spans[pencil]):
+                        lo = max(spans[pencil, q, 0], k_lo)
+                        hi = min(spans[pencil, q, 1], k_hi)
+                        if hi <= lo:
+                            continue
+                        north = p[i + 1, j, lo:hi]
+                        south = p[i - 1, j, lo:hi]
+                        east = p[i, j + 1, lo:hi]
+                        west = p[i, j - 1, lo:hi]
+                        row = p[i, j, lo - 1 : hi + 1]
+                        prev = p_prev[i, j, lo:hi]
+                        for k in range(hi - lo):
+                            lap = (
+                                north[k]
+                                + south[k]
+                                + east[k]
+                                + west[k]
+                                + row[k + 2]
+                                + row[k]
+                                - 6.0 * row[k + 1]
+                            )
+                            prev[k] = 2.0 * row[k + 1] - prev[k] + coeff * lap
+            for j in range(j_lo, j_hi):
+                for k in range(k_lo, k_hi):
+                    p_prev[0, j, k] = 0.0
+                    p_prev[ni - 1, j, k] = 0.0
+            for i in range(i_lo, i_hi):
+                for k in range(k_lo, k_hi):
+                    p_prev[i, 0, k] = 0.0
+                    p_prev[i, nj - 1, k] = 0.0
+            for i in range(i_lo, i_hi):
+                for j in range(j_lo, j_hi):
+                    p_prev[i, j, 0] = 0.0
+                    p_prev[i, j, nk - 1] = 0.0
+            _box_grow(box, p.shape)
+        for d in range(n_drv):
+            if driver_solid[d]:
+                p_prev[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] = 0.0
+        for d in range(n_drv):
+            p_prev[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] += source[s, d]
+            if source[s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+        tmp = p_prev
+        p_prev = p
+        p = tmp
+        if n_sen > 0 and s % record_step == 0:
+            for m in range(n_sen):
+                f = sensor_idx[m]
+                r = f % njk
+                out[w, m] = p[f // njk, r // nk, r % nk]
+            w += 1
+
+
+# =====================================================================
+# Reduced-precision storage (float16 / bfloat16)
+# =====================================================================
+#
+# The large-grid sweep is memory-bound, so halving the bytes per cell
+# halves the traffic and the footprint. Numba's CPU target has no
+# float16 type, so both 16-bit formats are stored as raw uint16 bit
+# patterns and converted in the kernel, a row at a time, into a small
+# per-thread float32 scratch:
+#
+#   decode  bits -> float32 with integer shifts (plus an int -> float
+#           conversion for float16 subnormals); exact, and branch-free
+#           so the loops vectorise
+#   compute float32, same stencil expression as the float32 kernels
+#   encode  float32 -> bits, round to nearest even, again branch-free
+#
+# A table lookup would be simpler but gathers do not vectorise; it is
+# only used for scalar reads (driver cells, sensors). To decode each
+# cell of ``p`` about once per step rather than once per stencil arm,
+# the prange runs over chunks of ``_RING_CHUNK`` consecutive rows (2D)
+# / planes (3D), and each chunk keeps a ring of three decoded rows /
+# planes (slot ``i % 3``): advancing ``i`` decodes only row / plane
+# ``i + 1``. A chunk re-decodes its two halo rows / planes, so larger
+# chunks waste less; smaller ones balance threads better.
+
+_RING_CHUNK = 16
+#
+# IEEE half (``float16``) keeps 10 mantissa bits and an exponent range
+# of about 6e-8 .. 65504. ``bfloat16`` keeps float32's range and only 7
+# mantissa bits. Both kernels are two-buffer (in place, see above):
+# 2 x 2 bytes per cell is a third of the 3 x 4-byte float32 default.
+# ``Simulate.step()`` is ``run(1)`` in this mode.
+
+
+def storage_decode_table(storage_dtype: str) -> np.ndarray:
+    """float32 value of every uint16 bit pattern of ``storage_dtype``."""
+    bits = np.arange(1 << 16, dtype=np.uint32)
+    if storage_dtype == "float16":
+        return bits.astype(np.uint16).view(np.float16).astype(np.float32)
+    if storage_dtype == "bfloat16":
+        return (bits << np.uint32(16)).view(np.float32)
+    raise ValueError(f"no 16-bit decode table for storage_dtype={storage_dtype!r}")
+
+
+@njit(cache=True, fastmath=True, boundscheck=False, error_model="numpy", inline="always")
+def _decode_span(src: np.ndarray, dst: np.ndarray, bf16: bool) -> None:
+    """Widen the 16-bit cells ``src`` into float32 ``dst`` (same length).
+
+    float16: ``(h & 0x7FFF) << 13`` rebiased by 112 is the float32 bit
+    pattern of every normal half; subnormals (magnitude < 0x400) are
+    ``mag * 2**-24``. Infinities and NaNs are not handled.
+    """
+    bits = dst.view(np.uint32)
+    n = src.shape[0]
+    if bf16:
+        for x in range(n):
+            bits[x] = np.uint32(src[x]) << np.uint32(16)
+        return
+    for x in range(n):
+        bits[x] = ((np.uint32(src[x]) & np.uint32(0x7FFF)) << np.uint32(13)) + np.uint32(112 << 23)
+    for x in range(n):
+        h = src[x]
+        mag = h & np.uint16(0x7FFF)
+        v = dst[x] if mag >= np.uint16(0x400) else np.float32(mag) * np.float32(2.0**-24)
+        dst[x] = -v if h & np.uint16(0x8000) else v
+
+
+@njit(cache=True, fastmath=True, boundscheck=False, error_model="numpy", inline="always")
+def _encode_span(acc: np.ndarray, dst: np.ndarray, bf16: bool) -> None:
+    """Round float32 ``acc`` into the 16-bit cells ``dst`` (same length).
+
+    Round to nearest, ties to even, as ``astype(np.float16)`` does.
+    float16 computes the normal and the subnormal rounding for every
+    cell and selects one, so the loop has no branches; magnitudes past
+    65504 saturate to infinity.
+    """
+    bits = acc.view(np.uint32)
+    n = dst.shape[0]
+    if bf16:
+        for x in range(n):
+            b = bits[x]
+            odd = (b >> np.uint32(16)) & np.uint32(1)
+            dst[x] = np.uint16((b + np.uint32(0x7FFF) + odd) >> np.uint32(16))
+        return
+    for x in range(n):
+        b = bits[x]
+        a = b & np.uint32(0x7FFFFFFF)
+        odd = (a >> np.uint32(13)) & np.uint32(1)
+        normal = (a - np.uint32(112 << 23) + np.uint32(0xFFF) + odd) >> np.uint32(13)
+        normal = min(normal, np.uint32(0x7C00))
+        shift = min(np.uint32(126) - (a >> np.uint32(23)), np.uint32(31))
+        m = (a & np.uint32(0x7FFFFF)) | np.uint32(0x800000)
+        odd = (m >> shift) & np.uint32(1)
+        sub = (m + (np.uint32(1) << (shift - np.uint32(1))) - np.uint32(1) + odd) >> shift
+        h = normal if a >= np.uint32(113 << 23) else sub
+        if a > np.uint32(0x7F800000):
+            h = np.uint32(0x7E00)
+        dst[x] = np.uint16(h | ((b >> np.uint32(16)) & np.uint32(0x8000)))
+
+
+@njit(cache=True, boundscheck=False)
+def _encode_value(value: float, bf16: bool) -> int:
+    acc = np.empty(1, dtype=np.float32)
+    acc[0] = value
+    out = np.empty(1, dtype=np.uint16)
+    _encode_span(acc, out, bf16)
+    return out[0]
+
+
+def encode_storage(values: np.ndarray, storage_dtype: str) -> np.ndarray:
+    """uint16 bit patterns of ``values`` (float32-castable) in ``storage_dtype``.
+
+    The host-side twin of the kernels' encoder, for tests and loaders.
+    """
+    acc = np.array(values, dtype=np.float32).ravel()
+    out = np.empty(acc.shape, dtype=np.uint16)
+    _encode_span(acc, out, storage_dtype == "bfloat16")
+    return out.reshape(np.shape(values))
+
+
+@njit(cache=True, fastmath=True, boundscheck=False, error_model="numpy", parallel=True)
+def encode_rows(values: np.ndarray, out: np.ndarray, bf16: bool) -> None:
+    """Encode the float32 rows of ``values`` into the uint16 rows of ``out``.
+
+    :func:`encode_storage` for bulk output (the dense receiver recording
+    of ``dataset.record_receiver_grid``): one prange over rows, each row
+    one vectorised :func:`_encode_span`. NumPy's ``astype(np.float16)``
+    is scalar and single-threaded, and costs more than the run itself.
+    """
+    for r in prange(values.shape[0]):  # ty: ignore[not-iterable]
+        _encode_span(values[r], out[r], bf16)
+
+
+@njit(
+    "void(uint16[:, ::1], uint16[:, ::1], float32, int64[:, :, ::1], int64[::1], "
+    "int64[:, ::1], int64[:, :], uint8[:], float32[:, :], int64[:], int64, float32[:, :], "
+    "float32[::1], boolean)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_u16_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+    lut: np.ndarray,
+    bf16: bool,
+) -> None:
+    """:func:`fused_leapfrog_run_inplace_2d` on 16-bit storage.
+
+    ``p`` / ``p_prev`` hold float16 or bfloat16 bit patterns and ``bf16``
+    says which. ``lut`` is the format's decode table
+    (:func:`storage_decode_table`), used for driver cells and sensors.
+    Recorded samples are float32.
+    """
+    ni, nj = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    w = 0
+    for s in range(n_steps):
+        if not _box_is_empty(box):
+            i_lo, i_hi = _box_window(box, 0, ni)
+            j_lo, j_hi = _box_window(box, 1, nj)
+            a = max(j_lo - 1, 0)
+            b = min(j_hi + 1, nj)
+            i_first = max(i_lo, 1)
+            n_rows = min(i_hi, ni - 1) - i_first
+            for c in prange((n_rows + _RING_CHUNK - 1) // _RING_CHUNK):  # ty: ignore[not-iterable]
+                c_lo = i_first + c * _RING_CHUNK
+                c_hi = min(c_lo + _RING_CHUNK, i_first + n_rows)
+                # Ring slots 0-2, then prev / result.
+                buf = np.empty((4, nj), dtype=np.float32)
+                _decode_span(p[c_lo - 1, a:b], buf[(c_lo - 1) % 3, a:b], bf16)
+                _decode_span(p[c_lo, a:b], buf[c_lo % 3, a:b], bf16)
+                for i in range(c_lo, c_hi):
+                    _decode_span(p[i + 1, a:b], buf[(i + 1) % 3, a:b], bf16)
+                    for q in range(n_spans[i]):
+                        lo = max(spans[i, q, 0], j_lo)
+                        hi = min(spans[i, q, 1], j_hi)
+                        if hi <= lo:
+                            continue
+                        up = buf[(i + 1) % 3, lo:hi]
+                        down = buf[(i - 1) % 3, lo:hi]
+                        row = buf[i % 3, lo - 1 : hi + 1]
+                        acc = buf[3, : hi - lo]
+                        _decode_span(p_prev[i, lo:hi], acc, bf16)
+                        for j in range(hi - lo):
+                            lap = up[j] + down[j] + row[j + 2] + row[j] - 4.0 * row[j + 1]
+                            acc[j] = 2.0 * row[j + 1] - acc[j] + coeff * lap
+                        _encode_span(acc, p_prev[i, lo:hi], bf16)
+            for j in range(j_lo, j_hi):
+                p_prev[0, j] = 0
+                p_prev[ni - 1, j] = 0
+            for i in range(i_lo, i_hi):
+                p_prev[i, 0] = 0
+                p_prev[i, nj - 1] = 0
+            _box_grow(box, p.shape)
+        for d in range(n_drv):
+            if driver_solid[d]:
+                p_prev[driver_idx[d, 0], driver_idx[d, 1]] = 0
+        for d in range(n_drv):
+            i = driver_idx[d, 0]
+            j = driver_idx[d, 1]
+            p_prev[i, j] = _encode_value(lut[p_prev[i, j]] + source[s, d], bf16)
+            if source[s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+        tmp = p_prev
+        p_prev = p
+        p = tmp
+        if n_sen > 0 and s % record_step == 0:
+            for m in range(n_sen):
+                f = sensor_idx[m]
+                out[w, m] = lut[p[f // nj, f % nj]]
+            w += 1
+
+
+@njit(
+    "void(uint16[:, :, ::1], uint16[:, :, ::1], float32, int64[:, :, ::1], int64[::1], "
+    "int64[:, ::1], int64[:, :], uint8[:], float32[:, :], int64[:], int64, float32[:, :], "
+    "float32[::1], boolean)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_u16_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+    lut: np.ndarray,
+    bf16: bool,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_run_u16_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    njk = nj * nk
+    w = 0
+    for s in range(n_steps):
+        if not _box_is_empty(box):
+            i_lo, i_hi = _box_window(box, 0, ni)
+            j_lo, j_hi = _box_window(box, 1, nj)
+            k_lo, k_hi = _box_window(box, 2, nk)
+            a = max(k_lo - 1, 0)
+            b = min(k_hi + 1, nk)
+            ja = max(j_lo - 1, 0)
+            jb = min(j_hi + 1, nj)
+            i_first = max(i_lo, 1)
+            n_planes = min(i_hi, ni - 1) - i_first
+            n_chunks = (n_planes + _RING_CHUNK - 1) // _RING_CHUNK
+            for c in prange(n_chunks):  # ty: ignore[not-iterable]
+                c_lo = i_first + c * _RING_CHUNK
+                c_hi = min(c_lo + _RING_CHUNK, i_first + n_planes)
+                ring = np.empty((3, nj, nk), dtype=np.float32)
+                acc_row = np.empty(nk, dtype=np.float32)
+                for j in range(ja, jb):
+                    _decode_span(p[c_lo - 1, j, a:b], ring[(c_lo - 1) % 3, j, a:b], bf16)
+                    _decode_span(p[c_lo, j, a:b], ring[c_lo % 3, j, a:b], bf16)
+                for i in range(c_lo, c_hi):
+                    for j in range(ja, jb):
+                        _decode_span(p[i + 1, j, a:b], ring[(i + 1) % 3, j, a:b], bf16)
+                    plane = ring[i % 3]
+                    above = ring[(i + 1) % 3]
+                    below = ring[(i - 1) % 3]
+                    for j in range(max(j_lo, 1), min(j_hi, nj - 1)):
+                        pencil = i * nj + j
+                        for q in range(n_spans[pencil]):
+                            lo = max(spans[pencil, q, 0], k_lo)
+                            hi = min(spans[pencil, q, 1], k_hi)
+                            if hi <= lo:
+                                continue
+                            row = plane[j, lo - 1 : hi + 1]
+                            east = plane[j + 1, lo:hi]
+                            west = plane[j - 1, lo:hi]
+                            north = above[j, lo:hi]
+                            south = below[j, lo:hi]
+                            acc = acc_row[: hi - lo]
+                            _decode_span(p_prev[i, j, lo:hi], acc, bf16)
+                            for k in range(hi - lo):
+                                lap = (
+                                    north[k]
+                                    + south[k]
+                                    + east[k]
+                                    + west[k]
+                                    + row[k + 2]
+                                    + row[k]
+                                    - 6.0 * row[k + 1]
+                                )
+                                acc[k] = 2.0 * row[k + 1] - acc[k] + coeff * lap
+                            _encode_span(acc, p_prev[i, j, lo:hi], bf16)
+            for j in range(j_lo, j_hi):
+                for k in range(k_lo, k_hi):
+                    p_prev[0, j, k] = 0
+                    p_prev[ni - 1, j, k] = 0
+            for i in range(i_lo, i_hi):
+                for k in range(k_lo, k_hi):
+                    p_prev[i, 0, k] = 0
+                    p_prev[i, nj - 1, k] = 0
+            for i in range(i_lo, i_hi):
+                for j in range(j_lo, j_hi):
+                    p_prev[i, j, 0] = 0
+                    p_prev[i, j, nk - 1] = 0
+            _box_grow(box, p.shape)
+        for d in range(n_drv):
+            if driver_solid[d]:
+                p_prev[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] = 0
+        for d in range(n_drv):
+            i = driver_idx[d, 0]
+            j = driver_idx[d, 1]
+            k = driver_idx[d, 2]
+            p_prev[i, j, k] = _encode_value(lut[p_prev[i, j, k]] + source[s, d], bf16)
+            if source[s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+        tmp = p_prev
+        p_prev = p
+        p = tmp
+        if n_sen > 0 and s % record_step == 0:
+            for m in range(n_sen):
+                f = sensor_idx[m]
+                r = f % njk
+                out[w, m] = lut[p[f // njk, r // nk, r % nk]]
+            w += 1
+
+
+# =====================================================================
+# Temporally blocked loops
+# =====================================================================
+#
+# The run kernels sweep the whole grid once per step. Once the field
+# buffers exceed the cache (the 512x512 benchmark, any realistic 3D
+# grid), every step streams them all from DRAM. These kernels advance
+# ``time_block`` steps per pass over memory with a wavefront along axis
+# 0. The grid is cut into slabs of ``slab`` consecutive rows (2D) /
+# planes (3D), and pass ``wave`` computes step ``s`` of the block on
+# slab ``wave - s``, for increasing ``s``:
+#
+#   wave 0:  s=0 @ slab 0
+#   wave 1:  s=0 @ slab 1,  s=1 @ slab 0
+#   wave 2:  s=0 @ slab 2,  s=1 @ slab 1,  s=2 @ slab 0      ...
+#
+# Step ``s`` on slab ``b`` needs step ``s - 1`` on slabs ``b - 1 .. b + 1``.
+# That was computed earlier in the same wave or in an earlier one, so
+# while a wave runs only about ``time_block + 2`` slabs per buffer are
+# live. Sized to fit in cache, each cell is loaded from memory once per
+# block rather than once per step.
+#
+# Time levels live in the buffers' rotation slots. Level ``L`` (0 is
+# ``p`` on entry, -1 is ``p_prev``) sits in slot ``(L + 1) % n_buffers``
+# of ``(p_prev, p, p_next)``, so step ``g`` writes slot ``(g + 2) %
+# n_buffers`` over level ``g - 2`` (three buffers) or ``g - 1`` (two
+# buffers, in place). Every cell of the overwritten level is dead by
+# then: its last readers are on lower levels of the same wave or of
+# earlier waves. The slots therefore end where the plain run kernels
+# leave them, and the caller replays the same ``n % 3`` rotations /
+# ``n % 2`` swaps. With two buffers, pass ``p_prev`` again as
+# ``p_next``.
+#
+# Per step, the ordering contract is unchanged. The stencil runs over
+# fluid spans clipped to that step's active-region window, the walls
+# are zeroed in the slab, and then the slab's drivers are zeroed (if
+# solid) and injected. Sensors in the slab are read after that. Box
+# growth does not depend on field values, so each block's per-step
+# windows are computed up front (``_block_windows``). Results are
+# bit-identical to the run kernels.
+
+
+@njit(cache=True, boundscheck=False)
+def _block_windows(
+    box: np.ndarray,
+    shape: Tuple[int, ...],
+    driver_idx: np.ndarray,
+    source: np.ndarray,
+    t0: int,
+    win: np.ndarray,
+    live: np.ndarray,
+) -> None:
+    """Per-step active-region windows for steps ``t0 .. t0 + len(live)``.
+
+    Fills ``win[s]`` with the ``(dims, 2)`` window step ``t0 + s`` sweeps
+    and ``live[s]`` with whether its box is nonempty, and advances
+    ``box`` over those steps exactly as the run kernels would.
+    """
+    for s in range(live.shape[0]):
+        live[s] = not _box_is_empty(box)
+        if live[s]:
+            for a in range(box.shape[0]):
+                win[s, a, 0], win[s, a, 1] = _box_window(box, a, shape[a])
+            _box_grow(box, shape)
+        for d in range(driver_idx.shape[0]):
+            if source[t0 + s, d] != 0.0:
+                _box_include(box, driver_idx[d])
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32, int64[:, :, ::1], "
+    "int64[::1], int64[:, ::1], int64[::1], int64[::1], float32[:, ::1], int64[:, :], uint8[:], "
+    "float32[:, :], int64[:], int64, float32[:, :], int64, int64, int64)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_tiled_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    wall_ptr: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+    n_buffers: int,
+    time_block: int,
+    slab: int,
+) -> None:
+    """:func:`fused_leapfrog_run_2d`, temporally blocked.
+
+    Arguments as for the run kernel, plus ``n_buffers`` (3, or 2 for the
+    in-place mode with ``p_next is p_prev``), the steps per block
+    ``time_block`` and the rows per slab ``slab``.
+    """
+    ni, nj = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    bufs = (p_prev, p, p_next)
+    n_slabs = (ni + slab - 1) // slab
+    win = np.zeros((time_block, 2, 2), dtype=np.int64)
+    live = np.zeros(time_block, dtype=np.bool_)
+    for t0 in range(0, n_steps, time_block):
+        n_lvl = min(time_block, n_steps - t0)
+        _block_windows(box, p.shape, driver_idx, source, t0, win[:n_lvl], live[:n_lvl])
+        for wave in range(n_slabs + n_lvl - 1):
+            for s in range(max(wave - n_slabs + 1, 0), min(wave + 1, n_lvl)):
+                g = t0 + s
+                old = bufs[g % n_buffers]
+                cur = bufs[(g + 1) % n_buffers]
+                dst = bufs[(g + 2) % n_buffers]
+                a = (wave - s) * slab
+                b = min(a + slab, ni)
+                if live[s]:
+                    i_lo = max(win[s, 0, 0], a)
+                    i_hi = min(win[s, 0, 1], b)
+                    j_lo = win[s, 1, 0]
+                    j_hi = win[s, 1, 1]
+                    for i in prange(max(i_lo, 1), min(i_hi, ni - 1)):  # ty: ignore[not-iterable]
+                        for q in range(n_spans[i]):
+                            lo = max(spans[i, q, 0], j_lo)
+                            hi = min(spans[i, q, 1], j_hi)
+                            if hi <= lo:
+                                continue
+                            up = cur[i + 1, lo:hi]
+                            down = cur[i - 1, lo:hi]
+                            row = cur[i, lo - 1 : hi + 1]
+                            prev = old[i, lo:hi]
+                            nxt = dst[i, lo:hi]
+                            for j in range(hi - lo):
+                                lap = up[j] + down[j] + row[j + 2] + row[j] - 4.0 * row[j + 1]
+                                nxt[j] = 2.0 * row[j + 1] - prev[j] + coeff * lap
+                        _wall_row(
+                            dst[i],
+                            cur[i],
+                            old[i],
+                            wall_pos,
+                            wall_coef,
+                            wall_ptr[i],
+                            wall_ptr[i + 1],
+                        )
+                    for j in range(j_lo, j_hi):
+                        if a == 0:
+                            dst[0, j] = 0.0
+                        if b == ni:
+                            dst[ni - 1, j] = 0.0
+                    for i in range(i_lo, i_hi):
+                        dst[i, 0] = 0.0
+                        dst[i, nj - 1] = 0.0
+                for d in range(n_drv):
+                    if driver_solid[d] and a <= driver_idx[d, 0] < b:
+                        dst[driver_idx[d, 0], driver_idx[d, 1]] = 0.0
+                for d in range(n_drv):
+                    if a <= driver_idx[d, 0] < b:
+                        dst[driver_idx[d, 0], driver_idx[d, 1]] += source[g, d]
+                if n_sen > 0 and g % record_step == 0:
+                    for m in range(n_sen):
+                        f = sensor_idx[m]
+                        if a <= f // nj < b:
+                            out[g // record_step, m] = dst[f // nj, f % nj]
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, int64[:, :, ::1], "
+    "int64[::1], int64[:, ::1], int64[::1], int64[::1], float32[:, ::1], int64[:, :], uint8[:], "
+    "float32[:, :], int64[:], int64, float32[:, :], int64, int64, int64)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_tiled_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    box: np.ndarray,
+    wall_ptr: np.ndarray,
+    wall_pos: np.ndarray,
+    wall_coef: np.ndarray,
+    driver_idx: np.ndarray,
+    driver_solid: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+    n_buffers: int,
+    time_block: int,
+    slab: int,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_run_tiled_2d`; ``slab`` counts planes.
+
+    The prange runs over the ``(i, j)`` pencils of a slab, so one-plane
+    slabs still spread over the threads.
+    """
+    ni, nj, nk = p.shape
+    n_steps = source.shape[0]
+    n_drv = driver_idx.shape[0]
+    n_sen = sensor_idx.shape[0]
+    njk = nj * nk
+    bufs = (p_prev, p, p_next)
+    n_slabs = (ni + slab - 1) // slab
+    win = np.zeros((time_block, 3, 2), dtype=np.int64)
+    live = np.zeros(time_block, dtype=np.bool_)
+    for t0 in range(0, n_steps, time_block):
+        n_lvl = min(time_block, n_steps - t0)
+        _block_windows(box, p.shape, driver_idx, source, t0, win[:n_lvl], live[:n_lvl])
+        for wave in range(n_slabs + n_lvl - 1):
+            for s in range(max(wave - n_slabs + 1, 0), min(wave + 1, n_lvl)):
+                g = t0 + s
+                old = bufs[g % n_buffers]
+                cur = bufs[(g + 1) % n_buffers]
+                dst = bufs[(g + 2) % n_buffers]
+                a = (wave - s) * slab
+                b = min(a + slab, ni)
+                if live[s]:
+                    i_lo = max(win[s, 0, 0], a)
+                    i_hi = min(win[s, 0, 1], b)
+                    j_lo = win[s, 1, 0]
+                    j_hi = win[s, 1, 1]
+                    k_lo = win[s, 2, 0]
+                    k_hi = win[s, 2, 1]
+                    i0 = max(i_lo, 1)
+                    j0 = max(j_lo, 1)
+                    n_i = min(i_hi, ni - 1) - i0
+                    n_j = min(j_hi, nj - 1) - j0
+                    for t in prange(max(n_i, 0) * max(n_j, 0)):  # ty: ignore[not-iterable]
+                        i = i0 + t // n_j
+                        j = j0 + t % n_j
+                        pencil = i * nj + j
+                        for q in range(n_spans[pencil]):
+                            lo = max(spans[pencil, q, 0], k_lo)
+                            hi = min(spans[pencil, q, 1], k_hi)
+                            if hi <= lo:
+                                continue
+                            north = cur[i + 1, j, lo:hi]
+                            south = cur[i - 1, j, lo:hi]
+                            east = cur[i, j + 1, lo:hi]
+                            west = cur[i, j - 1, lo:hi]
+                            row = cur[i, j, lo - 1 : hi + 1]
+                            prev = old[i, j, lo:hi]
+                            nxt = dst[i, j, lo:hi]
+                            for k in range(hi - lo):
+                                lap = (
+                                    north[k]
+                                    + south[k]
+                                    + east[k]
+                                    + west[k]
+                                    + row[k + 2]
+                                    + row[k]
+                                    - 6.0 * row[k + 1]
+                                )
+                                nxt[k] = 2.0 * row[k + 1] - prev[k] + coeff * lap
+                        _wall_row(
+                            dst[i, j],
+                            cur[i, j],
+                            old[i, j],
+                            wall_pos,
+                            wall_coef,
+                            wall_ptr[pencil],
+                            wall_ptr[pencil + 1],
+                        )
+                    for j in range(j_lo, j_hi):
+                        for k in range(k_lo, k_hi):
+                            if a == 0:
+                                dst[0, j, k] = 0.0
+                            if b == ni:
+                                dst[ni - 1, j, k] = 0.0
+                    for i in range(i_lo, i_hi):
+                        for k in range(k_lo, k_hi):
+                            dst[i, 0, k] = 0.0
+                            dst[i, nj - 1, k] = 0.0
+                    for i in range(i_lo, i_hi):
+                        for j in range(j_lo, j_hi):
+                            dst[i, j, 0] = 0.0
+                            dst[i, j, nk - 1] = 0.0
+                for d in range(n_drv):
+                    if driver_solid[d] and a <= driver_idx[d, 0] < b:
+                        dst[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] = 0.0
+                for d in range(n_drv):
+                    if a <= driver_idx[d, 0] < b:
+                        dst[driver_idx[d, 0], driver_idx[d, 1], driver_idx[d, 2]] += source[g, d]
+                if n_sen > 0 and g % record_step == 0:
+                    for m in range(n_sen):
+                        f = sensor_idx[m]
+                        if a <= f // njk < b:
+                            r = f % njk
+                            out[g // record_step, m] = dst[f // njk, r // nk, r % nk]
+
+
+# =====================================================================
+# Batched multi-room loops (BatchSimulate)
+# =====================================================================
+#
+# A 64x64 sensing room is ~16 KB per buffer: one room cannot keep a
+# dozen numba threads busy, and a prange over its 62 interior rows is
+# dominated by the parallel-region fork/join. The batched kernels hold
+# B independent rooms in fields of shape (B, *grid) and put the prange
+# on the batch axis instead. Each thread then runs the *entire* time
+# loop of its member with the member's three buffers resident in L2 —
+# no barrier per timestep, because members never read each other.
+#
+# Per-member geometry is a uint8 ``fluid`` mask (1 = fluid, 0 =
+# obstacle). The stencil sweep is the plain single-room loop nest; a
+# second sweep then zeroes obstacle cells before driver injection, so
+# the walls -> obstacles -> drivers ordering of ``Simulate.step()`` is
+# preserved. Folding the mask into the stencil loop (as a multiply, a
+# select, or a per-row zero) changes how LLVM vectorises and
+# FMA-contracts the stencil under fastmath; as two passes the members
+# run the same float32 operations as ``Simulate`` and agree with it to
+# round-off (check_batch.py). The member's buffers are cache-resident,
+# so the extra sweep is cheap. Drivers and
+# sensors are padded to the widest member; ``n_drv[b]`` / ``n_sen[b]``
+# give each member's true count. A sensor sample is taken after the
+# rotation on every step ``s`` with ``s % record_step == 0`` — the
+# ``run_with_sensors`` convention.
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, "
+    "uint8[:, :, ::1], int64[:, :, :], int64[:], float32[:, :, :], int64[:, :, :], "
+    "int64[:], int64, float32[:, :, :])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_batch_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+    driver_idx: np.ndarray,
+    n_drv: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    n_sen: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+) -> None:
+    """Advance B independent 2D rooms ``source.shape[0]`` steps each.
+
+    Shapes: fields and ``fluid`` ``(B, Ni, Nj)``; ``driver_idx``
+    ``(B, D_max, 2)``; ``source`` ``(n_steps, B, D_max)``; ``sensor_idx``
+    ``(B, S_max, 2)``; ``out`` ``(T_rec, B, S_max)``.
+    """
+    nb, ni, nj = p.shape
+    n_steps = source.shape[0]
+    for b in prange(nb):  # ty: ignore[not-iterable]
+        cur = p[b]
+        prv = p_prev[b]
+        nxt = p_next[b]
+        fl = fluid[b]
+        w = 0
+        for s in range(n_steps):
+            for i in range(1, ni - 1):
+                for j in range(1, nj - 1):
+                    lap = (
+                        cur[i + 1, j]
+                        + cur[i - 1, j]
+                        + cur[i, j + 1]
+                        + cur[i, j - 1]
+                        - 4.0 * cur[i, j]
+                    )
+                    nxt[i, j] = 2.0 * cur[i, j] - prv[i, j] + coeff * lap
+            for i in range(1, ni - 1):
+                for j in range(1, nj - 1):
+                    if not fl[i, j]:
+                        nxt[i, j] = 0.0
+            for j in range(nj):
+                nxt[0, j] = 0.0
+                nxt[ni - 1, j] = 0.0
+            for i in range(ni):
+                nxt[i, 0] = 0.0
+                nxt[i, nj - 1] = 0.0
+            for d in range(n_drv[b]):
+                nxt[driver_idx[b, d, 0], driver_idx[b, d, 1]] += source[s, b, d]
+            tmp = prv
+            prv = cur
+            cur = nxt
+            nxt = tmp
+            if s % record_step == 0:
+                for m in range(n_sen[b]):
+                    out[w, b, m] = cur[sensor_idx[b, m, 0], sensor_idx[b, m, 1]]
+                w += 1
+
+
+@njit(
+    "void(float32[:, :, :, ::1], float32[:, :, :, ::1], float32[:, :, :, ::1], float32, "
+    "uint8[:, :, :, ::1], int64[:, :, :], int64[:], float32[:, :, :], int64[:, :, :], int64[:], "
+    "int64, float32[:, :, :])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_run_batch_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+    driver_idx: np.ndarray,
+    n_drv: np.ndarray,
+    source: np.ndarray,
+    sensor_idx: np.ndarray,
+    n_sen: np.ndarray,
+    record_step: int,
+    out: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_run_batch_2d` (seven-point stencil)."""
+    nb, ni, nj, nk = p.shape
+    n_steps = source.shape[0]
+    for b in prange(nb):  # ty: ignore[not-iterable]
+        cur = p[b]
+        prv = p_prev[b]
+        nxt = p_next[b]
+        fl = fluid[b]
+        w = 0
+        for s in range(n_steps):
+            for i in range(1, ni - 1):
+                for j in range(1, nj - 1):
+                    for k in range(1, nk - 1):
+                        lap = (
+                            cur[i + 1, j, k]
+                            + cur[i - 1, j, k]
+                            + cur[i, j + 1, k]
+                            + cur[i, j - 1, k]
+                            + cur[i, j, k + 1]
+                            + cur[i, j, k - 1]
+                            - 6.0 * cur[i, j, k]
+                        )
+                        nxt[i, j, k] = 2.0 * cur[i, j, k] - prv[i, j, k] + coeff * lap
+            for i in range(1, ni - 1):
+                for j in range(1, nj - 1):
+                    for k in range(1, nk - 1):
+                        if not fl[i, j, k]:
+                            nxt[i, j, k] = 0.0
+            for j in range(nj):
+                for k in range(nk):
+                    nxt[0, j, k] = 0.0
+                    nxt[ni - 1, j, k] = 0.0
+            for i in range(ni):
+                for k in range(nk):
+                    nxt[i, 0, k] = 0.0
+                    nxt[i, nj - 1, k] = 0.0
+            for i in range(ni):
+                for j in range(nj):
+                    nxt[i, j, 0] = 0.0
+                    nxt[i, j, nk - 1] = 0.0
+            for d in range(n_drv[b]):
+                nxt[driver_idx[b, d, 0], driver_idx[b, d, 1], driver_idx[b, d, 2]] += source[
+                    s, b, d
+                ]
+            tmp = prv
+            prv = cur
+            cur = nxt
+            nxt = tmp
+            if s % record_step == 0:
+                for m in range(n_sen[b]):
+                    out[w, b, m] = cur[
+                        sensor_idx[b, m, 0], sensor_idx[b, m, 1], sensor_idx[b, m, 2]
+                    ]
+                w += 1
+
+
+# =====================================================================
+# Absorbing boundaries (Mur, PML)
+# =====================================================================
+#
+# The kernels above end every face in a Dirichlet wall, so free-field
+# problems had to pad the grid until wall echoes arrived after the
+# recording window. These step kernels replace the wall with an
+# absorbing boundary (``Simulate(boundary=...)``); profiles and
+# coefficients come from ``boundary.py``. Both take the ``fluid`` grid
+# and a ``masked`` flag, and zero obstacle cells in the same pass, so
+# one kernel serves rooms with and without obstacles. Ordering is
+# unchanged: boundary, then obstacles, then drivers (by the caller).
+#
+# Mur (first order). The outer layer is extrapolated from the cell
+# inside it with the one-way wave equation, exact at normal incidence:
+#
+#   p_next[0] = p[1] + mur * (p_next[1] - p[0]),  mur = (C - 1) / (C + 1)
+#
+# with C the Courant number. Faces are applied axis by axis, each over
+# the faces already written by the earlier axes, which settles edges
+# and corners without special cases. Cost: one extra O(surface) pass.
+#
+# PML (convolutional, second-order form). Inside a layer of ``w`` cells
+# on each face, d/dx becomes the stretched derivative d/dx + psi with
+# psi a recursive convolution of the field gradient, and likewise for
+# the second derivative (auxiliary zeta), per damped axis:
+#
+#   psi[i+1/2] = b * psi[i+1/2] + a * (p[i+1] - p[i])          (faces)
+#   t          = p[i+1] - 2 p[i] + p[i-1] + psi[i+1/2] - psi[i-1/2]
+#   zeta[i]    = b * zeta[i] + a * t                             (cells)
+#   D_xx p     = t + zeta[i]
+#
+# with b = exp(-(sigma + alpha) dt), a = sigma (b - 1) / (sigma + alpha)
+# and sigma rising quadratically from 0 at the inner edge of the layer to
+# the wall (``pml_coefficients``). The small frequency shift alpha damps
+# static fields, which an unshifted layer leaves frozen (a stretch of
+# 1 + sigma / (i omega) is infinite at omega = 0). Where sigma = 0 both
+# auxiliaries stay 0 and D_xx is the plain
+# difference, so the interior update is unchanged; the layer ends in a
+# Dirichlet wall. The auxiliaries are stored only for the two slabs of
+# each axis (``w + 1`` cells / faces per side: the grid with that axis
+# cut to ``2 (w + 1)``), one time level, updated in place. Faces are
+# shared by neighbouring cells, so a first pass updates every psi from
+# ``p``; the stencil pass then reads them and updates its own zeta.
+# Rows / pencils that miss every layer run the plain vectorisable
+# update. ``p`` itself is not split, so drivers and obstacles inside
+# the layer behave as elsewhere (just damped).
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32, uint8[:, ::1], boolean, "
+    "float32)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_mur_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+    masked: bool,
+    mur: np.float32,
+) -> None:
+    """:func:`fused_leapfrog_step_masked_2d` with first-order Mur edges.
+
+    ``masked`` False skips the obstacle pass (``fluid`` is not read).
+    """
+    ni, nj = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            lap = p[i + 1, j] + p[i - 1, j] + p[i, j + 1] + p[i, j - 1] - 4.0 * p[i, j]
+            p_next[i, j] = 2.0 * p[i, j] - p_prev[i, j] + coeff * lap
+        if masked:
+            for j in range(1, nj - 1):
+                if fluid[i, j] == 0:
+                    p_next[i, j] = 0.0
+
+    for j in range(1, nj - 1):
+        p_next[0, j] = p[1, j] + mur * (p_next[1, j] - p[0, j])
+        p_next[ni - 1, j] = p[ni - 2, j] + mur * (p_next[ni - 2, j] - p[ni - 1, j])
+    for i in range(ni):
+        p_next[i, 0] = p[i, 1] + mur * (p_next[i, 1] - p[i, 0])
+        p_next[i, nj - 1] = p[i, nj - 2] + mur * (p_next[i, nj - 2] - p[i, nj - 1])
+    if masked:
+        for j in range(nj):
+            for i in (0, ni - 1):
+                if fluid[i, j] == 0:
+                    p_next[i, j] = 0.0
+        for i in range(ni):
+            for j in (0, nj - 1):
+                if fluid[i, j] == 0:
+                    p_next[i, j] = 0.0
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, "
+    "uint8[:, :, ::1], boolean, float32)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_mur_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+    masked: bool,
+    mur: np.float32,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_mur_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            for k in range(1, nk - 1):
+                lap = (
+                    p[i + 1, j, k]
+                    + p[i - 1, j, k]
+                    + p[i, j + 1, k]
+                    + p[i, j - 1, k]
+                    + p[i, j, k + 1]
+                    + p[i, j, k - 1]
+                    - 6.0 * p[i, j, k]
+                )
+                p_next[i, j, k] = 2.0 * p[i, j, k] - p_prev[i, j, k] + coeff * lap
+            if masked:
+                for k in range(1, nk - 1):
+                    if fluid[i, j, k] == 0:
+                        p_next[i, j, k] = 0.0
+
+    for j in range(1, nj - 1):
+        for k in range(1, nk - 1):
+            p_next[0, j, k] = p[1, j, k] + mur * (p_next[1, j, k] - p[0, j, k])
+            p_next[ni - 1, j, k] = p[ni - 2, j, k] + mur * (p_next[ni - 2, j, k] - p[ni - 1, j, k])
+    for i in range(ni):
+        for k in range(1, nk - 1):
+            p_next[i, 0, k] = p[i, 1, k] + mur * (p_next[i, 1, k] - p[i, 0, k])
+            p_next[i, nj - 1, k] = p[i, nj - 2, k] + mur * (p_next[i, nj - 2, k] - p[i, nj - 1, k])
+    for i in range(ni):
+        for j in range(nj):
+            p_next[i, j, 0] = p[i, j, 1] + mur * (p_next[i, j, 1] - p[i, j, 0])
+            p_next[i, j, nk - 1] = p[i, j, nk - 2] + mur * (p_next[i, j, nk - 2] - p[i, j, nk - 1])
+    if masked:
+        for i in range(ni):
+            for j in range(nj):
+                for k in range(nk):
+                    on_face = i in (0, ni - 1) or j in (0, nj - 1) or k in (0, nk - 1)
+                    if on_face and fluid[i, j, k] == 0:
+                        p_next[i, j, k] = 0.0
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32, uint8[:, ::1], boolean, "
+    "float32[:, ::1], float32[:, ::1], float32[:, ::1], float32[:, ::1], float32[:, ::1], "
+    "float32[:, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_pml_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+    masked: bool,
+    pml0: np.ndarray,
+    pml1: np.ndarray,
+    psi0: np.ndarray,
+    zeta0: np.ndarray,
+    psi1: np.ndarray,
+    zeta1: np.ndarray,
+) -> None:
+    """Fused 2D step with a convolutional PML in front of the Dirichlet edges.
+
+    ``pml0`` / ``pml1`` hold ``(b_cell, a_cell, b_face, a_face)`` along
+    each axis (``boundary.pml_coefficients``); ``psi*`` / ``zeta*`` are
+    that axis' face and cell auxiliaries over its two slabs of
+    ``psi0.shape[0] // 2`` cells, updated in place. ``masked`` False
+    skips the obstacle pass (``fluid`` is not read).
+    """
+    ni, nj = p.shape
+    wi = psi0.shape[0] // 2
+    wj = psi1.shape[1] // 2
+
+    # Face auxiliaries of axis 0 first: each is read by the rows on both
+    # sides, which other threads may own. Those of the last axis are
+    # updated in the cell loop, carried from each cell to the next.
+    for r in prange(2 * wi):  # ty: ignore[not-iterable]
+        i = r + (r >= wi) * (ni - 1 - 2 * wi)
+        b = pml0[2, i]
+        a = pml0[3, i]
+        for j in range(1, nj - 1):
+            psi0[r, j] = b * psi0[r, j] + a * (p[i + 1, j] - p[i, j])
+
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        # Slab row of cell i along axis 0 (-1 outside the layers) and of
+        # the face below it.
+        ri = -1
+        fi = 0
+        if i < wi:
+            ri = i
+            fi = i - 1
+        elif i >= ni - wi:
+            ri = i - ni + 2 * wi
+            fi = ri
+        bi = pml0[0, i]
+        ai = pml0[1, i]
+        # Middle of the row: axis 1 undamped. Read through views that
+        # start one cell early so the loop starts at a literal 1; with a
+        # runtime start numba cannot drop the negative-index wraparound
+        # on ``j - 1`` and the loop does not vectorise.
+        lo = wj - 1
+        m = nj - 2 * wj + 2
+        c = p[i, lo : lo + m]
+        up = p[i + 1, lo : lo + m]
+        down = p[i - 1, lo : lo + m]
+        prev = p_prev[i, lo : lo + m]
+        out = p_next[i, lo : lo + m]
+        if ri < 0:
+            for j in range(1, m - 1):
+                lap = up[j] + down[j] + c[j + 1] + c[j - 1] - 4.0 * c[j]
+                out[j] = 2.0 * c[j] - prev[j] + coeff * lap
+        else:
+            psi_up = psi0[fi + 1, lo : lo + m]
+            psi_down = psi0[fi, lo : lo + m]
+            zeta = zeta0[ri, lo : lo + m]
+            for j in range(1, m - 1):
+                t = up[j] + down[j] - 2.0 * c[j] + psi_up[j] - psi_down[j]
+                z = bi * zeta[j] + ai * t
+                zeta[j] = z
+                lap = t + z + c[j + 1] + c[j - 1] - 2.0 * c[j]
+                out[j] = 2.0 * c[j] - prev[j] + coeff * lap
+        # Both ends of the row: axis 1 damped, axis 0 where ri says.
+        for side in range(2):
+            j_lo = 1 if side == 0 else nj - wj
+            j_hi = wj if side == 0 else nj - 1
+            shift = 0 if side == 0 else nj - 2 * wj
+            g = j_lo - 1
+            fj = g - shift + side
+            below = pml1[2, g] * psi1[i, fj] + pml1[3, g] * (p[i, g + 1] - p[i, g])
+            psi1[i, fj] = below
+            for j in range(j_lo, j_hi):
+                c = p[i, j]
+                d0 = p[i + 1, j] + p[i - 1, j] - 2.0 * c
+                if ri >= 0:
+                    t = d0 + psi0[fi + 1, j] - psi0[fi, j]
+                    z = bi * zeta0[ri, j] + ai * t
+                    zeta0[ri, j] = z
+                    d0 = t + z
+                rj = j - shift
+                fj = rj + side
+                above = pml1[2, j] * psi1[i, fj] + pml1[3, j] * (p[i, j + 1] - c)
+                psi1[i, fj] = above
+                t = p[i, j + 1] + p[i, j - 1] - 2.0 * c + above - below
+                below = above
+                z = pml1[0, j] * zeta1[i, rj] + pml1[1, j] * t
+                zeta1[i, rj] = z
+                p_next[i, j] = 2.0 * c - p_prev[i, j] + coeff * (d0 + t + z)
+        if masked:
+            for j in range(1, nj - 1):
+                if fluid[i, j] == 0:
+                    p_next[i, j] = 0.0
+
+    for j in range(nj):
+        p_next[0, j] = 0.0
+        p_next[ni - 1, j] = 0.0
+    for i in range(ni):
+        p_next[i, 0] = 0.0
+        p_next[i, nj - 1] = 0.0
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, "
+    "uint8[:, :, ::1], boolean, float32[:, ::1], float32[:, ::1], float32[:, ::1], "
+    "float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], "
+    "float32[:, :, ::1], float32[:, :, ::1])",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_pml_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    fluid: np.ndarray,
+    masked: bool,
+    pml0: np.ndarray,
+    pml1: np.ndarray,
+    pml2: np.ndarray,
+    psi0: np.ndarray,
+    zeta0: np.ndarray,
+    psi1: np.ndarray,
+    zeta1: np.ndarray,
+    psi2: np.ndarray,
+    zeta2: np.ndarray,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_pml_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    wi = psi0.shape[0] // 2
+    wj = psi1.shape[1] // 2
+    wk = psi2.shape[2] // 2
+
+    # As in 2D: axes 0 and 1 first, the last axis carried in the cell loop.
+    for r in prange(2 * wi):  # ty: ignore[not-iterable]
+        i = r + (r >= wi) * (ni - 1 - 2 * wi)
+        b = pml0[2, i]
+        a = pml0[3, i]
+        for j in range(1, nj - 1):
+            for k in range(1, nk - 1):
+                psi0[r, j, k] = b * psi0[r, j, k] + a * (p[i + 1, j, k] - p[i, j, k])
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for r in range(2 * wj):
+            j = r + (r >= wj) * (nj - 1 - 2 * wj)
+            b = pml1[2, j]
+            a = pml1[3, j]
+            for k in range(1, nk - 1):
+                psi1[i, r, k] = b * psi1[i, r, k] + a * (p[i, j + 1, k] - p[i, j, k])
+
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        ri = -1
+        fi = 0
+        if i < wi:
+            ri = i
+            fi = i - 1
+        elif i >= ni - wi:
+            ri = i - ni + 2 * wi
+            fi = ri
+        bi = pml0[0, i]
+        ai = pml0[1, i]
+        for j in range(1, nj - 1):
+            rj = -1
+            fj = 0
+            if j < wj:
+                rj = j
+                fj = j - 1
+            elif j >= nj - wj:
+                rj = j - nj + 2 * wj
+                fj = rj
+            bj = pml1[0, j]
+            aj = pml1[1, j]
+            # Middle of the pencil: axis 2 undamped, read through views
+            # as in the 2D kernel.
+            lo = wk - 1
+            m = nk - 2 * wk + 2
+            c = p[i, j, lo : lo + m]
+            xp = p[i + 1, j, lo : lo + m]
+            xm = p[i - 1, j, lo : lo + m]
+            yp = p[i, j + 1, lo : lo + m]
+            ym = p[i, j - 1, lo : lo + m]
+            prev = p_prev[i, j, lo : lo + m]
+            out = p_next[i, j, lo : lo + m]
+            if ri < 0 and rj < 0:
+                for k in range(1, m - 1):
+                    lap = xp[k] + xm[k] + yp[k] + ym[k] + c[k + 1] + c[k - 1] - 6.0 * c[k]
+                    out[k] = 2.0 * c[k] - prev[k] + coeff * lap
+            elif rj < 0:
+                psi_up = psi0[fi + 1, j, lo : lo + m]
+                psi_down = psi0[fi, j, lo : lo + m]
+                zeta = zeta0[ri, j, lo : lo + m]
+                for k in range(1, m - 1):
+                    t = xp[k] + xm[k] - 2.0 * c[k] + psi_up[k] - psi_down[k]
+                    z = bi * zeta[k] + ai * t
+                    zeta[k] = z
+                    lap = t + z + yp[k] + ym[k] + c[k + 1] + c[k - 1] - 4.0 * c[k]
+                    out[k] = 2.0 * c[k] - prev[k] + coeff * lap
+            elif ri < 0:
+                psi_up = psi1[i, fj + 1, lo : lo + m]
+                psi_down = psi1[i, fj, lo : lo + m]
+                zeta = zeta1[i, rj, lo : lo + m]
+                for k in range(1, m - 1):
+                    t = yp[k] + ym[k] - 2.0 * c[k] + psi_up[k] - psi_down[k]
+                    z = bj * zeta[k] + aj * t
+                    zeta[k] = z
+                    lap = xp[k] + xm[k] + t + z + c[k + 1] + c[k - 1] - 4.0 * c[k]
+                    out[k] = 2.0 * c[k] - prev[k] + coeff * lap
+            else:
+                psi0_up = psi0[fi + 1, j, lo : lo + m]
+                psi0_down = psi0[fi, j, lo : lo + m]
+                zeta_i = zeta0[ri, j, lo : lo + m]
+                psi1_up = psi1[i, fj + 1, lo : lo + m]
+                psi1_down = psi1[i, fj, lo : lo + m]
+                zeta_j = zeta1[i, rj, lo : lo + m]
+                for k in range(1, m - 1):
+                    t0 = xp[k] + xm[k] - 2.0 * c[k] + psi0_up[k] - psi0_down[k]
+                    z0 = bi * zeta_i[k] + ai * t0
+                    zeta_i[k] = z0
+                    t1 = yp[k] + ym[k] - 2.0 * c[k] + psi1_up[k] - psi1_down[k]
+                    z1 = bj * zeta_j[k] + aj * t1
+                    zeta_j[k] = z1
+                    lap = t0 + z0 + t1 + z1 + c[k + 1] + c[k - 1] - 2.0 * c[k]
+                    out[k] = 2.0 * c[k] - prev[k] + coeff * lap
+            # Both ends of the pencil: axis 2 damped, axes 0 and 1 where
+            # ri and rj say.
+            for side in range(2):
+                k_lo = 1 if side == 0 else nk - wk
+                k_hi = wk if side == 0 else nk - 1
+                shift = 0 if side == 0 else nk - 2 * wk
+                g = k_lo - 1
+                fk = g - shift + side
+                below = pml2[2, g] * psi2[i, j, fk] + pml2[3, g] * (p[i, j, g + 1] - p[i, j, g])
+                psi2[i, j, fk] = below
+                for k in range(k_lo, k_hi):
+                    c = p[i, j, k]
+                    d0 = p[i + 1, j, k] + p[i - 1, j, k] - 2.0 * c
+                    if ri >= 0:
+                        t = d0 + psi0[fi + 1, j, k] - psi0[fi, j, k]
+                        z = bi * zeta0[ri, j, k] + ai * t
+                        zeta0[ri, j, k] = z
+                        d0 = t + z
+                    d1 = p[i, j + 1, k] + p[i, j - 1, k] - 2.0 * c
+                    if rj >= 0:
+                        t = d1 + psi1[i, fj + 1, k] - psi1[i, fj, k]
+                        z = bj * zeta1[i, rj, k] + aj * t
+                        zeta1[i, rj, k] = z
+                        d1 = t + z
+                    rk = k - shift
+                    fk = rk + side
+                    above = pml2[2, k] * psi2[i, j, fk] + pml2[3, k] * (p[i, j, k + 1] - c)
+                    psi2[i, j, fk] = above
+                    t = p[i, j, k + 1] + p[i, j, k - 1] - 2.0 * c + above - below
+                    below = above
+                    z = pml2[0, k] * zeta2[i, j, rk] + pml2[1, k] * t
+                    zeta2[i, j, rk] = z
+                    p_next[i, j, k] = 2.0 * c - p_prev[i, j, k] + coeff * (d0 + d1 + t + z)
+            if masked:
+                for k in range(1, nk - 1):
+                    if fluid[i, j, k] == 0:
+                        p_next[i, j, k] = 0.0
+
+    for j in range(nj):
+        for k in range(nk):
+            p_next[0, j, k] = 0.0
+            p_next[ni - 1, j, k] = 0.0
+    for i in range(ni):
+        for k in range(nk):
+            p_next[i, 0, k] = 0.0
+            p_next[i, nj - 1, k] = 0.0
+    for i in range(ni):
+        for j in range(nj):
+            p_next[i, j, 0] = 0.0
+            p_next[i, j, nk - 1] = 0.0
+
+
+# =====================================================================
+# Heterogeneous media
+# =====================================================================
+#
+# With a per-cell wavespeed c(x) the leap-frog update keeps its form,
+# with the scalar coefficient replaced by a per-cell one:
+#
+#   p_next[x] = 2 p[x] - p_prev[x] + coeff[x] * lap(p)[x],
+#   coeff[x] = (c(x) dt / dx)^2
+#
+# (constant density, so an interface between speeds c1 and c2 reflects
+# (c2 - c1) / (c2 + c1) at normal incidence). The timestep is set by
+# the fastest cell. The coefficient is either a float32 grid (4 bytes
+# per cell) or, for fields with few distinct speeds, a uint8 code per
+# cell into a float32 table (1 byte per cell, one gather per cell).
+# Either is read in the stencil pass itself. The kernels mirror the
+# Mur ones: walls are Dirichlet, and obstacles are zeroed in the same
+# pass when ``masked`` is set. A cell of speed 0 has coefficient 0 and
+# so keeps 2 p - p_prev = 0 from rest: it is a pressure-release
+# obstacle without a mask.
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], float32[:, ::1], uint8[:, ::1], "
+    "boolean)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_media_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.ndarray,
+    fluid: np.ndarray,
+    masked: bool,
+) -> None:
+    """:func:`fused_leapfrog_step_masked_2d` with a per-cell float32 ``coeff`` grid.
+
+    ``masked`` False skips the obstacle pass (``fluid`` is not read).
+    """
+    ni, nj = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            lap = p[i + 1, j] + p[i - 1, j] + p[i, j + 1] + p[i, j - 1] - 4.0 * p[i, j]
+            p_next[i, j] = 2.0 * p[i, j] - p_prev[i, j] + coeff[i, j] * lap
+        if masked:
+            for j in range(1, nj - 1):
+                if fluid[i, j] == 0:
+                    p_next[i, j] = 0.0
+
+    for j in range(nj):
+        p_next[0, j] = 0.0
+        p_next[ni - 1, j] = 0.0
+    for i in range(ni):
+        p_next[i, 0] = 0.0
+        p_next[i, nj - 1] = 0.0
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], "
+    "uint8[:, :, ::1], boolean)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_media_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.ndarray,
+    fluid: np.ndarray,
+    masked: bool,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_media_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            for k in range(1, nk - 1):
+                lap = (
+                    p[i + 1, j, k]
+                    + p[i - 1, j, k]
+                    + p[i, j + 1, k]
+                    + p[i, j - 1, k]
+                    + p[i, j, k + 1]
+                    + p[i, j, k - 1]
+                    - 6.0 * p[i, j, k]
+                )
+                p_next[i, j, k] = 2.0 * p[i, j, k] - p_prev[i, j, k] + coeff[i, j, k] * lap
+            if masked:
+                for k in range(1, nk - 1):
+                    if fluid[i, j, k] == 0:
+                        p_next[i, j, k] = 0.0
+
+    for j in range(nj):
+        for k in range(nk):
+            p_next[0, j, k] = 0.0
+            p_next[ni - 1, j, k] = 0.0
+    for i in range(ni):
+        for k in range(nk):
+            p_next[i, 0, k] = 0.0
+            p_next[i, nj - 1, k] = 0.0
+    for i in range(ni):
+        for j in range(nj):
+            p_next[i, j, 0] = 0.0
+            p_next[i, j, nk - 1] = 0.0
+
+
+@njit(
+    "void(float32[:, ::1], float32[:, ::1], float32[:, ::1], uint8[:, ::1], float32[::1], "
+    "uint8[:, ::1], boolean)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_media_u8_2d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    code: np.ndarray,
+    lut: np.ndarray,
+    fluid: np.ndarray,
+    masked: bool,
+) -> None:
+    """:func:`fused_leapfrog_step_media_2d` with the coefficient ``lut[code[i, j]]``."""
+    ni, nj = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            lap = p[i + 1, j] + p[i - 1, j] + p[i, j + 1] + p[i, j - 1] - 4.0 * p[i, j]
+            p_next[i, j] = 2.0 * p[i, j] - p_prev[i, j] + lut[code[i, j]] * lap
+        if masked:
+            for j in range(1, nj - 1):
+                if fluid[i, j] == 0:
+                    p_next[i, j] = 0.0
+
+    for j in range(nj):
+        p_next[0, j] = 0.0
+        p_next[ni - 1, j] = 0.0
+    for i in range(ni):
+        p_next[i, 0] = 0.0
+        p_next[i, nj - 1] = 0.0
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], uint8[:, :, ::1], "
+    "float32[::1], uint8[:, :, ::1], boolean)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+)
+def fused_leapfrog_step_media_u8_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    code: np.ndarray,
+    lut: np.ndarray,
+    fluid: np.ndarray,
+    masked: bool,
+) -> None:
+    """3D twin of :func:`fused_leapfrog_step_media_u8_2d` (seven-point stencil)."""
+    ni, nj, nk = p.shape
+    for i in prange(1, ni - 1):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            for k in range(1, nk - 1):
+                lap = (
+                    p[i + 1, j, k]
+                    + p[i - 1, j, k]
+                    + p[i, j + 1, k]
+                    + p[i, j - 1, k]
+                    + p[i, j, k + 1]
+                    + p[i, j, k - 1]
+                    - 6.0 * p[i, j, k]
+                )
+                p_next[i, j, k] = 2.0 * p[i, j, k] - p_prev[i, j, k] + lut[code[i, j, k]] * lap
+            if masked:
+                for k in range(1, nk - 1):
+                    if fluid[i, j, k] == 0:
+                        p_next[i, j, k] = 0.0
+
+    for j in range(nj):
+        for k in range(nk):
+            p_next[0, j, k] = 0.0
+            p_next[ni - 1, j, k] = 0.0
+    for i in range(ni):
+        for k in range(nk):
+            p_next[i, 0, k] = 0.0
+            p_next[i, nj - 1, k] = 0.0
+    for i in range(ni):
+        for j in range(nj):
+            p_next[i, j, 0] = 0.0
+            p_next[i, j, nk - 1] = 0.0
+
+
+# =====================================================================
+# Slab kernels (domain decomposition)
+# =====================================================================
+#
+# ``Simulate(workers=N)`` splits a 3D grid into N slabs of i-rows, each
+# stepped by its own process on buffers in shared memory (see
+# ``decompose.py``). A worker must write only its own rows, so the
+# slab kernel is the span kernel with the row range ``[i0, i1)`` in
+# place of the box: it computes p_next on the fluid spans of those rows
+# and zeroes only the wall cells among them. It reads p one row past
+# either end of the slab, the neighbours' edge rows, which is the
+# one-row halo; the per-step barrier makes them current. The span table
+# covers the slab's pencils only: row i, column j is pencil
+# ``(i - i0) * nj + j``. The same kernel steps the in-memory tiles of
+# an out-of-core grid (``outofcore.py``), whose I/O thread runs while it
+# computes, hence ``nogil``.
+
+
+@njit(
+    "void(float32[:, :, ::1], float32[:, :, ::1], float32[:, :, ::1], float32, "
+    "int64[:, :, ::1], int64[::1], int64, int64)",
+    cache=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+    parallel=True,
+    nogil=True,
+)
+def fused_leapfrog_step_slab_3d(
+    p: np.ndarray,
+    p_prev: np.ndarray,
+    p_next: np.ndarray,
+    coeff: np.float32,
+    spans: np.ndarray,
+    n_spans: np.ndarray,
+    i0: int,
+    i1: int,
+) -> None:
+    """:func:`fused_leapfrog_step_spans_3d` on rows ``i0 .. i1 - 1`` only.
+
+    ``spans`` / ``n_spans`` hold the slab's pencils, ``(i - i0) * nj + j``.
+    """
+    ni, nj, nk = p.shape
+    for i in prange(max(i0, 1), min(i1, ni - 1)):  # ty: ignore[not-iterable]
+        for j in range(1, nj - 1):
+            pencil = (i - i0) * nj + j
+            for q in range(n_spans[pencil]):
+                lo = spans[pencil, q, 0]
+                hi = spans[pencil, q, 1]
+                north = p[i + 1, j, lo:hi]
+                south = p[i - 1, j, lo:hi]
+                east = p[i, j + 1, lo:hi]
+                west = p[i, j - 1, lo:hi]
+                row = p[i, j, lo - 1 : hi + 1]
+                prev = p_prev[i, j, lo:hi]
+                nxt = p_next[i, j, lo:hi]
+                for k in range(hi - lo):
+                    lap = (
+                        north[k]
+                        + south[k]
+                        + east[k]
+                        + west[k]
+                        + row[k + 2]
+                        + row[k]
+                        - 6.0 * row[k + 1]
+                    )
+                    nxt[k] = 2.0 * row[k + 1] - prev[k] + coeff * lap
+
+    for i in (0, ni - 1):
+        if i0 <= i < i1:
+            for j in range(nj):
+                for k in range(nk):
+                    p_next[i, j, k] = 0.0
+    for i in range(i0, i1):
+        for k in range(nk):
+            p_next[i, 0, k] = 0.0
+            p_next[i, nj - 1, k] = 0.0
+        for j in range(nj):
+            p_next[i, j, 0] = 0.0
+            p_next[i, j, nk - 1] = 0.0
+
+
+# =====================================================================
+# First-touch allocation
+# =====================================================================
+#
+# Linux places a page on the NUMA node of the thread that first writes
+# it. ``np.zeros`` from the main thread, or a later ``fill`` there,
+# therefore puts a whole field on one socket, and the prange threads
+# on the other socket stream it across the interconnect every step.
+# ``first_touch_array`` maps fresh anonymous memory (untouched pages,
+# whatever the allocator's state) and writes it with the same
+# ``prange(1, n0 - 1)`` over axis 0 that the step, span and run kernels
+# use, so each thread's rows land on its own node. numba's static
+# schedule gives a thread the same rows in both loops as long as the
+# thread count is the same. The fill works on the bytes of any
+# C-contiguous array: field buffers, ``fluid`` and obstacle masks.
+
+
+@njit(
+    "void(uint8[:, ::1], uint8)",
+    cache=True,
+    boundscheck=False,
+    parallel=True,
+)
+def _first_touch_rows(rows: np.ndarray, value: np.uint8) -> None:
+    n0, width = rows.shape
+    for i in prange(1, n0 - 1):  # ty: ignore[not-iterable]
+        for b in range(width):
+            rows[i, b] = value
+    for i in (0, n0 - 1):
+        for b in range(width):
+            rows[i, b] = value
+
+
+def first_touch_fill(buf: np.ndarray, value: int = 0) -> None:
+    """Set every byte of the C-contiguous ``buf`` to ``value``, row-parallel over axis 0."""
+    rows = buf.reshape(buf.shape[0], -1).view(np.uint8)
+    _first_touch_rows(rows, np.uint8(value))
+
+
+def first_touch_array(shape: Tuple[int, ...], dtype: Any, value: int = 0) -> np.ndarray:
+    """A new array of ``shape`` / ``dtype``, every byte ``value``, placed by first touch.
+
+    The memory is a private anonymous mapping, released when the last
+    array viewing it is.
+    """
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    buf = np.frombuffer(mmap.mmap(-1, max(nbytes, 1)), dtype=np.uint8)[:nbytes]
+    buf = buf.view(dtype).reshape(shape)
+    first_touch_fill(buf, value)
+    return buf
@@ -8,7 +8,15 @@ core ``Simulate`` engine intentionally does not own:
    wall (``random_free_position``).
 3. A streaming-recording runner that advances the simulation ``duration``
    steps and returns the per-sensor pressure timeseries without keeping
-   the full pressure history in memory (``run_with_sensors``).
+   the full pressure history in memory (``run_with_sensors``), and a
+   dense variant that records every cell of a strided receiver lattice
+   so that mic placements can be drawn after the run
+   (``record_receiver_grid`` / ``pick_mic_pairs``).
+4. The eight symmetries of the square (``d4_mask``, ``d4_positions``,
+   ``d4_channel_order``), which turn one simulated room into eight
+   exact samples: written to disk by ``generate_active_sensing.py
+   --d4-augment``, or drawn on the fly by
+   ``ActiveSensingDataset(symmetry=True)``.
 
 These helpers are deliberately kept out of ``simulate.py`` to preserve
 the engine's tight step-at-a-time contract and to leave the public
@@ -17,10 +25,14 @@ attribute surface tested by ``tests/perf/check_simulate.py`` unchanged.
 
 from __future__ import annotations
 
-from typing import Optional, Sequence, Tuple
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
+from .batch import BatchSimulate
+from .calculate import encode_rows
+from .outofcore import memmap_array
 from .setup import Sensor
 from .simulate import Simulate
 
@@ -290,6 +302,46 @@ def pick_mic_positions(
     )
 
 
+def pick_mic_pairs(
+    grid_shape: Tuple[int, ...],
+    obstacle_mask: np.ndarray,
+    n_pairs: int,
+    spacing: float = 16.0,
+    stride: int = 1,
+    rng: Optional[np.random.Generator] = None,
+    margin: int = 2,
+) -> list[list[tuple[int, ...]]]:
+    """Draw ``n_pairs`` stereo pairs on the receiver lattice of ``stride``.
+
+    Each pair is ``pick_mic_positions(n_mics=2)`` on the decimated grid
+    ``obstacle_mask[::stride, ::stride]`` with spacing ``spacing / stride``,
+    mapped back to full-grid cells, so both mics are lattice cells that
+    ``record_receiver_grid`` recorded and neither is an obstacle. Snapping
+    to the lattice moves each mic by less than ``stride`` cells per axis,
+    so the baseline is ``spacing`` to within about ``stride``. ``margin``
+    is in full-grid cells (rounded up to whole lattice steps).
+    """
+    if stride < 1:
+        raise ValueError("stride must be >= 1")
+    if rng is None:
+        rng = np.random.default_rng()
+    lattice = tuple(slice(None, None, stride) for _ in grid_shape)
+    coarse_mask = np.asarray(obstacle_mask, dtype=bool)[lattice]
+    coarse_margin = -(-int(margin) // stride)
+    pairs = []
+    for _ in range(int(n_pairs)):
+        pair = pick_mic_positions(
+            coarse_mask.shape,
+            coarse_mask,
+            n_mics=2,
+            spacing=float(spacing) / stride,
+            rng=rng,
+            margin=coarse_margin,
+        )
+        pairs.append([tuple(stride * c for c in pos) for pos in pair])
+    return pairs
+
+
 def random_free_position(
     grid_shape: Tuple[int, ...],
     obstacle_mask: np.ndarray,
@@ -324,6 +376,26 @@ def random_free_position(
     return tuple(int(c) for c in free[idx])
 
 
+def free_positions(
+    grid_shape: Tuple[int, ...],
+    obstacle_mask: np.ndarray,
+    stride: int = 1,
+    margin: int = 2,
+) -> List[Tuple[int, ...]]:
+    """Every ``stride``-th interior cell along each axis that is not an obstacle.
+
+    The candidate driver set of reciprocal acquisition
+    (``ImpulseResponseCache.reciprocal``): the same interior as
+    ``random_free_position`` (``margin`` from each wall), decimated to
+    a lattice of spacing ``stride``. 2D or 3D; row-major order.
+    """
+    if stride < 1:
+        raise ValueError("stride must be >= 1")
+    lattice = tuple(slice(margin, n - margin, stride) for n in grid_shape)
+    free = np.argwhere(~np.asarray(obstacle_mask, dtype=bool)[lattice])
+    return [tuple(margin + stride * int(c) for c in cell) for cell in free]
+
+
 # =====================================================================
 # Streaming sensor runner
 # =====================================================================
@@ -349,22 +421,13 @@ def run_with_sensors(
     16 kHz observations: record_step = round(1 / (16000 * dt_sim))).
     Set to 1 to record every step (the default).
 
-    The sensors' positions must be in-bounds tuples matching ``sim.dims``;
-    the runner does not validate this (a bad index will raise from numpy).
+    The recording itself is ``sim.record``: sensor positions are turned
+    into flat indices once and, on the compiled CPU path, gathered inside
+    the time loop, so sampling costs nothing per step on the Python side.
+    Positions must be in-bounds tuples matching ``sim.dims``
+    (``ValueError`` otherwise).
     """
-    if duration <= 0:
-        return np.zeros((0, len(sensors)), dtype=np.float32)
-    n_recorded = (duration + record_step - 1) // record_step
-    out = np.zeros((n_recorded, len(sensors)), dtype=np.float32)
-    positions = [tuple(int(c) for c in s.position) for s in sensors]
-    write_idx = 0
-    for step_idx in range(duration):
-        sim.step()
-        if step_idx % record_step == 0:
-            row = out[write_idx]
-            for s_idx, pos in enumerate(positions):
-                row[s_idx] = sim.p[pos]
-            write_idx += 1
+    out = sim.record(duration, [s.position for s in sensors], record_step=record_step)
     # Attach the timeseries back onto the Sensor objects too, so callers
     # that prefer the existing main.py-style "sensor.timeseries" pattern
     # find the data where they expect it.
@@ -374,6 +437,207 @@ def run_with_sensors(
     return out
 
 
+# =====================================================================
+# Dense receiver grid
+# =====================================================================
+
+# Most bytes of float32 output one chunk of ``record_receiver_grid`` may
+# hold in memory before it is written out.
+_RECEIVER_CHUNK_BYTES = 64 << 20
+
+
+def receiver_lattice(grid_shape: Tuple[int, ...], stride: int) -> Tuple[int, ...]:
+    """Shape of the receiver lattice ``grid[::stride, ::stride(, ::stride)]``."""
+    if stride < 1:
+        raise ValueError("stride must be >= 1")
+    return tuple(-(-int(n) // stride) for n in grid_shape)
+
+
+def record_receiver_grid(
+    sim: Union[Simulate, BatchSimulate],
+    duration: int,
+    stride: int = 2,
+    record_step: int = 1,
+    dtype: Any = np.float16,
+    directory: Optional[Union[str, Path]] = None,
+    name: str = "receivers",
+) -> np.ndarray:
+    """Advance ``sim`` by ``duration`` steps, recording every ``stride``-th cell.
+
+    ``run_with_sensors`` fixes its mics before the run; this records the
+    whole receiver lattice (``receiver_lattice``: cells whose coordinates
+    are all multiples of ``stride``) so that any number of mic placements
+    can be drawn from one run afterwards (``pick_mic_pairs``,
+    ``receiver_series``).
+
+    Returns, for a ``Simulate``, an array of shape
+    ``(ceil(duration / record_step), *lattice)``, and for a
+    ``BatchSimulate`` ``(B, ceil(duration / record_step), *lattice)``:
+    row ``w`` is what ``run_with_sensors`` / ``BatchSimulate.run`` would
+    record at those cells. It is preallocated as ``dtype`` (float16
+    halves the footprint; its ~5e-4 relative rounding is far below the
+    grid's own dispersion error), in memory, or as the ``np.memmap`` file
+    ``directory / f"{name}.dat"`` when ``directory`` is given.
+
+    The run is split into chunks of a multiple of ``record_step`` steps
+    whose float32 output fits ``_RECEIVER_CHUNK_BYTES``; each chunk goes
+    through the engine's own sensor path (``Simulate.record``, or the
+    batch kernel's sensor gather) and is then written out (float16 by
+    ``calculate.encode_rows``, rounding as ``astype`` does). Chunking
+    changes nothing: the clock and the fields carry over between runs.
+    A batch's own sensor lists are restored afterwards.
+    """
+    n = int(duration)
+    record_step = int(record_step)
+    if record_step < 1:
+        raise ValueError("record_step must be >= 1")
+    lattice = receiver_lattice(sim.grid_shape, int(stride))
+    axes = [np.arange(0, size * stride, stride) for size in lattice]
+    cells = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(lattice))
+    batched = isinstance(sim, BatchSimulate)
+    members = (sim.batch_size,) if batched else ()
+    n_recorded = (max(n, 0) + record_step - 1) // record_step
+    shape = members + (n_recorded,) + lattice
+    if directory is None:
+        out = np.zeros(shape, dtype=dtype)
+    else:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        out = memmap_array(directory, name, shape, dtype)
+    if n <= 0:
+        return out
+
+    row_bytes = 4 * len(cells) * (sim.batch_size if batched else 1)
+    chunk = record_step * max(1, _RECEIVER_CHUNK_BYTES // (row_bytes * record_step))
+    saved = list(sim.sensor_positions) if batched else None
+    try:
+        if batched:
+            # An (S, dims) array is what ``run`` turns the lists into.
+            sim.sensor_positions = [cells] * sim.batch_size
+        row = 0
+        for first in range(0, n, chunk):
+            steps = min(chunk, n - first)
+            if batched:
+                rec = sim.run(steps, record_step=record_step)
+            else:
+                rec = sim.record(steps, cells, record_step=record_step)[None]
+            rows = rec.shape[1]
+            for member in range(rec.shape[0]):
+                dst = (out[member] if batched else out)[row : row + rows]
+                _write_rows(dst.reshape(rows, -1), rec[member])
+            row += rows
+    finally:
+        if batched:
+            sim.sensor_positions = saved
+    return out
+
+
+def _write_rows(dst: np.ndarray, rows: np.ndarray) -> None:
+    """Store float32 ``rows`` into ``dst``; float16 through the parallel encoder."""
+    if dst.dtype == np.float16:
+        encode_rows(np.ascontiguousarray(rows), dst.view(np.uint16), False)
+    else:
+        dst[...] = rows
+
+
+def receiver_series(
+    recording: np.ndarray, positions: Sequence[Sequence[int]], stride: int
+) -> np.ndarray:
+    """The ``(T_rec, n_positions)`` float32 sensor block of lattice cells.
+
+    ``recording`` is one run's ``(T_rec, *lattice)`` array from
+    ``record_receiver_grid`` (``recording[b]`` for a batch member). The
+    columns are what ``run_with_sensors`` would have returned for
+    ``positions``, which must be lattice cells (``ValueError``
+    otherwise).
+    """
+    columns = []
+    for pos in positions:
+        if any(int(c) % stride for c in pos) or len(pos) != recording.ndim - 1:
+            raise ValueError(f"position {tuple(pos)} is not on the stride-{stride} lattice")
+        columns.append(recording[(slice(None),) + tuple(int(c) // stride for c in pos)])
+    return np.stack(columns, axis=-1).astype(np.float32)
+
+
+# =====================================================================
+# D4 symmetry augmentation
+# =====================================================================
+#
+# The 2D stencils are unchanged by quarter turns and axis flips, every
+# wall is Dirichlet, and drivers and sensors are single cells. So if a
+# room, its driver and its mics are all moved by one symmetry g of the
+# grid, each mic records exactly what it recorded before (to float32
+# rounding: the stencil's four arms are summed in another order). One
+# simulation therefore yields eight samples: the mask and positions
+# transformed by each of the eight g, the recording unchanged.
+#
+# Variant k is ``k % 4`` counter-clockwise quarter turns (``np.rot90``)
+# followed, for k >= 4, by a transpose. Variants 4..7 are reflections.
+# A reflection turns a pair that had mic 0 on the left, seen from the
+# driver, into one with mic 0 on the right. ``d4_channel_order``
+# reverses the channels for those variants so that left/right survives.
+# The positions are reordered with the channels, so column m still
+# belongs to ``sensor_positions[m]``.
+#
+# ``generate_active_sensing.py --d4-augment`` writes all eight variants
+# of each room; ``ActiveSensingDataset(symmetry=True)`` draws one per
+# sample. The placement draws (``pick_mic_positions``,
+# ``random_free_position``) are themselves D4-invariant, so a variant
+# is as likely a sample as a freshly simulated room.
+
+D4_VARIANTS = 8
+
+
+def _check_d4(k: int, ndim: int) -> int:
+    if ndim != 2:
+        raise ValueError(f"D4 symmetries are 2D only, got {ndim}D")
+    if not 0 <= int(k) < D4_VARIANTS:
+        raise ValueError(f"D4 variant must be in 0..{D4_VARIANTS - 1}, got {k}")
+    return int(k)
+
+
+def d4_mask(obstacle_mask: np.ndarray, k: int) -> np.ndarray:
+    """``obstacle_mask`` under D4 variant ``k`` (contiguous copy)."""
+    k = _check_d4(k, np.ndim(obstacle_mask))
+    out = np.rot90(obstacle_mask, k % 4)
+    if k >= 4:
+        out = out.T
+    return np.ascontiguousarray(out)
+
+
+def d4_positions(positions: Any, grid_shape: Tuple[int, ...], k: int) -> np.ndarray:
+    """Cells ``positions`` (``(..., 2)``) under D4 variant ``k``.
+
+    ``grid_shape`` is the shape before the transform. Cell ``(i, j)`` of
+    ``mask`` is cell ``d4_positions((i, j), mask.shape, k)`` of
+    ``d4_mask(mask, k)``.
+    """
+    k = _check_d4(k, len(grid_shape))
+    pos = np.array(positions, dtype=np.int64)
+    if pos.shape[-1] != 2:
+        raise ValueError(f"positions must have shape (..., 2), got {pos.shape}")
+    i, j = pos[..., 0], pos[..., 1]
+    ni, nj = grid_shape
+    for _ in range(k % 4):
+        # np.rot90: a[i, j] lands at (nj - 1 - j, i) of an (nj, ni) grid.
+        i, j = nj - 1 - j, i
+        ni, nj = nj, ni
+    if k >= 4:
+        i, j = j, i
+    return np.stack([i, j], axis=-1)
+
+
+def d4_channel_order(n_mics: int, k: int) -> np.ndarray:
+    """Permutation of the mic channels (and their positions) for variant ``k``.
+
+    Reversed for the reflections (k >= 4), so that a stereo pair keeps
+    its handedness; the identity otherwise.
+    """
+    k = _check_d4(k, 2)
+    order = np.arange(int(n_mics))
+    return order[::-1].copy() if k >= 4 else order
+
+
 # =====================================================================
 # Synthetic source (for when the user has no audio corpus yet)
 # =====================================================================
@@ -407,7 +671,16 @@ __all__ = [
     "generate_random_obstacles",
     "generate_diverse_obstacles",
     "random_free_position",
+    "free_positions",
     "pick_mic_positions",
+    "pick_mic_pairs",
     "run_with_sensors",
+    "receiver_lattice",
+    "record_receiver_grid",
+    "receiver_series",
+    "D4_VARIANTS",
+    "d4_mask",
+    "d4_positions",
+    "d4_channel_order",
     "synthetic_chirp",
 ]
@@ -0,0 +1,283 @@
+"""Multi-process domain decomposition of a 3D grid over shared memory.
+
+One ``Simulate`` is one process: its prange spreads the i-rows over
+numba threads, but every thread shares one address space, and the
+memory traffic of a large 3D grid is capped by what that process can
+pull through. ``Simulate(workers=N)`` instead splits the grid into N
+slabs of i-rows and gives each slab to its own worker process:
+
+* The field buffers (``p``, ``p_prev``, the rotation scratch) and the
+  ``fluid`` map live in ``multiprocessing.shared_memory`` blocks that
+  the parent and every worker map as the same NumPy arrays. ``p_host()``
+  and the obstacle methods keep working on the parent's views, with no
+  gather or scatter.
+* A worker steps only its own rows (``fused_leapfrog_step_slab_3d``)
+  and injects only the drivers inside them. The stencil reads one row
+  past either end of the slab, the neighbours' edge rows. Those rows
+  are the halo, exchanged through the shared buffers themselves.
+* All workers wait at one barrier per timestep. After it the
+  neighbours' edge rows of the new ``p`` are complete, and nobody
+  writes a buffer that another worker still reads: a step writes only
+  its own rows of ``p_next`` and reads only its own rows of ``p_prev``.
+* Each worker rotates the three buffers exactly as ``step()`` does, so
+  the parent replays the rotation on its attributes after a run.
+
+The parent only sends commands: "run n steps with this driver table"
+(one message per worker per ``run()``, or per ``step()``) and "the
+geometry changed". Workers rebuild the fluid spans of their own slab
+from the shared ``fluid`` map on the next run after a change.
+
+Workers are started with the ``spawn`` method, so nothing of the
+parent's numba thread pool is inherited; each one loads the cached
+kernels and limits itself to ``threads`` numba threads. The blocks
+are created empty and each worker writes its own rows of them first,
+so on a NUMA machine a slab's pages sit on the node of the worker
+that streams them.
+
+Linux / POSIX shared memory, CPU backend, 3D only.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import traceback
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numba
+import numpy as np
+
+from .calculate import fluid_spans, fused_leapfrog_step_slab_3d
+
+# Seconds a worker waits at the step barrier (or the parent for a
+# reply) before giving up, and how often the parent checks that every
+# worker is still alive while it waits: a crashed peer must not hang
+# the rest.
+_TIMEOUT = 600.0
+_POLL = 0.1
+
+
+def slab_bounds(n_rows: int, workers: int) -> List[Tuple[int, int]]:
+    """Split ``n_rows`` rows into ``workers`` contiguous ``[lo, hi)`` slabs.
+
+    The first ``n_rows % workers`` slabs get one row more than the rest.
+    """
+    size, extra = divmod(n_rows, workers)
+    bounds = []
+    lo = 0
+    for w in range(workers):
+        hi = lo + size + (1 if w < extra else 0)
+        bounds.append((lo, hi))
+        lo = hi
+    return bounds
+
+
+class SlabWorkers:
+    """N worker processes stepping the slabs of one shared 3D grid.
+
+    Parameters
+    ----------
+    grid_shape
+        The 3D grid.
+    workers
+        Number of slabs / processes (at most one per row).
+    coeff
+        ``(c dt / dx) ** 2``.
+    threads
+        numba threads per worker. Defaults to the machine's thread
+        count divided among the workers.
+
+    Attributes
+    ----------
+    buffers
+        The three float32 field buffers, in the parent's initial
+        rotation order (``p``, ``p_prev``, ``p_next``).
+    fluid
+        The shared uint8 fluid map.
+    bounds
+        ``[lo, hi)`` row range of each worker.
+    """
+
+    def __init__(
+        self,
+        grid_shape: Tuple[int, int, int],
+        workers: int,
+        coeff: np.float32,
+        threads: Optional[int] = None,
+    ) -> None:
+        self.grid_shape = tuple(grid_shape)
+        self.bounds = slab_bounds(self.grid_shape[0], workers)
+        if threads is None:
+            threads = max(1, numba.config.NUMBA_NUM_THREADS // workers)
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.buffers = [self._shared(np.float32) for _ in range(3)]
+        # Left untouched here: each worker writes its own rows first.
+        self.fluid = self._shared(np.uint8)
+
+        ctx = mp.get_context("spawn")
+        self._barrier = barrier = ctx.Barrier(workers, timeout=_TIMEOUT)
+        names = [block.name for block in self._blocks]
+        self._pipes = []
+        self._procs = []
+        for lo, hi in self.bounds:
+            parent_end, child_end = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker_main,
+                args=(child_end, barrier, names, self.grid_shape, lo, hi, coeff, threads),
+                daemon=True,
+            )
+            proc.start()
+            child_end.close()
+            self._pipes.append(parent_end)
+            self._procs.append(proc)
+        self._geometry_dirty = True
+        self._finalizer = weakref.finalize(self, _shutdown, self._pipes, self._procs, self._blocks)
+        self._collect()
+
+    def _shared(self, dtype: Any) -> np.ndarray:
+        """A zeroed array of ``grid_shape`` in a new shared-memory block."""
+        nbytes = int(np.prod(self.grid_shape)) * np.dtype(dtype).itemsize
+        block = shared_memory.SharedMemory(create=True, size=nbytes)
+        # The block's own mapping is closed at once: see ``_map``.
+        block.close()
+        self._blocks.append(block)
+        return _map(block.name, self.grid_shape, dtype)
+
+    def geometry_changed(self) -> None:
+        """Have the workers re-encode their fluid spans before the next run."""
+        self._geometry_dirty = True
+
+    def run(self, n_steps: int, driver_idx: np.ndarray, source: np.ndarray) -> None:
+        """Advance every slab ``n_steps`` timesteps and wait for all of them.
+
+        ``driver_idx`` / ``source`` are the in-bounds driver cells and
+        their ``(n_steps, n_drivers)`` values, as ``Simulate`` tabulates
+        them; each worker keeps the drivers in its own rows.
+        """
+        if not self._finalizer.alive:
+            raise RuntimeError("the slab workers have been closed")
+        if self._geometry_dirty:
+            self._command(("geometry",))
+            self._geometry_dirty = False
+        self._command(("run", int(n_steps), driver_idx, source))
+
+    def _command(self, message: Tuple) -> None:
+        """Send ``message`` to every worker and wait for all of them."""
+        for pipe in self._pipes:
+            try:
+                pipe.send(message)
+            except OSError:
+                # A dead worker; _collect reports it.
+                pass
+        self._collect()
+
+    def _collect(self) -> None:
+        """Wait for one reply per worker; raise if any of them failed."""
+        errors = []
+        waited = 0.0
+        for w, (pipe, proc) in enumerate(zip(self._pipes, self._procs)):
+            while not pipe.poll(_POLL):
+                waited += _POLL
+                if waited >= _TIMEOUT or not all(other.is_alive() for other in self._procs):
+                    # Release the others from the barrier; they reply with an error.
+                    self._barrier.abort()
+                    break
+            try:
+                status, detail = pipe.recv() if pipe.poll(1.0) else ("error", "no reply")
+            except (EOFError, OSError):
+                status, detail = "error", f"exited with code {proc.exitcode}"
+            if status != "ok":
+                errors.append(f"worker {w}: {detail}")
+        if errors:
+            self.close()
+            raise RuntimeError("slab workers failed:\n" + "\n".join(errors))
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory.
+
+        The parent's arrays stay valid until they are garbage collected.
+        """
+        self._finalizer()
+
+
+def _map(name: str, shape: Tuple[int, ...], dtype: Any) -> np.ndarray:
+    """Map the shared-memory block ``name`` as an array that owns its mapping.
+
+    An array built on ``SharedMemory.buf`` holds no buffer export, so
+    ``SharedMemory.close()`` (also run when the object is collected)
+    would unmap it under a live array. A memory map of the block's file
+    stays mapped for as long as any array viewing it.
+    """
+    return np.memmap(f"/dev/shm/{name}", dtype=dtype, mode="r+", shape=shape).view(np.ndarray)
+
+
+def _shutdown(
+    pipes: Sequence[Any],
+    procs: Sequence[mp.process.BaseProcess],
+    blocks: Sequence[shared_memory.SharedMemory],
+) -> None:
+    for pipe in pipes:
+        try:
+            pipe.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+    for proc in procs:
+        proc.join(timeout=5.0)
+        if proc.is_alive():
+            proc.terminate()
+    for block in blocks:
+        # Unlinked now, freed when the last array mapping it goes.
+        block.unlink()
+
+
+def _worker_main(
+    pipe: Any,
+    barrier: Any,
+    names: Sequence[str],
+    grid_shape: Tuple[int, int, int],
+    lo: int,
+    hi: int,
+    coeff: np.float32,
+    threads: int,
+) -> None:
+    """Worker loop: map the shared grid, then serve commands until "stop"."""
+    numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+    p, p_prev, p_next = (_map(name, grid_shape, np.float32) for name in names[:3])
+    fluid = _map(names[3], grid_shape, np.uint8)
+    # First touch: the slab's pages are placed on this worker's node.
+    for buf in (p, p_prev, p_next):
+        buf[lo:hi] = 0.0
+    fluid[lo:hi] = 1
+    nk = grid_shape[2]
+    spans = np.zeros((0, 1, 2), dtype=np.int64)
+    n_spans = np.zeros(0, dtype=np.int64)
+    pipe.send(("ok", None))
+    while True:
+        command = pipe.recv()
+        if command[0] == "stop":
+            break
+        try:
+            if command[0] == "geometry":
+                spans, n_spans = fluid_spans(fluid[lo:hi].reshape(-1, nk))
+            else:
+                _, n_steps, driver_idx, source = command
+                mine = (driver_idx[:, 0] >= lo) & (driver_idx[:, 0] < hi)
+                cells = [tuple(int(c) for c in row) for row in driver_idx[mine]]
+                values = source[:, mine]
+                solid = [cell for cell in cells if fluid[cell] == 0]
+                for t in range(n_steps):
+                    fused_leapfrog_step_slab_3d(p, p_prev, p_next, coeff, spans, n_spans, lo, hi)
+                    # Same order as Simulate.step(): walls and obstacles
+                    # (in the kernel), then drivers.
+                    for cell in solid:
+                        p_next[cell] = 0.0
+                    row = values[t]
+                    for d, cell in enumerate(cells):
+                        p_next[cell] += row[d]
+                    barrier.wait()
+                    p_prev, p, p_next = p, p_next, p_prev
+            pipe.send(("ok", None))
+        except Exception:
+            barrier.abort()
+            pipe.send(("error", traceback.format_exc()))
@@ -0,0 +1,321 @@
+"""Cached impulse responses and convolution rendering of sources.
+
+For fixed geometry the FDTD scheme is a linear, time-invariant map
+from the driver's source sequence to each sensor's recording: the
+stencil is linear, walls and obstacles zero cells, and a driver adds
+its value after both. So with ``h`` the recording of a unit impulse
+injected at step 0,
+
+    recording[k] = sum_{m <= k} h[k - m] * source[m],
+
+where ``source[m]`` is the value the engine would inject at step ``m``
+(``waveform.sample`` at that step's time). The discrete impulse is
+exact for the discrete scheme; no band-limiting is needed, because
+the grid's own dispersion already is the band limit. The sum holds up
+to float32 rounding of the simulated fields.
+
+``ImpulseResponseCache`` simulates ``h`` once per (obstacle mask,
+driver cell, sensor cells, protocol) and keeps it in a directory of
+``.npy`` files named by a SHA-256 of those inputs, so a later run, or
+another process, finds it there. Misses are simulated together as one
+``BatchSimulate`` launch. ``render`` then turns an impulse response and
+any ``Waveform`` (an ``AudioFileWaveform`` from a file or a
+``synthetic_chirp``, say) into the recording by FFT convolution, at
+the cost of one ``fftconvolve`` instead of a simulation.
+
+``reciprocal`` uses acoustic reciprocity the other way round: an
+impulse at each microphone, recorded at every candidate driver cell,
+gives the responses of all those driver placements around a fixed mic
+array for one simulation per mic.
+
+The impulse is not injected through a driver. After step 0 of a run
+from rest whose only source is a unit impulse, ``p`` is exactly one at
+the driver cell (the stencil of zero fields is zero, and injection
+comes after the wall and obstacle zeroing) and ``p_prev`` is zero. The
+cache writes that state and records the remaining steps.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+from .batch import BatchSimulate
+from .simulate import resolve_timestep
+from .waveforms import Waveform
+
+# Changes to the key's inputs or the file layout bump this.
+_KEY_VERSION = b"impulse-v1"
+
+
+class ImpulseResponseCache:
+    """Impulse responses of one acquisition protocol, cached on disk.
+
+    Parameters
+    ----------
+    directory
+        Where the ``<key>.npy`` files live; created if missing. ``None``
+        keeps nothing: every lookup simulates.
+    grid_shape
+        Spatial shape of the rooms (2D or 3D, as ``BatchSimulate``).
+    duration
+        Steps per recording: the impulse responses have this length.
+    wavespeed, timestep, gridstep, courant
+        As for ``Simulate``.
+    batch_size
+        Most misses simulated per ``BatchSimulate`` launch.
+
+    Attributes
+    ----------
+    simulated
+        Impulse responses simulated (cache misses) so far.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str | Path],
+        grid_shape: Tuple[int, ...],
+        duration: int,
+        wavespeed: float = 1.0,
+        timestep: Optional[float] = None,
+        gridstep: float = 1.0,
+        courant: float = 0.5,
+        batch_size: int = 64,
+    ) -> None:
+        self.directory: Optional[Path] = None
+        if directory is not None:
+            self.directory = Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.grid_shape: Tuple[int, ...] = tuple(int(s) for s in grid_shape)
+        self.duration: int = int(duration)
+        if self.duration < 1:
+            raise ValueError("duration must be >= 1")
+        self.wavespeed: float = float(wavespeed)
+        self.gridstep: float = float(gridstep)
+        self.courant: float = float(courant)
+        self.timestep: float = resolve_timestep(
+            len(self.grid_shape), self.wavespeed, self.gridstep, timestep, courant
+        )
+        self.batch_size: int = int(batch_size)
+        self.simulated: int = 0
+
+    # ----- Keys ---------------------------------------------------------- #
+
+    def _check_position(self, pos: Sequence[int]) -> Tuple[int, ...]:
+        tpos = tuple(int(c) for c in pos)
+        if len(tpos) != len(self.grid_shape) or not all(
+            0 <= c < s for c, s in zip(tpos, self.grid_shape)
+        ):
+            raise ValueError(f"position {tpos} outside grid {self.grid_shape}")
+        return tpos
+
+    def _key(self, obstacle_mask: np.ndarray, *fields) -> str:
+        mask = np.asarray(obstacle_mask, dtype=bool)
+        if mask.shape != self.grid_shape:
+            raise ValueError(f"mask shape {mask.shape} != grid shape {self.grid_shape}")
+        digest = hashlib.sha256(_KEY_VERSION)
+        protocol = (
+            self.grid_shape,
+            self.duration,
+            self.wavespeed.hex(),
+            self.timestep.hex(),
+            self.gridstep.hex(),
+        ) + fields
+        digest.update(repr(protocol).encode())
+        digest.update(np.packbits(mask).tobytes())
+        return digest.hexdigest()
+
+    def key(
+        self,
+        obstacle_mask: np.ndarray,
+        driver_position: Sequence[int],
+        sensor_positions: Sequence[Sequence[int]],
+    ) -> str:
+        """Hex SHA-256 naming the impulse response of this geometry and protocol."""
+        return self._key(
+            obstacle_mask,
+            self._check_position(driver_position),
+            tuple(self._check_position(p) for p in sensor_positions),
+        )
+
+    # ----- Lookup -------------------------------------------------------- #
+
+    def get(
+        self,
+        obstacle_mask: np.ndarray,
+        driver_position: Sequence[int],
+        sensor_positions: Sequence[Sequence[int]],
+    ) -> np.ndarray:
+        """The ``(duration, n_sensors)`` float32 impulse response, simulated on a miss."""
+        return self.get_many([(obstacle_mask, driver_position, sensor_positions)])[0]
+
+    def get_many(
+        self,
+        requests: Sequence[Tuple[np.ndarray, Sequence[int], Sequence[Sequence[int]]]],
+    ) -> List[np.ndarray]:
+        """``get`` for each ``(obstacle_mask, driver_position, sensor_positions)``.
+
+        Every miss (each distinct key once) is simulated in
+        ``BatchSimulate`` launches of up to ``batch_size`` members and
+        written to the cache before returning.
+        """
+        keys = [self.key(*request) for request in requests]
+        found = {}
+        misses = {}
+        for key, request in zip(keys, requests):
+            if key in found or key in misses:
+                continue
+            ir = self._load(key)
+            if ir is not None:
+                found[key] = ir
+            else:
+                misses[key] = request
+        pending = list(misses.items())
+        for first in range(0, len(pending), self.batch_size):
+            chunk = pending[first : first + self.batch_size]
+            for (key, _), ir in zip(chunk, self._simulate([r for _, r in chunk])):
+                self._store(key, ir)
+                found[key] = ir
+        return [found[key] for key in keys]
+
+    def _simulate(
+        self, requests: Sequence[Tuple[np.ndarray, Sequence[int], Sequence[Sequence[int]]]]
+    ) -> List[np.ndarray]:
+        """Impulse responses of ``requests``, one ``BatchSimulate`` member each."""
+        batch = BatchSimulate(
+            grid_shape=self.grid_shape,
+            batch_size=len(requests),
+            wavespeed=self.wavespeed,
+            timestep=self.timestep,
+            gridstep=self.gridstep,
+        )
+        first_rows = []
+        for member, (mask, driver, sensors) in enumerate(requests):
+            batch.set_obstacle_mask(member, mask)
+            batch.set_sensors(member, sensors)
+            driver = self._check_position(driver)
+            # The state after step 0 of a unit impulse (module docstring).
+            batch.p[member][driver] = 1.0
+            first_rows.append([1.0 if tuple(int(c) for c in s) == driver else 0.0 for s in sensors])
+        rest = batch.run(self.duration - 1)
+        self.simulated += len(requests)
+        out = []
+        for member, (_, _, sensors) in enumerate(requests):
+            ir = np.empty((self.duration, len(sensors)), dtype=np.float32)
+            ir[0] = first_rows[member]
+            ir[1:] = rest[member, :, : len(sensors)]
+            out.append(ir)
+        return out
+
+    def reciprocal(
+        self,
+        obstacle_mask: np.ndarray,
+        mic_positions: Sequence[Sequence[int]],
+        driver_positions: Sequence[Sequence[int]],
+    ) -> np.ndarray:
+        """Impulse responses from every driver cell to every mic, one simulation per mic.
+
+        Returns ``(n_drivers, duration, n_mics)`` float32: entry ``d``
+        is what ``get(obstacle_mask, driver_positions[d], mic_positions)``
+        returns, to float32 rounding. The update is symmetric in any
+        two fluid cells (the Laplacian is, and walls and obstacles only
+        zero cells), so the response at ``b`` to an impulse at ``a``
+        equals the response at ``a`` to one at ``b``. An impulse at each
+        mic, recorded at all the driver cells, therefore gives every
+        pose of a fixed mic array at once.
+
+        Drivers and mics must be fluid cells off the outer wall layer:
+        a driver on a zeroed cell still leaks its injection for a step,
+        while a sensor there reads zero, so the symmetry fails there.
+        The block is cached as one file.
+        """
+        return self.reciprocal_many([(obstacle_mask, mic_positions, driver_positions)])[0]
+
+    def reciprocal_many(
+        self,
+        requests: Sequence[Tuple[np.ndarray, Sequence[Sequence[int]], Sequence[Sequence[int]]]],
+    ) -> List[np.ndarray]:
+        """``reciprocal`` for each ``(obstacle_mask, mic_positions, driver_positions)``.
+
+        The per-mic simulations of every miss share ``BatchSimulate``
+        launches of up to ``batch_size`` members, as in ``get_many``.
+        """
+        keys = []
+        found = {}
+        misses = {}
+        for mask, mic_positions, driver_positions in requests:
+            mics = tuple(self._check_position(p) for p in mic_positions)
+            drivers = tuple(self._check_position(p) for p in driver_positions)
+            mask = np.asarray(mask, dtype=bool)
+            key = self._key(mask, "reciprocal", drivers, mics)
+            for pos in mics + drivers:
+                on_wall = any(c in (0, s - 1) for c, s in zip(pos, self.grid_shape))
+                if on_wall or mask[pos]:
+                    raise ValueError(f"reciprocal position {pos} is on a wall or obstacle cell")
+            keys.append(key)
+            if key in found or key in misses:
+                continue
+            block = self._load(key)
+            if block is not None:
+                found[key] = block
+            else:
+                misses[key] = [(mask, mic, drivers) for mic in mics]
+        # One member per (miss, mic), flattened so that small mic arrays
+        # still fill a launch.
+        members = [(key, member) for key, per_mic in misses.items() for member in per_mic]
+        per_mic = {key: [] for key in misses}
+        for first in range(0, len(members), self.batch_size):
+            chunk = members[first : first + self.batch_size]
+            for (key, _), ir in zip(chunk, self._simulate([m for _, m in chunk])):
+                per_mic[key].append(ir)
+        for key, irs in per_mic.items():
+            # (n_mics, duration, n_drivers) -> (n_drivers, duration, n_mics)
+            block = np.ascontiguousarray(np.stack(irs).transpose(2, 1, 0))
+            self._store(key, block)
+            found[key] = block
+        return [found[key] for key in keys]
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        if self.directory is None:
+            return None
+        path = self.directory / f"{key}.npy"
+        return np.load(path) if path.exists() else None
+
+    def _store(self, key: str, ir: np.ndarray) -> None:
+        if self.directory is None:
+            return
+        # Write then rename, so that a concurrent reader never sees half a file.
+        path = self.directory / f"{key}.npy"
+        tmp = self.directory / f"{key}.{os.getpid()}.tmp.npy"
+        np.save(tmp, ir)
+        os.replace(tmp, path)
+
+    # ----- Rendering ----------------------------------------------------- #
+
+    def source(self, waveform: Waveform) -> np.ndarray:
+        """The ``(duration,)`` values the engine injects for ``waveform`` from rest."""
+        increments = np.full(self.duration, self.timestep, dtype=np.float64)
+        increments[0] = 0.0
+        return np.asarray(waveform.sample(np.cumsum(increments)), dtype=np.float32)
+
+    def render(self, ir: np.ndarray, waveform: Waveform, record_step: int = 1) -> np.ndarray:
+        """The recording of ``waveform`` through ``ir``, as ``BatchSimulate.run`` returns it.
+
+        Shape ``(ceil(duration / record_step), n_sensors)``, float32:
+        row ``w`` is the sensors after step ``w * record_step``. The
+        convolution runs in float64; several drivers sum their renders.
+        """
+        record_step = int(record_step)
+        if record_step < 1:
+            raise ValueError("record_step must be >= 1")
+        source = self.source(waveform).astype(np.float64)
+        full = fftconvolve(np.asarray(ir, dtype=np.float64), source[:, None], axes=0)
+        return full[: self.duration : record_step].astype(np.float32)
+
+
+__all__ = ["ImpulseResponseCache"]
@@ -0,0 +1,171 @@
+"""Out-of-core stepping of a 3D grid stored in memory-mapped files.
+
+``Simulate(out_of_core=directory)`` keeps the three field buffers, the
+obstacle mask and the fluid map in ``np.memmap`` files in
+``directory`` instead of RAM, so the grid is bounded by disk space.
+A step cannot run the kernels over the files directly without paging
+the whole grid through memory in the kernels' access order. Instead
+``TileStream`` cuts axis 0 into tiles of ``rows`` i-rows and streams
+them through a fixed set of in-memory buffers:
+
+* Reading tile ``[a, b)`` copies ``p`` rows ``a - 1 .. b`` (one halo
+  row on each side, clipped to the grid) and ``p_prev`` rows
+  ``a .. b - 1`` into a buffer set.
+* ``fused_leapfrog_step_slab_3d`` computes ``p_next`` on the tile's own
+  rows of that set, zeroed first since it skips solid cells. The set's
+  first row is global row ``a - 1`` (or 0), so the kernel's row range
+  and its wall zeroing are those of the tile. The drivers in the tile
+  are injected.
+* Writing copies the tile's rows of ``p_next`` back to its file.
+
+One background thread does every read and write, in submission order.
+The next tile is read while the current one is computed and the
+previous one is written. FIFO order is what makes this safe: a read of
+``p`` rows the step before wrote, or a write over ``p_prev`` rows a
+read still needs, always comes after the operation it depends on.
+Three buffer sets (being read, computed, written) bound the working
+set to ``9 * (rows + 2)`` rows of the grid.
+
+The files hold C-order arrays, so a tile is one contiguous range of
+each file. The kernel releases the GIL, which lets the I/O thread's
+copies and page faults run during compute.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+from pathlib import Path
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+
+from .calculate import fused_leapfrog_step_slab_3d
+
+# Buffer sets in flight: one being read, one computed, one written.
+_SETS = 3
+
+
+def memmap_array(
+    directory: Path, name: str, shape: Tuple[int, ...], dtype: Any, value: int = 0
+) -> np.ndarray:
+    """A new ``np.memmap`` file ``directory / name`` of ``shape`` / ``dtype``.
+
+    The file starts as zeros (sparse on most filesystems). A nonzero
+    ``value`` is written one i-row at a time.
+    """
+    buf = np.memmap(directory / f"{name}.dat", dtype=dtype, mode="w+", shape=shape)
+    if value:
+        for i in range(shape[0]):
+            buf[i] = value
+    return buf
+
+
+class TileStream:
+    """Streams i-row tiles of memory-mapped 3D buffers through compute.
+
+    Parameters
+    ----------
+    grid_shape
+        The 3D grid.
+    memory_bytes
+        Budget for the in-memory buffer sets; sets the tile height
+        ``rows`` (at least one row).
+    """
+
+    def __init__(self, grid_shape: Tuple[int, int, int], memory_bytes: int) -> None:
+        self.grid_shape = tuple(grid_shape)
+        n0 = self.grid_shape[0]
+        row_bytes = int(np.prod(self.grid_shape[1:])) * 4
+        self.rows: int = int(min(n0, max(1, memory_bytes // (3 * _SETS * row_bytes) - 2)))
+        self.tiles: List[Tuple[int, int]] = [
+            (a, min(a + self.rows, n0)) for a in range(0, n0, self.rows)
+        ]
+        shape = (self.rows + 2,) + self.grid_shape[1:]
+        self._sets = [
+            tuple(np.zeros(shape, dtype=np.float32) for _ in range(3)) for _ in range(_SETS)
+        ]
+        self._io = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="tile-io"
+        )
+
+    def _window(self, tile: int) -> Tuple[int, int, int, int]:
+        """``(a, b, base, top)``: the tile's rows and its halo window ``[base, top)``."""
+        a, b = self.tiles[tile]
+        return a, b, max(a - 1, 0), min(b + 1, self.grid_shape[0])
+
+    def _read(self, job: int, p: np.ndarray, p_prev: np.ndarray) -> None:
+        a, b, base, top = self._window(job % len(self.tiles))
+        cur, prev, nxt = self._sets[job % _SETS]
+        cur[: top - base] = p[base:top]
+        prev[a - base : b - base] = p_prev[a:b]
+        # The kernel skips solid cells, which must come back as zeros
+        # rather than whatever tile the set held before.
+        nxt[a - base : b - base] = 0.0
+
+    def _write(self, job: int, p_next: np.ndarray) -> None:
+        a, b, base, _ = self._window(job % len(self.tiles))
+        p_next[a:b] = self._sets[job % _SETS][2][a - base : b - base]
+
+    def run(
+        self,
+        roles: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+        coeff: np.float32,
+        spans: np.ndarray,
+        n_spans: np.ndarray,
+        driver_idx: np.ndarray,
+        driver_solid: np.ndarray,
+        source: np.ndarray,
+    ) -> None:
+        """Advance ``len(roles)`` steps; ``roles[t]`` is ``(p, p_prev, p_next)`` at step ``t``.
+
+        ``spans`` / ``n_spans`` is the full-grid fluid-span table,
+        ``driver_idx`` / ``driver_solid`` / ``source`` the driver table
+        as the run kernels take it. Returns once every write is on its
+        file (in the page cache, not necessarily on disk).
+        """
+        n_tiles = len(self.tiles)
+        n_jobs = len(roles) * n_tiles
+        nj = self.grid_shape[1]
+        rows = driver_idx[:, 0]
+        reads = {0: self._io.submit(self._read, 0, *roles[0][:2])}
+        writes = []
+        for job in range(n_jobs):
+            t, tile = divmod(job, n_tiles)
+            # Read ahead one tile. Across a step boundary the first tile
+            # needs p rows written by tiles 0 and 1 of this step, which
+            # are already queued only if there are at least three tiles.
+            ahead = job + 1 < n_jobs and (tile + 1 < n_tiles or n_tiles >= 3)
+            if ahead:
+                nt = (job + 1) // n_tiles
+                reads[job + 1] = self._io.submit(self._read, job + 1, *roles[nt][:2])
+            reads.pop(job).result()
+            a, b, base, top = self._window(tile)
+            cur, prev, nxt = (buf[: top - base] for buf in self._sets[job % _SETS])
+            fused_leapfrog_step_slab_3d(
+                cur,
+                prev,
+                nxt,
+                coeff,
+                spans[a * nj : b * nj],
+                n_spans[a * nj : b * nj],
+                a - base,
+                b - base,
+            )
+            # Walls and obstacles (in the kernel), then drivers.
+            mine = np.flatnonzero((rows >= a) & (rows < b))
+            cells = [(int(rows[d]) - base, *(int(c) for c in driver_idx[d, 1:])) for d in mine]
+            for d, cell in zip(mine, cells):
+                if driver_solid[d]:
+                    nxt[cell] = 0.0
+            for d, cell in zip(mine, cells):
+                nxt[cell] += source[t, d]
+            writes.append(self._io.submit(self._write, job, roles[t][2]))
+            if not ahead and job + 1 < n_jobs:
+                nt = (job + 1) // n_tiles
+                reads[job + 1] = self._io.submit(self._read, job + 1, *roles[nt][:2])
+        for write in writes:
+            write.result()
+
+    def close(self) -> None:
+        """Stop the I/O thread."""
+        self._io.shutdown(wait=True)
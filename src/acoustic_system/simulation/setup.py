@@ -17,6 +17,10 @@ class Driver:
     def get_value(self, time: float) -> float:
         return float(self.waveform(time))
 
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        """float32 source values at every time in ``times`` (vectorised)."""
+        return self.waveform.sample(times)
+
 
 @dataclass
 class Sensor:
@@ -1,15 +1,214 @@
 import warnings
-from typing import Iterable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from .calculate import Calculate, fused_leapfrog_step_2d, fused_leapfrog_step_3d
+from .autotune import (
+    KernelConfig,
+    default_config,
+    kernel_config,
+    serial_twin,
+    set_default_threads,
+    threads,
+)
+from .boundary import (
+    BOUNDARIES,
+    PML_WIDTH,
+    impedance_walls,
+    mur_coefficient,
+    pml_coefficients,
+    sponge_coefficients,
+)
+from .calculate import (
+    STENCILS,
+    Calculate,
+    first_touch_array,
+    fluid_spans,
+    fused_leapfrog_run_2d,
+    fused_leapfrog_run_3d,
+    fused_leapfrog_run_inplace_2d,
+    fused_leapfrog_run_inplace_3d,
+    fused_leapfrog_run_tiled_2d,
+    fused_leapfrog_run_tiled_3d,
+    fused_leapfrog_run_u16_2d,
+    fused_leapfrog_run_u16_3d,
+    fused_leapfrog_step_2d,
+    fused_leapfrog_step_3d,
+    fused_leapfrog_step_inplace_2d,
+    fused_leapfrog_step_inplace_3d,
+    fused_leapfrog_step_masked_2d,
+    fused_leapfrog_step_masked_3d,
+    fused_leapfrog_step_media_2d,
+    fused_leapfrog_step_media_3d,
+    fused_leapfrog_step_media_u8_2d,
+    fused_leapfrog_step_media_u8_3d,
+    fused_leapfrog_step_mur_2d,
+    fused_leapfrog_step_mur_3d,
+    fused_leapfrog_step_pml_2d,
+    fused_leapfrog_step_pml_3d,
+    fused_leapfrog_step_spans_2d,
+    fused_leapfrog_step_spans_3d,
+    leapfrog_step_kernel,
+    stencil_cfl_limit,
+    storage_decode_table,
+)
+from .decompose import SlabWorkers
+from .outofcore import TileStream, memmap_array
+from .pstd import SpectralPropagator, source_values
 from .setup import Driver, Sensor
-from .utils import set_edge_values
+from .snapshot import read_state, write_state
 
 laplacian_operator = Calculate().laplacian_operator
 
 
+def resolve_timestep(
+    dims: int,
+    wavespeed: float,
+    gridstep: float,
+    timestep: Optional[float],
+    courant: float,
+    stencil: str = "second_order",
+) -> float:
+    """Pick (or validate) the leap-frog timestep for a ``dims``-D grid.
+
+    If no timestep is provided, derive one from the requested Courant
+    number. The CFL limit in d dimensions is C_max = 1/sqrt(d) for the
+    second-order stencil, and ``stencil_cfl_limit`` for the others; we
+    stay strictly under it. An explicit ``timestep`` is used as given,
+    with a ``RuntimeWarning`` when it violates the bound. Shared by
+    ``Simulate`` and ``BatchSimulate`` so both engines agree on dt for
+    the same inputs.
+    """
+    if stencil == "second_order":
+        cfl_limit = 1.0 / np.sqrt(dims)
+        bound = f"1/sqrt({dims})"
+    else:
+        cfl_limit = stencil_cfl_limit(dims, *STENCILS[stencil])
+        bound = f"{stencil} limit"
+    if timestep is None:
+        chosen_courant = min(courant, 0.95 * cfl_limit)
+        return chosen_courant * gridstep / wavespeed
+    dt = float(timestep)
+    actual_courant = wavespeed * dt / gridstep
+    if actual_courant >= cfl_limit:
+        warnings.warn(
+            f"CFL violated: Courant={actual_courant:.3f} >= {bound}={cfl_limit:.3f}. "
+            f"Simulation will be unstable.",
+            RuntimeWarning,
+        )
+    return dt
+
+
+@dataclass(frozen=True)
+class _Options:
+    """The constructor options ``_check_options`` rules on, normalised."""
+
+    backend: str
+    dims: int
+    stencil: str
+    storage_dtype: str
+    two_buffer: bool
+    active_region: bool
+    boundary: str
+    media: bool
+    workers: int
+    first_touch: bool
+    out_of_core: bool
+
+
+# What an option can ask of the rest of the configuration, by key: the
+# phrase used in the error message and the test it names.
+_NEEDS: Dict[str, Tuple[str, Callable[[_Options], bool]]] = {
+    "cpu": ("backend='cpu'", lambda o: o.backend == "cpu"),
+    "2d_3d": ("a 2D or 3D grid", lambda o: o.dims in (2, 3)),
+    "3d": ("a 3D grid", lambda o: o.dims == 3),
+    "second_order": ("the second-order stencil", lambda o: o.stencil == "second_order"),
+    "three_buffer": ("three-buffer float32 storage", lambda o: not o.two_buffer),
+    "two_buffer": ("memory_mode='two_buffer'", lambda o: o.two_buffer),
+    "static": ("active_region=False", lambda o: not o.active_region),
+    "dirichlet": ("boundary='dirichlet'", lambda o: o.boundary == "dirichlet"),
+    "pstd": ("backend='pstd'", lambda o: o.backend == "pstd"),
+    "dirichlet_sponge": (
+        "boundary='dirichlet' or 'sponge'",
+        lambda o: o.boundary in ("dirichlet", "sponge"),
+    ),
+    "uniform": ("no wavespeed_field", lambda o: not o.media),
+    "serial": ("workers=1", lambda o: o.workers == 1),
+    "no_first_touch": ("first_touch=False", lambda o: not o.first_touch),
+}
+
+# Which options only some engines support, and what each then needs
+# (keys of ``_NEEDS``): the option as the message names it (formatted
+# with the options as ``o``), when it is in use, and its needs. 16-bit
+# storage implies two-buffer mode, so "three_buffer" also rules it out.
+_OPTION_RULES: Tuple[Tuple[str, Callable[[_Options], bool], Tuple[str, ...]], ...] = (
+    ("backend='gpu'", lambda o: o.backend == "gpu", ("2d_3d",)),
+    ("backend='pstd'", lambda o: o.backend == "pstd", ("dirichlet_sponge",)),
+    (
+        "storage_dtype={o.storage_dtype!r}",
+        lambda o: o.storage_dtype != "float32",
+        ("cpu", "2d_3d", "two_buffer"),
+    ),
+    ("memory_mode='two_buffer'", lambda o: o.two_buffer, ("cpu", "2d_3d")),
+    ("active_region=True", lambda o: o.active_region, ("cpu", "2d_3d")),
+    ("stencil={o.stencil!r}", lambda o: STENCILS[o.stencil][1], ("2d_3d",)),
+    (
+        "stencil={o.stencil!r}",
+        lambda o: o.stencil != "second_order",
+        ("cpu", "three_buffer", "static"),
+    ),
+    (
+        "boundary={o.boundary!r}",
+        lambda o: o.boundary in ("mur", "pml"),
+        ("cpu", "2d_3d", "second_order", "three_buffer", "static"),
+    ),
+    ("boundary='sponge'", lambda o: o.boundary == "sponge", ("pstd",)),
+    (
+        "wavespeed_field",
+        lambda o: o.media,
+        ("cpu", "2d_3d", "second_order", "three_buffer", "static", "dirichlet"),
+    ),
+    (
+        "workers > 1",
+        # With backend="pstd", workers is the transforms' thread count.
+        lambda o: o.workers > 1 and o.backend != "pstd",
+        ("cpu", "3d", "second_order", "three_buffer", "static", "dirichlet", "uniform"),
+    ),
+    ("first_touch=True", lambda o: o.first_touch, ("cpu",)),
+    (
+        "out_of_core",
+        lambda o: o.out_of_core,
+        (
+            "cpu",
+            "3d",
+            "second_order",
+            "three_buffer",
+            "static",
+            "dirichlet",
+            "uniform",
+            "serial",
+            "no_first_touch",
+        ),
+    ),
+)
+
+
+def _check_options(options: _Options) -> None:
+    """Raise ``ValueError`` for the first option in ``_OPTION_RULES`` whose needs are unmet.
+
+    The message names the option and everything it needs, met or not.
+    """
+    for option, in_use, needs in _OPTION_RULES:
+        if in_use(options) and not all(_NEEDS[key][1](options) for key in needs):
+            phrases = [_NEEDS[key][0] for key in needs]
+            listed = phrases[0] if len(phrases) == 1 else ", ".join(phrases[:-1])
+            if len(phrases) > 1:
+                listed += f" and {phrases[-1]}"
+            raise ValueError(f"{option.format(o=options)} requires {listed}")
+
+
 class Simulate:
     """Stateful FDTD simulation advanced one step at a time.
 
@@ -20,25 +219,30 @@ class Simulate:
 
     Stability requires the Courant number to satisfy
         C = c \\Delta t / \\Delta x \\le 1 / \\sqrt{d}
-    where d is the spatial dimensionality. A warning is raised when violated.
+    where d is the spatial dimensionality (other stencils: see "Stencils"
+    below). A warning is raised when violated.
 
-    The 2D path uses a numba ``@njit`` fused stencil kernel
-    (``fused_leapfrog_step_2d``); 1D and 3D paths fall back to the legacy
-    ``scipy.ndimage.laplace`` based code so the public API behaves identically
-    for all supported dimensionalities.
+    Every dimensionality steps with a numba ``@njit`` fused stencil
+    kernel: hand-written for 2D and 3D (``fused_leapfrog_step_2d`` /
+    ``_3d``), generated by ``leapfrog_step_kernel`` for 1D, 4D and up.
+    ``run()`` / ``record()`` have compiled loops in 2D/3D only; other
+    dimensionalities loop over ``step()``.
 
     Backends (Task 1.5)
     -------------------
-    ``backend="cpu"`` (default) is the numba/scipy engine described above,
+    ``backend="cpu"`` (default) is the numba engine described above,
     unchanged. ``backend="gpu"`` (2D/3D only, requires the ``gpu`` extra and
     a CUDA device) binds the CuPy ``RawKernel`` twins from
     ``calculate_gpu.py`` and allocates ``p``, ``p_prev``, ``_p_next`` and
     ``obstacle_mask`` as device arrays. ``step()`` is shared verbatim between
-    backends — the kernels have identical signatures and CuPy mirrors the
-    NumPy operations used for the obstacle scrub and driver injection — so
-    the ordering contracts (walls, then obstacles, then drivers) hold on
-    both. No transfer occurs in the step path; use ``p_host()`` for
-    readback and ``set_obstacle_mask()`` for bulk geometry upload.
+    backends — the kernels (plain and obstacle-masked) have identical
+    signatures and CuPy mirrors the NumPy operations used for driver
+    injection — so the ordering contracts (walls, then obstacles, then
+    drivers) hold on both. No transfer occurs in the step path; use
+    ``p_host()`` for readback and ``set_obstacle_mask()`` for bulk
+    geometry upload.
+    ``backend="pstd"`` replaces the stencil instead (see "Pseudo-spectral
+    backend" below).
 
     Round-3 cand-c performance technique
     -------------------------------------
@@ -71,15 +275,263 @@ class Simulate:
     Interior obstacles
     ------------------
     A boolean ``obstacle_mask`` of the same shape as the field marks cells
-    that act as rigid Dirichlet walls inside the domain. After the stencil
-    pass and before driver injection, ``step()`` zeroes ``p_next`` at the
-    masked cells; the cached ``_has_obstacles`` flag lets the hot loop
-    skip this work entirely when the mask is empty, preserving bit-identical
-    behaviour against the no-obstacle reference. Drivers placed on
-    obstacle cells still emit (just like drivers placed on the outer wall),
-    which matches the boundary semantics already encoded in the kernel.
+    that act as rigid Dirichlet walls inside the domain. When any are set,
+    ``step()`` calls the masked kernel twin (``fused_leapfrog_step_masked_*``),
+    which zeroes ``p_next`` at obstacle cells inside the stencil pass —
+    after the walls and before driver injection — reading a uint8 copy of
+    the mask (``_fluid``) kept in sync by the mutation methods. The cached
+    ``_has_obstacles`` flag selects the plain kernel when the mask is
+    empty, preserving bit-identical behaviour against the no-obstacle
+    reference. Drivers placed on obstacle cells still emit (just like
+    drivers placed on the outer wall), which matches the boundary
+    semantics already encoded in the kernel.
+
+    Compiled multi-step runs
+    ------------------------
+    ``run(n_steps)`` is equivalent to calling ``step()`` ``n_steps`` times
+    but keeps the whole loop — stencil, obstacle zeroing, driver injection
+    and buffer rotation — inside one numba call (CPU backend, 2D/3D). The
+    driver values for the window are tabulated up front, so drivers must
+    not be mutated mid-window; between ``run`` calls the usual mutation
+    methods apply. Other configurations fall back to a ``step()`` loop.
+
+    Source tables
+    -------------
+    Driver values are never evaluated one scalar at a time in the hot
+    loop. ``step()`` reads them from a float32 table of
+    ``_SOURCE_CHUNK`` rows built with the vectorised ``Waveform.sample``
+    and rebuilt when it runs out, when the clock no longer matches the
+    table (``reset()``, a manual ``time`` change) or when the driver list
+    changes. ``step()`` compares ``tuple(self.drivers)`` with the one the
+    table was built from, so direct edits (``sim.drivers.append``) count
+    as well as ``add_driver`` / ``remove_driver`` / ``set_drivers``;
+    ``run()`` tabulates its whole window the same way. The table agrees
+    with per-step ``get_value`` evaluation up to float32 rounding, not
+    bit for bit: vectorised NumPy can round the last float64 bit of a
+    ``cos`` / ``exp`` differently, so fields may differ from the
+    pre-table engine in the last float32 place. A waveform object's
+    parameters are treated as fixed once attached — after editing one in
+    place, call ``set_drivers`` to refresh.
+
+    Active-region tracking
+    ----------------------
+    With ``active_region=True`` (CPU backend, 2D/3D) the stencil only
+    sweeps a bounding box of the cells that can be nonzero: the fields
+    start at rest, and the 5/7-point stencil moves information one cell
+    per step, so the box is the union of the drivers' light cones. The
+    kernels grow it by one cell per step, and a driver joins it once
+    its source value is nonzero. ``reset()`` then only zeroes the box.
+    Results are identical to the full sweep. Code that writes ``p`` /
+    ``p_prev`` directly must call ``observe_active_region()`` afterwards
+    so the box covers the new values.
+
+    Memory modes
+    ------------
+    ``memory_mode="three_buffer"`` (default) keeps the scratch buffer
+    ``_p_next`` and rotates three fields. ``memory_mode="two_buffer"``
+    (CPU backend, 2D/3D) writes each step's result over ``p_prev`` in
+    place with the ``fused_leapfrog_*_inplace_*`` kernels and swaps two
+    buffers. This takes a third less field memory and is bit-identical.
+    ``p`` and ``p_prev`` keep their meaning in both modes. ``_p_next`` is
+    None in two-buffer mode. The default (``memory_mode=None``) is
+    three-buffer, except with reduced-precision storage.
+
+    Temporal blocking
+    -----------------
+    ``run_blocked(n)`` gives the same result as ``run(n)``, but advances
+    ``time_block`` steps per pass over memory with a wavefront of
+    cache-sized slabs (``fused_leapfrog_run_tiled_*``). It pays off once
+    the field buffers no longer fit in cache. CPU backend, 2D/3D,
+    float32 storage. Anywhere else it is ``run(n)``.
+
+    Storage precision
+    -----------------
+    ``storage_dtype="float16"`` or ``"bfloat16"`` (CPU backend, 2D/3D)
+    stores ``p`` / ``p_prev`` in 16 bits and computes each step in
+    float32 (``fused_leapfrog_run_u16_*``), always in two-buffer mode:
+    4 bytes per cell instead of 12. ``p`` is an ``np.float16`` array for
+    float16 and a ``uint16`` array of raw bit patterns for bfloat16
+    (NumPy has no bfloat16); ``p_host()`` decodes either to float32, and
+    ``record()`` samples are float32. ``step()`` is ``run(1)`` in this
+    mode. Rounding every step to 16 bits costs accuracy; see
+    ``docs/simulate.md`` for measured error against float32.
+
+    Autotuning
+    ----------
+    On the CPU backend in 2D/3D the first ``run`` / ``record`` /
+    ``run_blocked`` call looks up how to launch the compiled loop on
+    this machine for this kind and size of grid — thread count, serial
+    or prange build, temporal blocking — in the tuning cache
+    (``autotune.py``). By default (``autotune=None``) only a cached
+    result is used; tuning is a separate step
+    (``python -m acoustic_system.simulation.autotune 64x64``).
+    ``autotune=True`` also measures a bucket that is not cached yet, on
+    a proxy grid of the bucket's size (never a copy of this one), and
+    writes it to the cache. Every choice gives the same field values,
+    so only speed changes. ``step()`` keeps the default thread count.
+    ``autotune=False`` or the environment variable
+    ``ACOUSTIC_AUTOTUNE=0`` use the defaults.
+
+    Boundaries
+    ----------
+    ``boundary="dirichlet"`` (default) zeroes every outer face, a
+    pressure-release wall. ``"mur"`` replaces it with a first-order Mur
+    absorbing boundary (exact at normal incidence) and ``"pml"`` with a
+    convolutional perfectly matched layer ``boundary_width`` cells thick
+    (default 16) in front of the wall, so a small domain stands in for
+    open space instead of one padded until echoes arrive after the
+    recording window. Both are fused step kernels (CPU backend, 2D/3D,
+    second-order stencil, three-buffer float32, no active region);
+    ``run()`` loops over ``step()`` and nothing is autotuned. Drivers,
+    sensors and obstacles inside the PML work but sit in a damped
+    region, so keep them out of it for free-field results.
+    ``"sponge"`` is the pseudo-spectral backend's absorbing layer, and
+    only that backend's (see "Pseudo-spectral backend" below).
+
+    Wall reflection
+    ---------------
+    ``set_wall_reflection(reflection)`` makes solid cells — obstacles
+    and the outer layer — partially reflective: a locally reacting wall
+    whose normal-incidence pressure reflection is ``reflection`` (1
+    rigid, 0 absorbing, NaN the default pressure-release wall). The map
+    is stored as a uint8 code per cell into a table of at most 255
+    distinct values, and applies wherever the cell is solid, so later
+    obstacle edits take the reflection of the cells they cover. The
+    fluid cells facing a reflective wall are corrected inside the span,
+    run and blocked kernels (see calculate.py, "Impedance walls"), so
+    ``step()`` takes the span kernel while any are set. CPU backend,
+    2D/3D, second-order stencil, three-buffer float32, Dirichlet
+    boundary.
+
+    Heterogeneous media
+    -------------------
+    ``wavespeed_field`` (an array of ``grid_shape``) gives every cell its
+    own wavespeed, for temperature layers, different materials or
+    fluid-filled obstacles; ``wavespeed`` is then ignored and reports
+    the field's maximum, which sets the timestep. The step kernel reads
+    a per-cell coefficient ``(c dt / dx) ** 2`` in the stencil pass:
+    a float32 grid, or with ``wavespeed_dtype="uint8"`` a one-byte code
+    per cell into a table of 256 speeds (the default when the field has
+    at most 256 distinct values; finer fields are quantised evenly
+    between their extremes). Cells of speed 0 stay at 0 from rest, so
+    they act as obstacles without the mask. CPU backend, 2D/3D,
+    second-order stencil, three-buffer float32, no active region,
+    Dirichlet boundary; ``run()`` loops over ``step()`` and nothing is
+    autotuned.
+
+    Domain decomposition
+    --------------------
+    ``workers=N`` (N > 1; CPU backend, 3D) splits the grid into N slabs
+    of i-rows, each stepped by its own worker process
+    (``decompose.SlabWorkers``). ``p``, ``p_prev``, ``_p_next`` and
+    ``_fluid`` are then views of shared memory that every worker maps,
+    so ``p_host()``, the obstacle methods and ``reset()`` work on them
+    directly. A worker writes only its own rows, reads its neighbours'
+    edge rows as a one-row halo, and waits at one barrier per step.
+    ``step()`` and ``run()`` send one command per worker; ``record()``
+    loops over ``step()``. Second-order stencil, three-buffer float32,
+    Dirichlet boundary, no active region, wall reflection or
+    wavespeed field, and nothing is autotuned. ``close()`` stops the
+    workers (otherwise they stop when the object is collected).
+
+    First-touch allocation
+    ----------------------
+    With ``first_touch=True`` (CPU backend) the field buffers, the
+    obstacle mask and ``_fluid`` are fresh anonymous memory written
+    first by the same prange partition of axis 0 that the kernels
+    use (``calculate.first_touch_array``), instead of ``np.zeros`` /
+    ``np.ones`` on this thread. On a multi-socket machine each page
+    then sits on the node of the thread that streams it. Geometry
+    updates copy into these arrays rather than replacing them. The
+    numbers are unchanged. Slab workers always first-touch their own
+    rows.
+
+    Out-of-core grids
+    -----------------
+    ``out_of_core=directory`` (CPU backend, 3D) keeps ``p``, ``p_prev``,
+    ``_p_next``, ``obstacle_mask`` and ``_fluid`` in ``np.memmap``
+    files in ``directory``, so a grid may exceed RAM. Steps stream
+    i-row tiles with one halo row each side through in-memory buffers
+    of at most ``out_of_core_memory`` bytes (default
+    ``_OUT_OF_CORE_BYTES``), with reads and write-backs on a background
+    thread overlapping the compute (``outofcore.TileStream``). Same
+    numbers as in memory. ``step()`` and ``run()`` stream; ``record()``
+    loops over ``step()`` and nothing is autotuned. Second-order
+    stencil, three-buffer float32, Dirichlet boundary, no active
+    region, wall reflection, wavespeed field, workers or first touch.
+    ``close()`` stops the I/O thread and flushes the files.
+
+    Snapshots
+    ---------
+    ``save_state(path)`` writes the fields, obstacles, drivers, sensors,
+    clock and settings to one file with page-aligned arrays
+    (``snapshot.py``); ``Simulate.load_state(path, backend=...)``
+    resumes from it, mapping the arrays copy-on-write instead of
+    reading them. The resumed run is bitwise the uninterrupted one.
+
+    Stencils
+    --------
+    ``stencil="second_order"`` (default) is the (2d+1)-point Laplacian
+    above. ``"fourth_order"`` uses fourth-order central differences
+    along each axis and ``"isotropic"`` (2D/3D) the compact 9-/27-point
+    Laplacian, whose error no longer depends on propagation direction.
+    Both let a coarser grid reach the same accuracy (``docs/simulate.md``
+    has measured dispersion). Each has its own CFL limit
+    (``stencil_cfl_limit``: 0.612 / 0.5 for fourth order in 2D / 3D,
+    0.866 / 0.808 isotropic), which ``courant`` and the timestep check
+    use. They step through generated kernels only — CPU backend,
+    three-buffer float32 storage, no active region, ``run()`` loops
+    over ``step()`` and nothing is autotuned. The fourth-order stencil
+    reads through the outer wall as its odd mirror image, so the wall
+    stays one cell thick; interior obstacles thinner than two cells are
+    partly read through.
+
+    Pseudo-spectral backend
+    -----------------------
+    ``backend="pstd"`` steps with ``pstd.SpectralPropagator``: the
+    interior is transformed to sine modes (scipy.fft type-I DST, on
+    ``workers`` threads — here a thread count, not processes), advanced
+    there with the exact ``2 (cos(c |k| dt) - 1)`` multiplier and
+    transformed back. Drivers are added in the same basis, filtered so
+    that the step stays exact for them too. Free-field propagation then
+    has no dispersion, so four to six cells per wavelength do what the
+    stencils need thirty or more for. The outer layer is the usual
+    pressure-release wall; ``boundary="sponge"`` (this backend's only
+    absorbing layer) puts a damped-wave sponge of ``boundary_width``
+    cells in front of it (``boundary.sponge_coefficients``), which
+    reflects 1–2% where the PML reflects 1e-4. Obstacles are a staircase of zeroed cells,
+    accurate only to first order at their faces. The timestep and its
+    bound are the second-order stencil's (past ``1 / sqrt(d)`` the
+    corner modes alias). Sensors, ``record()``, ``p_host()``, the
+    obstacle methods and snapshots work as on the CPU; ``run()`` loops
+    over ``step()``. Any dimensionality, default stencil, three-buffer
+    float32, no active region, wavespeed field or wall reflection, and
+    nothing is autotuned. Drivers on an obstacle or the outer layer
+    are silent, unlike on the other backends.
     """
 
+    # Rows per step() source table: amortises one vectorised waveform
+    # evaluation over many steps without tabulating far past the point
+    # an interactive session might change its drivers.
+    _SOURCE_CHUNK: int = 256
+
+    # Mean fluid-span length (cells) below which step() prefers the masked
+    # kernel to the span kernel: short spans defeat SIMD and add loop
+    # overhead per span. 16 float32 = two AVX-512 / four AVX2 vectors.
+    _MIN_MEAN_SPAN: int = 16
+
+    # run_blocked() defaults: steps per wavefront pass, and the cache
+    # budget that sizes its slabs. About time_block + 2 slabs per buffer
+    # are live at once; 2 MiB is a typical per-core L2.
+    _TIME_BLOCK: int = 4
+    _TILE_CACHE_BYTES: int = 2 << 20
+
+    # Default working-set budget of an out-of-core grid's tile buffers.
+    _OUT_OF_CORE_BYTES: int = 256 << 20
+
+    # Speeds a uint8 wavespeed_field can hold (one code each).
+    _MEDIA_LEVELS: int = 256
+
     def __init__(
         self,
         grid_shape: Tuple[int, ...] = (200, 200),
@@ -90,25 +542,132 @@ class Simulate:
         gridstep: float = 1.0,
         courant: float = 0.5,
         backend: str = "cpu",
+        active_region: bool = False,
+        memory_mode: Optional[str] = None,
+        storage_dtype: str = "float32",
+        autotune: Optional[bool] = None,
+        stencil: str = "second_order",
+        boundary: str = "dirichlet",
+        boundary_width: int = PML_WIDTH,
+        wavespeed_field: Optional[np.ndarray] = None,
+        wavespeed_dtype: Optional[str] = None,
+        workers: int = 1,
+        first_touch: bool = False,
+        out_of_core: Optional[str] = None,
+        out_of_core_memory: Optional[int] = None,
     ) -> None:
         self.grid_shape: Tuple[int, ...] = tuple(grid_shape)
         self.wavespeed: float = float(wavespeed)
+        # Heterogeneous medium (see "Heterogeneous media" above): the
+        # fastest cell sets the timestep, so ``wavespeed`` reports it.
+        speeds: Optional[np.ndarray] = None
+        if wavespeed_field is not None:
+            speeds = np.asarray(wavespeed_field, dtype=np.float64)
+            if speeds.shape != self.grid_shape:
+                raise ValueError(
+                    f"wavespeed_field shape {speeds.shape} != grid shape {self.grid_shape}"
+                )
+            if not np.all(np.isfinite(speeds)) or np.any(speeds < 0.0) or not np.any(speeds):
+                raise ValueError("wavespeed_field must be finite, >= 0 and positive somewhere")
+            self.wavespeed = float(speeds.max())
         self.gridstep: float = float(gridstep)
         self.dims: int = len(self.grid_shape)
 
         # Backend selection (Task 1.5). "cpu" (default) is the numba fast
-        # path / scipy fallback, byte-identical to the pre-GPU engine.
+        # path, byte-identical to the pre-GPU engine.
         # "gpu" keeps all three field buffers resident on the CUDA device
         # as CuPy arrays for the lifetime of the object — the step path
         # performs no host<->device transfer at all; readback is explicit
         # via p_host(). Restricted to 2D/3D because only the fused kernels
-        # have GPU twins (the 1D scipy fallback has no GPU value).
+        # have GPU twins (the generated 1D / 4D+ kernels have none).
+        # "pstd" steps host arrays with scipy.fft instead of a stencil
+        # (see "Pseudo-spectral backend" above).
         self.backend: str = str(backend)
-        if self.backend not in ("cpu", "gpu"):
-            raise ValueError(f"backend must be 'cpu' or 'gpu', got {backend!r}")
+        if self.backend not in ("cpu", "gpu", "pstd"):
+            raise ValueError(f"backend must be 'cpu', 'gpu' or 'pstd', got {backend!r}")
+        # Spatial stencil (see "Stencils" above). The default is the
+        # hand-written (2d+1)-point engine; the others step through
+        # generated kernels only.
+        self.stencil: str = str(stencil)
+        if self.stencil not in STENCILS:
+            raise ValueError(f"stencil must be one of {sorted(STENCILS)}, got {stencil!r}")
+        order, isotropic = STENCILS[self.stencil]
+        # Field storage precision (see "Storage precision" above). The
+        # 16-bit modes default to, and need, two-buffer mode.
+        self.storage_dtype: str = str(storage_dtype)
+        if self.storage_dtype not in ("float32", "float16", "bfloat16"):
+            raise ValueError(
+                f"storage_dtype must be 'float32', 'float16' or 'bfloat16', got {storage_dtype!r}"
+            )
+        if memory_mode is None:
+            memory_mode = "three_buffer" if self.storage_dtype == "float32" else "two_buffer"
+        self.memory_mode: str = str(memory_mode)
+        if self.memory_mode not in ("three_buffer", "two_buffer"):
+            raise ValueError(
+                f"memory_mode must be 'three_buffer' or 'two_buffer', got {memory_mode!r}"
+            )
+        self._two_buffer: bool = self.memory_mode == "two_buffer"
+        self.active_region: bool = bool(active_region)
+        # Outer-face boundary (see "Boundaries" above).
+        self.boundary: str = str(boundary)
+        if self.boundary not in BOUNDARIES:
+            raise ValueError(f"boundary must be one of {BOUNDARIES}, got {boundary!r}")
+        self.boundary_width: int = int(boundary_width)
+        self.wavespeed_dtype: Optional[str] = None
+        if speeds is not None:
+            if wavespeed_dtype is None:
+                few = len(np.unique(speeds)) <= self._MEDIA_LEVELS
+                wavespeed_dtype = "uint8" if few else "float32"
+            self.wavespeed_dtype = str(wavespeed_dtype)
+            if self.wavespeed_dtype not in ("float32", "uint8"):
+                raise ValueError(
+                    f"wavespeed_dtype must be 'float32' or 'uint8', got {wavespeed_dtype!r}"
+                )
+        elif wavespeed_dtype is not None:
+            raise ValueError("wavespeed_dtype needs a wavespeed_field")
+        self.workers: int = int(workers)
+        if self.workers < 1:
+            raise ValueError(f"workers must be >= 1, got {workers!r}")
+        # NUMA placement (see "First-touch allocation" above): the field
+        # buffers and masks are written first by the kernels' row
+        # partition rather than by this thread.
+        self.first_touch: bool = bool(first_touch)
+        # Which options combine is one table (``_OPTION_RULES``); what
+        # is left below depends on the grid's size.
+        _check_options(
+            _Options(
+                self.backend,
+                self.dims,
+                self.stencil,
+                self.storage_dtype,
+                self._two_buffer,
+                self.active_region,
+                self.boundary,
+                speeds is not None,
+                self.workers,
+                self.first_touch,
+                out_of_core is not None,
+            )
+        )
+        reach = order // 2
+        if min(self.grid_shape) < 2 * reach + 1:
+            raise ValueError(
+                f"stencil={self.stencil!r} needs at least {2 * reach + 1} cells per axis"
+            )
+        if self.boundary in ("pml", "sponge") and (
+            self.boundary_width < 1 or min(self.grid_shape) < 2 * self.boundary_width + 3
+        ):
+            raise ValueError(
+                f"boundary_width={self.boundary_width} needs >= 1 and at least "
+                f"2 * width + 3 cells per axis, got grid_shape={self.grid_shape}"
+            )
+        if self.workers > self.grid_shape[0] and self.backend == "cpu":
+            raise ValueError(
+                f"workers={self.workers} needs at least one row per worker, "
+                f"got grid_shape={self.grid_shape}"
+            )
+
         if self.backend == "gpu":
-            if self.dims not in (2, 3):
-                raise ValueError("backend='gpu' supports 2D and 3D grids only")
             from . import calculate_gpu
 
             if not calculate_gpu.gpu_available():
@@ -120,33 +679,35 @@ class Simulate:
             self._xp = calculate_gpu.cp
         else:
             self._xp = np
-        xp = self._xp
+        # Out-of-core storage (see "Out-of-core grids" above): the
+        # buffers below are files in this directory.
+        self.out_of_core: Optional[Path] = None
+        if out_of_core is not None:
+            self.out_of_core = Path(out_of_core)
+            self.out_of_core.mkdir(parents=True, exist_ok=True)
 
-        # If no timestep provided, derive one from the requested Courant number.
-        # The CFL limit in d dimensions is C_max = 1/sqrt(d); we stay strictly under it.
-        cfl_limit = 1.0 / np.sqrt(self.dims)
-        if timestep is None:
-            chosen_courant = min(courant, 0.95 * cfl_limit)
-            self.timestep = chosen_courant * self.gridstep / self.wavespeed
-        else:
-            self.timestep = float(timestep)
-            actual_courant = self.wavespeed * self.timestep / self.gridstep
-            if actual_courant >= cfl_limit:
-                warnings.warn(
-                    f"CFL violated: Courant={actual_courant:.3f} >= 1/sqrt({self.dims})={cfl_limit:.3f}. "
-                    f"Simulation will be unstable.",
-                    RuntimeWarning,
-                )
+        self.timestep: float = resolve_timestep(
+            self.dims, self.wavespeed, self.gridstep, timestep, courant, self.stencil
+        )
 
         self.drivers: List[Driver] = list(drivers) if drivers is not None else []
         self.sensors: List[Sensor] = list(sensors) if sensors is not None else []
 
         self.time: float = 0.0
         self.step_count: int = 0
-        # xp is numpy on the CPU backend (allocations identical to the
-        # pre-GPU engine) and cupy on the GPU backend (device-resident).
-        self.p_prev: np.ndarray = xp.zeros(self.grid_shape, dtype=np.float32)
-        self.p: np.ndarray = xp.zeros(self.grid_shape, dtype=np.float32)
+        # The 16-bit storage modes keep their decode table: run kernels
+        # read through it, p_host() decodes with it. None means float32
+        # storage.
+        self._storage_lut: Optional[np.ndarray] = None
+        field_dtype = np.float32
+        if self.storage_dtype != "float32":
+            self._storage_lut = storage_decode_table(self.storage_dtype)
+            field_dtype = np.float16 if self.storage_dtype == "float16" else np.uint16
+        # _allocate uses xp: numpy on the CPU backend (allocations
+        # identical to the pre-GPU engine) and cupy on the GPU backend
+        # (device-resident).
+        self.p_prev: np.ndarray = self._allocate(field_dtype, name="buffer_1")
+        self.p: np.ndarray = self._allocate(field_dtype, name="buffer_0")
 
         # Interior Dirichlet obstacles: a boolean mask the same shape as the
         # field. Cells flagged True are forced to p=0 each step before driver
@@ -156,13 +717,56 @@ class Simulate:
         # passing without regenerating the reference). The ``_has_obstacles``
         # flag is an O(1) hot-loop guard: ``mask.any()`` would re-scan the
         # whole grid every step, so we cache it and update it only on mutation.
-        self.obstacle_mask: np.ndarray = xp.zeros(self.grid_shape, dtype=bool)
+        self.obstacle_mask: np.ndarray = self._allocate(bool, name="obstacle_mask")
         self._has_obstacles: bool = False
+        # Kernel-side view of the same geometry: uint8, 1 on fluid cells and
+        # 0 on obstacles, consumed by the masked step kernels so the
+        # rigid-wall zero happens inside the stencil pass. Kept in sync by
+        # the obstacle mutation methods below.
+        self._fluid: np.ndarray = self._allocate(np.uint8, 1, name="fluid")
+        # CPU fluid-span table (see calculate.py, "Fluid-span kernels"):
+        # run-length encoded fluid per row (2D) / (i, j) pencil (3D), so
+        # obstacle rooms only pay for their fluid cells. Rebuilt in full by
+        # set_obstacle_mask and per touched pencil by set_obstacle. With no
+        # obstacles it is one full-width span per pencil (what run() uses).
+        # ``_use_spans`` picks the span kernel over the masked one unless
+        # the geometry is so fragmented that spans average under
+        # ``_MIN_MEAN_SPAN`` cells (then the vectorised masked sweep wins).
+        self._spans: np.ndarray = np.zeros((0, 1, 2), dtype=np.int64)
+        self._n_spans: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._use_spans: bool = False
+        if self.backend == "cpu" and self.dims in (2, 3) and self.stencil == "second_order":
+            self._rebuild_spans()
+        # Wall reflection (see "Wall reflection" above): uint8 material
+        # codes per cell into a float32 table (code 0 is pressure-release,
+        # NaN), or None while every wall is pressure-release. ``_walls``
+        # is the kernels' (wall_ptr, wall_pos, wall_coef) table derived
+        # from it, empty without reflective walls.
+        self._wall_code: Optional[np.ndarray] = None
+        self._wall_table: np.ndarray = np.full(1, np.nan, dtype=np.float32)
+        self._walls: Tuple[np.ndarray, np.ndarray, np.ndarray] = (
+            np.zeros(int(np.prod(self.grid_shape[:-1])) + 1, dtype=np.int64),
+            np.zeros(0, dtype=np.int64),
+            np.zeros((0, 3), dtype=np.float32),
+        )
+        self._has_walls: bool = False
+
+        # Active-region box (see calculate.py, "Active-region box"): per
+        # axis, the half-open range of cells that may be nonzero in any
+        # field buffer. Grown in place by the span and run kernels. Without
+        # active-region tracking it stays the full grid, so those kernels
+        # sweep every fluid cell; with it, it starts empty (fields at rest).
+        self._box: np.ndarray = np.zeros((self.dims, 2), dtype=np.int64)
+        if not self.active_region:
+            self._box[:, 1] = self.grid_shape
 
         # Pre-allocated next-step buffer. Rotated each step rather than
         # allocated each step, eliminating per-step heap traffic. Kept private
         # to avoid expanding the public attribute surface tested by the gate.
-        self._p_next: np.ndarray = xp.zeros(self.grid_shape, dtype=np.float32)
+        # Not allocated in two-buffer mode, where p_prev is updated in place.
+        self._p_next: Optional[np.ndarray] = (
+            None if self._two_buffer else self._allocate(np.float32, name="buffer_2")
+        )
 
         # Cached scalar coefficient for the fused 2D kernel:
         #   coeff = (c * dt / dx) ** 2
@@ -170,35 +774,200 @@ class Simulate:
         # but precomputed once so the inner kernel takes a plain float32.
         self._coeff: np.float32 = np.float32((self.wavespeed * self.timestep / self.gridstep) ** 2)
 
+        # Worker processes of a decomposed grid (see "Domain
+        # decomposition" above). Their shared buffers replace the ones
+        # allocated above, in the same rotation order.
+        self._slabs: Optional[SlabWorkers] = None
+        if self.workers > 1 and self.backend == "cpu":
+            self._slabs = SlabWorkers(self.grid_shape, self.workers, self._coeff)
+            self.p, self.p_prev, self._p_next = self._slabs.buffers
+            self._fluid = self._slabs.fluid
+        # Tile streamer of an out-of-core grid, with its working-set budget.
+        self._tiles: Optional[TileStream] = None
+        if self.out_of_core is not None:
+            memory = self._OUT_OF_CORE_BYTES if out_of_core_memory is None else out_of_core_memory
+            self._tiles = TileStream(self.grid_shape, int(memory))
+
         # Pre-bind the active fused kernel as a plain attribute. Picked once
         # at construction by dimensionality:
         #   * 2D -> fused_leapfrog_step_2d (5-point stencil)
         #   * 3D -> fused_leapfrog_step_3d (7-point stencil)
-        #   * other -> None (1D falls through to the legacy scipy path)
+        #   * other -> generated by leapfrog_step_kernel (1D, 4D, ...)
+        #   * stencil other than second_order -> generated, any dims
         # Assigning to a local at the top of step() collapses the chained
         # ``self._kernel(...)`` lookup into a single load-fast call.
         if self.backend == "gpu":
-            # GPU twins share the CPU kernels' exact call signature
-            # (p, p_prev, p_next, coeff), so step() below is backend-
-            # agnostic: same buffer rotation, same obstacle scrub, same
-            # driver-injection ordering — on device arrays.
+            # GPU twins share the CPU kernels' exact call signatures
+            # ((p, p_prev, p_next, coeff) and the masked variant's extra
+            # ``fluid``), so step() below is backend-agnostic: same buffer
+            # rotation, same obstacle handling, same driver-injection
+            # ordering — on device arrays.
             from . import calculate_gpu
 
+            # No span kernel on the GPU: one thread per cell gains
+            # nothing from skipping cells, so obstacles use the masked twin.
+            self._spans_kernel = None
             if self.dims == 2:
                 self._kernel = calculate_gpu.fused_leapfrog_step_2d_gpu
+                self._masked_kernel = calculate_gpu.fused_leapfrog_step_masked_2d_gpu
             else:
                 self._kernel = calculate_gpu.fused_leapfrog_step_3d_gpu
+                self._masked_kernel = calculate_gpu.fused_leapfrog_step_masked_3d_gpu
+        elif self.backend == "pstd":
+            # No stencil kernels: step() hands the fields to the
+            # spectral propagator bound below.
+            self._kernel = None
+            self._masked_kernel = None
+            self._spans_kernel = None
+        elif self.stencil != "second_order":
+            # Wider or denser stencils have no span, run or blocked
+            # kernels: step() takes the generated plain / masked pair.
+            self._kernel = leapfrog_step_kernel(self.dims, order, isotropic=isotropic)
+            self._masked_kernel = leapfrog_step_kernel(self.dims, order, True, isotropic)
+            self._spans_kernel = None
         elif self.dims == 2:
             self._kernel = fused_leapfrog_step_2d
+            self._masked_kernel = fused_leapfrog_step_masked_2d
+            self._spans_kernel = fused_leapfrog_step_spans_2d
         elif self.dims == 3:
             self._kernel = fused_leapfrog_step_3d
+            self._masked_kernel = fused_leapfrog_step_masked_3d
+            self._spans_kernel = fused_leapfrog_step_spans_3d
+            if self._slabs is not None:
+                # The workers keep the span tables of their own slabs.
+                self._spans_kernel = None
         else:
-            self._kernel = None
+            # Same fused, zero-allocation step as 2D/3D, generated for
+            # this dimensionality. No span table, so obstacles always
+            # take the masked twin.
+            self._kernel = leapfrog_step_kernel(self.dims)
+            self._masked_kernel = leapfrog_step_kernel(self.dims, masked=True)
+            self._spans_kernel = None
+        if self.backend == "cpu":
+            # step() kernels run at the untuned heuristic thread count.
+            set_default_threads()
+
+        # Absorbing-boundary step kernel, used by step() in place of all
+        # the above (it zeroes obstacles itself when told to). The PML
+        # keeps two auxiliary fields per axis (psi on faces, zeta on
+        # cells), each over the two slabs of width + 1 cells that hold
+        # that axis' layers, updated in place.
+        self._boundary_kernel = None
+        self._mur: np.float32 = np.float32(0.0)
+        self._pml_coeffs: List[np.ndarray] = []
+        self._psi: List[np.ndarray] = []
+        self._zeta: List[np.ndarray] = []
+        courant_number = self.wavespeed * self.timestep / self.gridstep
+        # Pseudo-spectral step (see "Pseudo-spectral backend" above),
+        # used by step() in place of every kernel. "sponge" is its
+        # absorbing layer, the sum of one damping profile per axis over
+        # the interior.
+        self._pstd: Optional[SpectralPropagator] = None
+        if self.backend == "pstd":
+            damping = None
+            if self.boundary == "sponge":
+                damping = np.zeros([n - 2 for n in self.grid_shape])
+                for axis, n in enumerate(self.grid_shape):
+                    profile = sponge_coefficients(n, self.boundary_width, courant_number)
+                    shape = [1] * self.dims
+                    shape[axis] = n - 2
+                    damping = damping + profile[1:-1].reshape(shape)
+            self._pstd = SpectralPropagator(
+                self.grid_shape,
+                self.wavespeed,
+                self.timestep,
+                self.gridstep,
+                self.workers,
+                damping,
+            )
+        elif self.boundary == "mur":
+            self._boundary_kernel = (
+                fused_leapfrog_step_mur_2d if self.dims == 2 else fused_leapfrog_step_mur_3d
+            )
+            self._mur = np.float32(mur_coefficient(courant_number))
+        elif self.boundary == "pml":
+            self._boundary_kernel = (
+                fused_leapfrog_step_pml_2d if self.dims == 2 else fused_leapfrog_step_pml_3d
+            )
+            width = self.boundary_width
+            for axis, n in enumerate(self.grid_shape):
+                self._pml_coeffs.append(pml_coefficients(n, width, courant_number))
+                slab = self.grid_shape[:axis] + (2 * (width + 1),) + self.grid_shape[axis + 1 :]
+                self._psi.append(np.zeros(slab, dtype=np.float32))
+                self._zeta.append(np.zeros(slab, dtype=np.float32))
+
+        # Heterogeneous-medium step kernel, used by step() in place of
+        # the above (it zeroes obstacles itself when told to), and its
+        # coefficient operands: the float32 grid, or uint8 codes and
+        # their table.
+        self._media_kernel = None
+        self._media: Tuple[np.ndarray, ...] = ()
+        if speeds is not None:
+            self._media = self._media_coefficients(speeds)
+            if self.wavespeed_dtype == "uint8":
+                self._media_kernel = (
+                    fused_leapfrog_step_media_u8_2d
+                    if self.dims == 2
+                    else fused_leapfrog_step_media_u8_3d
+                )
+            else:
+                self._media_kernel = (
+                    fused_leapfrog_step_media_2d if self.dims == 2 else fused_leapfrog_step_media_3d
+                )
+
+        # Multi-step twin of self._kernel used by run(). Only the numba
+        # CPU kernels have one; GPU, 1D, the non-default stencils, the
+        # absorbing boundaries and heterogeneous media fall back to a
+        # step() loop, a decomposed grid runs in its workers and an
+        # out-of-core grid through its tile streamer. Two-buffer mode binds the in-place step
+        # and run kernels instead, and 16-bit storage its own run kernel
+        # (step() calls run(1)).
+        self._inplace_kernel = None
+        compiled_loop = (
+            self.backend == "cpu"
+            and self.stencil == "second_order"
+            and self.boundary == "dirichlet"
+            and self._media_kernel is None
+            and self._slabs is None
+            and self._tiles is None
+        )
+        if compiled_loop and self.dims == 2:
+            self._run_kernel = fused_leapfrog_run_2d
+            if self._two_buffer:
+                self._inplace_kernel = fused_leapfrog_step_inplace_2d
+                self._run_kernel = fused_leapfrog_run_inplace_2d
+            if self._storage_lut is not None:
+                self._run_kernel = fused_leapfrog_run_u16_2d
+        elif compiled_loop and self.dims == 3:
+            self._run_kernel = fused_leapfrog_run_3d
+            if self._two_buffer:
+                self._inplace_kernel = fused_leapfrog_step_inplace_3d
+                self._run_kernel = fused_leapfrog_run_inplace_3d
+            if self._storage_lut is not None:
+                self._run_kernel = fused_leapfrog_run_u16_3d
+        else:
+            self._run_kernel = None
+        # Temporally blocked twin of the run kernel (run_blocked()). It
+        # covers both memory modes but not 16-bit storage.
+        self._tiled_kernel = None
+        if self._run_kernel is not None and self._storage_lut is None:
+            self._tiled_kernel = (
+                fused_leapfrog_run_tiled_2d if self.dims == 2 else fused_leapfrog_run_tiled_3d
+            )
+
+        # Launch configuration of the compiled run loops (see "Autotuning"
+        # above): thread count, serial vs prange build, temporal blocking.
+        # Resolved on the first compiled call; the defaults until then.
+        # None reads a tuned configuration from the cache if there is
+        # one, True also measures a missing one, False never looks.
+        self._autotune: Optional[bool] = None if autotune is None else bool(autotune)
+        self._config: Optional[KernelConfig] = None
+        if self._autotune is False or self._run_kernel is None:
+            self._config = default_config()
 
-        # Cached fast-path predicate. The 2D AND 3D paths share the same
-        # surrounding plumbing — they only differ in which @njit kernel
-        # they call, which is already encoded in self._kernel. The 1D path
-        # still uses the scipy.ndimage.laplace fallback.
+        # Cached fast-path predicate, kept for external code that read
+        # it. Every dimensionality now shares the same plumbing and only
+        # differs in which kernel self._kernel holds, so it is always True.
         self._fast_path: bool = self._kernel is not None
         # Kept for backwards compatibility with any external code that
         # referenced ``_is_2d`` directly. Value remains correct.
@@ -213,6 +982,19 @@ class Simulate:
         # loop, where the original guard runs unchanged.
         self._fast_driver: Optional[Driver] = None
         self._fast_driver_pos: Optional[Tuple[int, ...]] = None
+        # step()'s source table (see "Source tables" above): clock values
+        # of its rows, the driver list it was built from, the
+        # (rows, n_active) float32 values, the in-bounds
+        # driver cells they belong to, and the next row to use. A None
+        # ``_src_times`` means "rebuild on the next step".
+        self._src_times: Optional[np.ndarray] = None
+        self._src_drivers: Optional[Tuple[Driver, ...]] = None
+        self._src_values: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self._src_pos: List[Tuple[int, ...]] = []
+        # Driver cells that lie on an obstacle. The span kernel never
+        # writes obstacle cells, so these are zeroed before injection.
+        self._src_solid: List[Tuple[int, ...]] = []
+        self._src_row: int = 0
         self._refresh_driver_cache()
 
     # ----- Driver mutation ---------------------------------------------- #
@@ -222,7 +1004,9 @@ class Simulate:
 
         Called by ``__init__`` and by every driver-list mutation method.
         Cheap: one length check and at most one bounds check on the position.
+        Also drops step()'s source table, which is keyed on the driver list.
         """
+        self._src_times = None
         self._fast_driver = None
         self._fast_driver_pos = None
         if len(self.drivers) == 1:
@@ -246,6 +1030,28 @@ class Simulate:
         self.drivers = list(drivers)
         self._refresh_driver_cache()
 
+    def _allocate(self, dtype, value: int = 0, name: str = "") -> np.ndarray:
+        """A ``grid_shape`` array of ``dtype`` with every byte ``value``.
+
+        ``xp.zeros`` / ``xp.ones``; with ``first_touch=True`` written
+        first by the kernels' row partition (``first_touch_array``); with
+        ``out_of_core`` the file ``name.dat`` in that directory.
+        """
+        if self.out_of_core is not None:
+            return memmap_array(self.out_of_core, name, self.grid_shape, dtype, value)
+        if self.first_touch:
+            return first_touch_array(self.grid_shape, dtype, value)
+        if value:
+            return self._xp.ones(self.grid_shape, dtype=dtype)
+        return self._xp.zeros(self.grid_shape, dtype=dtype)
+
+    def _field_buffers(self) -> List[np.ndarray]:
+        """The allocated field buffers: ``p``, ``p_prev`` and, unless in
+        two-buffer mode, the rotation scratch ``_p_next``."""
+        if self._p_next is None:
+            return [self.p, self.p_prev]
+        return [self.p, self.p_prev, self._p_next]
+
     # ----- Obstacle mutation -------------------------------------------- #
 
     def set_obstacle(
@@ -260,12 +1066,14 @@ class Simulate:
         coordinate one cell past the edge.
 
         When marking new obstacles, also zero the existing field at those
-        cells in ``p``, ``p_prev`` and ``_p_next``. Otherwise stale pressure
-        from before the cell was an obstacle would leak into one final
-        stencil read before the next ``step()`` scrubs it.
+        cells in ``p``, ``p_prev`` and (if allocated) ``_p_next``.
+        Otherwise stale pressure from before the cell was an obstacle
+        would leak into one final stencil read before the next ``step()``
+        scrubs it.
         """
         shape = self.grid_shape
         v = bool(value)
+        touched = set()
         for pos in positions:
             tpos = tuple(int(c) for c in pos)
             if len(tpos) != len(shape):
@@ -273,11 +1081,13 @@ class Simulate:
             if not all(0 <= c < s for c, s in zip(tpos, shape)):
                 continue
             self.obstacle_mask[tpos] = v
+            self._fluid[tpos] = 0 if v else 1
+            touched.add(tpos[:-1])
             if v:
-                self.p[tpos] = 0.0
-                self.p_prev[tpos] = 0.0
-                self._p_next[tpos] = 0.0
+                for buf in self._field_buffers():
+                    buf[tpos] = 0.0
         self._has_obstacles = bool(self.obstacle_mask.any())
+        self._geometry_changed(touched)
 
     def set_obstacle_mask(self, mask: np.ndarray) -> None:
         """Replace the whole obstacle mask in one operation.
@@ -293,22 +1103,127 @@ class Simulate:
         m = xp.asarray(mask, dtype=bool)
         if m.shape != self.grid_shape:
             raise ValueError(f"mask shape {m.shape} != grid shape {self.grid_shape}")
-        self.obstacle_mask = m
+        if self._slabs is None and not self.first_touch and self.out_of_core is None:
+            self.obstacle_mask = m
+            self._fluid = xp.ascontiguousarray(~m, dtype=np.uint8)
+        else:
+            # Update in place: the workers map ``_fluid``, first-touched
+            # pages keep their placement, and out-of-core ones are files.
+            self.obstacle_mask[...] = m
+            self._fluid[...] = ~m
         zero = np.float32(0.0)
-        self.p[m] = zero
-        self.p_prev[m] = zero
-        self._p_next[m] = zero
+        for buf in self._field_buffers():
+            buf[m] = zero
         self._has_obstacles = bool(m.any())
+        self._geometry_changed(None)
 
     def clear_obstacles(self) -> None:
         """Remove every obstacle. Field is left untouched."""
         self.obstacle_mask.fill(False)
+        self._fluid.fill(1)
         self._has_obstacles = False
+        self._geometry_changed(None)
+
+    def _geometry_changed(self, pencils: Optional[Iterable[Tuple[int, ...]]]) -> None:
+        """Refresh geometry-derived caches after an obstacle mutation.
+
+        ``pencils`` lists the leading indices (``(i,)`` in 2D, ``(i, j)``
+        in 3D) of the rows whose cells changed, or None for "all". The
+        span table is only kept on the CPU 2D/3D path. The source table is
+        dropped because its list of drivers-on-obstacles may have changed.
+        """
+        self._src_times = None
+        if self._slabs is not None:
+            self._slabs.geometry_changed()
+        if self._spans_kernel is not None:
+            if pencils is None:
+                self._rebuild_spans()
+            else:
+                self._rebuild_spans(sorted(pencils))
+        if self._wall_code is not None:
+            self._rebuild_walls()
+
+    def set_wall_reflection(self, reflection) -> None:
+        """Set the normal-incidence reflection coefficient of the walls.
+
+        ``reflection`` is a scalar or an array of shape ``grid_shape``,
+        read on solid cells (obstacles and the outer layer): values in
+        ``[0, 1]`` make a locally reacting wall (1 rigid, 0 absorbing
+        at normal incidence) and NaN the default pressure-release wall.
+        At most 255 distinct values; quantise finer maps first. Passing
+        NaN everywhere restores the default engine.
+        """
+        if (
+            self._spans_kernel is None
+            or self._two_buffer
+            or self.boundary != "dirichlet"
+            or self._media_kernel is not None
+            or self._tiles is not None
+        ):
+            raise ValueError(
+                "set_wall_reflection requires backend='cpu', a 2D or 3D grid, the "
+                "second-order stencil, three-buffer float32 storage, boundary='dirichlet', "
+                "no wavespeed_field, workers=1 and in-memory buffers"
+            )
+        r = np.broadcast_to(np.asarray(reflection, dtype=np.float32), self.grid_shape)
+        finite = ~np.isnan(r)
+        values, codes = np.unique(r[finite], return_inverse=True)
+        if np.any((values < 0.0) | (values > 1.0)):
+            raise ValueError("wall reflection must lie in [0, 1] (or be NaN)")
+        if len(values) > 255:
+            raise ValueError(f"at most 255 distinct wall reflections, got {len(values)}")
+        self._wall_table = np.concatenate([[np.nan], values]).astype(np.float32)
+        self._wall_code = None
+        if len(values):
+            self._wall_code = np.zeros(self.grid_shape, dtype=np.uint8)
+            self._wall_code[finite] = codes.reshape(-1) + 1
+        self._rebuild_walls()
+
+    def _rebuild_walls(self) -> None:
+        """Recompute the impedance-wall table from the geometry and the codes."""
+        if self._wall_code is None:
+            self._walls = (
+                np.zeros_like(self._walls[0]),
+                np.zeros(0, dtype=np.int64),
+                np.zeros((0, 3), dtype=np.float32),
+            )
+        else:
+            courant = self.wavespeed * self.timestep / self.gridstep
+            self._walls = impedance_walls(self._fluid, self._wall_code, self._wall_table, courant)
+        self._has_walls = len(self._walls[1]) > 0
+
+    def _rebuild_spans(self, pencils: Optional[Sequence[Tuple[int, ...]]] = None) -> None:
+        """Recompute the fluid-span table, in full or for ``pencils`` only.
+
+        Incremental updates re-encode just the touched pencils; if one of
+        them now needs more spans than the table is wide, the table is
+        widened (existing rows copied) rather than rebuilt.
+        """
+        rows = self._fluid.reshape(-1, self.grid_shape[-1])
+        if pencils is None:
+            self._spans, self._n_spans = fluid_spans(rows)
+        else:
+            if not pencils:
+                return
+            ids = np.ravel_multi_index(tuple(np.asarray(pencils).T), self.grid_shape[:-1])
+            sub_spans, sub_counts = fluid_spans(rows[ids])
+            width = sub_spans.shape[1]
+            if width > self._spans.shape[1]:
+                grown = np.zeros((self._spans.shape[0], width, 2), dtype=np.int64)
+                grown[:, : self._spans.shape[1]] = self._spans
+                self._spans = grown
+            self._spans[ids] = 0
+            self._spans[ids, :width] = sub_spans
+            self._n_spans[ids] = sub_counts
+        total = int(self._n_spans.sum())
+        fluid_cells = int((self._spans[..., 1] - self._spans[..., 0]).sum())
+        self._use_spans = total == 0 or fluid_cells >= self._MIN_MEAN_SPAN * total
 
     def p_host(self) -> np.ndarray:
         """Current pressure field as a NumPy array.
 
-        CPU backend: returns the live ``self.p`` (no copy). GPU backend:
+        CPU and PSTD backends: returns the live ``self.p`` (no copy), or a
+        float32 decode of it with 16-bit ``storage_dtype``. GPU backend:
         one device->host transfer returning a fresh host copy. This is
         the intended readback point for backend-agnostic consumers —
         per-step device readbacks are exactly the transfer pattern the
@@ -319,17 +1234,540 @@ class Simulate:
             from . import calculate_gpu
 
             return calculate_gpu.cp.asnumpy(self.p)
+        if self._storage_lut is not None:
+            return self._storage_lut[self.p.view(np.uint16)]
         return self.p
 
+    def observe_active_region(self) -> None:
+        """Reset the active-region box to the nonzero cells of the fields.
+
+        Only needed with ``active_region=True``, after writing ``p`` or
+        ``p_prev`` directly. The kernels cannot see such writes, so values
+        outside the tracked box would never propagate.
+        """
+        nonzero = np.zeros(self.grid_shape, dtype=bool)
+        for buf in self._field_buffers():
+            nonzero |= buf != 0
+        cells = np.argwhere(nonzero)
+        self._box[:] = 0
+        if cells.size:
+            self._box[:, 0] = cells.min(axis=0)
+            self._box[:, 1] = cells.max(axis=0) + 1
+
     def reset(self) -> None:
         """Zero pressure fields and the clock; preserve geometry and drivers."""
-        self.p_prev.fill(0.0)
-        self.p.fill(0.0)
         # Also zero the rotation buffer so a stale slot cannot leak into the
         # next call after the three-way pointer rotation in step().
-        self._p_next.fill(0.0)
+        if self.active_region:
+            # Everything outside the box is already zero in all three
+            # buffers, so only the box needs clearing.
+            box = self._box
+            if (box[:, 1] > box[:, 0]).all():
+                region = tuple(slice(lo, hi) for lo, hi in box)
+                for buf in self._field_buffers():
+                    buf[region] = 0.0
+            box[:] = 0
+        else:
+            for buf in self._field_buffers():
+                buf.fill(0.0)
+        for buf in self._psi + self._zeta:
+            buf.fill(0.0)
         self.time = 0.0
         self.step_count = 0
+        self._src_times = None
+
+    def _media_coefficients(self, speeds: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Per-cell ``(c dt / dx) ** 2`` for ``speeds``, in the ``wavespeed_dtype`` layout.
+
+        float32: ``(coeff,)``, a grid. uint8: ``(code, lut)``, with the
+        distinct speeds in the table if there are at most
+        ``_MEDIA_LEVELS`` of them, else the field quantised to that many
+        evenly spaced speeds between its minimum and maximum.
+        """
+        scale = self.timestep / self.gridstep
+        if self.wavespeed_dtype == "float32":
+            return (np.ascontiguousarray((speeds * scale) ** 2, dtype=np.float32),)
+        levels, code = np.unique(speeds, return_inverse=True)
+        if len(levels) > self._MEDIA_LEVELS:
+            lo, hi = float(levels[0]), float(levels[-1])
+            levels = np.linspace(lo, hi, self._MEDIA_LEVELS)
+            code = np.rint((speeds - lo) * ((self._MEDIA_LEVELS - 1) / (hi - lo)))
+        code = np.ascontiguousarray(code.reshape(self.grid_shape), dtype=np.uint8)
+        return code, ((levels * scale) ** 2).astype(np.float32)
+
+    def _boundary_operands(self) -> Tuple:
+        """Trailing arguments of ``self._boundary_kernel`` for this step."""
+        if self.boundary == "mur":
+            return (self._mur,)
+        pairs = [buf for pair in zip(self._psi, self._zeta) for buf in pair]
+        return (*self._pml_coeffs, *pairs)
+
+    def _step_times(self, n_steps: int) -> np.ndarray:
+        """Clock values seen by the next ``n_steps`` steps, plus the final time.
+
+        Returns ``n_steps + 1`` float64 values. ``np.cumsum`` accumulates
+        sequentially, so entry ``k`` is bit-identical to the ``self.time``
+        that ``k`` successive ``step()`` calls would have produced.
+        """
+        increments = np.full(n_steps + 1, self.timestep, dtype=np.float64)
+        increments[0] = self.time
+        return np.cumsum(increments)
+
+    def _driver_table(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Tabulate in-bounds drivers for the injection times ``times``.
+
+        Returns ``(driver_idx, source)``: an ``(n_drivers, dims)`` int64 index
+        list and the ``(len(times), n_drivers)`` float32 values that
+        ``step()`` would inject. Out-of-bounds drivers are dropped, exactly
+        as the generic injection loop skips them.
+        """
+        grid_shape = self.grid_shape
+        active = [
+            d
+            for d in self.drivers
+            if all(0 <= pos < size for pos, size in zip(d.position, grid_shape))
+        ]
+        driver_idx = np.asarray(
+            [tuple(int(c) for c in d.position) for d in active], dtype=np.int64
+        ).reshape(len(active), self.dims)
+        source = np.empty((len(times), len(active)), dtype=np.float32)
+        for d_idx, driver in enumerate(active):
+            source[:, d_idx] = driver.sample(times)
+        return driver_idx, source
+
+    def _fill_source_table(self) -> None:
+        """Tabulate the next ``_SOURCE_CHUNK`` steps of driver values for step()."""
+        drivers = tuple(self.drivers)
+        if drivers != self._src_drivers:
+            # Also catches edits of the list itself (``sim.drivers.append``),
+            # which bypass the mutation methods and their cache refresh.
+            self._refresh_driver_cache()
+            self._src_drivers = drivers
+        times = self._step_times(self._SOURCE_CHUNK)
+        driver_idx, values = self._driver_table(times[:-1])
+        if self._pstd is not None:
+            # The spectral step takes each step's samples with their
+            # neighbours in time (pstd.source_values).
+            _, ends = self._driver_table(np.asarray([times[0] - self.timestep, times[-1]]))
+            values = source_values(np.concatenate([ends[:1], values, ends[1:]]))
+        self._src_times = times
+        self._src_values = values
+        self._src_pos = [tuple(int(c) for c in row) for row in driver_idx]
+        solid = (
+            [pos for pos in self._src_pos if self.obstacle_mask[pos]] if self._has_obstacles else []
+        )
+        if self._has_obstacles:
+            # A removed driver's last injections sit in an obstacle cell
+            # the span kernel never rewrites, so its cell stays on the
+            # list: zeroing p_next on an obstacle is what every kernel does.
+            solid += [
+                pos for pos in self._src_solid if pos not in solid and self.obstacle_mask[pos]
+            ]
+        self._src_solid = solid
+        if self._pstd is not None and self._src_solid:
+            # A filtered source is not confined to its cell, so zeroing
+            # the obstacle after it would still leak its side lobes:
+            # drivers on obstacles are silenced instead.
+            solid = [d for d, pos in enumerate(self._src_pos) if pos in self._src_solid]
+            self._src_values[:, solid] = 0.0
+        if self._pstd is not None:
+            # Driver cells rarely move, so their spectra outlive the table.
+            self._pstd.set_sources(self._src_pos)
+        self._src_row = 0
+        if self.active_region:
+            # Drivers enter the box for the whole chunk as soon as any of
+            # their values in it is nonzero. That is a little early, but
+            # safe, and it keeps per-step bookkeeping out of step().
+            live = driver_idx[(values != 0).any(axis=0)]
+            if live.size:
+                box = self._box
+                if (box[:, 1] > box[:, 0]).all():
+                    box[:, 0] = np.minimum(box[:, 0], live.min(axis=0))
+                    box[:, 1] = np.maximum(box[:, 1], live.max(axis=0) + 1)
+                else:
+                    box[:, 0] = live.min(axis=0)
+                    box[:, 1] = live.max(axis=0) + 1
+
+    def run(self, n_steps: int) -> None:
+        """Advance the simulation by ``n_steps`` timesteps.
+
+        Same result as ``n_steps`` calls to ``step()``: same kernel body,
+        same walls -> obstacles -> drivers ordering, same clock and buffer
+        rotation. On the CPU backend in 2D/3D the loop runs inside one
+        compiled call (``fused_leapfrog_run_{2d,3d}``), and on a
+        decomposed grid inside the workers; elsewhere it simply calls
+        ``step()`` repeatedly.
+        """
+        n = int(n_steps)
+        if n <= 0:
+            return
+        if self._slabs is not None:
+            self._run_slabs(n)
+            return
+        if self._tiles is not None:
+            self._run_tiles(n)
+            return
+        if self._run_kernel is None:
+            for _ in range(n):
+                self.step()
+            return
+        self._run_compiled(n, np.zeros(0, dtype=np.int64), 1, np.zeros((0, 0), dtype=np.float32))
+
+    def run_blocked(self, n_steps: int, time_block: Optional[int] = None) -> None:
+        """Advance ``n_steps`` timesteps, ``time_block`` steps per pass over memory.
+
+        Same result as ``run(n_steps)``, bit for bit. Drivers, obstacles,
+        walls and the active region keep their per-step semantics. Axis 0
+        is cut into slabs sized so that ``time_block + 2`` of them per
+        field buffer fit in ``_TILE_CACHE_BYTES``, and a wavefront over
+        them advances each slab ``time_block`` steps before moving on
+        (see calculate.py, "Temporally blocked loops"). Without a
+        blocked kernel (GPU, 1D, 16-bit storage) this is ``run``. When
+        ``time_block`` is omitted and autotuning picked a blocked
+        configuration, its block length and slab budget are used.
+        """
+        n = int(n_steps)
+        block = self._TIME_BLOCK if time_block is None else int(time_block)
+        if block < 1:
+            raise ValueError("time_block must be >= 1")
+        if n <= 0:
+            return
+        if self._tiled_kernel is None:
+            self.run(n)
+            return
+        tiling = self._tiling(block, self._TILE_CACHE_BYTES)
+        if time_block is None:
+            config = self._kernel_config()
+            if config.time_block > 1:
+                tiling = self._tiling(config.time_block, config.tile_bytes)
+        self._run_compiled(
+            n,
+            np.zeros(0, dtype=np.int64),
+            1,
+            np.zeros((0, 0), dtype=np.float32),
+            tiling=tiling,
+        )
+
+    def _run_slabs(self, n: int) -> None:
+        """Advance a decomposed grid ``n`` steps in its workers."""
+        times = self._step_times(n)
+        driver_idx, source = self._driver_table(times[:n])
+        self._slabs.run(n, driver_idx, source)
+        # The workers rotated their references n times; replay it here.
+        for _ in range(n % 3):
+            self.p_prev, self.p, self._p_next = self.p, self._p_next, self.p_prev
+        self.time = float(times[n])
+        self.step_count += n
+
+    def _run_tiles(self, n: int) -> None:
+        """Advance an out-of-core grid ``n`` steps through its tile streamer."""
+        times = self._step_times(n)
+        driver_idx, source = self._driver_table(times[:n])
+        driver_solid = (self._fluid[tuple(driver_idx.T)] == 0).astype(np.uint8)
+        roles = []
+        p, p_prev, p_next = self.p, self.p_prev, self._p_next
+        for _ in range(n):
+            roles.append((p, p_prev, p_next))
+            p_prev, p, p_next = p, p_next, p_prev
+        self._tiles.run(
+            roles, self._coeff, self._spans, self._n_spans, driver_idx, driver_solid, source
+        )
+        self.p, self.p_prev, self._p_next = p, p_prev, p_next
+        self.time = float(times[n])
+        self.step_count += n
+
+    def _step_pstd(self) -> None:
+        """``step()`` of the pseudo-spectral backend.
+
+        Same source table, clock and three-way rotation as the kernel
+        path, but the drivers go into the propagator, which filters them
+        in the sine basis, and it zeroes the walls and obstacles itself.
+        """
+        time = self.time
+        row = self._src_row
+        src_times = self._src_times
+        if (
+            src_times is None
+            or row >= self._SOURCE_CHUNK
+            or src_times[row] != time
+            or tuple(self.drivers) != self._src_drivers
+        ):
+            self._fill_source_table()
+            row = 0
+        self._src_row = row + 1
+        p, p_prev, p_next = self.p, self.p_prev, self._p_next
+        self._pstd.step(
+            p,
+            p_prev,
+            p_next,
+            self.obstacle_mask if self._has_obstacles else None,
+            self._src_values[row],
+        )
+        self.p_prev, self.p, self._p_next = p, p_next, p_prev
+        self.time = time + self.timestep
+        self.step_count += 1
+
+    def close(self) -> None:
+        """Release what a decomposed or out-of-core grid holds (no-op otherwise).
+
+        Stops the worker processes, or the I/O thread after flushing the
+        files. The fields stay readable; stepping afterwards raises.
+        """
+        if self._slabs is not None:
+            self._slabs.close()
+        if self._tiles is not None:
+            self._tiles.close()
+            for buf in self._field_buffers() + [self.obstacle_mask, self._fluid]:
+                buf.flush()
+
+    # ----- Snapshots ----------------------------------------------------- #
+
+    # Constructor settings a snapshot records; load_state passes them back.
+    _STATE_SETTINGS: Tuple[str, ...] = (
+        "wavespeed",
+        "timestep",
+        "gridstep",
+        "active_region",
+        "memory_mode",
+        "storage_dtype",
+        "stencil",
+        "boundary",
+        "boundary_width",
+    )
+
+    def save_state(self, path) -> None:
+        """Write the fields, geometry, drivers, sensors and clock to ``path``.
+
+        One uncompressed file whose arrays start on page boundaries
+        (``snapshot.py``), so that ``load_state`` maps them back
+        instead of reading them. Not supported with a wavespeed field
+        or wall reflection.
+        """
+        if self._media_kernel is not None or self._has_walls:
+            raise ValueError("save_state does not support wavespeed_field or wall reflection")
+        host = np.asarray
+        if self.backend == "gpu":
+            from . import calculate_gpu
+
+            host = calculate_gpu.cp.asnumpy
+        header = {name: getattr(self, name) for name in self._STATE_SETTINGS}
+        header.update(
+            grid_shape=list(self.grid_shape),
+            backend=self.backend,
+            time=self.time,
+            step_count=self.step_count,
+        )
+        arrays = {
+            "p": host(self.p),
+            "p_prev": host(self.p_prev),
+            "obstacle_mask": host(self.obstacle_mask),
+        }
+        for axis, (psi, zeta) in enumerate(zip(self._psi, self._zeta)):
+            arrays[f"psi_{axis}"] = psi
+            arrays[f"zeta_{axis}"] = zeta
+        write_state(Path(path), header, (self.drivers, self.sensors), arrays)
+
+    @classmethod
+    def load_state(cls, path, backend: Optional[str] = None, **kwargs) -> "Simulate":
+        """A ``Simulate`` resumed from a ``save_state`` file.
+
+        ``backend`` defaults to the one saved, so a CPU snapshot can
+        resume on the GPU and back. ``kwargs`` are further constructor
+        arguments (``autotune``, ``workers``, ``first_touch``,
+        ``out_of_core``, ...); the recorded settings cannot be changed.
+        On the CPU with ordinary buffers, ``p`` and ``p_prev`` are
+        copy-on-write maps of the file, so nothing is read until
+        touched; otherwise they are copied into the allocated buffers.
+        The file holds pickled drivers: load only trusted snapshots.
+        """
+        header, (drivers, sensors), arrays = read_state(Path(path))
+        fixed = sorted(set(kwargs) & set(cls._STATE_SETTINGS + ("grid_shape",)))
+        if fixed:
+            raise ValueError(f"load_state cannot override the recorded {fixed}")
+        sim = cls(
+            grid_shape=tuple(header["grid_shape"]),
+            drivers=drivers,
+            sensors=sensors,
+            backend=header["backend"] if backend is None else backend,
+            **{name: header[name] for name in cls._STATE_SETTINGS},
+            **kwargs,
+        )
+        # The constructor already built the obstacle-free geometry.
+        if arrays["obstacle_mask"].any():
+            sim.set_obstacle_mask(arrays["obstacle_mask"])
+        if (
+            sim.backend == "cpu"
+            and sim._slabs is None
+            and sim._tiles is None
+            and not sim.first_touch
+        ):
+            sim.p, sim.p_prev = arrays["p"], arrays["p_prev"]
+        else:
+            sim.p[...] = sim._xp.asarray(arrays["p"])
+            sim.p_prev[...] = sim._xp.asarray(arrays["p_prev"])
+        for axis, (psi, zeta) in enumerate(zip(sim._psi, sim._zeta)):
+            psi[...] = arrays[f"psi_{axis}"]
+            zeta[...] = arrays[f"zeta_{axis}"]
+        if sim.active_region:
+            sim.observe_active_region()
+        sim.time = float(header["time"])
+        sim.step_count = int(header["step_count"])
+        return sim
+
+    def _tiling(self, block: int, cache_bytes: int) -> Tuple[int, int]:
+        """``(time_block, slab)`` for the blocked kernel under a cache budget."""
+        n_buffers = len(self._field_buffers())
+        slab_bytes = self.p[0].nbytes * n_buffers * (block + 2)
+        return block, max(1, cache_bytes // slab_bytes)
+
+    def _kernel_config(self) -> KernelConfig:
+        """Launch configuration of the compiled loops, resolved on first use."""
+        config = self._config
+        if config is None:
+            config = self._config = kernel_config(self, measure=bool(self._autotune))
+        return config
+
+    def record(
+        self,
+        n_steps: int,
+        positions: Sequence[Sequence[int]],
+        record_step: int = 1,
+    ) -> np.ndarray:
+        """Advance ``n_steps`` timesteps, sampling ``p`` at ``positions``.
+
+        Returns a host float32 array of shape
+        ``(ceil(n_steps / record_step), len(positions))``: row ``w`` holds
+        ``p`` at every position after step ``w * record_step`` of this
+        call. Positions are converted to flat C-order indices once
+        (``np.ravel_multi_index``, which raises ``ValueError`` for
+        out-of-bounds cells); on the compiled path the gather happens
+        inside the time loop, otherwise as one fancy-indexed read of
+        ``p.ravel()`` per recorded step.
+        """
+        n = int(n_steps)
+        record_step = int(record_step)
+        if record_step < 1:
+            raise ValueError("record_step must be >= 1")
+        n_sensors = len(positions)
+        if n <= 0:
+            return np.zeros((0, n_sensors), dtype=np.float32)
+        n_recorded = (n + record_step - 1) // record_step
+        if n_sensors:
+            coords = np.asarray(positions, dtype=np.int64).reshape(n_sensors, self.dims)
+            flat_idx = np.ravel_multi_index(tuple(coords.T), self.grid_shape).astype(np.int64)
+        else:
+            flat_idx = np.zeros(0, dtype=np.int64)
+
+        if self._run_kernel is not None:
+            out = np.zeros((n_recorded, n_sensors), dtype=np.float32)
+            self._run_compiled(n, flat_idx, record_step, out)
+            return out
+
+        # step() loop (GPU backend, 1D). The output stays on the field's
+        # device until the end so the GPU path does one readback.
+        xp = self._xp
+        out_dev = xp.zeros((n_recorded, n_sensors), dtype=np.float32)
+        flat_dev = xp.asarray(flat_idx)
+        write_idx = 0
+        for step_idx in range(n):
+            self.step()
+            if step_idx % record_step == 0:
+                out_dev[write_idx] = self.p.ravel()[flat_dev]
+                write_idx += 1
+        if self.backend == "gpu":
+            from . import calculate_gpu
+
+            return calculate_gpu.cp.asnumpy(out_dev)
+        return out_dev
+
+    def _run_compiled(
+        self,
+        n: int,
+        sensor_idx: np.ndarray,
+        record_step: int,
+        out: np.ndarray,
+        tiling: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """Shared body of ``run`` / ``record`` / ``run_blocked`` on the compiled path.
+
+        ``tiling`` is ``(time_block, slab)`` for the temporally blocked
+        kernel, which leaves the buffers in the same rotation slots. The
+        launch configuration (``_kernel_config``) sets the thread count,
+        picks the serial build if tuning chose it, and may route plain
+        runs through the blocked kernel.
+        """
+        run_kernel = self._run_kernel
+        if run_kernel is None:
+            raise RuntimeError("no compiled run kernel for this backend/dimensionality")
+        config = self._kernel_config()
+        tiled_kernel = self._tiled_kernel
+        if tiling is None and config.time_block > 1 and tiled_kernel is not None:
+            tiling = self._tiling(config.time_block, config.tile_bytes)
+        if not config.parallel:
+            run_kernel = serial_twin(run_kernel)
+            tiled_kernel = None if tiled_kernel is None else serial_twin(tiled_kernel)
+        times = self._step_times(n)
+        driver_idx, source = self._driver_table(times[:n])
+        driver_solid = (self._fluid[tuple(driver_idx.T)] == 0).astype(np.uint8)
+        geometry = (self._spans, self._n_spans, self._box)
+        drivers = (driver_idx, driver_solid, source)
+        tables = (*geometry, *drivers)
+        # The three-buffer and blocked kernels also take the wall table.
+        walled = (*geometry, *self._walls, *drivers)
+        lut = self._storage_lut
+        with threads(config.threads):
+            if tiling is not None and tiled_kernel is not None:
+                p_next = self.p_prev if self._p_next is None else self._p_next
+                tiled_kernel(
+                    self.p,
+                    self.p_prev,
+                    p_next,
+                    self._coeff,
+                    *walled,
+                    sensor_idx,
+                    record_step,
+                    out,
+                    len(self._field_buffers()),
+                    *tiling,
+                )
+            elif lut is not None:
+                run_kernel(
+                    self.p.view(np.uint16),
+                    self.p_prev.view(np.uint16),
+                    self._coeff,
+                    *tables,
+                    sensor_idx,
+                    record_step,
+                    out,
+                    lut,
+                    self.storage_dtype == "bfloat16",
+                )
+            elif self._p_next is None:
+                run_kernel(self.p, self.p_prev, self._coeff, *tables, sensor_idx, record_step, out)
+            else:
+                run_kernel(
+                    self.p,
+                    self.p_prev,
+                    self._p_next,
+                    self._coeff,
+                    *walled,
+                    sensor_idx,
+                    record_step,
+                    out,
+                )
+        if self._p_next is None:
+            # Two-buffer kernels (and 16-bit storage) swap (p_prev, p)
+            # each step: period 2.
+            if n % 2:
+                self.p_prev, self.p = self.p, self.p_prev
+        else:
+            # The kernel rotated its local references n times; one rotation
+            # has period 3, so replay the remainder on the attributes. The
+            # blocked kernel leaves the buffers in the same slots.
+            for _ in range(n % 3):
+                self.p_prev, self.p, self._p_next = self.p, self._p_next, self.p_prev
+        self.time = float(times[n])
+        self.step_count += n
 
     def step(self) -> None:
         """Advance the simulation by a single timestep.
@@ -342,73 +1780,124 @@ class Simulate:
         # Bind every per-call value used more than once as a local.
         # This converts O(N_uses) attribute lookups to O(N_uses) of cheaper
         # local-variable loads after a fixed O(N_distinct) attribute snapshot.
-        # Bind the kernel once. The ``is not None`` test both selects the
-        # fast path AND narrows self._kernel's type for ty (the 1D
-        # fallback below leaves self._kernel = None).
+        if self._slabs is not None:
+            self._run_slabs(1)
+            return
+        if self._tiles is not None:
+            self._run_tiles(1)
+            return
+        if self._pstd is not None:
+            self._step_pstd()
+            return
+        if self._storage_lut is not None:
+            # 16-bit storage has no separate step kernel: encoding,
+            # injection and the swap all live in the run kernel.
+            self._run_compiled(
+                1, np.zeros(0, dtype=np.int64), 1, np.zeros((0, 0), dtype=np.float32)
+            )
+            return
         kernel = self._kernel
-        if kernel is not None:
-            # 2D and 3D both go through a fused @njit kernel. Which one
-            # was bound to self._kernel depends on dimensionality (set
-            # once in __init__); the surrounding plumbing — buffer
-            # rotation, obstacle scrub, driver injection — is identical.
-            p = self.p
-            p_prev = self.p_prev
-            p_next = self._p_next
-            coeff = self._coeff
-
-            # Fused njit kernel: writes p_next, also zeroing the outer
-            # faces to enforce the Dirichlet hard-wall BC. Operands are
-            # passed positionally to skip any kwarg dict construction.
+        # Every dimensionality goes through a fused @njit kernel. Which
+        # one was bound to self._kernel depends on dimensionality (set
+        # once in __init__); the surrounding plumbing — buffer
+        # rotation, obstacle scrub, driver injection — is identical.
+        p = self.p
+        p_prev = self.p_prev
+        p_next = self._p_next
+        coeff = self._coeff
+
+        # Fused njit kernel: writes p_next, also zeroing the outer
+        # faces to enforce the Dirichlet hard-wall BC. Operands are
+        # passed positionally to skip any kwarg dict construction.
+        # Rooms with interior obstacles use the span kernel, which
+        # only visits fluid cells, or — for fragmented geometry and on
+        # the GPU — the masked twin, which zeroes obstacle cells in the
+        # same pass. Either way obstacles are settled after the walls
+        # and before the driver injection below. Guarded by the cached
+        # flag so the no-obstacle path is bit-identical to the
+        # pre-obstacle code and check_simulate.py keeps matching
+        # reference.npz.
+        # With active-region tracking the span kernel (one span per
+        # row when there are no obstacles) also clips to the box, and
+        # it is the kernel that applies reflective walls.
+        # Two-buffer mode has a single in-place kernel for every case;
+        # its p_next is the p_prev buffer. An absorbing boundary and a
+        # heterogeneous medium have one kernel each too, told whether
+        # to zero obstacles.
+        if p_next is None:
+            p_next = p_prev
+            self._inplace_kernel(p, p_prev, coeff, self._spans, self._n_spans, self._box)
+        elif self._media_kernel is not None:
+            self._media_kernel(p, p_prev, p_next, *self._media, self._fluid, self._has_obstacles)
+        elif self._boundary_kernel is not None:
+            self._boundary_kernel(
+                p,
+                p_prev,
+                p_next,
+                coeff,
+                self._fluid,
+                self._has_obstacles,
+                *self._boundary_operands(),
+            )
+        elif self.active_region or self._has_walls:
+            self._spans_kernel(
+                p, p_prev, p_next, coeff, self._spans, self._n_spans, self._box, *self._walls
+            )
+        elif not self._has_obstacles:
             kernel(p, p_prev, p_next, coeff)
+        elif self._use_spans:
+            self._spans_kernel(
+                p, p_prev, p_next, coeff, self._spans, self._n_spans, self._box, *self._walls
+            )
         else:
-            # Legacy 1D path: scipy.ndimage.laplace fallback. Kept for
-            # behavioural compatibility with any caller that builds a 1D
-            # Simulate; the fused kernels are 2D and 3D only.
-            laplacian = laplacian_operator(grid=self.p, gridstep=self.gridstep)
-            p_next = 2.0 * self.p - self.p_prev + (self.wavespeed * self.timestep) ** 2 * laplacian
-            # Hard-wall (Dirichlet, p=0) boundaries first so interior drivers
-            # are not erased.
-            set_edge_values(arr=p_next, value=0)
-            p = self.p
-            p_prev = self.p_prev
-
-        # Interior Dirichlet obstacle scrub. Mirrors the outer wall: zero
-        # the masked cells in p_next AFTER the stencil pass but BEFORE driver
-        # injection, so a driver placed on an obstacle cell still emits
-        # (matches the documented boundary semantics where a driver at the
-        # edge overwrites the wall). Guarded by the cached flag so the
-        # no-obstacle path is bit-identical to the pre-obstacle code and
-        # check_simulate.py keeps matching reference.npz.
-        if self._has_obstacles:
-            p_next[self.obstacle_mask] = np.float32(0.0)
+            self._masked_kernel(p, p_prev, p_next, coeff, self._fluid)
 
-        # Driver injection happens after the boundary zeroing in BOTH paths
-        # (the 2D kernel zeros edges internally). This ordering matters and
-        # must not be changed; drivers placed on a boundary are intentionally
-        # allowed to overwrite the wall.
+        # Driver injection happens after the kernel's boundary zeroing.
+        # This ordering matters and must not be changed; drivers placed on
+        # a boundary are intentionally allowed to overwrite the wall.
+        #
+        # Values come from the precomputed source table. Its row for this
+        # step is valid only if it was tabulated for exactly this clock
+        # value; anything else (first step, exhausted chunk, reset, an
+        # external write to ``time``, a driver list that is no longer the
+        # one it was built from) rebuilds it. Out-of-bounds drivers are
+        # not in the table, exactly as the bounds guard used to skip them.
         time = self.time
-        fast_driver = self._fast_driver
-        if fast_driver is not None:
-            # Single-driver fast path: position validated and tuple-cached at
-            # construction time, so we skip the per-step ``zip``/``all``/
-            # ``tuple(...)`` chain and go straight to the indexed write.
-            p_next[self._fast_driver_pos] += fast_driver.get_value(time)
+        row = self._src_row
+        src_times = self._src_times
+        if (
+            src_times is None
+            or row >= self._SOURCE_CHUNK
+            or src_times[row] != time
+            or tuple(self.drivers) != self._src_drivers
+        ):
+            self._fill_source_table()
+            row = 0
+        values = self._src_values[row]
+        self._src_row = row + 1
+        for pos in self._src_solid:
+            # A driver on an obstacle left its last injection in this
+            # buffer, and the span kernel does not overwrite obstacles.
+            p_next[pos] = 0.0
+        fast_pos = self._fast_driver_pos
+        if fast_pos is not None:
+            # Single-driver fast path: position validated and tuple-cached
+            # at mutation time, so skip the loop and write directly.
+            p_next[fast_pos] += values[0]
         else:
-            # Generic path: zero or many drivers, or out-of-bounds single
-            # driver. Behaviour is bit-identical to the original code.
-            grid_shape = self.grid_shape
-            for driver in self.drivers:
-                value = driver.get_value(time)
-                if all(0 <= pos < size for pos, size in zip(driver.position, grid_shape)):
-                    p_next[tuple(driver.position)] += value
+            for d_idx, pos in enumerate(self._src_pos):
+                p_next[pos] += values[d_idx]
 
         # Three-way pointer rotation: p_prev <- p, p <- p_next, _p_next <- old p_prev.
         # The old p_prev buffer becomes the new scratch pad for the next step,
         # so no array is allocated in the hot path. We use the locals captured
         # above (rather than re-reading self) for the source half of the swap.
+        # In two-buffer mode p_next *is* the old p_prev buffer, so this is
+        # a two-way swap and _p_next stays None.
         self.p_prev = p
         self.p = p_next
-        self._p_next = p_prev
+        if p_next is not p_prev:
+            self._p_next = p_prev
 
         self.time = time + self.timestep
         self.step_count += 1
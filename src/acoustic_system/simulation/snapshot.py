@@ -0,0 +1,107 @@
+"""Snapshot files of ``Simulate`` state, read back as memory maps.
+
+``Simulate.save_state(path)`` writes one uncompressed file and
+``Simulate.load_state(path)`` maps it back. The layout is:
+
+* 16 bytes: the magic ``b"ACSTATE1"`` and the length of the header as
+  a little-endian uint64.
+* The header, UTF-8 JSON: the constructor settings, the clock, and
+  ``offset`` / ``nbytes`` of every section below.
+* A pickle of the drivers and sensors (waveforms are arbitrary Python
+  objects, some holding sample arrays).
+* The arrays (``p``, ``p_prev``, ``obstacle_mask`` and any boundary
+  state) as raw C-order bytes, each starting on a page boundary.
+
+Page-aligned sections can be mapped with ``np.memmap`` straight from
+the page cache with no copy and no parsing, so reading a snapshot
+costs what the kernel's readahead costs. ``read_state`` maps them
+copy-on-write (``mode="c"``): a loaded simulation can step on them
+without writing to the file.
+
+The pickle section means a snapshot, like any pickle, should only be
+loaded from a trusted source.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+_MAGIC = b"ACSTATE1"
+_PREFIX = len(_MAGIC) + 8
+_PAGE = mmap.ALLOCATIONGRANULARITY
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _PAGE) * _PAGE
+
+
+def write_state(
+    path: Path, header: Dict[str, Any], objects: Any, arrays: Dict[str, np.ndarray]
+) -> None:
+    """Write ``header`` (JSON-able), ``objects`` (pickled) and ``arrays`` to ``path``.
+
+    The section table is added to a copy of ``header``, laid out so
+    that every array starts on a page boundary after the header.
+    """
+    blob = pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    header = dict(header)
+    # The header's length depends on the offsets, which depend on its
+    # length: lay out with a guess until it fits before the first section.
+    room = _PAGE
+    while True:
+        offset = room
+        header["objects"] = {"offset": offset, "nbytes": len(blob)}
+        table = {}
+        offset = _align(offset + len(blob))
+        for name, a in arrays.items():
+            table[name] = {
+                "dtype": a.dtype.str,
+                "shape": list(a.shape),
+                "offset": offset,
+                "nbytes": a.nbytes,
+            }
+            offset = _align(offset + a.nbytes)
+        header["arrays"] = table
+        encoded = json.dumps(header).encode()
+        if _PREFIX + len(encoded) <= room:
+            break
+        room = _align(_PREFIX + len(encoded))
+    with open(path, "wb") as f:
+        f.write(_MAGIC + len(encoded).to_bytes(8, "little") + encoded)
+        f.seek(header["objects"]["offset"])
+        f.write(blob)
+        for name, a in arrays.items():
+            f.seek(table[name]["offset"])
+            f.write(memoryview(a.reshape(-1).view(np.uint8)))
+        f.truncate(offset)
+
+
+def read_state(path: Path) -> Tuple[Dict[str, Any], Any, Dict[str, np.ndarray]]:
+    """``(header, objects, arrays)`` of a file written by ``write_state``.
+
+    The arrays are copy-on-write maps of the file, not copies.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX)
+        if len(prefix) != _PREFIX or prefix[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{path} is not a Simulate snapshot")
+        header = json.loads(f.read(int.from_bytes(prefix[len(_MAGIC) :], "little")))
+        f.seek(header["objects"]["offset"])
+        objects = pickle.loads(f.read(header["objects"]["nbytes"]))
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        shape = tuple(entry["shape"])
+        if entry["nbytes"] == 0:
+            arrays[name] = np.zeros(shape, dtype=entry["dtype"])
+            continue
+        arrays[name] = np.memmap(
+            path, dtype=entry["dtype"], mode="c", offset=entry["offset"], shape=shape
+        ).view(np.ndarray)
+    return header, objects, arrays
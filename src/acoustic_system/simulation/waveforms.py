@@ -4,11 +4,27 @@ import numpy as np
 
 
 class Waveform:
-    """Base class for callable driver waveforms p_src(t)."""
+    """Base class for callable driver waveforms p_src(t).
+
+    ``__call__(t)`` evaluates one time; ``sample(times)`` evaluates a whole
+    array of times at once and returns float32 (the field dtype). The
+    engine builds its per-step source tables with ``sample``, so the
+    built-in families override it with vectorised NumPy that performs the
+    same float64 operations as ``__call__`` in the same order. The two
+    are identical up to float32 rounding, not bit for bit: array and
+    scalar ``np.cos`` / ``np.exp`` may differ in the last float64 bit,
+    which can flip a rounded float32. The default here just loops over
+    ``__call__``, so a subclass that only implements ``__call__`` still
+    works everywhere.
+    """
 
     def __call__(self, t: float) -> float:
         raise NotImplementedError
 
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        t = np.asarray(times, dtype=np.float64)
+        return np.array([self(float(x)) for x in t.ravel()], dtype=np.float32).reshape(t.shape)
+
 
 @dataclass
 class Cosine(Waveform):
@@ -25,6 +41,10 @@ class Cosine(Waveform):
     def __call__(self, t: float) -> float:
         return self.amplitude * np.cos(2.0 * np.pi * self.frequency * t)
 
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        t = np.asarray(times, dtype=np.float64)
+        return (self.amplitude * np.cos(2.0 * np.pi * self.frequency * t)).astype(np.float32)
+
 
 @dataclass
 class GaussianPulse(Waveform):
@@ -42,6 +62,11 @@ class GaussianPulse(Waveform):
     def __call__(self, t: float) -> float:
         return self.amplitude * np.exp(-((t - self.center_time) ** 2) / (2.0 * self.width**2))
 
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        t = np.asarray(times, dtype=np.float64)
+        value = self.amplitude * np.exp(-((t - self.center_time) ** 2) / (2.0 * self.width**2))
+        return value.astype(np.float32)
+
 
 @dataclass
 class RickerWavelet(Waveform):
@@ -63,6 +88,12 @@ class RickerWavelet(Waveform):
         arg2 = arg * arg
         return self.amplitude * (1.0 - 2.0 * arg2) * np.exp(-arg2)
 
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        t = np.asarray(times, dtype=np.float64)
+        arg = np.pi * self.frequency * (t - self.delay)
+        arg2 = arg * arg
+        return (self.amplitude * (1.0 - 2.0 * arg2) * np.exp(-arg2)).astype(np.float32)
+
 
 @dataclass
 class AudioFileWaveform(Waveform):
@@ -173,6 +204,32 @@ class AudioFileWaveform(Waveform):
         b = self._samples[idx0 + 1]
         return float(self.amplitude * ((1.0 - frac) * a + frac * b))
 
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        """Vectorised ``__call__``: one gather + lerp over the whole array.
+
+        The scalar path mixes Python floats with float32 samples, which
+        NumPy evaluates in float32 (the Python operand is cast down); the
+        weights and amplitude are cast to float32 here for the same
+        arithmetic, identical up to float32 rounding.
+        """
+        t = np.asarray(times, dtype=np.float64)
+        out = np.zeros(t.shape, dtype=np.float32)
+        n = self._samples.shape[0]
+        if n == 0 or self._fs_audio <= 0.0:
+            return out
+        t_audio = t - self.delay
+        idx_f = t_audio * self._fs_audio
+        valid = (t_audio >= 0.0) & (t_audio < self._duration)
+        idx0 = np.where(valid, idx_f, 0.0).astype(np.int64)
+        valid &= idx0 < n - 1
+        idx0 = idx0[valid]
+        frac = idx_f[valid] - idx0
+        a = self._samples[idx0]
+        b = self._samples[idx0 + 1]
+        lerp = (1.0 - frac).astype(np.float32) * a + frac.astype(np.float32) * b
+        out[valid] = np.float32(self.amplitude) * lerp
+        return out
+
     @classmethod
     def from_samples(
         cls,
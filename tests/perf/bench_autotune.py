@@ -0,0 +1,103 @@
+"""Default vs autotuned launch configuration of ``Simulate.run()``.
+
+For each grid, tunes into a fresh cache file (unless ``--cache`` names
+one to reuse) and times ``run()`` under the untuned default and under
+the tuned configuration, median of ``--trials``; then the same for a
+``BatchSimulate`` of ``--batch`` 64x64 rooms:
+
+    BENCH_AUTOTUNE grid=<shape> threads=<int> parallel=<bool> time_block=<int>
+        tile_kb=<int> tune_s=<float> default_ms=<float> tuned_ms=<float> speedup=<float>
+
+``grid`` is ``<batch>x<shape>`` for the batch. ``tune_s`` is the one-off
+tuning cost (0 when the bucket was cached); grids past the largest
+proxy are tuned at its size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation import autotune  # noqa: E402
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+GRIDS = ((64, 64), (512, 512), (2048, 2048), (64, 64, 64), (128, 128, 128), (256, 256, 256))
+
+
+def build_sim(grid_shape: Tuple[int, ...]) -> Simulate:
+    return Simulate(
+        grid_shape=grid_shape,
+        drivers=[
+            Driver(
+                position=tuple(s // 2 for s in grid_shape),
+                waveform=RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0),
+            )
+        ],
+        courant=0.5,
+        autotune=False,
+    )
+
+
+def build_batch(grid_shape: Tuple[int, ...], members: int) -> BatchSimulate:
+    batch = BatchSimulate(grid_shape, members, courant=0.5, autotune=False)
+    for b in range(members):
+        centre = tuple(s // 2 for s in grid_shape)
+        batch.set_drivers(b, [Driver(centre, RickerWavelet(amplitude=5.0, frequency=0.1))])
+        batch.set_sensors(b, [centre])
+    return batch
+
+
+def per_step_ms(sim, config: autotune.KernelConfig, steps: int, trials: int) -> float:
+    sim._config = config
+    sim.run(1)
+    samples = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        sim.run(steps)
+        samples.append((time.perf_counter() - t0) * 1000.0 / steps)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--cache", type=str, default=None)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["ACOUSTIC_AUTOTUNE_CACHE"] = args.cache or os.path.join(tmp.name, "autotune.json")
+    autotune.clear_memory_cache()
+    runs = [(build_sim(grid), autotune.kernel_config, grid) for grid in GRIDS]
+    runs.append((build_batch((64, 64), args.batch), autotune.batch_config, (args.batch, 64, 64)))
+    for sim, lookup, grid in runs:
+        t0 = time.perf_counter()
+        tuned = lookup(sim, measure=True)
+        tune_s = time.perf_counter() - t0
+        base_ms = per_step_ms(sim, autotune.default_config(), args.steps, args.trials)
+        tuned_ms = per_step_ms(sim, tuned, args.steps, args.trials)
+        shape = "x".join(str(s) for s in grid)
+        print(
+            f"BENCH_AUTOTUNE grid={shape} threads={tuned.threads} parallel={tuned.parallel} "
+            f"time_block={tuned.time_block} tile_kb={tuned.tile_bytes >> 10} "
+            f"tune_s={tune_s:.2f} default_ms={base_ms:.3f} tuned_ms={tuned_ms:.3f} "
+            f"speedup={base_ms / tuned_ms:.2f}"
+        )
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Throughput benchmark for the batched engine (``BatchSimulate``).
+
+Sensing-style workload: 64x64 rooms with three rectangular obstacles, one
+Ricker driver and a stereo sensor pair, 200 steps each. For every batch
+size B in ``--batch-sizes`` the script times one ``BatchSimulate.run``
+over B rooms and reports rooms per second; the ``sequential`` line is
+the pre-batch baseline of one ``Simulate`` + ``run_with_sensors`` per
+room. Throughput should grow near-linearly in B until B reaches the
+numba thread count, then flatten.
+
+Prints one line per configuration:
+
+    BENCH_BATCH mode=<sequential|batch> B=<int> median_ms=<float> rooms_per_s=<float>
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    random_free_position,
+    run_with_sensors,
+)
+from acoustic_system.simulation.setup import Driver, Sensor  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+
+def make_rooms(grid: int, n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    rooms = []
+    for _ in range(n):
+        mask = generate_random_obstacles((grid, grid), 3, 4, 14, rng=rng)
+        driver = Driver(
+            random_free_position((grid, grid), mask, rng),
+            RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0),
+        )
+        mics = [random_free_position((grid, grid), mask, rng) for _ in range(2)]
+        rooms.append((mask, driver, mics))
+    return rooms
+
+
+def time_sequential(rooms, grid: int, steps: int) -> float:
+    t0 = time.perf_counter()
+    for mask, driver, mics in rooms:
+        sim = Simulate(grid_shape=(grid, grid), drivers=[driver], courant=0.5)
+        sim.set_obstacle_mask(mask)
+        run_with_sensors(sim, steps, [Sensor(position=m) for m in mics])
+    return time.perf_counter() - t0
+
+
+def time_batch(rooms, grid: int, steps: int) -> float:
+    t0 = time.perf_counter()
+    batch = BatchSimulate((grid, grid), batch_size=len(rooms), courant=0.5)
+    for b, (mask, driver, mics) in enumerate(rooms):
+        batch.set_obstacle_mask(b, mask)
+        batch.set_drivers(b, [driver])
+        batch.set_sensors(b, mics)
+    batch.run(steps)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--trials", type=int, default=5)
+    args = parser.parse_args()
+
+    n_seq = max(args.batch_sizes)
+    rooms = make_rooms(args.grid, n_seq)
+    times = [time_sequential(rooms, args.grid, args.steps) for _ in range(args.trials)]
+    med = statistics.median(times)
+    print(
+        f"BENCH_BATCH mode=sequential B={n_seq} median_ms={med * 1000:.3f} "
+        f"rooms_per_s={n_seq / med:.1f}"
+    )
+    for b in args.batch_sizes:
+        times = [time_batch(rooms[:b], args.grid, args.steps) for _ in range(args.trials)]
+        med = statistics.median(times)
+        print(f"BENCH_BATCH mode=batch B={b} median_ms={med * 1000:.3f} rooms_per_s={b / med:.1f}")
+
+
+if __name__ == "__main__":
+    main()
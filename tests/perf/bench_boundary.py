@@ -0,0 +1,105 @@
+"""Cost and accuracy of absorbing boundaries against a padded domain.
+
+A free-field problem of ``--grid`` cells per axis (default 256 in 2D,
+96 in 3D) with a centred Ricker driver, recorded for ``--steps`` steps
+at receivers on the axis and the diagonal near the edge of the region
+of interest. Without an absorbing boundary the usual remedy is padding
+the Dirichlet domain until echoes from its walls arrive after the
+recording window (``pad = ceil(C * steps)`` cells per side, C the
+Courant number); that run is the reference. The same problem is then
+run on the unpadded grid with ``boundary="mur"`` and with PMLs of a few
+widths (grown outward, so the region of interest is unchanged).
+
+    BENCH_BOUNDARY scenario=<2D|3D> boundary=<name> cells=<int> run_ms=<float>
+        speedup=<float> max_err=<float>
+
+``run_ms`` is the best of ``--trials`` timed ``record()`` calls,
+``speedup`` the padded run time over this one and ``max_err`` the
+largest receiver error relative to the reference peak.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+WIDTHS = (8, 16, 24)
+
+
+def build(shape: Tuple[int, ...], **kwargs) -> Simulate:
+    return Simulate(
+        grid_shape=shape,
+        drivers=[Driver(tuple(s // 2 for s in shape), RickerWavelet(1.0, 0.08, 20.0))],
+        autotune=False,
+        **kwargs,
+    )
+
+
+def receivers(shape: Tuple[int, ...], n: int) -> List[Tuple[int, ...]]:
+    c = shape[0] // 2
+    dims = len(shape)
+    return [(c + n // 2 - 2,) + (c,) * (dims - 1), (c + n // 3,) * dims]
+
+
+def timed(shape: Tuple[int, ...], n: int, steps: int, trials: int, **kwargs):
+    best, out = math.inf, None
+    for _ in range(trials + 1):  # the first call compiles
+        sim = build(shape, **kwargs)
+        t0 = time.perf_counter()
+        out = sim.record(steps, receivers(shape, n))
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0, out
+
+
+def scenario(name: str, dims: int, n: int, steps: int, trials: int) -> None:
+    courant = build((8,) * dims).timestep  # wavespeed = gridstep = 1
+    pad = math.ceil(courant * steps)
+    shape = (n + 2 * pad,) * dims
+    ref_ms, ref = timed(shape, n, steps, trials)
+    scale = np.max(np.abs(ref), axis=0)
+
+    def report(label: str, cells: int, ms: float, out: np.ndarray) -> None:
+        err = float(np.max(np.max(np.abs(out - ref), axis=0) / scale))
+        print(
+            f"BENCH_BOUNDARY scenario={name} boundary={label} cells={cells} "
+            f"run_ms={ms:.1f} speedup={ref_ms / ms:.2f} max_err={err:.3e}"
+        )
+
+    report("padded", int(np.prod(shape)), ref_ms, ref)
+    for boundary, width in [("dirichlet", 0), ("mur", 0)] + [("pml", w) for w in WIDTHS]:
+        kwargs = dict(boundary=boundary)
+        if boundary == "pml":
+            kwargs["boundary_width"] = width
+        grown = (n + 2 * width,) * dims
+        ms, out = timed(grown, n, steps, trials, **kwargs)
+        label = f"pml{width}" if boundary == "pml" else boundary
+        report(label, int(np.prod(grown)), ms, out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", type=int, default=256)
+    parser.add_argument("--grid-3d", type=int, default=96)
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--steps-3d", type=int, default=200)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+    scenario("2D", 2, args.grid, args.steps, args.trials)
+    scenario("3D", 3, args.grid_3d, args.steps_3d, args.trials)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Scaling benchmark for ``Simulate(workers=N)`` on one host.
+
+For each cubic grid, times ``run(steps)`` in the ordinary in-process
+engine (``workers=1``: one process, every numba thread) and then with
+2 .. N slab workers, and prints one line per configuration:
+
+    BENCH_DECOMPOSE grid=N workers=W threads=T per_step_ms=<float>  speedup=<float>
+        trials_ms=[...]  steps=<int>
+
+``threads`` is numba threads per process; ``speedup`` is relative to
+``workers=1``. Worker start-up (spawning, loading the cached kernels)
+is excluded: each configuration builds its ``Simulate`` once, runs a
+warm-up, and then times ``--trials`` runs of ``--steps`` steps.
+
+``--workers`` defaults to 1 2 4 ... up to the CPU count. On a
+multi-socket machine, compare against ``numactl --interleave=all`` for
+the in-process engine; slab workers are not pinned, so the kernel's
+first-touch placement decides where their pages land.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+DEFAULT_GRIDS = [128, 200]
+
+
+def default_workers() -> List[int]:
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def time_workers(grid: int, workers: int, steps: int, trials: int) -> List[float]:
+    sim = Simulate(
+        grid_shape=(grid, grid, grid),
+        drivers=[Driver((grid // 2, grid // 2, grid // 2), RickerWavelet(5.0, 0.1, 20.0))],
+        autotune=workers == 1,
+        workers=workers,
+    )
+    sim.run(2)
+    times_s = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        sim.run(steps)
+        times_s.append(time.perf_counter() - t0)
+    sim.close()
+    return times_s
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grids", nargs="+", type=int, default=DEFAULT_GRIDS)
+    parser.add_argument("--workers", nargs="+", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+
+    import numba
+
+    counts = args.workers if args.workers is not None else default_workers()
+    for grid in args.grids:
+        baseline = None
+        for workers in counts:
+            times_s = time_workers(grid, workers, args.steps, args.trials)
+            per_step_ms = round(statistics.median(times_s) * 1000.0 / args.steps, 3)
+            if baseline is None:
+                baseline = per_step_ms
+            threads = numba.config.NUMBA_NUM_THREADS
+            if workers > 1:
+                threads = max(1, threads // workers)
+            print(
+                f"BENCH_DECOMPOSE grid={grid} workers={workers} threads={threads} "
+                f"per_step_ms={per_step_ms}  speedup={baseline / per_step_ms:.2f}  "
+                f"trials_ms={[round(t * 1000.0, 3) for t in times_s]}  steps={args.steps}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""NUMA placement benchmark for ``Simulate(first_touch=True)``.
+
+For each cubic grid, builds a ``Simulate`` with the default allocation
+and with ``first_touch=True``, and for each prints the ``run()`` time
+and how the pages of its field buffers are spread over NUMA nodes
+(from ``/proc/self/numa_maps``):
+
+    BENCH_FIRST_TOUCH grid=N mode=<default|first_touch|main_touched> per_step_ms=<float>
+        trials_ms=[...]  nodes=<N0:pages,N1:pages,...>  threads=<int>
+
+``main_touched`` is the default allocation with the buffers then
+written once from the main thread (as ``reset()`` or a NumPy
+initialisation of ``p`` would do before the first step), which puts
+every page on the main thread's node.
+
+The effect only shows on a multi-socket host with threads on several
+nodes. Run it there with the numba thread count covering all sockets,
+e.g. ``NUMBA_NUM_THREADS=$(nproc) python tests/perf/bench_first_touch.py``.
+On a single node every mode reports one node and the same time.
+Autotuning is off so that the kernels run with the same thread count
+as the first-touch fill.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+DEFAULT_GRIDS = [200, 256]
+
+
+def node_pages(buf: np.ndarray) -> Dict[str, int]:
+    """Pages per NUMA node of the mappings that overlap ``buf``."""
+    lo = buf.ctypes.data
+    hi = lo + buf.nbytes
+    starts = set()
+    with open("/proc/self/maps") as f:
+        for line in f:
+            start, end = (int(a, 16) for a in line.split()[0].split("-"))
+            if start < hi and end > lo:
+                starts.add(start)
+    counts: Counter = Counter()
+    with open("/proc/self/numa_maps") as f:
+        for line in f:
+            fields = line.split()
+            if int(fields[0], 16) not in starts:
+                continue
+            for field in fields[1:]:
+                if field.startswith("N") and "=" in field:
+                    node, pages = field.split("=")
+                    counts[node] += int(pages)
+    return dict(counts)
+
+
+def build(grid: int, mode: str) -> Simulate:
+    sim = Simulate(
+        grid_shape=(grid, grid, grid),
+        drivers=[Driver((grid // 2, grid // 2, grid // 2), RickerWavelet(5.0, 0.1, 20.0))],
+        autotune=False,
+        first_touch=mode == "first_touch",
+    )
+    if mode == "main_touched":
+        for buf in sim._field_buffers():
+            buf.fill(0.0)
+    return sim
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grids", nargs="+", type=int, default=DEFAULT_GRIDS)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+
+    import numba
+
+    for grid in args.grids:
+        for mode in ("main_touched", "default", "first_touch"):
+            sim = build(grid, mode)
+            sim.run(2)
+            nodes: Counter = Counter()
+            for buf in sim._field_buffers():
+                nodes.update(node_pages(buf))
+            times_s = []
+            for _ in range(args.trials):
+                t0 = time.perf_counter()
+                sim.run(args.steps)
+                times_s.append(time.perf_counter() - t0)
+            per_step_ms = round(statistics.median(times_s) * 1000.0 / args.steps, 3)
+            placement = ",".join(f"{node}:{pages}" for node, pages in sorted(nodes.items()))
+            print(
+                f"BENCH_FIRST_TOUCH grid={grid} mode={mode} per_step_ms={per_step_ms}  "
+                f"trials_ms={[round(t * 1000.0, 3) for t in times_s]}  nodes={placement}  "
+                f"threads={numba.get_num_threads()}"
+            )
+            del sim
+
+
+if __name__ == "__main__":
+    main()
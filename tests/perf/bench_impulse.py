@@ -0,0 +1,92 @@
+"""Cost of a recording: simulated vs rendered from cached impulse responses.
+
+Draws ``--rooms`` rooms with ``--poses`` (driver, mic-pair) poses each
+on the sensing protocol's grid, and times three ways of producing
+every pose's recording of a chirp:
+
+* ``simulate``: one ``BatchSimulate`` launch driving the chirp (what
+  the dataset generator does without ``--ir-cache``);
+* ``cold``: ``ImpulseResponseCache`` on an empty directory (impulse
+  simulations, file writes and renders);
+* ``warm``: the same cache again, as when only the source changes
+  (lookups and renders only).
+
+One line per mode:
+
+    BENCH_IMPULSE mode=<simulate|cold|warm> per_pose_ms=<float>  total_ms=<float>  poses=<int>
+        grid=<int>  steps=<int>
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    pick_mic_positions,
+    random_free_position,
+    synthetic_chirp,
+)
+from acoustic_system.simulation.impulse import ImpulseResponseCache  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.waveforms import AudioFileWaveform  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=16)
+    parser.add_argument("--poses", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.grid, args.grid)
+    poses = []
+    for _ in range(args.rooms):
+        mask = generate_random_obstacles(shape, 3, 4, 14, rng=rng)
+        for _ in range(args.poses):
+            driver = random_free_position(shape, mask, rng)
+            poses.append((mask, driver, pick_mic_positions(shape, mask, spacing=12.0, rng=rng)))
+    chirp = synthetic_chirp(int(200.0 * args.steps * 0.35), 200.0, 0.02, 0.4)
+    waveform = AudioFileWaveform.from_samples(samples=chirp, sample_rate=200.0, amplitude=5.0)
+
+    def simulate() -> None:
+        batch = BatchSimulate(shape, len(poses))
+        for member, (mask, driver, mics) in enumerate(poses):
+            batch.set_obstacle_mask(member, mask)
+            batch.set_drivers(member, [Driver(driver, waveform)])
+            batch.set_sensors(member, mics)
+        batch.run(args.steps)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ImpulseResponseCache(tmp, shape, args.steps)
+
+        def rendered() -> None:
+            for ir in cache.get_many(poses):
+                cache.render(ir, waveform)
+
+        simulate()  # compile the batch kernel outside the timing
+        for mode, fn in (("simulate", simulate), ("cold", rendered), ("warm", rendered)):
+            t0 = time.perf_counter()
+            fn()
+            total_ms = (time.perf_counter() - t0) * 1000.0
+            print(
+                f"BENCH_IMPULSE mode={mode} per_pose_ms={total_ms / len(poses):.3f}  "
+                f"total_ms={total_ms:.1f}  poses={len(poses)}  grid={args.grid}  "
+                f"steps={args.steps}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Throughput benchmark for ``Simulate(out_of_core=directory)``.
+
+For each cubic grid, times ``run(steps)`` in memory and then out of
+core with each working-set budget, and prints one line per
+configuration:
+
+    BENCH_OUTOFCORE grid=N mode=<memory|out_of_core> budget_mb=<int|-> tiles=<int|->
+        per_step_ms=<float>  slowdown=<float>  trials_ms=[...]
+
+``slowdown`` is relative to the in-memory run. The files go to
+``--directory`` (default: a temporary directory), which should be on
+the local disk the real runs would use. With a grid that fits in RAM
+the files stay in the page cache, so this measures the tiling and
+copy overhead; the disk only shows for grids larger than RAM.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+DEFAULT_GRIDS = [128, 200]
+DEFAULT_BUDGETS_MB = [16, 64, 256]
+
+
+def time_run(
+    grid: int, directory: Optional[Path], budget_mb: int, steps: int, trials: int
+) -> tuple:
+    sim = Simulate(
+        grid_shape=(grid, grid, grid),
+        drivers=[Driver((grid // 2, grid // 2, grid // 2), RickerWavelet(5.0, 0.1, 20.0))],
+        autotune=False,
+        out_of_core=None if directory is None else str(directory),
+        out_of_core_memory=budget_mb << 20,
+    )
+    sim.run(2)
+    times_s: List[float] = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        sim.run(steps)
+        times_s.append(time.perf_counter() - t0)
+    tiles = "-" if sim._tiles is None else len(sim._tiles.tiles)
+    sim.close()
+    return times_s, tiles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grids", nargs="+", type=int, default=DEFAULT_GRIDS)
+    parser.add_argument("--budgets-mb", nargs="+", type=int, default=DEFAULT_BUDGETS_MB)
+    parser.add_argument("--directory", type=Path, default=None)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as tmp:
+        for grid in args.grids:
+            configs = [("memory", None, "-")]
+            configs += [("out_of_core", Path(tmp) / f"{grid}_{mb}", mb) for mb in args.budgets_mb]
+            baseline = None
+            for mode, directory, mb in configs:
+                times_s, tiles = time_run(
+                    grid, directory, 0 if mb == "-" else mb, args.steps, args.trials
+                )
+                per_step_ms = round(statistics.median(times_s) * 1000.0 / args.steps, 3)
+                if baseline is None:
+                    baseline = per_step_ms
+                print(
+                    f"BENCH_OUTOFCORE grid={grid} mode={mode} budget_mb={mb} tiles={tiles} "
+                    f"per_step_ms={per_step_ms}  slowdown={per_step_ms / baseline:.2f}  "
+                    f"trials_ms={[round(t * 1000.0, 3) for t in times_s]}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Accuracy and cost of the pseudo-spectral backend against the FDTD engine.
+
+One 2D room, ``--size`` peak wavelengths square, empty (``free``) or
+with a rectangular obstacle (``obstacle``), driven by a Ricker wavelet
+of unit peak frequency (``c = 1``, so the peak wavelength is 1) and
+recorded at three receivers for ``--periods`` periods. Every length is
+a whole number of wavelengths, so walls, obstacle, driver and
+receivers sit on grid cells at every resolution, and the scene is
+identical up to discretisation.
+
+Each run is labelled by ``ppw``, cells per peak wavelength. Its
+timestep is the largest one at Courant number <= 0.5 that divides the
+receivers' sampling period of 1/8, and the driver amplitude is the
+Courant number squared, so the injected source is the same physical
+source on every grid (in 2D ``p += s`` per step is a source of
+strength ``s c^2 / C^2`` per unit area). The reference is the numba
+FDTD at ``--reference`` cells per wavelength, Richardson-extrapolated
+with the run at half that (the stencil's error is second order).
+
+    BENCH_PSTD scene=<free|obstacle> backend=<cpu|pstd> ppw=<int> cells=<int>
+        steps=<int> run_ms=<float> max_err=<float>
+
+``run_ms`` is the best of ``--trials`` timed ``record()`` calls (CPU
+runs after a compile call), and ``max_err`` the largest receiver error
+relative to the reference peak. The ``reference`` line reports the gap
+between the two reference runs, an upper bound on the reference's own
+error.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+SAMPLE = 1.0 / 8.0
+DRIVER = (2, 2)
+RECEIVERS = [(6, 6), (2, 6), (6, 1)]
+OBSTACLE = (slice(4, 5), slice(2, 5))
+
+
+def build(backend: str, ppw: int, scene: str, size: int, workers: int) -> Simulate:
+    """The scene at ``ppw`` cells per wavelength on ``backend``."""
+    substeps = math.ceil(SAMPLE * 2 * ppw)
+    courant = SAMPLE / substeps * ppw
+    n = size * ppw + 1
+    sim = Simulate(
+        grid_shape=(n, n),
+        drivers=[Driver((DRIVER[0] * ppw, DRIVER[1] * ppw), RickerWavelet(courant**2, 1.0, 1.5))],
+        timestep=SAMPLE / substeps,
+        gridstep=1.0 / ppw,
+        backend=backend,
+        autotune=False,
+        workers=workers if backend == "pstd" else 1,
+    )
+    if scene == "obstacle":
+        mask = np.zeros((n, n), dtype=bool)
+        mask[tuple(slice(s.start * ppw, s.stop * ppw + 1) for s in OBSTACLE)] = True
+        sim.set_obstacle_mask(mask)
+    return sim
+
+
+def record(sim: Simulate, ppw: int, periods: int) -> np.ndarray:
+    """Receiver samples every ``SAMPLE`` periods, ``(periods / SAMPLE, 3)``."""
+    substeps = round(SAMPLE / sim.timestep)
+    sim.run(substeps - 1)
+    cells = [(i * ppw, j * ppw) for i, j in RECEIVERS]
+    return sim.record(round(periods / SAMPLE) * substeps - (substeps - 1), cells, substeps)
+
+
+def timed(backend: str, ppw: int, scene: str, args: argparse.Namespace):
+    best, out = math.inf, None
+    for trial in range(args.trials + (backend == "cpu")):
+        sim = build(backend, ppw, scene, args.size, args.workers)
+        t0 = time.perf_counter()
+        out = record(sim, ppw, args.periods)
+        elapsed = time.perf_counter() - t0
+        if backend == "pstd" or trial:
+            best = min(best, elapsed)
+    return best * 1000.0, out, sim
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--periods", type=int, default=12)
+    parser.add_argument("--reference", type=int, default=128)
+    parser.add_argument("--fdtd", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--pstd", type=int, nargs="+", default=[3, 4, 6, 8])
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    half = args.reference // 2
+    for scene in ("free", "obstacle"):
+        fine = record(
+            build("cpu", args.reference, scene, args.size, 1), args.reference, args.periods
+        )
+        coarse = record(build("cpu", half, scene, args.size, 1), half, args.periods)
+        reference = (4.0 * fine.astype(np.float64) - coarse) / 3.0
+        peak = float(np.max(np.abs(reference)))
+        gap = float(np.max(np.abs(fine - coarse))) / peak
+        print(f"BENCH_PSTD scene={scene} reference ppw={args.reference}/{half}  max_gap={gap:.3e}")
+        for backend, ppws in (("cpu", args.fdtd), ("pstd", args.pstd)):
+            for ppw in ppws:
+                run_ms, out, sim = timed(backend, ppw, scene, args)
+                err = float(np.max(np.abs(out - reference))) / peak
+                print(
+                    f"BENCH_PSTD scene={scene} backend={backend} ppw={ppw} cells={sim.p.size} "
+                    f"steps={sim.step_count} run_ms={run_ms:.1f}  max_err={err:.3e}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cost per pose of dense receiver-grid recording vs one run per pose.
+
+Draws ``--rooms`` rooms with ``--drivers`` drivers each and
+``--pairs`` stereo pairs per driver (``pick_mic_pairs`` on the
+``--stride`` lattice), and times two ways of producing every pose's
+recording:
+
+* ``simulate``: one ``BatchSimulate`` member per pose with its two mics;
+* ``dense``: one member per driver, recorded on the receiver lattice
+  (``record_receiver_grid``, float16 memmap in a temporary directory),
+  then each pair read out (``receiver_series``).
+
+One line per mode:
+
+    BENCH_RECEIVERS mode=<simulate|dense> per_pose_ms=<float>  total_ms=<float>  runs=<int>
+        poses=<int>  grid=<int>  steps=<int>  stride=<int>  mb=<float>
+
+``mb`` is the size of the dense recording.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    pick_mic_pairs,
+    random_free_position,
+    receiver_series,
+    record_receiver_grid,
+    synthetic_chirp,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.waveforms import AudioFileWaveform  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--drivers", type=int, default=2)
+    parser.add_argument("--pairs", type=int, default=16)
+    parser.add_argument("--stride", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.grid, args.grid)
+    runs = []  # (mask, driver, pairs)
+    for _ in range(args.rooms):
+        mask = generate_random_obstacles(shape, 3, 4, 14, rng=rng)
+        for _ in range(args.drivers):
+            driver = random_free_position(shape, mask, rng)
+            runs.append(
+                (mask, driver, pick_mic_pairs(shape, mask, args.pairs, 12.0, args.stride, rng))
+            )
+    n_poses = len(runs) * args.pairs
+    chirp = synthetic_chirp(int(200.0 * args.steps * 0.35), 200.0, 0.02, 0.4)
+    waveform = AudioFileWaveform.from_samples(samples=chirp, sample_rate=200.0, amplitude=5.0)
+
+    def simulate() -> float:
+        batch = BatchSimulate(shape, n_poses)
+        member = 0
+        for mask, driver, pairs in runs:
+            for pair in pairs:
+                batch.set_obstacle_mask(member, mask)
+                batch.set_drivers(member, [Driver(driver, waveform)])
+                batch.set_sensors(member, pair)
+                member += 1
+        batch.run(args.steps)
+        return 0.0
+
+    def dense() -> float:
+        batch = BatchSimulate(shape, len(runs))
+        for member, (mask, driver, _) in enumerate(runs):
+            batch.set_obstacle_mask(member, mask)
+            batch.set_drivers(member, [Driver(driver, waveform)])
+        with tempfile.TemporaryDirectory() as tmp:
+            grid = record_receiver_grid(batch, args.steps, args.stride, directory=tmp)
+            for member, (_, _, pairs) in enumerate(runs):
+                for pair in pairs:
+                    receiver_series(grid[member], pair, args.stride)
+            mb = grid.nbytes / 1e6
+            del grid
+        return mb
+
+    simulate()  # compile the batch kernel outside the timing
+    for mode, fn, n_runs in (("simulate", simulate, n_poses), ("dense", dense, len(runs))):
+        t0 = time.perf_counter()
+        mb = fn()
+        total_ms = (time.perf_counter() - t0) * 1000.0
+        print(
+            f"BENCH_RECEIVERS mode={mode} per_pose_ms={total_ms / n_poses:.3f}  "
+            f"total_ms={total_ms:.1f}  runs={n_runs}  poses={n_poses}  grid={args.grid}  "
+            f"steps={args.steps}  stride={args.stride}  mb={mb:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
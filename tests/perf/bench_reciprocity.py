@@ -0,0 +1,103 @@
+"""Cost per pose of reciprocal acquisition vs driving each pose.
+
+Draws ``--rooms`` rooms, each with one stereo pair and ``--poses``
+driver cells (the ``--reciprocal`` layout of the dataset generator),
+and times three ways of producing every pose's recording of a chirp,
+all without a disk cache:
+
+* ``simulate``: one ``BatchSimulate`` member per pose driving the chirp;
+* ``impulse``: ``ImpulseResponseCache.get_many``, one impulse
+  simulation per pose, then renders;
+* ``reciprocal``: ``ImpulseResponseCache.reciprocal_many``, one impulse
+  simulation per mic recording all the room's drivers, then renders.
+
+One line per mode:
+
+    BENCH_RECIPROCITY mode=<simulate|impulse|reciprocal> per_pose_ms=<float>  total_ms=<float>
+        simulations=<int>  poses=<int>  grid=<int>  steps=<int>
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    pick_mic_positions,
+    random_free_position,
+    synthetic_chirp,
+)
+from acoustic_system.simulation.impulse import ImpulseResponseCache  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.waveforms import AudioFileWaveform  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=16)
+    parser.add_argument("--poses", type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.grid, args.grid)
+    rooms = []
+    for _ in range(args.rooms):
+        mask = generate_random_obstacles(shape, 3, 4, 14, rng=rng)
+        mics = pick_mic_positions(shape, mask, spacing=12.0, rng=rng)
+        drivers = [random_free_position(shape, mask, rng) for _ in range(args.poses)]
+        rooms.append((mask, mics, drivers))
+    n_poses = args.rooms * args.poses
+    chirp = synthetic_chirp(int(200.0 * args.steps * 0.35), 200.0, 0.02, 0.4)
+    waveform = AudioFileWaveform.from_samples(samples=chirp, sample_rate=200.0, amplitude=5.0)
+
+    def simulate() -> int:
+        batch = BatchSimulate(shape, n_poses)
+        member = 0
+        for mask, mics, drivers in rooms:
+            for driver in drivers:
+                batch.set_obstacle_mask(member, mask)
+                batch.set_drivers(member, [Driver(driver, waveform)])
+                batch.set_sensors(member, mics)
+                member += 1
+        batch.run(args.steps)
+        return n_poses
+
+    def impulse() -> int:
+        cache = ImpulseResponseCache(None, shape, args.steps)
+        poses = [(mask, d, mics) for mask, mics, drivers in rooms for d in drivers]
+        for ir in cache.get_many(poses):
+            cache.render(ir, waveform)
+        return cache.simulated
+
+    def reciprocal() -> int:
+        cache = ImpulseResponseCache(None, shape, args.steps)
+        for block in cache.reciprocal_many(rooms):
+            for ir in block:
+                cache.render(ir, waveform)
+        return cache.simulated
+
+    simulate()  # compile the batch kernel outside the timing
+    for mode, fn in (("simulate", simulate), ("impulse", impulse), ("reciprocal", reciprocal)):
+        t0 = time.perf_counter()
+        simulations = fn()
+        total_ms = (time.perf_counter() - t0) * 1000.0
+        print(
+            f"BENCH_RECIPROCITY mode={mode} per_pose_ms={total_ms / n_poses:.3f}  "
+            f"total_ms={total_ms:.1f}  simulations={simulations}  poses={n_poses}  "
+            f"grid={args.grid}  steps={args.steps}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,23 @@ Measures the median of ``--trials`` independent runs of ``--steps`` time
 steps on a ``--grid``x``--grid`` 2D grid with a centred Ricker driver.
 Prints a single grep-friendly line:
 
-    BENCH median_ms=<float>  trials_ms=[t1, t2, ...]  steps=<int>  grid=<int>
+    BENCH median_ms=<float>  trials_ms=[t1, t2, ...]  steps=<int>  grid=<int>  mode=<str>
+        obstacles=<bool>  active=<bool>  time_block=<int|None>
+
+``--mode run`` times the compiled multi-step ``Simulate.run(steps)``
+instead of a Python loop over ``step()``; the gap is the per-step
+interpreter overhead, which dominates on small (64x64) grids.
+
+``--mode blocked`` times ``Simulate.run_blocked(steps, time_block)``,
+the temporally blocked twin of ``run``. ``--time-block`` sets its steps
+per pass (default: ``Simulate._TIME_BLOCK``).
+
+``--obstacles`` adds two rectangular interior obstacles (a quarter of
+the grid between them), exercising the fluid-span step kernels.
+
+``--active-region`` builds the ``Simulate`` with ``active_region=True``,
+so the sweep is limited to the driver's light cone until that cone
+covers the grid.
 
 The first trial absorbs any one-time JIT compile / page-fault cost;
 ``--trials >= 5`` makes the median robust against that and against OS
@@ -18,6 +34,9 @@ import statistics
 import sys
 import time
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
 
 ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT / "src"))
@@ -27,25 +46,44 @@ from acoustic_system.simulation.simulate import Simulate  # noqa: E402
 from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
 
 
-def build_sim(grid: int) -> Simulate:
+def build_sim(grid: int, obstacles: bool = False, active: bool = False) -> Simulate:
     driver = Driver(
         position=(grid // 2, grid // 2),
         waveform=RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0),
     )
-    return Simulate(
+    sim = Simulate(
         grid_shape=(grid, grid),
         drivers=[driver],
         wavespeed=1.0,
         gridstep=1.0,
         courant=0.5,
+        active_region=active,
     )
-
-
-def time_one_run(grid: int, steps: int) -> float:
-    sim = build_sim(grid)
+    if obstacles:
+        mask = np.zeros((grid, grid), dtype=bool)
+        mask[grid // 8 : grid // 8 + grid // 4, grid // 8 : grid // 2] = True
+        mask[grid * 5 // 8 : grid * 7 // 8, grid // 2 : grid * 7 // 8] = True
+        sim.set_obstacle_mask(mask)
+    return sim
+
+
+def time_one_run(
+    grid: int,
+    steps: int,
+    mode: str = "step",
+    obstacles: bool = False,
+    active: bool = False,
+    time_block: Optional[int] = None,
+) -> float:
+    sim = build_sim(grid, obstacles, active)
     t0 = time.perf_counter()
-    for _ in range(steps):
-        sim.step()
+    if mode == "run":
+        sim.run(steps)
+    elif mode == "blocked":
+        sim.run_blocked(steps, time_block)
+    else:
+        for _ in range(steps):
+            sim.step()
     return time.perf_counter() - t0
 
 
@@ -54,14 +92,24 @@ def main() -> None:
     parser.add_argument("--grid", type=int, default=512)
     parser.add_argument("--steps", type=int, default=1000)
     parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--mode", choices=["step", "run", "blocked"], default="step")
+    parser.add_argument("--time-block", type=int, default=None)
+    parser.add_argument("--obstacles", action="store_true")
+    parser.add_argument("--active-region", action="store_true")
     args = parser.parse_args()
 
-    times_s = [time_one_run(args.grid, args.steps) for _ in range(args.trials)]
+    times_s = [
+        time_one_run(
+            args.grid, args.steps, args.mode, args.obstacles, args.active_region, args.time_block
+        )
+        for _ in range(args.trials)
+    ]
     times_ms = [round(t * 1000, 3) for t in times_s]
     median_ms = round(statistics.median(times_ms), 3)
     print(
         f"BENCH median_ms={median_ms}  trials_ms={times_ms}  "
-        f"steps={args.steps}  grid={args.grid}"
+        f"steps={args.steps}  grid={args.grid}  mode={args.mode}  obstacles={args.obstacles}  "
+        f"active={args.active_region}  time_block={args.time_block}"
     )
 
 
@@ -2,7 +2,8 @@
 
 Sweeps a list of cubic grid sizes and prints one line per size:
 
-    BENCH_3D grid=N median_ms=<float>  trials_ms=[t1, t2, ...]  steps=<int>
+    BENCH_3D grid=N median_ms=<float>  trials_ms=[t1, t2, ...]  steps=<int>  memory_mode=<str>
+        mode=<str>  time_block=<int|None>
 
 Run with `--grids 32 64 100 128 200` (or any subset). Defaults to a sweep
 that maps the visualisation candidates discussed in the project plan:
@@ -15,6 +16,14 @@ The first trial of every grid size absorbs any one-time JIT compile cost
 (the @njit kernel is cached across runs by ``cache=True`` in calculate.py
 so subsequent invocations of this script are fast). ``--trials`` >= 5
 makes the median robust against that warm-up and against scheduler noise.
+
+``--memory-mode two_buffer`` times ``Simulate(memory_mode="two_buffer")``
+(in-place kernels, two field buffers instead of three).
+
+``--mode`` picks what is timed: a Python loop over ``step()`` (default),
+the compiled ``run(steps)``, or ``run_blocked(steps, time_block)``, the
+temporally blocked run (``--time-block``, default
+``Simulate._TIME_BLOCK``).
 """
 
 from __future__ import annotations
@@ -24,6 +33,7 @@ import statistics
 import sys
 import time
 from pathlib import Path
+from typing import Optional
 
 ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT / "src"))
@@ -36,7 +46,7 @@ DEFAULT_GRIDS = [32, 64, 100, 128]
 LARGE_GRIDS = [200]
 
 
-def build_sim(grid: int) -> Simulate:
+def build_sim(grid: int, memory_mode: str = "three_buffer") -> Simulate:
     return Simulate(
         grid_shape=(grid, grid, grid),
         drivers=[
@@ -48,14 +58,26 @@ def build_sim(grid: int) -> Simulate:
         wavespeed=1.0,
         gridstep=1.0,
         courant=0.5,
+        memory_mode=memory_mode,
     )
 
 
-def time_one_run(grid: int, steps: int) -> float:
-    sim = build_sim(grid)
+def time_one_run(
+    grid: int,
+    steps: int,
+    memory_mode: str = "three_buffer",
+    mode: str = "step",
+    time_block: Optional[int] = None,
+) -> float:
+    sim = build_sim(grid, memory_mode)
     t0 = time.perf_counter()
-    for _ in range(steps):
-        sim.step()
+    if mode == "run":
+        sim.run(steps)
+    elif mode == "blocked":
+        sim.run_blocked(steps, time_block)
+    else:
+        for _ in range(steps):
+            sim.step()
     return time.perf_counter() - t0
 
 
@@ -75,6 +97,11 @@ def main() -> None:
     )
     parser.add_argument("--steps", type=int, default=50)
     parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument(
+        "--memory-mode", choices=["three_buffer", "two_buffer"], default="three_buffer"
+    )
+    parser.add_argument("--mode", choices=["step", "run", "blocked"], default="step")
+    parser.add_argument("--time-block", type=int, default=None)
     args = parser.parse_args()
 
     grids = list(args.grids) if args.grids is not None else list(DEFAULT_GRIDS)
@@ -82,13 +109,17 @@ def main() -> None:
         grids.extend(LARGE_GRIDS)
 
     for grid in grids:
-        times_s = [time_one_run(grid, args.steps) for _ in range(args.trials)]
+        times_s = [
+            time_one_run(grid, args.steps, args.memory_mode, args.mode, args.time_block)
+            for _ in range(args.trials)
+        ]
         times_ms = [round(t * 1000.0, 3) for t in times_s]
         median_ms = round(statistics.median(times_ms), 3)
         per_step_ms = round(median_ms / args.steps, 3)
         print(
             f"BENCH_3D grid={grid} median_ms={median_ms} per_step_ms={per_step_ms} "
-            f"trials_ms={times_ms}  steps={args.steps}"
+            f"trials_ms={times_ms}  steps={args.steps}  memory_mode={args.memory_mode}  "
+            f"mode={args.mode}  time_block={args.time_block}"
         )
 
 
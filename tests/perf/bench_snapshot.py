@@ -0,0 +1,95 @@
+"""Save / restore throughput of ``Simulate.save_state`` / ``load_state``.
+
+For each cubic grid, steps a ``Simulate`` a little, then times
+``save_state``, ``load_state`` alone, ``load_state`` followed by a read of
+every byte of ``p`` and ``p_prev`` (which is when the mapped pages come
+in), and that read on the bare file maps (``snapshot.read_state``,
+without building a ``Simulate``). ``np.save`` / ``np.load`` of the same two fields is the
+reference. One line per operation:
+
+    BENCH_SNAPSHOT grid=N op=<save|load|load_touch|map_touch|np_save|np_load> ms=<float>
+        gb_per_s=<float>  mb=<float>
+
+``gb_per_s`` is the size of the two fields over the time. The files go
+to ``--directory`` (default: a temporary directory). Without root the
+page cache cannot be dropped between trials, so the reads are served
+from memory unless the grid exceeds it: these are upper bounds on what
+the disk would allow, and show the format's own overhead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.snapshot import read_state  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+DEFAULT_GRIDS = [128, 256]
+
+
+def median_ms(fn, trials: int) -> float:
+    times_s = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        fn()
+        times_s.append(time.perf_counter() - t0)
+    return statistics.median(times_s) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grids", nargs="+", type=int, default=DEFAULT_GRIDS)
+    parser.add_argument("--directory", type=Path, default=None)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as tmp:
+        for grid in args.grids:
+            sim = Simulate(
+                grid_shape=(grid, grid, grid),
+                drivers=[Driver((grid // 2, grid // 2, grid // 2), RickerWavelet(5.0, 0.1, 20.0))],
+                autotune=False,
+            )
+            sim.run(5)
+            path = Path(tmp) / f"{grid}.state"
+            npz = Path(tmp) / f"{grid}.npz"
+            mb = (sim.p.nbytes + sim.p_prev.nbytes) / 1e6
+
+            def load_touch() -> None:
+                loaded = Simulate.load_state(path, autotune=False)
+                float(loaded.p.sum()) + float(loaded.p_prev.sum())
+
+            def map_touch() -> None:
+                arrays = read_state(path)[2]
+                float(arrays["p"].sum()) + float(arrays["p_prev"].sum())
+
+            ops = {
+                "save": lambda: sim.save_state(path),
+                "load": lambda: Simulate.load_state(path, autotune=False),
+                "load_touch": load_touch,
+                "map_touch": map_touch,
+                "np_save": lambda: np.savez(npz, p=sim.p, p_prev=sim.p_prev),
+                "np_load": lambda: dict(np.load(npz)),
+            }
+            for op, fn in ops.items():
+                ms = median_ms(fn, args.trials)
+                print(
+                    f"BENCH_SNAPSHOT grid={grid} op={op} ms={ms:.3f}  "
+                    f"gb_per_s={mb / ms:.3f}  mb={mb:.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
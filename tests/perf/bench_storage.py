@@ -0,0 +1,102 @@
+"""Accuracy and speed report for 16-bit field storage (``storage_dtype``).
+
+Two scenarios, one line per storage dtype:
+
+* ``2D``: the 200x200 / 200-step sanity run of ``make_reference.py``,
+  scored against ``reference.npz`` (the float32 baseline snapshot).
+* ``3D``: an N^3 room (``--grid``, default 128) with a centred Ricker
+  driver, run for ``--steps`` steps and scored against the float32
+  ``Simulate`` on the same room.
+
+    BENCH_STORAGE scenario=<2D|3D> dtype=<str> max_abs=<float> l2_rel=<float>
+        peak=<float> per_step_ms=<float> field_mb=<float>
+
+``peak`` is ``max |p|`` of the reference field, for scale. ``per_step_ms``
+is the median of ``--trials`` timed ``run()`` calls (3D only; the 2D run
+is too short to time). ``field_mb`` counts the allocated field buffers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+DTYPES = ("float32", "float16", "bfloat16")
+
+
+def build_sim(grid_shape: Tuple[int, ...], storage_dtype: str) -> Simulate:
+    return Simulate(
+        grid_shape=grid_shape,
+        drivers=[
+            Driver(
+                position=tuple(s // 2 for s in grid_shape),
+                waveform=RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0),
+            )
+        ],
+        wavespeed=1.0,
+        gridstep=1.0,
+        courant=0.5,
+        storage_dtype=storage_dtype,
+    )
+
+
+def field_mb(sim: Simulate) -> float:
+    return sum(buf.nbytes for buf in sim._field_buffers()) / 2**20
+
+
+def report(scenario: str, dtype: str, ref: np.ndarray, p: np.ndarray, ms: float, mb: float) -> None:
+    diff = p.astype(np.float64) - ref.astype(np.float64)
+    max_abs = float(np.max(np.abs(diff)))
+    l2_rel = float(np.linalg.norm(diff) / (np.linalg.norm(ref) or 1.0))
+    peak = float(np.max(np.abs(ref)))
+    print(
+        f"BENCH_STORAGE scenario={scenario} dtype={dtype} max_abs={max_abs:.3e} "
+        f"l2_rel={l2_rel:.3e} peak={peak:.3e} per_step_ms={ms:.3f} field_mb={mb:.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", type=int, default=128)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+
+    ref = np.load(Path(__file__).parent / "reference.npz")["p"]
+    for dtype in DTYPES:
+        sim = build_sim((200, 200), dtype)
+        for _ in range(200):
+            sim.step()
+        report("2D", dtype, ref, sim.p_host(), float("nan"), field_mb(sim))
+
+    grid = (args.grid,) * 3
+    ref3 = None
+    for dtype in DTYPES:
+        trials = []
+        for _ in range(args.trials):
+            sim = build_sim(grid, dtype)
+            sim.run(1)  # compile outside the timed window
+            t0 = time.perf_counter()
+            sim.run(args.steps - 1)
+            trials.append((time.perf_counter() - t0) * 1000.0 / (args.steps - 1))
+        p = sim.p_host().copy()
+        if ref3 is None:
+            ref3 = p
+        report("3D", dtype, ref3, p, statistics.median(trials), field_mb(sim))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Correctness gate for the kernel autotuner (``autotune.py``).
+
+Five parts, all against a throwaway cache file:
+
+1. Keys: grids of similar size share a bucket; dimensionality, memory
+   mode and storage dtype do not; grids past the largest proxy share
+   the top bucket; batches key on member and batch size.
+2. Cache: by default a ``run()`` neither tunes nor writes; with
+   ``autotune=True`` the first ``run()`` tunes on a proxy no larger
+   than ``_MAX_PROXY_CELLS`` and writes the winner under this machine's
+   fingerprint; a fresh process-level lookup (``autotune=None``) reads
+   it back without re-tuning; entries for other machines and files of
+   another cache version are ignored; ``ACOUSTIC_AUTOTUNE=0`` neither
+   tunes nor writes. ``main`` tunes from the command line.
+3. Configs: every launch configuration the tuner can pick (thread
+   count, serial build, temporal blocking with small and large slabs)
+   must leave ``Simulate`` equal to the untuned engine (by value: the
+   serial build may write -0.0 for +0.0 on obstacles), through
+   ``run()``, ``record()`` and ``run_blocked()``, in 2D and 3D, both
+   memory modes and 16-bit storage.
+4. Batch: ``BatchSimulate(autotune=True)`` tunes and caches its own
+   bucket, and every configuration records what the default does.
+5. Threads: the numba thread count is restored after each compiled call.
+
+Prints one grep-able line per scenario:
+
+    CHECK_AUTOTUNE_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numba
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation import autotune  # noqa: E402
+from acoustic_system.simulation.autotune import KernelConfig  # noqa: E402
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import GaussianPulse, RickerWavelet  # noqa: E402
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_AUTOTUNE_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_AUTOTUNE_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def build(grid_shape: Tuple[int, ...], autotune: Optional[bool] = False, **kwargs) -> Simulate:
+    n = grid_shape[0]
+    sim = Simulate(
+        grid_shape=grid_shape,
+        drivers=[
+            Driver(tuple(n // 3 for _ in grid_shape), RickerWavelet(5.0, 0.1, 15.0)),
+            Driver((0,) + tuple(n // 2 for _ in grid_shape[1:]), RickerWavelet(1.0, 0.15, 10.0)),
+            Driver(tuple(2 * n // 3 for _ in grid_shape), GaussianPulse(3.0, 30.0, 2.0)),
+        ],
+        courant=0.5,
+        autotune=autotune,
+        **kwargs,
+    )
+    mask = np.zeros(grid_shape, dtype=bool)
+    mask[tuple(slice(n // 2, n // 2 + n // 6) for _ in grid_shape)] = True
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def check_keys() -> None:
+    key = autotune.bucket_key
+    if key(2, "three_buffer", "float32", (200, 200)) != key(
+        2, "three_buffer", "float32", (201, 199)
+    ):
+        fail("KEYS", "neighbouring grid sizes fall in different buckets")
+    keys = {
+        key(2, "three_buffer", "float32", (64, 64)),
+        key(3, "three_buffer", "float32", (16, 16, 16)),
+        key(2, "two_buffer", "float32", (64, 64)),
+        key(2, "two_buffer", "float16", (64, 64)),
+        key(2, "three_buffer", "float32", (256, 256)),
+    }
+    if len(keys) != 5:
+        fail("KEYS", "distinct grid kinds share a bucket")
+    top = key(3, "three_buffer", "float32", (1024, 1024, 1024))
+    if top != key(3, "three_buffer", "float32", (256, 256, 256)):
+        fail("KEYS", "grids past the largest proxy do not share the top bucket")
+    batch = autotune.batch_key
+    if batch(2, (64, 64), 32) == batch(2, (64, 64), 4) or batch(2, (64, 64), 32) == key(
+        2, "three_buffer", "float32", (64, 64)
+    ):
+        fail("KEYS", "batch buckets collide")
+    ok("KEYS")
+
+
+def check_cache(path: Path) -> None:
+    os.environ["ACOUSTIC_AUTOTUNE_CACHE"] = str(path)
+    other = {"2d/three_buffer/float32/2^12": {"threads": 99, "parallel": False}}
+    version = autotune._CACHE_VERSION
+    path.write_text(json.dumps({"version": version, "machines": {"someone-else": other}}))
+    autotune.clear_memory_cache()
+
+    untouched = path.read_text()
+    plain = build((64, 64), autotune=None)
+    plain.run(5)
+    if path.read_text() != untouched or plain._config != autotune.default_config():
+        fail("CACHE", "a default engine tuned or wrote the cache")
+
+    sim = build((64, 64), autotune=True)
+    sim.run(5)
+    data = json.loads(path.read_text())
+    entries = data["machines"].get(autotune.machine_fingerprint(), {})
+    key = autotune.bucket_key(2, "three_buffer", "float32", (64, 64))
+    if key not in entries or sim._config is None:
+        fail("CACHE", "tuned entry was not written under this machine's fingerprint")
+    if data["machines"]["someone-else"] != other:
+        fail("CACHE", "another machine's entries were lost")
+    if sim._config.threads == 99 or not {"ms_per_step", "grid"} <= set(entries[key]):
+        fail("CACHE", "tuned entry is incomplete or came from another machine")
+
+    tune = autotune.tune
+    autotune.tune = lambda sim: fail("CACHE", "re-tuned a cached bucket")  # type: ignore
+    autotune.clear_memory_cache()
+    again = build((63, 65), autotune=None)
+    again.run(2)
+    autotune.tune = tune
+    if again._config != sim._config:
+        fail("CACHE", "cached entry read back differently")
+
+    # A grid past the largest proxy is tuned at the proxy's size.
+    cap = autotune._MAX_PROXY_CELLS
+    autotune._MAX_PROXY_CELLS = 1 << 10
+    large = build((96, 96), autotune=True)
+    large.run(2)
+    autotune._MAX_PROXY_CELLS = cap
+    entry = json.loads(path.read_text())["machines"][autotune.machine_fingerprint()]
+    proxy = entry.get("2d/three_buffer/float32/2^10", {}).get("grid")
+    if proxy is None or int(np.prod(proxy)) > 1 << 10:
+        fail("CACHE", f"a large grid was tuned on {proxy}, not a bounded proxy")
+
+    autotune.clear_memory_cache()
+    with contextlib.redirect_stdout(io.StringIO()):
+        autotune.main(["20x20x20", "--batch", "8"])
+    entries = json.loads(path.read_text())["machines"][autotune.machine_fingerprint()]
+    cli = {autotune.bucket_key(3, "three_buffer", "float32", (20, 20, 20))}
+    cli.add(autotune.batch_key(3, (20, 20, 20), 8))
+    if not cli <= set(entries):
+        fail("CACHE", "the command line did not tune its buckets")
+
+    path.write_text(json.dumps({"version": 0, "machines": data["machines"]}))
+    autotune.clear_memory_cache()
+    if autotune._machine_entries():
+        fail("CACHE", "entries from another cache version were used")
+
+    path.unlink()
+    autotune.clear_memory_cache()
+    os.environ["ACOUSTIC_AUTOTUNE"] = "0"
+    off = build((64, 64), autotune=True)
+    off.run(3)
+    del os.environ["ACOUSTIC_AUTOTUNE"]
+    if path.exists() or off._config != autotune.default_config():
+        fail("CACHE", "ACOUSTIC_AUTOTUNE=0 still tuned")
+    ok("CACHE")
+
+
+CONFIGS = (
+    KernelConfig(threads=1),
+    KernelConfig(threads=1, parallel=False),
+    KernelConfig(threads=numba.config.NUMBA_NUM_THREADS, time_block=3, tile_bytes=0),
+    KernelConfig(threads=1, parallel=False, time_block=2, tile_bytes=8 << 20),
+)
+
+
+def check_configs(name: str, grid_shape: Tuple[int, ...], **kwargs) -> None:
+    sensors = [tuple(s // 4 for s in grid_shape), tuple(s - 2 for s in grid_shape)]
+    ref = build(grid_shape, **kwargs)
+    ref.run(17)
+    ref_rec = ref.record(11, sensors, record_step=2)
+    ref.run_blocked(6)
+    threads = numba.get_num_threads()
+    for config in CONFIGS:
+        if "storage_dtype" in kwargs and config.time_block > 1:
+            continue  # no blocked kernel for 16-bit storage
+        sim = build(grid_shape, **kwargs)
+        sim._config = config
+        sim.run(17)
+        rec = sim.record(11, sensors, record_step=2)
+        sim.run_blocked(6)
+        if numba.get_num_threads() != threads:
+            fail("THREADS", f"thread count not restored after {config}")
+        # Compared by value: the serial build may zero an obstacle cell
+        # as -0.0 where the parallel one writes +0.0.
+        p_prev = (
+            sim.p_prev if sim._storage_lut is None else sim._storage_lut[sim.p_prev.view(np.uint16)]
+        )
+        ref_prev = (
+            ref.p_prev if ref._storage_lut is None else ref._storage_lut[ref.p_prev.view(np.uint16)]
+        )
+        same = (
+            np.array_equal(rec, ref_rec)
+            and np.array_equal(sim.p_host(), ref.p_host())
+            and np.array_equal(p_prev, ref_prev)
+        )
+        if not same or sim.step_count != ref.step_count:
+            max_abs = float(np.max(np.abs(sim.p_host() - ref.p_host())))
+            fail(name, f"{config} differs from the untuned engine", max_abs)
+    ok(name)
+
+
+def check_batch(path: Path) -> None:
+    os.environ["ACOUSTIC_AUTOTUNE_CACHE"] = str(path)
+    autotune.clear_memory_cache()
+    grid, members = (48, 40), 6
+
+    def batch(config) -> BatchSimulate:
+        b = BatchSimulate(grid, members, courant=0.5, autotune=config is None)
+        if config is not None:
+            b._config = config
+        for m in range(members):
+            b.set_drivers(m, [Driver((10 + m, 12), RickerWavelet(2.0, 0.1, 12.0))])
+            b.set_sensors(m, [(30, 30), (5, 35 - m)])
+            mask = np.zeros(grid, dtype=bool)
+            mask[20:26, 8 + m : 20 + m] = True
+            b.set_obstacle_mask(m, mask)
+        return b
+
+    tuned = batch(None)
+    ref = batch(autotune.default_config()).run(60, record_step=3)
+    got = tuned.run(60, record_step=3)
+    entries = json.loads(path.read_text())["machines"][autotune.machine_fingerprint()]
+    if autotune.batch_key(2, grid, members) not in entries:
+        fail("BATCH", "BatchSimulate(autotune=True) did not cache its bucket")
+    threads = numba.get_num_threads()
+    for config in (tuned._config,) + CONFIGS[:2]:
+        out = batch(config).run(60, record_step=3)
+        if numba.get_num_threads() != threads:
+            fail("THREADS", f"thread count not restored after a batch run with {config}")
+        if not np.array_equal(out, ref):
+            fail(
+                "BATCH",
+                f"{config} records differently from the default",
+                float(np.max(abs(out - ref))),
+            )
+    if not np.array_equal(got, ref):
+        fail("BATCH", "the tuned batch records differently from the default")
+    ok("BATCH")
+
+
+def main() -> None:
+    check_keys()
+    with tempfile.TemporaryDirectory() as tmp:
+        check_cache(Path(tmp) / "autotune.json")
+        check_batch(Path(tmp) / "autotune.json")
+    check_configs("2D", (96, 80))
+    check_configs("2D_TWO_BUFFER", (96, 80), memory_mode="two_buffer")
+    check_configs("3D", (30, 28, 26))
+    check_configs("3D_ACTIVE", (30, 28, 26), active_region=True)
+    check_configs("2D_BF16", (64, 64), storage_dtype="bfloat16")
+    ok("THREADS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Correctness gate for the batched engine (``BatchSimulate``).
+
+Member ``b`` of a batch must record exactly what a standalone
+``Simulate`` + ``run_with_sensors`` records for the same room, driver
+and sensors. The gate builds B rooms with *different* obstacle masks,
+driver positions, waveforms, driver counts and sensor counts (so the
+padding of the per-member tables is exercised), runs them once as a
+batch and once one by one, and compares recordings and final fields.
+
+A second pass runs after ``reset()`` with ``record_step=3`` to cover
+decimated recording and state reuse across runs.
+
+Prints one grep-able line per scenario:
+
+    CHECK_BATCH_<name> pass=true|false  max_abs=<float>  l2_rel=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    random_free_position,
+    run_with_sensors,
+)
+from acoustic_system.simulation.setup import Driver, Sensor  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+ATOL = 1e-4
+RTOL = 1e-3
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan"), l2_rel: float = float("nan")) -> None:
+    print(
+        f"CHECK_BATCH_{name} pass=false  max_abs={max_abs:.3e}  l2_rel={l2_rel:.3e}  failure={msg}"
+    )
+    sys.exit(1)
+
+
+def compare(name: str, a: np.ndarray, b: np.ndarray) -> None:
+    diff = a.astype(np.float64) - b.astype(np.float64)
+    max_abs = float(np.max(np.abs(diff)))
+    base = float(np.linalg.norm(b.astype(np.float64))) or 1.0
+    l2_rel = float(np.linalg.norm(diff) / base)
+    if not (max_abs < ATOL and l2_rel < RTOL):
+        fail(name, f"divergence (atol={ATOL:.0e}, rtol={RTOL:.0e})", max_abs, l2_rel)
+    print(f"CHECK_BATCH_{name} pass=true   max_abs={max_abs:.3e}  l2_rel={l2_rel:.3e}  failure=-")
+
+
+def make_scenes(
+    grid_shape: Tuple[int, ...], n: int, rng: np.random.Generator
+) -> List[Tuple[np.ndarray, List[Driver], List[Tuple[int, ...]]]]:
+    scenes = []
+    for b in range(n):
+        if len(grid_shape) == 2:
+            mask = generate_random_obstacles(
+                grid_shape, n_obstacles=2, min_size=3, max_size=8, rng=rng
+            )
+            free = lambda: random_free_position(grid_shape, mask, rng)  # noqa: E731
+        else:
+            mask = np.zeros(grid_shape, dtype=bool)
+            lo = 2 + b
+            mask[lo : lo + 4, lo : lo + 4, lo : lo + 4] = True
+            free = lambda: tuple(int(rng.integers(10, s - 2)) for s in grid_shape)  # noqa: E731
+        drivers = [
+            Driver(free(), RickerWavelet(amplitude=5.0, frequency=0.08 + 0.01 * k, delay=15.0))
+            for k in range(1 + b % 2)
+        ]
+        sensors = [free() for _ in range(1 + (b + 1) % 3)]
+        scenes.append((mask, drivers, sensors))
+    return scenes
+
+
+def run_scenario(name: str, grid_shape: Tuple[int, ...], n: int, steps: int) -> None:
+    scenes = make_scenes(grid_shape, n, np.random.default_rng(7))
+    batch = BatchSimulate(grid_shape, batch_size=n, courant=0.5)
+    singles = []
+    for b, (mask, drivers, sensors) in enumerate(scenes):
+        batch.set_obstacle_mask(b, mask)
+        batch.set_drivers(b, drivers)
+        batch.set_sensors(b, sensors)
+        sim = Simulate(grid_shape=grid_shape, drivers=drivers, courant=0.5)
+        sim.set_obstacle_mask(mask)
+        singles.append(sim)
+
+    for record_step, tag in ((1, ""), (3, "_RESET")):
+        if tag:
+            batch.reset()
+            for sim in singles:
+                sim.reset()
+        rec = batch.run(steps, record_step=record_step)
+        for b, (_, _, sensors) in enumerate(scenes):
+            ref = run_with_sensors(
+                singles[b], steps, [Sensor(position=p) for p in sensors], record_step=record_step
+            )
+            if rec[b, :, : len(sensors)].shape != ref.shape:
+                fail(name + tag, f"member {b} shape {rec[b].shape} vs {ref.shape}")
+            diff = float(np.max(np.abs(rec[b, :, : len(sensors)] - ref)))
+            if diff >= ATOL:
+                fail(name + tag, f"member {b} recording diverges", max_abs=diff)
+        compare(name + tag, batch.p, np.stack([s.p for s in singles]))
+        if batch.time != singles[0].time or batch.step_count != singles[0].step_count:
+            fail(name + tag, "clock mismatch")
+
+
+def main() -> None:
+    run_scenario("2D", (48, 48), n=5, steps=160)
+    run_scenario("3D", (24, 24, 24), n=3, steps=60)
+
+
+if __name__ == "__main__":
+    main()
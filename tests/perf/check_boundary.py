@@ -0,0 +1,260 @@
+"""Correctness gate for ``Simulate(boundary=...)``.
+
+Five parts:
+
+1. Coefficients: ``mur_coefficient`` matches its closed form and
+   ``pml_coefficients`` is neutral (``b = 1``, ``a = 0``) in the
+   interior, mirror-symmetric, graded towards the walls and reduces to
+   ``a = b - 1`` without the frequency shift.
+2. Identity: a PML whose coefficients are forced neutral reproduces the
+   Dirichlet engine (drivers and obstacles included) to round-off, so
+   the PML kernels differ from the plain ones only through the layer.
+3. Reflection: a pulse in a small absorbing domain, recorded at two
+   receivers near the walls (one off-axis), against the same receivers
+   in a domain padded until its echoes arrive after the window. The
+   unpadded Dirichlet domain is recorded too, as the scale of the
+   problem.
+4. Stability: a random field with an obstacle reaching into the layer
+   stays bounded for 3000 steps, and a smooth one is absorbed (without
+   the frequency shift a static remnant stays frozen in the PML).
+5. Plumbing: ``run()`` and ``record()`` match a ``step()`` loop,
+   ``reset()`` clears the PML state, and unsupported combinations raise
+   ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_BOUNDARY_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import scipy as sp
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.boundary import (  # noqa: E402
+    mur_coefficient,
+    pml_coefficients,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+# Largest receiver error allowed, relative to the reference peak.
+TOLERANCE = {("pml", 16): 2e-4, ("pml", 8): 1e-3, ("mur", 0): 0.15}
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_BOUNDARY_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_BOUNDARY_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_coefficients() -> None:
+    max_abs = abs(mur_coefficient(0.5) + 1.0 / 3.0)
+    n, width = 50, 8
+    coeffs = pml_coefficients(n, width, 0.6)
+    b_cell, a_cell, b_face, a_face = coeffs.astype(np.float64)
+    interior = slice(width, n - 1 - width)
+    if coeffs.shape != (4, n) or coeffs.dtype != np.float32:
+        fail("COEFFICIENTS", f"shape {coeffs.shape} / dtype {coeffs.dtype}")
+    if np.any(b_cell[interior] != 1.0) or np.any(a_face[interior] != 0.0):
+        fail("COEFFICIENTS", "damping inside the interior")
+    if not np.array_equal(b_cell, b_cell[::-1]) or not np.array_equal(b_face[:-1], b_face[-2::-1]):
+        fail("COEFFICIENTS", "profile not mirror-symmetric")
+    if not (np.all(np.diff(b_cell[: width + 1]) > 0) and b_face[0] < b_cell[1] < b_face[1]):
+        fail("COEFFICIENTS", "profile not graded towards the wall")
+    # The frequency shift keeps a strictly between b - 1 and 0 in the layer.
+    layer = np.r_[1:width, n - width : n - 1]
+    for b, a in ((b_cell, a_cell), (b_face, a_face)):
+        if not (np.all(a[layer] < 0.0) and np.all(a[layer] > b[layer] - 1.0)):
+            fail("COEFFICIENTS", "a outside (b - 1, 0) in the layer")
+    unshifted = pml_coefficients(n, width, 0.6, alpha=0.0).astype(np.float64)
+    max_abs = max(max_abs, float(np.max(np.abs(unshifted[1::2] - (unshifted[0::2] - 1.0)))))
+    if max_abs > 1e-6:
+        fail("COEFFICIENTS", "a != b - 1 without a shift, or wrong Mur coefficient", max_abs)
+    ok("COEFFICIENTS", max_abs)
+
+
+def build(shape: Tuple[int, ...], **kwargs) -> Simulate:
+    centre = tuple(s // 2 for s in shape)
+    return Simulate(
+        grid_shape=shape,
+        drivers=[Driver(centre, RickerWavelet(1.0, 0.08, 20.0))],
+        autotune=False,
+        **kwargs,
+    )
+
+
+def with_obstacle(sim: Simulate) -> Simulate:
+    shape = sim.grid_shape
+    sim.add_driver(Driver(tuple(s // 4 for s in shape), RickerWavelet(2.0, 0.12, 12.0)))
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(s // 2 + 3, s // 2 + 8) for s in shape)] = True
+    mask[(slice(0, 6),) + tuple(slice(s // 3, s // 3 + 4) for s in shape[1:])] = True
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def check_identity(shape: Tuple[int, ...]) -> None:
+    name = f"IDENTITY_{len(shape)}D"
+    plain = with_obstacle(build(shape))
+    pml = with_obstacle(build(shape, boundary="pml", boundary_width=6))
+    for coeffs in pml._pml_coeffs:
+        coeffs[0::2] = 1.0
+        coeffs[1::2] = 0.0
+    for _ in range(150):
+        plain.step()
+        pml.step()
+    max_abs = float(np.max(np.abs(plain.p - pml.p)))
+    if not max_abs < 1e-5 * float(np.max(np.abs(plain.p))) or not np.any(plain.p):
+        fail(name, "neutral PML differs from the Dirichlet engine", max_abs)
+    ok(name, max_abs)
+
+
+def receivers(shape: Tuple[int, ...], n: int) -> List[Tuple[int, ...]]:
+    c = shape[0] // 2
+    dims = len(shape)
+    return [(c + n // 2 - 2,) + (c,) * (dims - 1), (c + n // 3,) * dims]
+
+
+def check_reflection(dims: int, n: int, n_steps: int) -> None:
+    # Padded so echoes from the far walls arrive after the window.
+    big = (n + 2 * n_steps,) * dims
+    ref = build(big).record(n_steps, receivers(big, n)).astype(np.float64)
+    scale = np.max(np.abs(ref), axis=0)
+
+    def error(boundary: str, width: int) -> float:
+        kwargs = dict(boundary=boundary)
+        if boundary == "pml":
+            kwargs["boundary_width"] = width
+        shape = (n + 2 * width,) * dims
+        out = build(shape, **kwargs).record(n_steps, receivers(shape, n))
+        return float(np.max(np.max(np.abs(out - ref), axis=0) / scale))
+
+    unabsorbed = error("dirichlet", 0)
+    if not unabsorbed > 0.5:
+        fail(f"REFLECTION_{dims}D", f"window too short to see the walls ({unabsorbed:.2e})")
+    for (boundary, width), tol in TOLERANCE.items():
+        name = f"REFLECTION_{boundary.upper()}{width or ''}_{dims}D"
+        err = error(boundary, width)
+        # Mur's first-order condition is weakest at oblique incidence,
+        # worst on the 3D body diagonal.
+        if boundary == "mur" and dims == 3:
+            tol = 0.4
+        if not err < tol:
+            fail(name, f"receiver error {err:.2e} of the peak (limit {tol:.0e})", err)
+        ok(name, err)
+
+
+def check_stability() -> None:
+    shape = (64, 56)
+    rng = np.random.default_rng(1)
+    noise = rng.uniform(-1.0, 1.0, shape).astype(np.float32)
+    # Grid-scale noise barely propagates (zero group velocity at the
+    # Nyquist wavenumber), so absorption is judged on a smoothed copy.
+    smooth = sp.ndimage.gaussian_filter(noise, 3.0)
+    smooth /= np.max(np.abs(smooth))
+    for boundary in ("pml", "mur"):
+        name = f"STABILITY_{boundary.upper()}"
+        peaks = []
+        for field in (noise, smooth):
+            sim = Simulate(grid_shape=shape, boundary=boundary, boundary_width=8, autotune=False)
+            sim.p[...] = field
+            sim.p_prev[...] = field
+            mask = np.zeros(shape, dtype=bool)
+            mask[2:20, 20:24] = True
+            sim.set_obstacle_mask(mask)
+            peak = 0.0
+            for _ in range(30):
+                sim.run(100)
+                peak = max(peak, float(np.max(np.abs(sim.p))))
+            peaks.append(peak)
+        final = float(np.max(np.abs(sim.p)))
+        if not max(peaks) < 10.0:
+            fail(name, f"field grew to {max(peaks):.2e} in 3000 steps", max(peaks))
+        if not final < 0.02:
+            fail(name, f"smooth field not absorbed ({final:.2e} left)", final)
+        ok(name, final)
+
+
+def check_plumbing(boundary: str, shape: Tuple[int, ...]) -> None:
+    name = f"PLUMBING_{boundary.upper()}_{len(shape)}D"
+    stepped = with_obstacle(build(shape, boundary=boundary, boundary_width=5))
+    for _ in range(60):
+        stepped.step()
+    ran = with_obstacle(build(shape, boundary=boundary, boundary_width=5))
+    ran.run(45)
+    sensors = [tuple(s // 4 for s in shape), tuple(s - 3 for s in shape)]
+    rec = ran.record(15, sensors, record_step=3)
+    max_abs = float(np.max(np.abs(ran.p - stepped.p)))
+    if max_abs != 0.0 or ran.step_count != 60:
+        fail(name, "run()/record() differ from a step() loop", max_abs)
+    replay = with_obstacle(build(shape, boundary=boundary, boundary_width=5))
+    replay.run(45)
+    expected = []
+    for i in range(15):
+        replay.step()
+        if i % 3 == 0:
+            expected.append([replay.p[s] for s in sensors])
+    if not np.array_equal(rec, np.asarray(expected, dtype=np.float32)):
+        fail(name, "record() samples differ from the stepped field")
+    if np.any(stepped.p[stepped.obstacle_mask]) or not np.any(stepped.p):
+        fail(name, "obstacle cells not held at zero, or no field at all")
+    stepped.reset()
+    if any(np.any(buf) for buf in stepped._psi + stepped._zeta):
+        fail(name, "reset() left PML state behind")
+    stepped.run(60)
+    max_abs = float(np.max(np.abs(stepped.p - ran.p)))
+    if max_abs != 0.0:
+        fail(name, "a reset engine does not replay the first run", max_abs)
+    ok(name, max_abs)
+
+
+def check_args() -> None:
+    bad = (
+        dict(grid_shape=(40, 40), boundary="neumann"),
+        dict(grid_shape=(40,), boundary="mur"),
+        dict(grid_shape=(40, 40), boundary="pml", stencil="fourth_order"),
+        dict(grid_shape=(40, 40), boundary="mur", memory_mode="two_buffer"),
+        dict(grid_shape=(40, 40), boundary="pml", active_region=True),
+        dict(grid_shape=(40, 40), boundary="pml", storage_dtype="float16"),
+        dict(grid_shape=(40, 40), boundary="pml", boundary_width=0),
+        dict(grid_shape=(40, 34), boundary="pml", boundary_width=16),
+    )
+    for kwargs in bad:
+        try:
+            Simulate(**kwargs)
+        except ValueError:
+            continue
+        fail("ARGS", f"Simulate({kwargs}) was accepted")
+    default = Simulate(grid_shape=(40, 40))
+    if default.boundary != "dirichlet" or default._run_kernel is None:
+        fail("ARGS", "default boundary lost its compiled run loop")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_coefficients()
+    check_identity((48, 40))
+    check_identity((24, 20, 22))
+    check_reflection(2, 60, 250)
+    check_reflection(3, 24, 110)
+    check_stability()
+    for boundary in ("pml", "mur"):
+        check_plumbing(boundary, (48, 40))
+        check_plumbing(boundary, (24, 20, 22))
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Correctness gate for ``Simulate(workers=N)`` (multi-process slabs).
+
+Five parts:
+
+1. Slabs: ``slab_bounds`` covers every row once, in balanced slabs.
+2. Match: 2, 3 and 4 workers reproduce the single-process engine bit
+   for bit through ``run()``, ``step()`` and ``record()``, with
+   obstacles and drivers on slab edges and on an obstacle.
+3. Live geometry: ``set_obstacle``, ``set_obstacle_mask``,
+   ``clear_obstacles`` and ``reset()`` between runs still match.
+4. Failure: a killed worker raises ``RuntimeError`` promptly instead of
+   hanging, and ``close()`` releases the shared memory.
+5. Arguments: unsupported combinations raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_DECOMPOSE_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.decompose import slab_bounds  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+SHAPE = (30, 24, 26)
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_DECOMPOSE_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_DECOMPOSE_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def build(workers: int, shape: Tuple[int, ...] = SHAPE) -> Simulate:
+    # Drivers on the first and last rows of the 3-worker slabs, and one
+    # that the mask below puts on an obstacle.
+    return Simulate(
+        grid_shape=shape,
+        drivers=[
+            Driver((10, 12, 13), RickerWavelet(1.0, 0.1, 15.0)),
+            Driver((19, 5, 5), RickerWavelet(0.5, 0.12, 12.0)),
+            Driver((14, 10, 10), RickerWavelet(0.8, 0.08, 10.0)),
+        ],
+        autotune=False,
+        workers=workers,
+    )
+
+
+def obstacles() -> np.ndarray:
+    mask = np.zeros(SHAPE, dtype=bool)
+    mask[12:18, 8:14, 8:20] = True
+    mask[2:5, 18:22, 3:24] = True
+    return mask
+
+
+def check_slabs() -> None:
+    for n_rows in (1, 7, 30, 257):
+        for workers in range(1, min(n_rows, 9) + 1):
+            bounds = slab_bounds(n_rows, workers)
+            sizes = [hi - lo for lo, hi in bounds]
+            edges = [b for lo_hi in bounds for b in lo_hi]
+            if edges[0] != 0 or edges[-1] != n_rows or edges[1:-1:2] != edges[2:-1:2]:
+                fail("SLABS", f"{n_rows} rows / {workers}: {bounds} do not tile the rows")
+            if max(sizes) - min(sizes) > 1 or min(sizes) < 1:
+                fail("SLABS", f"{n_rows} rows / {workers}: unbalanced {sizes}")
+    ok("SLABS")
+
+
+def check_match(workers: int) -> None:
+    name = f"MATCH_W{workers}"
+    plain = build(1)
+    sim = build(workers)
+    positions = [(10, 12, 13), (9, 12, 13), (20, 5, 5), (25, 20, 3)]
+    traces = []
+    for s in (plain, sim):
+        s.set_obstacle_mask(obstacles())
+        s.run(37)
+        for _ in range(8):
+            s.step()
+        traces.append(s.record(29, positions, record_step=3))
+    sim.close()
+    max_abs = max(
+        float(np.max(np.abs(sim.p_host() - plain.p_host()))),
+        float(np.max(np.abs(sim.p_prev - plain.p_prev))),
+        float(np.max(np.abs(traces[1] - traces[0]))),
+    )
+    if max_abs != 0.0 or not np.any(plain.p):
+        fail(name, "fields differ from the single-process engine", max_abs)
+    if sim.time != plain.time or sim.step_count != plain.step_count:
+        fail(name, f"clock {sim.time}/{sim.step_count} != {plain.time}/{plain.step_count}")
+    ok(name, max_abs)
+
+
+def check_live_geometry() -> None:
+    plain = build(1)
+    sim = build(3)
+    max_abs = 0.0
+    for s in (plain, sim):
+        s.run(30)
+        # Obstacles across a slab edge, added to a moving field.
+        s.set_obstacle([(r, 12, k) for r in range(8, 13) for k in range(4, 9)])
+        s.run(20)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    for s in (plain, sim):
+        s.set_obstacle_mask(obstacles())
+        s.run(15)
+        s.set_obstacle([(14, 10, 10)], value=False)
+        s.run(15)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    for s in (plain, sim):
+        s.clear_obstacles()
+        s.run(12)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    for s in (plain, sim):
+        s.reset()
+        s.run(25)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    sim.close()
+    if max_abs != 0.0:
+        fail("LIVE_GEOMETRY", "fields differ after a geometry change", max_abs)
+    ok("LIVE_GEOMETRY", max_abs)
+
+
+def check_failure() -> None:
+    sim = build(3)
+    sim.run(5)
+    names = [block.name for block in sim._slabs._blocks]
+    sim._slabs._procs[1].kill()
+    start = time.perf_counter()
+    try:
+        sim.run(10)
+    except RuntimeError:
+        pass
+    else:
+        fail("FAILURE", "a killed worker went unnoticed")
+    elapsed = time.perf_counter() - start
+    if elapsed > 30.0:
+        fail("FAILURE", f"took {elapsed:.1f} s to notice a killed worker", elapsed)
+    try:
+        sim.step()
+    except RuntimeError:
+        pass
+    else:
+        fail("FAILURE", "stepping after the failure was accepted")
+    if any(Path("/dev/shm", name).exists() for name in names):
+        fail("FAILURE", "shared memory still linked after the failure")
+    if any(proc.is_alive() for proc in sim._slabs._procs):
+        fail("FAILURE", "workers still running after the failure")
+    ok("FAILURE", elapsed)
+
+
+def check_args() -> None:
+    bad = (
+        dict(workers=0),
+        dict(grid_shape=(40, 40), workers=2),
+        dict(workers=2, memory_mode="two_buffer"),
+        dict(workers=2, active_region=True),
+        dict(workers=2, stencil="fourth_order"),
+        dict(workers=2, boundary="mur"),
+        dict(workers=2, wavespeed_field=np.full(SHAPE, 0.5)),
+        dict(grid_shape=(3, 20, 20), workers=4),
+    )
+    for kwargs in bad:
+        kwargs.setdefault("grid_shape", SHAPE)
+        try:
+            Simulate(autotune=False, **kwargs)
+        except ValueError:
+            continue
+        fail("ARGS", f"Simulate({sorted(kwargs)}) was accepted")
+    sim = Simulate(grid_shape=SHAPE, workers=2)
+    try:
+        sim.set_wall_reflection(0.5)
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "set_wall_reflection accepted with workers > 1")
+    if sim._run_kernel is not None or sim._autotune:
+        fail("ARGS", "a decomposed grid bound a compiled run loop")
+    sim.close()
+    ok("ARGS")
+
+
+def main() -> None:
+    check_slabs()
+    for workers in (2, 3, 4):
+        check_match(workers)
+    check_live_geometry()
+    check_failure()
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
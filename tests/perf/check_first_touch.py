@@ -0,0 +1,139 @@
+"""Correctness gate for ``Simulate(first_touch=True)``.
+
+Three parts:
+
+1. Fill: ``first_touch_array`` / ``first_touch_fill`` give C-contiguous,
+   writable arrays of the requested shape, dtype and byte value, for
+   shapes from one row up.
+2. Identity: first-touched buffers step bit for bit like the default
+   ones through ``step()``, ``run()`` and ``record()``, in 1D to 4D,
+   in two-buffer mode and with 16-bit storage, with obstacles set by
+   mask and by cell.
+3. In place: geometry updates keep the first-touched arrays instead of
+   replacing them.
+
+Prints one grep-able line per scenario:
+
+    CHECK_FIRST_TOUCH_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.calculate import (  # noqa: E402
+    first_touch_array,
+    first_touch_fill,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_FIRST_TOUCH_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_FIRST_TOUCH_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_fill() -> None:
+    cases = (
+        ((1,), np.float32, 0),
+        ((2, 5), np.uint8, 1),
+        ((7, 3, 4), np.float32, 0),
+        ((5, 4, 3, 2), np.float16, 0),
+        ((33, 17), bool, 0),
+        ((9, 8), np.uint8, 1),
+    )
+    for shape, dtype, value in cases:
+        buf = first_touch_array(shape, dtype, value)
+        if buf.shape != shape or buf.dtype != np.dtype(dtype):
+            fail("FILL", f"{shape} {np.dtype(dtype)} came back {buf.shape} {buf.dtype}")
+        if not (buf.flags["C_CONTIGUOUS"] and buf.flags["WRITEABLE"]):
+            fail("FILL", f"{shape} {np.dtype(dtype)} is not a writable C-contiguous array")
+        if np.any(buf.view(np.uint8) != value):
+            fail("FILL", f"{shape} {np.dtype(dtype)} not filled with byte {value}")
+        buf.view(np.uint8)[...] = 7
+        first_touch_fill(buf, value)
+        if np.any(buf.view(np.uint8) != value):
+            fail("FILL", f"first_touch_fill left bytes of {shape} unset")
+    ok("FILL")
+
+
+def build(shape: Tuple[int, ...], **kwargs) -> Simulate:
+    return Simulate(
+        grid_shape=shape,
+        drivers=[
+            Driver(tuple(s // 3 for s in shape), RickerWavelet(1.0, 0.1, 15.0)),
+            Driver(tuple(s // 2 + 1 for s in shape), RickerWavelet(0.5, 0.12, 12.0)),
+        ],
+        autotune=False,
+        **kwargs,
+    )
+
+
+def check_identity(name: str, shape: Tuple[int, ...], **kwargs) -> None:
+    sims = [build(shape, first_touch=flag, **kwargs) for flag in (False, True)]
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(s // 2 - 2, s // 2) for s in shape)] = True
+    positions = [tuple(s // 4 for s in shape), tuple(s - 3 for s in shape)]
+    traces = []
+    for sim in sims:
+        # A copy each: the default mode keeps the caller's mask.
+        sim.set_obstacle_mask(mask.copy())
+        sim.run(23)
+        sim.set_obstacle([tuple(s // 3 + 2 for s in shape)])
+        for _ in range(6):
+            sim.step()
+        traces.append(sim.record(17, positions, record_step=2))
+    plain, touched = sims
+    max_abs = max(
+        float(np.max(np.abs(touched.p_host() - plain.p_host()))),
+        float(np.max(np.abs(traces[1] - traces[0]))),
+    )
+    if max_abs != 0.0 or not np.any(plain.p_host()):
+        fail(name, "first-touched buffers step differently", max_abs)
+    ok(name, max_abs)
+
+
+def check_in_place() -> None:
+    sim = build((40, 36, 30), first_touch=True)
+    arrays = (sim.obstacle_mask, sim._fluid)
+    mask = np.zeros(sim.grid_shape, dtype=bool)
+    mask[10:20, 5:15, 8:12] = True
+    sim.set_obstacle_mask(mask)
+    sim.clear_obstacles()
+    sim.set_obstacle([(3, 3, 3)])
+    if sim.obstacle_mask is not arrays[0] or sim._fluid is not arrays[1]:
+        fail("IN_PLACE", "a geometry update replaced a first-touched array")
+    if not sim.obstacle_mask[3, 3, 3] or sim._fluid[3, 3, 3] or sim.obstacle_mask.sum() != 1:
+        fail("IN_PLACE", "in-place geometry update lost cells")
+    mask[0, 0, 0] = True
+    if sim.obstacle_mask[0, 0, 0]:
+        fail("IN_PLACE", "the obstacle mask aliases the caller's array")
+    ok("IN_PLACE")
+
+
+def main() -> None:
+    check_fill()
+    check_identity("IDENTITY_1D", (301,))
+    check_identity("IDENTITY_2D", (64, 58))
+    check_identity("IDENTITY_3D", (30, 26, 22))
+    check_identity("IDENTITY_4D", (12, 11, 10, 9))
+    check_identity("TWO_BUFFER", (30, 26, 22), memory_mode="two_buffer")
+    check_identity("FLOAT16", (64, 58), storage_dtype="float16")
+    check_in_place()
+
+
+if __name__ == "__main__":
+    main()
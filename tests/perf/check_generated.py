@@ -0,0 +1,227 @@
+"""Correctness gate for the generated N-dimensional step kernels.
+
+Five parts:
+
+1. Weights: ``central_difference_weights`` matches the textbook
+   second-, fourth- and sixth-order tables and differentiates
+   polynomials up to its order exactly.
+2. Hand-written twins: the generated second-order 2D/3D kernels (plain
+   and masked) agree with ``fused_leapfrog_step_*`` on random fields.
+3. Other dimensionalities and orders: generated 1D to 4D kernels of
+   order 2, 4 and 6 against a NumPy stencil that reads an odd mirror
+   image beyond the walls, with the outer layer zeroed.
+4. 1D ``Simulate``: 300 steps with a driver, an obstacle and a driver
+   on the wall agree with the legacy ``scipy.ndimage.laplace`` step to
+   round-off (``ATOL`` relative to the field's peak), and ``step()`` only ever rotates the three
+   preallocated buffers.
+5. Arguments: odd or too-small orders and ``dims < 1`` are rejected.
+
+Prints one grep-able line per scenario:
+
+    CHECK_GENERATED_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import scipy as sp
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation import calculate  # noqa: E402
+from acoustic_system.simulation.calculate import (  # noqa: E402
+    central_difference_weights,
+    leapfrog_step_kernel,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.utils import set_edge_values  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+ATOL = 1e-5
+COEFF = np.float32(0.2)
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_GENERATED_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_GENERATED_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_weights() -> None:
+    tables = {
+        2: (-2.0, 1.0),
+        4: (-5.0 / 2.0, 4.0 / 3.0, -1.0 / 12.0),
+        6: (-49.0 / 18.0, 3.0 / 2.0, -3.0 / 20.0, 1.0 / 90.0),
+    }
+    for order, expected in tables.items():
+        if not np.allclose(central_difference_weights(order), expected, rtol=1e-14):
+            fail("WEIGHTS", f"order {order} weights differ from the textbook table")
+    for order in (2, 4, 6, 8):
+        w = np.asarray(central_difference_weights(order))
+        k = np.arange(1, len(w), dtype=np.float64)
+        # sum_k w_k ((x+k)^q + (x-k)^q) at x = 0, for even q; odd q cancel.
+        for q in range(0, order + 1, 2):
+            moment = (w[0] if q == 0 else 0.0) + 2.0 * float(np.sum(w[1:] * k**q))
+            if abs(moment - (2.0 if q == 2 else 0.0)) > 1e-9:
+                fail("WEIGHTS", f"order {order} is not exact on x^{q}")
+    ok("WEIGHTS")
+
+
+def fields(shape: Tuple[int, ...], seed: int = 0):
+    rng = np.random.default_rng(seed)
+    p = rng.standard_normal(shape).astype(np.float32)
+    p_prev = rng.standard_normal(shape).astype(np.float32)
+    fluid = (rng.random(shape) > 0.2).astype(np.uint8)
+    return p, p_prev, fluid
+
+
+def check_hand_written() -> None:
+    max_abs = 0.0
+    for shape, plain, masked in (
+        ((37, 29), calculate.fused_leapfrog_step_2d, calculate.fused_leapfrog_step_masked_2d),
+        ((17, 13, 21), calculate.fused_leapfrog_step_3d, calculate.fused_leapfrog_step_masked_3d),
+    ):
+        dims = len(shape)
+        if (
+            leapfrog_step_kernel(dims) is not plain
+            or leapfrog_step_kernel(dims, masked=True) is not masked
+        ):
+            fail("HAND_WRITTEN", f"{dims}D factory did not return the hand-written kernels")
+        p, p_prev, fluid = fields(shape)
+        for gen, ref, extra in (
+            (calculate._generate_step_kernel(dims, 2, False), plain, ()),
+            (calculate._generate_step_kernel(dims, 2, True), masked, (fluid,)),
+        ):
+            a, b = np.full(shape, 7.0, np.float32), np.full(shape, 7.0, np.float32)
+            gen(p, p_prev, a, COEFF, *extra)
+            ref(p, p_prev, b, COEFF, *extra)
+            max_abs = max(max_abs, float(np.max(np.abs(a - b))))
+    if max_abs > 1e-6:
+        fail(
+            "HAND_WRITTEN",
+            "generated second-order kernel differs from the hand-written one",
+            max_abs,
+        )
+    ok("HAND_WRITTEN", max_abs)
+
+
+def reference_step(p, p_prev, fluid, order: int) -> np.ndarray:
+    """NumPy step: odd reflection beyond the walls, outer layer zeroed."""
+    w = central_difference_weights(order)
+    m = order // 2
+    # Extend every axis by its odd mirror image about the wall node
+    # (p[-j] = -p[j]), as the kernels read it.
+    p64 = p.astype(np.float64)
+    padded = np.pad(p64, m, mode="reflect")
+    for axis in range(p.ndim):
+        for side in (slice(0, m), slice(-m, None)):
+            index = [slice(None)] * p.ndim
+            index[axis] = side
+            padded[tuple(index)] *= -1.0
+    lap = p.ndim * w[0] * p64
+    for axis in range(p.ndim):
+        for k in range(1, m + 1):
+            for s in (k, -k):
+                index = [slice(m, -m)] * p.ndim
+                index[axis] = slice(m + s, m + s + p.shape[axis])
+                lap += w[k] * padded[tuple(index)]
+    out = 2.0 * p64 - p_prev + float(COEFF) * lap
+    inner = tuple(slice(1, n - 1) for n in p.shape)
+    expected = np.zeros_like(out)
+    expected[inner] = out[inner]
+    if fluid is not None:
+        expected[fluid == 0] = 0.0
+    return expected
+
+
+def check_nd(name: str, shape: Tuple[int, ...], order: int) -> None:
+    max_abs = 0.0
+    p, p_prev, fluid = fields(shape, seed=len(shape) + order)
+    for masked in (False, True):
+        kernel = leapfrog_step_kernel(len(shape), order, masked)
+        if leapfrog_step_kernel(len(shape), order, masked) is not kernel:
+            fail(name, "factory did not memoise the generated kernel")
+        out = np.full(shape, 7.0, np.float32)
+        kernel(p, p_prev, out, COEFF, *((fluid,) if masked else ()))
+        expected = reference_step(p, p_prev, fluid if masked else None, order)
+        max_abs = max(max_abs, float(np.max(np.abs(out - expected))))
+    if max_abs > ATOL:
+        fail(name, "generated kernel differs from the NumPy stencil", max_abs)
+    ok(name, max_abs)
+
+
+def legacy_run(n: int, n_steps: int, drivers, mask: np.ndarray, dt: float) -> np.ndarray:
+    """The pre-generator 1D ``Simulate.step()``, transcribed."""
+    p = np.zeros(n, np.float32)
+    p_prev = np.zeros(n, np.float32)
+    t = 0.0
+    for _ in range(n_steps):
+        lap = sp.ndimage.laplace(p) / 1.0
+        p_next = 2.0 * p - p_prev + dt**2 * lap
+        set_edge_values(arr=p_next, value=0)
+        p_next[mask] = np.float32(0.0)
+        for d in drivers:
+            if 0 <= d.position[0] < n:
+                p_next[d.position] += np.float32(d.sample(np.array([t]))[0])
+        p_prev, p = p, p_next
+        t += dt
+    return p
+
+
+def check_simulate_1d() -> None:
+    n = 400
+    drivers = [
+        Driver((n // 3,), RickerWavelet(5.0, 0.1, 15.0)),
+        Driver((0,), RickerWavelet(1.0, 0.15, 10.0)),
+        Driver((250,), RickerWavelet(2.0, 0.12, 12.0)),  # inside the obstacle
+    ]
+    sim = Simulate(grid_shape=(n,), drivers=drivers, courant=0.5)
+    mask = np.zeros(n, dtype=bool)
+    mask[240:260] = True
+    sim.set_obstacle_mask(mask)
+    buffers = {id(b) for b in sim._field_buffers()}
+    for _ in range(300):
+        sim.step()
+        if {id(b) for b in sim._field_buffers()} != buffers:
+            fail("SIMULATE_1D", "step() allocated a new field buffer")
+    expected = legacy_run(n, 300, drivers, mask, sim.timestep)
+    max_abs = float(np.max(np.abs(sim.p - expected)))
+    # 1D waves do not spread out, so the field peaks near 20 here.
+    if not max_abs < ATOL * float(np.max(np.abs(expected))) or not np.any(sim.p):
+        fail("SIMULATE_1D", "1D step() differs from the legacy scipy path", max_abs)
+    ok("SIMULATE_1D", max_abs)
+
+
+def check_args() -> None:
+    for args in ((2, 3), (2, 0), (0, 2)):
+        try:
+            leapfrog_step_kernel(args[0], args[1])
+        except ValueError:
+            continue
+        fail("ARGS", f"leapfrog_step_kernel{args} was accepted")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_weights()
+    check_hand_written()
+    check_nd("1D_ORDER2", (301,), 2)
+    check_nd("1D_ORDER4", (301,), 4)
+    check_nd("3D_ORDER4", (19, 23, 17), 4)
+    check_nd("4D_ORDER2", (9, 11, 8, 13), 2)
+    check_nd("2D_ORDER6", (41, 37), 6)
+    check_simulate_1d()
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Correctness gate for ``ImpulseResponseCache`` (simulation/impulse.py).
+
+Four parts:
+
+1. Render: a cached impulse response convolved with a source matches
+   ``BatchSimulate`` driving that source, within float32 rounding, for
+   a chirp ``AudioFileWaveform`` and a Ricker wavelet, with
+   ``record_step`` 1 and 3, in 2D and 3D, with the driver on an
+   obstacle and a sensor on the driver.
+2. Cache: a second lookup reads the file instead of simulating, a new
+   cache on the same directory finds it, and ``get_many`` simulates
+   each distinct miss once.
+3. Keys: stable for equal inputs, different when the mask, a position
+   or the protocol changes.
+4. Arguments: out-of-grid positions and wrong mask shapes raise
+   ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_IMPULSE_<name> pass=true|false  max_abs=<float>  failure=<str|->
+
+``max_abs`` is relative to the simulated recording's peak.
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    synthetic_chirp,
+)
+from acoustic_system.simulation.impulse import ImpulseResponseCache  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.waveforms import (  # noqa: E402
+    AudioFileWaveform,
+    RickerWavelet,
+    Waveform,
+)
+
+DURATION = 200
+TOLERANCE = 1e-5
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_IMPULSE_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_IMPULSE_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def chirp() -> AudioFileWaveform:
+    samples = synthetic_chirp(int(200.0 * DURATION * 0.35), 200.0, 0.02, 0.4)
+    return AudioFileWaveform.from_samples(samples=samples, sample_rate=200.0, amplitude=5.0)
+
+
+def simulate(
+    mask: np.ndarray, driver: Tuple[int, ...], mics: list, waveform: Waveform, record_step: int
+) -> np.ndarray:
+    batch = BatchSimulate(mask.shape, 1)
+    batch.set_obstacle_mask(0, mask)
+    batch.set_drivers(0, [Driver(driver, waveform)])
+    batch.set_sensors(0, mics)
+    return batch.run(DURATION, record_step=record_step)[0]
+
+
+def check_render(name: str, directory: Path, mask: np.ndarray, driver, mics) -> None:
+    cache = ImpulseResponseCache(directory / name, mask.shape, DURATION)
+    ir = cache.get(mask, driver, mics)
+    worst = 0.0
+    for waveform in (chirp(), RickerWavelet(1.0, 5.0, 0.1)):
+        for record_step in (1, 3):
+            direct = simulate(mask, driver, mics, waveform, record_step)
+            rendered = cache.render(ir, waveform, record_step)
+            if rendered.shape != direct.shape or rendered.dtype != np.float32:
+                fail(name, f"rendered {rendered.shape} {rendered.dtype} vs {direct.shape}")
+            peak = float(np.max(np.abs(direct)))
+            if peak == 0.0:
+                fail(name, "the simulated recording is silent")
+            worst = max(worst, float(np.max(np.abs(rendered - direct))) / peak)
+    if worst > TOLERANCE:
+        fail(name, "render differs from the simulation", worst)
+    ok(name, worst)
+
+
+def check_cache(directory: Path, mask: np.ndarray) -> None:
+    cache = ImpulseResponseCache(directory / "cache", mask.shape, DURATION)
+    mics = [(30, 30), (30, 42)]
+    first = cache.get(mask, (10, 12), mics)
+    again = cache.get(mask, (10, 12), mics)
+    if cache.simulated != 1 or not np.array_equal(first, again):
+        fail("CACHE", f"second lookup simulated again ({cache.simulated} simulations)")
+    other = ImpulseResponseCache(directory / "cache", mask.shape, DURATION)
+    if not np.array_equal(other.get(mask, (10, 12), mics), first) or other.simulated:
+        fail("CACHE", "a new cache on the same directory did not find the file")
+    requests = [(mask, (20, 20), mics), (mask, (10, 12), mics), (mask, (20, 20), mics)]
+    irs = other.get_many(requests)
+    if other.simulated != 1 or not np.array_equal(irs[0], irs[2]):
+        fail("CACHE", f"get_many simulated {other.simulated} for one distinct miss")
+    if not np.array_equal(irs[1], first) or len(list((directory / "cache").iterdir())) != 2:
+        fail("CACHE", "get_many lost a hit or left stray files")
+    ok("CACHE")
+
+
+def check_keys(directory: Path, mask: np.ndarray) -> None:
+    cache = ImpulseResponseCache(directory / "keys", mask.shape, DURATION)
+    mics = [(30, 30), (30, 42)]
+    base = cache.key(mask, (10, 12), mics)
+    if cache.key(mask.copy(), [10, 12], [list(m) for m in mics]) != base:
+        fail("KEYS", "equal inputs gave different keys")
+    moved = mask.copy()
+    moved[1, 1] = not moved[1, 1]
+    variants = [
+        cache.key(moved, (10, 12), mics),
+        cache.key(mask, (10, 13), mics),
+        cache.key(mask, (10, 12), mics[::-1]),
+        ImpulseResponseCache(directory / "keys", mask.shape, DURATION + 1).key(
+            mask, (10, 12), mics
+        ),
+        ImpulseResponseCache(directory / "keys", mask.shape, DURATION, courant=0.4).key(
+            mask, (10, 12), mics
+        ),
+    ]
+    if base in variants or len(set(variants)) != len(variants):
+        fail("KEYS", "different inputs share a key")
+    ok("KEYS")
+
+
+def check_args(directory: Path, mask: np.ndarray) -> None:
+    cache = ImpulseResponseCache(directory / "args", mask.shape, DURATION)
+    bad = (
+        (mask, (64, 3), [(5, 5)]),
+        (mask, (3, 3), [(5, -1)]),
+        (mask, (3, 3, 3), [(5, 5)]),
+        (mask[:10], (3, 3), [(5, 5)]),
+    )
+    for request in bad:
+        try:
+            cache.get(*request)
+        except ValueError:
+            continue
+        fail("ARGS", f"accepted driver {request[1]}, sensors {request[2]}")
+    try:
+        cache.render(np.zeros((DURATION, 1), dtype=np.float32), chirp(), record_step=0)
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "render accepted record_step=0")
+    ok("ARGS")
+
+
+def main() -> None:
+    mask = generate_random_obstacles((64, 64), 3, 4, 14, rng=np.random.default_rng(1))
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        check_render("RENDER_2D", directory, mask, (10, 12), [(30, 30), (30, 42)])
+        solid = tuple(int(c) for c in np.argwhere(mask)[0])
+        check_render("DRIVER_ON_OBSTACLE", directory, mask, solid, [(30, 30), (40, 20)])
+        check_render("SENSOR_ON_DRIVER", directory, mask, (10, 12), [(10, 12), (30, 42)])
+        box = np.zeros((24, 22, 20), dtype=bool)
+        box[8:14, 6:12, 5:15] = True
+        check_render("RENDER_3D", directory, box, (4, 5, 6), [(18, 15, 10), (18, 15, 14)])
+        check_cache(directory, mask)
+        check_keys(directory, mask)
+        check_args(directory, mask)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Correctness gate for ``Simulate(wavespeed_field=...)``.
+
+Five parts:
+
+1. Identity: a uniform field reproduces the scalar-wavespeed engine
+   (drivers and obstacles included), with float32 and uint8
+   coefficients, in 2D and 3D.
+2. Zero speed: cells of speed 0 behave exactly like masked obstacles.
+3. Interface: a plane pulse crossing from speed c1 into c2 reflects
+   ``(c2 - c1) / (c2 + c1)`` of its amplitude and travels at c2 behind
+   the interface.
+4. Quantised: a smooth field with more distinct speeds than uint8
+   codes is quantised to within half a level, its uint8 run matches a
+   float32 run on the quantised speeds, and it stays bounded at the
+   timestep of its fastest cell.
+5. Arguments: bad fields and unsupported combinations raise
+   ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_MEDIA_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import scipy as sp
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate, resolve_timestep  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_MEDIA_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_MEDIA_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def build(shape: Tuple[int, ...], **kwargs) -> Simulate:
+    return Simulate(
+        grid_shape=shape,
+        drivers=[
+            Driver(tuple(s // 3 for s in shape), RickerWavelet(1.0, 0.1, 15.0)),
+            Driver((0,) + tuple(s // 2 for s in shape[1:]), RickerWavelet(0.5, 0.12, 12.0)),
+        ],
+        autotune=False,
+        **kwargs,
+    )
+
+
+def obstacles(shape: Tuple[int, ...]) -> np.ndarray:
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(s // 2, s // 2 + 4) for s in shape)] = True
+    mask[(slice(2, 5),) + tuple(slice(s - 8, s - 1) for s in shape[1:])] = True
+    return mask
+
+
+def check_identity(shape: Tuple[int, ...]) -> None:
+    name = f"IDENTITY_{len(shape)}D"
+    mask = obstacles(shape)
+    plain = build(shape, wavespeed=0.7)
+    plain.set_obstacle_mask(mask)
+    plain.run(50)
+    scale = float(np.max(np.abs(plain.p)))
+    max_abs = 0.0
+    for dtype in ("float32", "uint8"):
+        sim = build(shape, wavespeed_field=np.full(shape, 0.7), wavespeed_dtype=dtype)
+        sim.set_obstacle_mask(mask)
+        sim.run(50)
+        if sim.timestep != plain.timestep or sim.wavespeed != plain.wavespeed:
+            fail(name, f"{dtype}: timestep {sim.timestep} != {plain.timestep}")
+        max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    if not max_abs <= 1e-6 * scale or scale == 0.0:
+        fail(name, "uniform field differs from the scalar engine", max_abs)
+    ok(name, max_abs)
+
+
+def check_zero_speed(shape: Tuple[int, ...]) -> None:
+    name = f"ZERO_SPEED_{len(shape)}D"
+    mask = obstacles(shape)
+    masked = build(shape, wavespeed_field=np.full(shape, 0.7))
+    masked.set_obstacle_mask(mask)
+    field = np.where(mask, 0.0, 0.7)
+    frozen = build(shape, wavespeed_field=field)
+    for sim in (masked, frozen):
+        sim.run(60)
+    max_abs = float(np.max(np.abs(frozen.p - masked.p)))
+    if max_abs != 0.0 or np.any(frozen.p[mask]) or frozen._has_obstacles:
+        fail(name, "speed-0 cells differ from masked obstacles", max_abs)
+    ok(name, max_abs)
+
+
+def peak_time(trace: np.ndarray) -> float:
+    """Index of the trace's maximum, refined by a parabola through its neighbours."""
+    k = int(np.argmax(trace))
+    a, b, c = trace[k - 1 : k + 2]
+    return k + 0.5 * (a - c) / (a - 2.0 * b + c)
+
+
+def plane_pulse(c1: float, c2: float, dt: float, n_steps: int) -> np.ndarray:
+    """Receiver traces of a plane pulse released at x = 100 towards an interface at x = 200."""
+    shape = (400, 400)
+    field = np.full(shape, c1)
+    field[200:] = c2
+    sim = Simulate(grid_shape=shape, wavespeed_field=field, timestep=dt, autotune=False)
+    x = np.arange(shape[0], dtype=np.float64)
+    pulse = np.exp(-(((x - 100.0) / 6.0) ** 2)).astype(np.float32)[:, None]
+    sim.p[1:-1, 1:-1] = pulse[1:-1]
+    sim.p_prev[1:-1, 1:-1] = pulse[1:-1]
+    return sim.record(n_steps, [(150, 200), (240, 200), (320, 200)]).astype(np.float64)
+
+
+def check_interface() -> None:
+    c1, c2, dt, n_steps = 0.5, 1.0, 0.5, 800
+    incident = plane_pulse(c1, c1, dt, n_steps)[:, 0]
+    traces = plane_pulse(c1, c2, dt, n_steps)
+    echo = traces[:, 0] - incident
+    expected = (c2 - c1) / (c2 + c1)
+    measured = echo[np.argmax(np.abs(echo))] / np.max(incident)
+    err = abs(measured - expected)
+    if not err < 0.02:
+        fail("INTERFACE_R", f"reflected {measured:.3f} of the pulse, expected {expected:.3f}", err)
+    ok("INTERFACE_R", err)
+    speed = 80.0 / ((peak_time(traces[:, 2]) - peak_time(traces[:, 1])) * dt)
+    err = abs(speed / c2 - 1.0)
+    if not err < 0.02:
+        fail("INTERFACE_SPEED", f"transmitted pulse travels at {speed:.3f}, expected {c2}", err)
+    ok("INTERFACE_SPEED", err)
+
+
+def check_quantised() -> None:
+    shape = (96, 80)
+    rng = np.random.default_rng(2)
+    # A smooth medium (temperature-like), scaled to speeds 0.3 .. 1.
+    field = sp.ndimage.gaussian_filter(rng.standard_normal(shape), 4.0)
+    field = 0.3 + 0.7 * (field - field.min()) / (field.max() - field.min())
+    wide = build(shape, wavespeed_field=field)
+    narrow = build(shape, wavespeed_field=field, wavespeed_dtype="uint8")
+    if wide.wavespeed_dtype != "float32" or narrow._media[0].dtype != np.uint8:
+        fail("QUANTISED", "a smooth field did not default to float32 / quantise to uint8")
+    expected = resolve_timestep(2, float(field.max()), 1.0, None, 0.5)
+    if wide.timestep != expected or narrow.timestep != expected:
+        fail("QUANTISED", "timestep not set by the fastest cell")
+    code = narrow._media[0]
+    levels = np.linspace(field.min(), field.max(), 256)
+    half_level = 0.5 * (levels[1] - levels[0])
+    level_err = float(np.max(np.abs(levels[code] - field)))
+    if not level_err <= half_level * 1.001:
+        fail("QUANTISED", f"quantised speeds off by {level_err:.2e} (> half a level)", level_err)
+    # The uint8 run is the float32 run on the quantised field.
+    dequantised = build(shape, wavespeed_field=levels[code], wavespeed_dtype="float32")
+    for sim in (wide, narrow, dequantised):
+        sim.run(300)
+    max_abs = float(np.max(np.abs(narrow.p - dequantised.p)))
+    scale = float(np.max(np.abs(wide.p)))
+    if not max_abs <= 1e-6 * scale:
+        fail("QUANTISED", "uint8 run differs from float32 on the quantised field", max_abs)
+    for _ in range(20):
+        wide.run(100)
+    peak = float(np.max(np.abs(wide.p)))
+    if not peak < 10.0 * scale:
+        fail("QUANTISED", f"field grew to {peak:.2e} over 2300 steps", peak)
+    ok("QUANTISED", max_abs)
+
+
+def check_args() -> None:
+    shape = (40, 40)
+    uniform = np.full(shape, 0.5)
+    bad = (
+        dict(wavespeed_field=np.full((40, 41), 0.5)),
+        dict(wavespeed_field=np.zeros(shape)),
+        dict(wavespeed_field=-uniform),
+        dict(wavespeed_field=np.where(np.eye(40) > 0, np.nan, 0.5)),
+        dict(wavespeed_field=uniform, wavespeed_dtype="float16"),
+        dict(wavespeed_dtype="uint8"),
+        dict(wavespeed_field=uniform, memory_mode="two_buffer"),
+        dict(wavespeed_field=uniform, active_region=True),
+        dict(wavespeed_field=uniform, stencil="isotropic"),
+        dict(wavespeed_field=uniform, boundary="pml", boundary_width=4),
+        dict(grid_shape=(40,), wavespeed_field=np.full(40, 0.5)),
+    )
+    for kwargs in bad:
+        kwargs.setdefault("grid_shape", shape)
+        try:
+            Simulate(**kwargs)
+        except ValueError:
+            continue
+        fail("ARGS", f"Simulate({sorted(kwargs)}) was accepted")
+    sim = Simulate(grid_shape=shape, wavespeed_field=uniform)
+    try:
+        sim.set_wall_reflection(0.5)
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "set_wall_reflection accepted with a wavespeed_field")
+    if sim._run_kernel is not None or Simulate(grid_shape=shape)._media_kernel is not None:
+        fail("ARGS", "kernel binding wrong with or without a wavespeed_field")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_identity((48, 40))
+    check_identity((24, 20, 22))
+    check_zero_speed((48, 40))
+    check_zero_speed((24, 20, 22))
+    check_interface()
+    check_quantised()
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Correctness gate for ``Simulate(out_of_core=directory)``.
+
+Four parts:
+
+1. Files: ``memmap_array`` creates its file with the requested shape,
+   dtype and value, and an out-of-core ``Simulate`` keeps its buffers
+   as ``np.memmap`` files in the directory.
+2. Match: with one tile, two, three and one row per tile, the streamed
+   engine reproduces the in-memory one bit for bit through ``run()``,
+   ``step()`` and ``record()``, with obstacles and drivers on tile
+   edges and on an obstacle.
+3. Live geometry: ``set_obstacle``, ``set_obstacle_mask``,
+   ``clear_obstacles`` and ``reset()`` between runs still match.
+4. Arguments: unsupported combinations raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_OUTOFCORE_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.outofcore import memmap_array  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+SHAPE = (30, 24, 26)
+ROW_BYTES = SHAPE[1] * SHAPE[2] * 4
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_OUTOFCORE_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_OUTOFCORE_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def budget(rows: int) -> int:
+    """The ``out_of_core_memory`` that gives tiles of ``rows`` rows."""
+    return 9 * (rows + 2) * ROW_BYTES
+
+
+def build(directory: Optional[Path] = None, rows: int = SHAPE[0]) -> Simulate:
+    # Drivers on the first and last rows of the 10-row tiles, and one
+    # that the mask below puts on an obstacle.
+    return Simulate(
+        grid_shape=SHAPE,
+        drivers=[
+            Driver((10, 12, 13), RickerWavelet(1.0, 0.1, 15.0)),
+            Driver((19, 5, 5), RickerWavelet(0.5, 0.12, 12.0)),
+            Driver((14, 10, 10), RickerWavelet(0.8, 0.08, 10.0)),
+        ],
+        autotune=False,
+        out_of_core=None if directory is None else str(directory),
+        out_of_core_memory=budget(rows),
+    )
+
+
+def obstacles() -> np.ndarray:
+    mask = np.zeros(SHAPE, dtype=bool)
+    mask[12:18, 8:14, 8:20] = True
+    mask[2:5, 18:22, 3:24] = True
+    return mask
+
+
+def check_files(directory: Path) -> None:
+    buf = memmap_array(directory, "ones", (5, 3, 4), np.uint8, 1)
+    if not isinstance(buf, np.memmap) or buf.shape != (5, 3, 4) or np.any(buf != 1):
+        fail("FILES", "memmap_array did not give a filled memmap")
+    if (directory / "ones.dat").stat().st_size != buf.nbytes:
+        fail("FILES", "memmap_array file has the wrong size")
+    sim = build(directory / "sim", rows=10)
+    buffers = sim._field_buffers() + [sim.obstacle_mask, sim._fluid]
+    if not all(isinstance(b, np.memmap) for b in buffers):
+        fail("FILES", "an out-of-core buffer is not a memmap")
+    names = sorted(p.name for p in (directory / "sim").iterdir())
+    expected = ["buffer_0.dat", "buffer_1.dat", "buffer_2.dat", "fluid.dat", "obstacle_mask.dat"]
+    if names != expected:
+        fail("FILES", f"directory holds {names}")
+    if np.any(sim._fluid != 1) or sim._tiles.tiles != [(0, 10), (10, 20), (20, 30)]:
+        fail("FILES", f"fluid map or tiles {sim._tiles.tiles} wrong")
+    sim.close()
+    ok("FILES")
+
+
+def check_match(name: str, directory: Path, rows: int) -> None:
+    plain = build()
+    sim = build(directory, rows)
+    if sim._tiles.rows != rows:
+        fail(name, f"budget gave {sim._tiles.rows}-row tiles, not {rows}")
+    positions = [(10, 12, 13), (9, 12, 13), (20, 5, 5), (25, 20, 3)]
+    traces = []
+    for s in (plain, sim):
+        s.set_obstacle_mask(obstacles())
+        s.run(37)
+        for _ in range(8):
+            s.step()
+        traces.append(s.record(29, positions, record_step=3))
+    sim.close()
+    max_abs = max(
+        float(np.max(np.abs(sim.p - plain.p))),
+        float(np.max(np.abs(sim.p_prev - plain.p_prev))),
+        float(np.max(np.abs(traces[1] - traces[0]))),
+    )
+    if max_abs != 0.0 or not np.any(plain.p):
+        fail(name, "fields differ from the in-memory engine", max_abs)
+    if sim.time != plain.time or sim.step_count != plain.step_count:
+        fail(name, f"clock {sim.time}/{sim.step_count} != {plain.time}/{plain.step_count}")
+    ok(name, max_abs)
+
+
+def check_live_geometry(directory: Path) -> None:
+    plain = build()
+    sim = build(directory, rows=4)
+    max_abs = 0.0
+    for s in (plain, sim):
+        s.run(30)
+        # Obstacles across a tile edge, added to a moving field.
+        s.set_obstacle([(r, 12, k) for r in range(6, 11) for k in range(4, 9)])
+        s.run(20)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    for s in (plain, sim):
+        s.set_obstacle_mask(obstacles())
+        s.run(15)
+        s.set_obstacle([(14, 10, 10)], value=False)
+        s.run(15)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    for s in (plain, sim):
+        s.clear_obstacles()
+        s.run(12)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    for s in (plain, sim):
+        s.reset()
+        s.run(25)
+    max_abs = max(max_abs, float(np.max(np.abs(sim.p - plain.p))))
+    sim.close()
+    if max_abs != 0.0:
+        fail("LIVE_GEOMETRY", "fields differ after a geometry change", max_abs)
+    ok("LIVE_GEOMETRY", max_abs)
+
+
+def check_args(directory: Path) -> None:
+    bad = (
+        dict(grid_shape=(40, 40)),
+        dict(backend="numpy"),
+        dict(memory_mode="two_buffer"),
+        dict(storage_dtype="float16"),
+        dict(active_region=True),
+        dict(stencil="fourth_order"),
+        dict(boundary="mur"),
+        dict(wavespeed_field=np.full(SHAPE, 0.5)),
+        dict(workers=2),
+        dict(first_touch=True),
+    )
+    for kwargs in bad:
+        kwargs.setdefault("grid_shape", SHAPE)
+        try:
+            Simulate(autotune=False, out_of_core=str(directory / "bad"), **kwargs)
+        except ValueError:
+            continue
+        fail("ARGS", f"Simulate({sorted(kwargs)}) was accepted")
+    if (directory / "bad").exists():
+        fail("ARGS", "a rejected Simulate created its directory")
+    sim = Simulate(grid_shape=SHAPE, out_of_core=str(directory / "good"))
+    try:
+        sim.set_wall_reflection(0.5)
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "set_wall_reflection accepted out of core")
+    if sim._run_kernel is not None or sim._autotune:
+        fail("ARGS", "an out-of-core grid bound a compiled run loop")
+    sim.close()
+    ok("ARGS")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        check_files(directory)
+        check_match("MATCH_T1", directory / "t1", rows=SHAPE[0])
+        check_match("MATCH_T2", directory / "t2", rows=15)
+        check_match("MATCH_T3", directory / "t3", rows=10)
+        check_match("MATCH_ROW", directory / "row", rows=1)
+        check_live_geometry(directory / "live")
+        check_args(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Correctness gate for the pseudo-spectral backend (``Simulate(backend="pstd")``).
+
+Five parts:
+
+1. Modes: a standing sine mode of the walled box, started at rest,
+   oscillates at ``c |k|`` within float32 rounding in 1D, 2D and 3D,
+   including modes at two cells per wavelength.
+2. Accuracy: a Ricker pulse in a 2D room, against the numba FDTD at 64
+   cells per wavelength Richardson-extrapolated with 32. Free field at
+   6 cells per wavelength stays within 1e-2 of the peak, where the FDTD
+   at 24 is off by more than ten times as much; with an obstacle the
+   staircase error at 8 cells per wavelength is under 0.1 and halves at
+   16. Obstacle cells, walls and a driver on an obstacle stay silent.
+3. Sponge: ``boundary="sponge"`` against a domain padded until its echoes
+   arrive after the window, and a random field that decays without
+   growing over 3000 steps.
+4. Plumbing: ``run()`` and ``record()`` match a ``step()`` loop (also
+   split across calls), ``workers=2`` matches ``workers=1``, and a
+   snapshot resumes bitwise.
+5. Arguments: combinations the backend does not support raise
+   ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_PSTD_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+# Receiver sampling period of the 2D scene, in periods of the pulse.
+SAMPLE = 1.0 / 8.0
+ROOM = 6
+PERIODS = 8
+DRIVER = (2, 2)
+RECEIVERS = [(4, 4), (1, 5), (5, 1)]
+OBSTACLE = (slice(3, 4), slice(1, 3))
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_PSTD_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_PSTD_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_modes() -> None:
+    worst = 0.0
+    for shape, modes in (
+        ((41,), [(3,), (39,)]),
+        ((33, 29), [(5, 7), (31, 27), (16, 1)]),
+        ((17, 19, 15), [(2, 3, 4), (15, 17, 13)]),
+    ):
+        for mode in modes:
+            sim = Simulate(shape, backend="pstd")
+            field = np.ones((), dtype=np.float64)
+            for m, n in zip(mode, shape):
+                field = np.multiply.outer(field, np.sin(np.pi * m * np.arange(n) / (n - 1)))
+            sim.p[...] = field
+            sim.p_prev[...] = field
+            k = math.pi * math.sqrt(sum((m / (n - 1)) ** 2 for m, n in zip(mode, shape)))
+            cell = np.unravel_index(np.argmax(np.abs(field)), shape)
+            got = sim.record(40, [cell])[:, 0] / field[cell]
+            # Started at rest (p = p_prev), the mode is cos(omega (t + dt / 2)) / cos(omega dt / 2).
+            expected = np.cos(k * sim.timestep * (np.arange(1, 41) + 0.5)) / math.cos(
+                k * sim.timestep / 2
+            )
+            worst = max(worst, float(np.max(np.abs(got - expected))))
+    if worst > 1e-4:
+        fail("MODES", "a standing mode does not oscillate at c |k|", worst)
+    ok("MODES", worst)
+
+
+def scene(backend: str, ppw: int, obstacle: bool, driver=None) -> Simulate:
+    """The 2D room at ``ppw`` cells per wavelength (see bench_pstd.py)."""
+    substeps = math.ceil(SAMPLE * 2 * ppw)
+    courant = SAMPLE / substeps * ppw
+    n = ROOM * ppw + 1
+    cell = tuple(c * ppw for c in DRIVER) if driver is None else driver
+    sim = Simulate(
+        grid_shape=(n, n),
+        drivers=[Driver(cell, RickerWavelet(courant**2, 1.0, 1.5))],
+        timestep=SAMPLE / substeps,
+        gridstep=1.0 / ppw,
+        backend=backend,
+        autotune=False,
+    )
+    if obstacle:
+        mask = np.zeros((n, n), dtype=bool)
+        mask[tuple(slice(s.start * ppw, s.stop * ppw + 1) for s in OBSTACLE)] = True
+        sim.set_obstacle_mask(mask)
+    return sim
+
+
+def recording(sim: Simulate, ppw: int) -> np.ndarray:
+    substeps = round(SAMPLE / sim.timestep)
+    sim.run(substeps - 1)
+    cells = [(i * ppw, j * ppw) for i, j in RECEIVERS]
+    return sim.record(round(PERIODS / SAMPLE) * substeps - (substeps - 1), cells, substeps)
+
+
+def error(name: str, backend: str, ppw: int, obstacle: bool, reference: np.ndarray) -> float:
+    out = recording(scene(backend, ppw, obstacle), ppw)
+    if out.shape != reference.shape:
+        fail(name, f"recording {out.shape} != reference {reference.shape}")
+    return float(np.max(np.abs(out - reference))) / float(np.max(np.abs(reference)))
+
+
+def check_accuracy() -> None:
+    for name, obstacle in (("FREE_FIELD", False), ("OBSTACLE", True)):
+        fine = recording(scene("cpu", 64, obstacle), 64).astype(np.float64)
+        reference = (4.0 * fine - recording(scene("cpu", 32, obstacle), 32)) / 3.0
+        if not obstacle:
+            pstd = error(name, "pstd", 6, obstacle, reference)
+            fdtd = error(name, "cpu", 24, obstacle, reference)
+            if pstd > 1e-2 or fdtd < 10.0 * pstd:
+                fail(name, f"pstd at 6 cells off by {pstd:.2e}, fdtd at 24 by {fdtd:.2e}", pstd)
+            ok(name, pstd)
+            continue
+        coarse = error(name, "pstd", 8, obstacle, reference)
+        finer = error(name, "pstd", 16, obstacle, reference)
+        if coarse > 0.1 or finer > 0.6 * coarse:
+            fail(name, f"staircase error {coarse:.2e} at 8 cells, {finer:.2e} at 16", coarse)
+        sim = scene("pstd", 8, True, driver=(3 * 8 + 2, 1 * 8 + 3))
+        sim.run(100)
+        if np.any(sim.p):
+            fail(name, "a driver on an obstacle radiated")
+        sim = scene("pstd", 8, True)
+        sim.run(100)
+        walls = np.concatenate([sim.p[0], sim.p[-1], sim.p[:, 0], sim.p[:, -1]])
+        if np.any(sim.p[sim.obstacle_mask]) or np.any(walls) or not np.any(sim.p):
+            fail(name, "obstacle or wall cells are nonzero, or the room is silent")
+        ok(name, coarse)
+
+
+def check_sponge() -> None:
+    width, n, steps, pad = 16, 97, 180, 120
+    wave = RickerWavelet(1.0, 0.15, 10.0)
+    cells = [(n // 2, n - width - 4), (width + 6, width + 6)]
+
+    def run(size: int, **kwargs) -> np.ndarray:
+        shift = (size - n) // 2
+        sim = Simulate(
+            (size, size), drivers=[Driver((size // 2, size // 2), wave)], backend="pstd", **kwargs
+        )
+        return sim.record(steps, [(i + shift, j + shift) for i, j in cells])
+
+    reference = run(n + 2 * pad)
+    absorbed = run(n, boundary="sponge", boundary_width=width)
+    walled = run(n)
+    peak = float(np.max(np.abs(reference)))
+    err = float(np.max(np.abs(absorbed - reference))) / peak
+    echo = float(np.max(np.abs(walled - reference))) / peak
+    if err > 2e-2 or echo < 20.0 * err:
+        fail("SPONGE", f"sponge off by {err:.2e} (walls {echo:.2e})", err)
+    sim = Simulate((64, 64), backend="pstd", boundary="sponge")
+    sim.p[1:-1, 1:-1] = np.random.default_rng(0).standard_normal((62, 62))
+    sim.p_prev[...] = sim.p
+    start = float(np.max(np.abs(sim.p)))
+    peak = 0.0
+    for _ in range(30):
+        sim.run(100)
+        peak = max(peak, float(np.max(np.abs(sim.p))))
+    if not peak < 10.0 * start or not np.max(np.abs(sim.p)) < 1e-2 * start:
+        fail("SPONGE", f"random field peaked at {peak:.2e}, ended at {np.max(np.abs(sim.p)):.2e}")
+    ok("SPONGE", err)
+
+
+def check_plumbing() -> None:
+    mask = np.zeros((40, 44), dtype=bool)
+    mask[12:20, 25:30] = True
+    drivers = [Driver((8, 9), RickerWavelet(1.0, 0.1, 12.0)), Driver((30, 35), RickerWavelet())]
+    cells = [(30, 10), (5, 40), (15, 27)]
+
+    def build(**kwargs) -> Simulate:
+        sim = Simulate((40, 44), drivers=drivers, backend="pstd", **kwargs)
+        sim.set_obstacle_mask(mask)
+        return sim
+
+    loop = build()
+    expected = []
+    for _ in range(300):
+        loop.step()
+        expected.append([loop.p_host()[c] for c in cells])
+    expected = np.asarray(expected, dtype=np.float32)
+    rec = build()
+    got = np.concatenate([rec.record(1, cells), rec.record(299, cells)])
+    if not np.array_equal(got, expected) or rec.time != loop.time:
+        fail("PLUMBING", "record() differs from a step() loop")
+    strided = build().record(300, cells, record_step=7)
+    if not np.array_equal(strided, expected[::7]):
+        fail("PLUMBING", "record_step differs from a step() loop")
+    run = build()
+    run.run(123)
+    run.run(177)
+    if not np.array_equal(run.p, loop.p) or run.step_count != 300:
+        fail("PLUMBING", "run() differs from a step() loop")
+    threaded = build(workers=2)
+    threaded.run(300)
+    worst = float(np.max(np.abs(threaded.p - loop.p)))
+    if worst > 1e-6 * float(np.max(np.abs(loop.p))):
+        fail("PLUMBING", "workers=2 differs from workers=1", worst)
+    with tempfile.TemporaryDirectory() as tmp:
+        half = build(boundary="sponge", boundary_width=6)
+        half.run(150)
+        half.save_state(Path(tmp) / "state")
+        resumed = Simulate.load_state(Path(tmp) / "state")
+        whole = build(boundary="sponge", boundary_width=6)
+        whole.run(300)
+        resumed.run(150)
+        if resumed.backend != "pstd" or not np.array_equal(resumed.p, whole.p):
+            fail("PLUMBING", "a snapshot did not resume bitwise")
+    ok("PLUMBING", worst)
+
+
+def check_args() -> None:
+    calls = (
+        lambda: Simulate((32, 32), backend="fft"),
+        lambda: Simulate((32, 32), backend="pstd", boundary="mur"),
+        lambda: Simulate((32, 32), backend="pstd", boundary="pml"),
+        lambda: Simulate((32, 32), boundary="sponge"),
+        lambda: Simulate((32, 32), backend="pstd", stencil="fourth_order"),
+        lambda: Simulate((32, 32), backend="pstd", storage_dtype="float16"),
+        lambda: Simulate((32, 32), backend="pstd", memory_mode="two_buffer"),
+        lambda: Simulate((32, 32), backend="pstd", active_region=True),
+        lambda: Simulate((32, 32), backend="pstd", wavespeed_field=np.ones((32, 32))),
+        lambda: Simulate((32, 32), backend="pstd", boundary="sponge", boundary_width=15),
+        lambda: Simulate((32, 32), backend="pstd").set_wall_reflection(0.5),
+    )
+    for index, call in enumerate(calls):
+        try:
+            call()
+        except ValueError:
+            continue
+        fail("ARGS", f"call {index} did not raise ValueError")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_modes()
+    check_accuracy()
+    check_sponge()
+    check_plumbing()
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Correctness gate for dense receiver-grid recording (simulation/dataset.py).
+
+Four parts:
+
+1. Match: ``record_receiver_grid`` in float32 equals what the engine's
+   own sensors record at the same cells, for a ``BatchSimulate`` and a
+   ``Simulate`` (2D and 3D), with ``record_step`` 1 and 3 and chunks
+   much shorter than the run.
+2. Storage: float16 rounds exactly as ``astype(np.float16)``; with ``directory`` the
+   result is a memmap of the expected file size, and a batch's own
+   sensors are restored.
+3. Pairs: ``pick_mic_pairs`` puts both mics on lattice cells, off
+   obstacles and inside the margin, about ``spacing`` apart.
+4. Arguments: ``stride=0``, ``record_step=0`` and off-lattice positions
+   raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_RECEIVERS_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+import acoustic_system.simulation.dataset as dataset  # noqa: E402
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    generate_random_obstacles,
+    pick_mic_pairs,
+    receiver_lattice,
+    receiver_series,
+    record_receiver_grid,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+DURATION = 200
+STRIDE = 2
+WAVE = RickerWavelet(1.0, 5.0, 0.1)
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_RECEIVERS_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_RECEIVERS_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def make_batch(mask: np.ndarray, drivers: list) -> BatchSimulate:
+    batch = BatchSimulate(mask.shape, len(drivers))
+    for member, driver in enumerate(drivers):
+        batch.set_obstacle_mask(member, mask)
+        batch.set_drivers(member, [Driver(driver, WAVE)])
+    return batch
+
+
+def make_sim(mask: np.ndarray, driver: tuple) -> Simulate:
+    sim = Simulate(grid_shape=mask.shape, drivers=[Driver(driver, WAVE)], autotune=False)
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def check_batch(mask: np.ndarray, drivers: list, pairs: list) -> None:
+    cells = [cell for pair in pairs for cell in pair]
+    for record_step in (1, 3):
+        grid = record_receiver_grid(
+            make_batch(mask, drivers), DURATION, STRIDE, record_step, np.float32
+        )
+        reference = make_batch(mask, drivers)
+        for member in range(len(drivers)):
+            reference.set_sensors(member, cells)
+        direct = reference.run(DURATION, record_step=record_step)
+        expected = (len(drivers), direct.shape[1]) + receiver_lattice(mask.shape, STRIDE)
+        if grid.shape != expected:
+            fail("BATCH", f"shape {grid.shape} != {expected}")
+        for member in range(len(drivers)):
+            if not np.array_equal(receiver_series(grid[member], cells, STRIDE), direct[member]):
+                fail("BATCH", f"member {member} differs at record_step={record_step}")
+    ok("BATCH")
+
+
+def check_simulate(name: str, mask: np.ndarray, driver: tuple, cells: list) -> None:
+    for record_step in (1, 3):
+        grid = record_receiver_grid(make_sim(mask, driver), DURATION, STRIDE, record_step, "f4")
+        direct = make_sim(mask, driver).record(DURATION, cells, record_step=record_step)
+        if not np.array_equal(receiver_series(grid, cells, STRIDE), direct):
+            fail(name, f"differs from Simulate.record at record_step={record_step}")
+    ok(name)
+
+
+def check_storage(directory: Path, mask: np.ndarray, drivers: list, pairs: list) -> None:
+    cells = [cell for pair in pairs for cell in pair]
+    exact = record_receiver_grid(make_batch(mask, drivers), DURATION, STRIDE, 1, np.float32)
+    batch = make_batch(mask, drivers)
+    batch.set_sensors(0, cells[:2])
+    half = record_receiver_grid(batch, DURATION, STRIDE, 1, np.float16, directory, "half")
+    if not isinstance(half, np.memmap) or half.dtype != np.float16:
+        fail("STORAGE", f"got {type(half).__name__} {half.dtype}")
+    if (directory / "half.dat").stat().st_size != half.size * 2:
+        fail("STORAGE", "memmap file has the wrong size")
+    if batch.sensor_positions[0] != cells[:2] or batch.sensor_positions[1]:
+        fail("STORAGE", "the batch's sensors were not restored")
+    if not np.array_equal(half, exact.astype(np.float16)):
+        fail("STORAGE", "float16 recording does not round as astype(np.float16)")
+    worst = float(np.max(np.abs(half.astype(np.float32) - exact))) / float(np.max(np.abs(exact)))
+    if worst > 1e-3:
+        fail("STORAGE", "float16 recording off by more than its rounding", worst)
+    ok("STORAGE", worst)
+
+
+def check_pairs(mask: np.ndarray) -> None:
+    spacing = 12.0
+    pairs = pick_mic_pairs(mask.shape, mask, 200, spacing, STRIDE, np.random.default_rng(3))
+    for a, b in pairs:
+        for pos in (a, b):
+            if any(c % STRIDE for c in pos) or mask[pos]:
+                fail("PAIRS", f"mic {pos} off the lattice or on an obstacle")
+            if not all(2 <= c < n - 2 for c, n in zip(pos, mask.shape)):
+                fail("PAIRS", f"mic {pos} inside the margin")
+        distance = float(np.hypot(a[0] - b[0], a[1] - b[1]))
+        if a == b or abs(distance - spacing) > STRIDE * np.sqrt(2.0):
+            fail("PAIRS", f"pair {a}, {b} is {distance:.2f} apart")
+    if len({tuple(pair) for pair in pairs}) < 150:
+        fail("PAIRS", "pairs are not spread over the room")
+    ok("PAIRS")
+
+
+def check_args(mask: np.ndarray) -> None:
+    calls = (
+        lambda: record_receiver_grid(make_batch(mask, [(10, 10)]), 10, stride=0),
+        lambda: record_receiver_grid(make_batch(mask, [(10, 10)]), 10, record_step=0),
+        lambda: receiver_series(np.zeros((5, 32, 32)), [(3, 4)], STRIDE),
+        lambda: pick_mic_pairs(mask.shape, mask, 1, stride=0),
+    )
+    for index, call in enumerate(calls):
+        try:
+            call()
+        except ValueError:
+            continue
+        fail("ARGS", f"call {index} did not raise ValueError")
+    ok("ARGS")
+
+
+def main() -> None:
+    # Chunks of a few steps, so that every run crosses many chunk borders.
+    dataset._RECEIVER_CHUNK_BYTES = 64 << 10
+    mask = generate_random_obstacles((64, 64), 3, 4, 14, rng=np.random.default_rng(1))
+    drivers = [(10, 12), (50, 20), (20, 50)]
+    pairs = pick_mic_pairs(mask.shape, mask, 4, 12.0, STRIDE, np.random.default_rng(2))
+    check_batch(mask, drivers, pairs)
+    check_simulate("SIMULATE_2D", mask, (10, 12), [cell for pair in pairs for cell in pair])
+    box = np.zeros((24, 22, 20), dtype=bool)
+    box[8:14, 6:12, 5:15] = True
+    check_simulate("SIMULATE_3D", box, (4, 5, 6), [(18, 14, 10), (18, 14, 14), (2, 20, 18)])
+    with tempfile.TemporaryDirectory() as tmp:
+        check_storage(Path(tmp), mask, drivers, pairs)
+    check_pairs(mask)
+    check_args(mask)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Correctness gate for reciprocal acquisition (``ImpulseResponseCache.reciprocal``).
+
+Four parts:
+
+1. Reciprocity: the per-driver blocks of ``reciprocal`` (an impulse at
+   each mic, recorded at the drivers) match ``get`` (an impulse at each
+   driver, recorded at the mics) within float32 rounding, in 2D and
+   3D, for drivers on every free cell of a decimated lattice
+   (``free_positions``) and a driver on a mic.
+2. Render: a pose rendered from the reciprocal block matches
+   ``BatchSimulate`` driving the chirp.
+3. Cache: a second lookup reads the one block file; ``reciprocal_many``
+   simulates one member per mic of each distinct miss; ``directory=None``
+   keeps nothing.
+4. Arguments: drivers or mics on an obstacle or the wall layer raise
+   ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_RECIPROCITY_<name> pass=true|false  max_abs=<float>  failure=<str|->
+
+``max_abs`` is relative to the direct response's peak.
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    free_positions,
+    generate_random_obstacles,
+    synthetic_chirp,
+)
+from acoustic_system.simulation.impulse import ImpulseResponseCache  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.waveforms import AudioFileWaveform  # noqa: E402
+
+DURATION = 200
+TOLERANCE = 1e-5
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_RECIPROCITY_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_RECIPROCITY_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_reciprocity(name: str, mask: np.ndarray, mics: list, stride: int) -> None:
+    cache = ImpulseResponseCache(None, mask.shape, DURATION)
+    drivers = free_positions(mask.shape, mask, stride=stride) + [mics[0]]
+    if any(mask[d] for d in drivers) or len(drivers) < 8:
+        fail(name, f"free_positions gave {len(drivers)} cells, some on obstacles")
+    block = cache.reciprocal(mask, mics, drivers)
+    if block.shape != (len(drivers), DURATION, len(mics)) or block.dtype != np.float32:
+        fail(name, f"block {block.shape} {block.dtype}")
+    if cache.simulated != len(mics):
+        fail(name, f"{cache.simulated} simulations for {len(mics)} mics")
+    direct = cache.get_many([(mask, d, mics) for d in drivers])
+    worst = 0.0
+    for d, ir in enumerate(direct):
+        peak = float(np.max(np.abs(ir)))
+        if peak == 0.0:
+            fail(name, f"driver {drivers[d]} is silent at the mics")
+        worst = max(worst, float(np.max(np.abs(block[d] - ir))) / peak)
+    if worst > TOLERANCE:
+        fail(name, "reciprocal responses differ from direct ones", worst)
+    ok(name, worst)
+
+
+def check_render(mask: np.ndarray) -> None:
+    samples = synthetic_chirp(int(200.0 * DURATION * 0.35), 200.0, 0.02, 0.4)
+    chirp = AudioFileWaveform.from_samples(samples=samples, sample_rate=200.0, amplitude=5.0)
+    mics = [(30, 30), (30, 42)]
+    drivers = [(10, 12), (50, 20), (20, 50)]
+    cache = ImpulseResponseCache(None, mask.shape, DURATION)
+    block = cache.reciprocal(mask, mics, drivers)
+    worst = 0.0
+    for record_step in (1, 3):
+        batch = BatchSimulate(mask.shape, len(drivers))
+        for member, driver in enumerate(drivers):
+            batch.set_obstacle_mask(member, mask)
+            batch.set_drivers(member, [Driver(driver, chirp)])
+            batch.set_sensors(member, mics)
+        direct = batch.run(DURATION, record_step=record_step)
+        for member in range(len(drivers)):
+            rendered = cache.render(block[member], chirp, record_step)
+            peak = float(np.max(np.abs(direct[member])))
+            worst = max(worst, float(np.max(np.abs(rendered - direct[member]))) / peak)
+    if worst > TOLERANCE:
+        fail("RENDER", "rendered poses differ from the simulation", worst)
+    ok("RENDER", worst)
+
+
+def check_cache(directory: Path, mask: np.ndarray) -> None:
+    cache = ImpulseResponseCache(directory / "cache", mask.shape, DURATION)
+    mics = [(30, 30), (30, 42)]
+    drivers = [(10, 12), (50, 20)]
+    first = cache.reciprocal(mask, mics, drivers)
+    again = ImpulseResponseCache(directory / "cache", mask.shape, DURATION)
+    if not np.array_equal(again.reciprocal(mask, mics, drivers), first) or again.simulated:
+        fail("CACHE", "a new cache on the same directory did not find the block")
+    if len(list((directory / "cache").iterdir())) != 1:
+        fail("CACHE", "the block was not stored as one file")
+    other = mask.copy()
+    other[40:44, 40:44] = True
+    blocks = again.reciprocal_many(
+        [(other, mics, drivers), (mask, mics, drivers), (other, mics, drivers)]
+    )
+    if again.simulated != len(mics) or not np.array_equal(blocks[0], blocks[2]):
+        fail("CACHE", f"reciprocal_many ran {again.simulated} simulations for one miss")
+    if not np.array_equal(blocks[1], first):
+        fail("CACHE", "reciprocal_many lost a hit")
+    memory = ImpulseResponseCache(None, mask.shape, DURATION)
+    memory.reciprocal(mask, mics, drivers)
+    memory.reciprocal(mask, mics, drivers)
+    if memory.simulated != 2 * len(mics) or memory.directory is not None:
+        fail("CACHE", "directory=None kept a block")
+    ok("CACHE")
+
+
+def check_args(mask: np.ndarray) -> None:
+    cache = ImpulseResponseCache(None, mask.shape, DURATION)
+    solid = tuple(int(c) for c in np.argwhere(mask)[0])
+    bad = (
+        ([(30, 30)], [solid]),
+        ([solid], [(30, 30)]),
+        ([(30, 30)], [(0, 20)]),
+        ([(63, 30)], [(20, 20)]),
+        ([(30, 30)], [(64, 20)]),
+    )
+    for mics, drivers in bad:
+        try:
+            cache.reciprocal(mask, mics, drivers)
+        except ValueError:
+            continue
+        fail("ARGS", f"accepted mics {mics}, drivers {drivers}")
+    try:
+        free_positions(mask.shape, mask, stride=0)
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "free_positions accepted stride=0")
+    if cache.simulated:
+        fail("ARGS", "a rejected request was simulated")
+    ok("ARGS")
+
+
+def main() -> None:
+    mask = generate_random_obstacles((64, 64), 3, 4, 14, rng=np.random.default_rng(1))
+    check_reciprocity("2D", mask, [(30, 30), (30, 42)], stride=9)
+    box = np.zeros((24, 22, 20), dtype=bool)
+    box[8:14, 6:12, 5:15] = True
+    check_reciprocity("3D", box, [(18, 15, 10), (18, 15, 14)], stride=5)
+    check_render(mask)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_cache(Path(tmp), mask)
+    check_args(mask)
+
+
+if __name__ == "__main__":
+    main()
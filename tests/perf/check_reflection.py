@@ -0,0 +1,291 @@
+"""Correctness gate for ``Simulate.set_wall_reflection``.
+
+Five parts:
+
+1. Table: ``impedance_walls`` matches a per-cell loop over the
+   neighbours of every fluid cell (2D and 3D, obstacles, several
+   materials, pressure-release cells, and block-wise encoding).
+2. Default: a NaN map (all pressure-release) reproduces the plain engine
+   bit for bit, before and after a reflective map is set and cleared.
+3. Reflection: a pulse down a one-cell channel with rigid side walls
+   (a 1D problem in a 2D / 3D grid) hits an end wall of reflection R.
+   The echo, separated from the incident pulse with a channel long
+   enough to have none, is projected on the rigid (R = 1) echo, which
+   in turn must carry the incident pulse's energy.
+4. Stability: a random field in a room of mixed reflections and
+   obstacles stays bounded for 3000 steps.
+5. Plumbing: ``run()``, ``record()``, ``run_blocked()`` and the
+   active-region engine match a ``step()`` loop; obstacles placed later
+   take the reflection of their cells; unsupported configurations and
+   maps raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_REFLECTION_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation import boundary  # noqa: E402
+from acoustic_system.simulation.boundary import impedance_walls, wall_admittance  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+# Largest error allowed on the measured reflection coefficient.
+R_TOLERANCE = 0.03
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_REFLECTION_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_REFLECTION_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def room(shape: Tuple[int, ...], seed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Random obstacles and a reflection map of a few materials plus NaN."""
+    rng = np.random.default_rng(seed)
+    mask = rng.random(shape) < 0.15
+    table = np.asarray([np.nan, 0.0, 0.4, 0.9, 1.0], dtype=np.float32)
+    code = rng.integers(0, len(table), shape).astype(np.uint8)
+    return mask, code, table
+
+
+def brute_force(fluid: np.ndarray, code: np.ndarray, table: np.ndarray, courant: float):
+    shape = fluid.shape
+    beta = wall_admittance(table)[code]
+    entries = []
+    for cell in np.ndindex(*shape):
+        if any(c in (0, s - 1) for c, s in zip(cell, shape)) or not fluid[cell]:
+            continue
+        n, total = 0, 0.0
+        for axis in range(len(shape)):
+            for shift in (-1, 1):
+                nb = list(cell)
+                nb[axis] += shift
+                nb = tuple(nb)
+                edge = any(c in (0, s - 1) for c, s in zip(nb, shape))
+                if (edge or not fluid[nb]) and not np.isnan(beta[nb]):
+                    n += 1
+                    total += beta[nb]
+        if n:
+            loss = 0.5 * courant * total
+            entries.append((cell, (courant**2 * n, loss, 1.0 / (1.0 + loss))))
+    return entries
+
+
+def check_table(shape: Tuple[int, ...]) -> None:
+    name = f"TABLE_{len(shape)}D"
+    mask, code, table = room(shape, 3)
+    fluid = (~mask).astype(np.uint8)
+    courant = 0.55
+    expected = brute_force(fluid, code, table, courant)
+    # The second pass encodes a plane (or row) per block.
+    for block in (boundary._WALL_BLOCK_CELLS, 1):
+        saved, boundary._WALL_BLOCK_CELLS = boundary._WALL_BLOCK_CELLS, block
+        try:
+            wall_ptr, wall_pos, wall_coef = impedance_walls(fluid, code, table, courant)
+        finally:
+            boundary._WALL_BLOCK_CELLS = saved
+        if len(wall_pos) != len(expected) or wall_ptr[-1] != len(expected):
+            fail(name, f"{len(wall_pos)} wall cells, expected {len(expected)}")
+        pencils = np.repeat(np.arange(len(wall_ptr) - 1), np.diff(wall_ptr))
+        cells = np.unravel_index(pencils, shape[:-1]) + (wall_pos,)
+        got = [tuple(int(c[e]) for c in cells) for e in range(len(wall_pos))]
+        if got != [cell for cell, _ in expected]:
+            fail(name, "wall cells differ from the per-cell loop")
+        want = np.asarray([coef for _, coef in expected], dtype=np.float32)
+        max_abs = float(np.max(np.abs(wall_coef - want)))
+        if max_abs > 1e-6:
+            fail(name, "wall coefficients differ from the per-cell loop", max_abs)
+    ok(name, max_abs)
+
+
+def build(shape: Tuple[int, ...], **kwargs) -> Simulate:
+    return Simulate(
+        grid_shape=shape,
+        drivers=[
+            Driver(tuple(s // 3 for s in shape), RickerWavelet(1.0, 0.1, 15.0)),
+            Driver((0,) + tuple(s // 2 for s in shape[1:]), RickerWavelet(0.5, 0.12, 12.0)),
+        ],
+        autotune=False,
+        **kwargs,
+    )
+
+
+def with_room(sim: Simulate, seed: int = 5) -> Simulate:
+    shape = sim.grid_shape
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(s // 2, s // 2 + 4) for s in shape)] = True
+    mask[(slice(2, 5),) + tuple(slice(s - 8, s - 1) for s in shape[1:])] = True
+    sim.set_obstacle_mask(mask)
+    _, code, table = room(shape, seed)
+    sim.set_wall_reflection(table[code])
+    return sim
+
+
+def check_default(shape: Tuple[int, ...]) -> None:
+    name = f"DEFAULT_{len(shape)}D"
+    plain = build(shape)
+    nan = build(shape)
+    nan.set_wall_reflection(np.nan)
+    cleared = build(shape)
+    cleared.set_wall_reflection(0.5)
+    cleared.set_wall_reflection(np.full(shape, np.nan))
+    for sim in (plain, nan, cleared):
+        sim.run(40)
+        for _ in range(20):
+            sim.step()
+    if nan._has_walls or cleared._has_walls or cleared._wall_code is not None:
+        fail(name, "a NaN map left a wall table behind")
+    max_abs = max(float(np.max(np.abs(sim.p - plain.p))) for sim in (nan, cleared))
+    if max_abs != 0.0 or not np.any(plain.p):
+        fail(name, "pressure-release map differs from the plain engine", max_abs)
+    ok(name, max_abs)
+
+
+def channel_echo(dims: int, length: int, reflection: float, n_steps: int) -> np.ndarray:
+    """Receiver trace in a channel along axis 0 whose far end reflects ``reflection``."""
+    shape = (length,) + (3,) * (dims - 1)
+    sim = Simulate(
+        grid_shape=shape,
+        drivers=[Driver((40,) + (1,) * (dims - 1), RickerWavelet(1.0, 0.05, 30.0))],
+        autotune=False,
+    )
+    r = np.ones(shape, dtype=np.float32)
+    r[-1] = reflection
+    r[0] = 0.0  # absorbing behind the driver, so the trace has one pulse
+    sim.set_wall_reflection(r)
+    return sim.record(n_steps, [(140,) + (1,) * (dims - 1)])[:, 0].astype(np.float64)
+
+
+def check_reflection(dims: int) -> None:
+    length, n_steps = 200, 600
+    incident = channel_echo(dims, length + n_steps, 1.0, n_steps)
+    rigid = channel_echo(dims, length, 1.0, n_steps) - incident
+    for target in (0.0, 0.3, 0.7):
+        name = f"COEFFICIENT_R{int(target * 10)}_{dims}D"
+        echo = channel_echo(dims, length, target, n_steps) - incident
+        measured = float(np.dot(echo, rigid) / np.dot(rigid, rigid))
+        err = abs(measured - target)
+        if not err < R_TOLERANCE:
+            fail(name, f"measured R = {measured:.3f} for a wall of R = {target}", err)
+        ok(name, err)
+    # The rigid echo itself carries all of the incident energy back.
+    name = f"COEFFICIENT_RIGID_{dims}D"
+    ratio = float(np.sqrt(np.dot(rigid, rigid) / np.dot(incident, incident)))
+    if not abs(ratio - 1.0) < R_TOLERANCE:
+        fail(name, f"rigid echo holds {ratio:.3f} of the incident amplitude", abs(ratio - 1.0))
+    ok(name, abs(ratio - 1.0))
+
+
+def check_stability() -> None:
+    shape = (64, 56)
+    rng = np.random.default_rng(1)
+    noise = rng.uniform(-1.0, 1.0, shape).astype(np.float32)
+    sim = with_room(Simulate(grid_shape=shape, autotune=False))
+    sim.p[...] = noise
+    sim.p_prev[...] = noise
+    sim.set_obstacle_mask(sim.obstacle_mask)
+    peak = 0.0
+    for _ in range(30):
+        sim.run(100)
+        peak = max(peak, float(np.max(np.abs(sim.p))))
+    if not peak < 10.0:
+        fail("STABILITY", f"field grew to {peak:.2e} in 3000 steps", peak)
+    ok("STABILITY", peak)
+
+
+def check_plumbing(shape: Tuple[int, ...]) -> None:
+    name = f"PLUMBING_{len(shape)}D"
+    stepped = with_room(build(shape))
+    for _ in range(60):
+        stepped.step()
+    sensors = [tuple(s // 4 for s in shape), tuple(s - 3 for s in shape)]
+    ran = with_room(build(shape))
+    ran.run(45)
+    rec = ran.record(15, sensors, record_step=3)
+    blocked = with_room(build(shape))
+    blocked.run_blocked(60, time_block=3)
+    active = with_room(build(shape, active_region=True))
+    active.run(30)
+    for _ in range(30):
+        active.step()
+    max_abs = max(float(np.max(np.abs(sim.p - stepped.p))) for sim in (ran, blocked, active))
+    if max_abs != 0.0 or not stepped._has_walls:
+        fail(name, "run()/run_blocked()/active region differ from a step() loop", max_abs)
+    replay = with_room(build(shape))
+    replay.run(45)
+    expected = []
+    for i in range(15):
+        replay.step()
+        if i % 3 == 0:
+            expected.append([replay.p[s] for s in sensors])
+    if not np.array_equal(rec, np.asarray(expected, dtype=np.float32)):
+        fail(name, "record() samples differ from the stepped field")
+    if np.any(stepped.p[stepped.obstacle_mask]) or not np.any(stepped.p):
+        fail(name, "obstacle cells not held at zero, or no field at all")
+    # A later obstacle takes its cells' reflection, incrementally or not.
+    cell = tuple(s // 4 + 2 for s in shape)
+    stepped.set_obstacle([cell])
+    fresh = impedance_walls(
+        stepped._fluid, stepped._wall_code, stepped._wall_table, float(np.sqrt(stepped._coeff))
+    )
+    if not all(np.array_equal(a, b) for a, b in zip(stepped._walls, fresh)):
+        fail(name, "wall table not refreshed after set_obstacle")
+    ok(name, max_abs)
+
+
+def check_args() -> None:
+    bad_engines = (
+        dict(grid_shape=(40,)),
+        dict(grid_shape=(40, 40), memory_mode="two_buffer"),
+        dict(grid_shape=(40, 40), storage_dtype="float16"),
+        dict(grid_shape=(40, 40), stencil="fourth_order"),
+        dict(grid_shape=(40, 40), boundary="mur"),
+    )
+    for kwargs in bad_engines:
+        sim = Simulate(autotune=False, **kwargs)
+        try:
+            sim.set_wall_reflection(0.5)
+        except ValueError:
+            continue
+        fail("ARGS", f"set_wall_reflection accepted by Simulate({kwargs})")
+    sim = Simulate(grid_shape=(40, 40), autotune=False)
+    bad_maps = (1.5, -0.2, np.zeros((40, 41)), np.linspace(0.0, 1.0, 1600).reshape(40, 40))
+    for reflection in bad_maps:
+        try:
+            sim.set_wall_reflection(reflection)
+        except ValueError:
+            continue
+        fail("ARGS", f"set_wall_reflection accepted a bad map ({np.shape(reflection)})")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_table((14, 12))
+    check_table((9, 8, 10))
+    check_default((48, 40))
+    check_default((24, 20, 22))
+    check_reflection(2)
+    check_reflection(3)
+    check_stability()
+    check_plumbing((48, 40))
+    check_plumbing((24, 20, 22))
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Correctness gate for the compiled multi-step ``Simulate.run(n_steps)``.
+
+``run(n)`` must leave a ``Simulate`` in the same state as ``n`` calls to
+``step()``. Each scenario builds two identical engines, advances one
+with ``step()`` and the other with ``run()`` (split into uneven chunks
+so the ``n % 3`` buffer-rotation replay is exercised for every
+remainder), then compares ``p``, ``p_prev``, ``time`` and
+``step_count``.
+
+Scenarios cover every ordering contract of ``step()``:
+
+* an interior Ricker driver plus a driver ON the outer wall,
+* an out-of-bounds driver (must be skipped, not raise),
+* an interior obstacle block with a driver placed inside it (the
+  obstacle zero must precede injection),
+* 2D and 3D kernels, and the 1D ``step()``-loop fallback.
+
+A second set of scenarios (``CHECK_RUN_<name>_RECORD``) checks
+``Simulate.record`` — the in-kernel sensor gather behind
+``run_with_sensors`` — against a ``step()`` loop that reads
+``sim.p[pos]`` in Python, for ``record_step`` 1 and 3 and sensors on the
+wall, inside the obstacle and on a driver cell.
+
+The two paths run the same float32 operations in the same order, so
+agreement is expected to be exact; the gate still uses the 3D
+tolerances (atol=1e-4, rtol=1e-3) so a harmless FMA-contraction change
+in a future numba release cannot flip it.
+
+Prints one grep-able line per scenario:
+
+    CHECK_RUN_<name> pass=true|false  max_abs=<float>  l2_rel=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+ATOL = 1e-4
+RTOL = 1e-3
+
+CHUNKS = (1, 7, 2, 30, 0, 12, 48)
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan"), l2_rel: float = float("nan")) -> None:
+    print(f"CHECK_RUN_{name} pass=false  max_abs={max_abs:.3e}  l2_rel={l2_rel:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def compare(name: str, a: np.ndarray, b: np.ndarray) -> Tuple[float, float]:
+    diff = a.astype(np.float64) - b.astype(np.float64)
+    max_abs = float(np.max(np.abs(diff)))
+    base = float(np.linalg.norm(b.astype(np.float64))) or 1.0
+    l2_rel = float(np.linalg.norm(diff) / base)
+    if not (max_abs < ATOL and l2_rel < RTOL):
+        fail(name, f"divergence (atol={ATOL:.0e}, rtol={RTOL:.0e})", max_abs, l2_rel)
+    return max_abs, l2_rel
+
+
+def make_sim(grid_shape: Tuple[int, ...]) -> Simulate:
+    centre = tuple(s // 2 for s in grid_shape)
+    wall = (0,) + tuple(s // 3 for s in grid_shape[1:])
+    outside = tuple(s + 5 for s in grid_shape)
+    in_block = tuple(s // 8 + 1 for s in grid_shape)
+    sim = Simulate(
+        grid_shape=grid_shape,
+        drivers=[
+            Driver(centre, RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0)),
+            Driver(wall, RickerWavelet(amplitude=3.0, frequency=0.08, delay=30.0)),
+            Driver(outside, RickerWavelet(amplitude=1.0, frequency=0.1, delay=5.0)),
+            Driver(in_block, RickerWavelet(amplitude=2.0, frequency=0.12, delay=10.0)),
+        ],
+        courant=0.5,
+    )
+    mask = np.zeros(grid_shape, dtype=bool)
+    mask[tuple(slice(s // 8, s // 4) for s in grid_shape)] = True
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def run_pair(name: str, grid_shape: Tuple[int, ...]) -> None:
+    stepped = make_sim(grid_shape)
+    ran = make_sim(grid_shape)
+    for n in CHUNKS:
+        for _ in range(n):
+            stepped.step()
+        ran.run(n)
+        if ran.step_count != stepped.step_count or ran.time != stepped.time:
+            fail(name, f"clock mismatch after run({n}): {ran.time} vs {stepped.time}")
+    max_abs, l2_rel = compare(name, ran.p, stepped.p)
+    compare(f"{name}_PREV", ran.p_prev, stepped.p_prev)
+    print(f"CHECK_RUN_{name} pass=true   max_abs={max_abs:.3e}  l2_rel={l2_rel:.3e}  failure=-")
+
+
+def record_pair(name: str, grid_shape: Tuple[int, ...]) -> None:
+    centre = tuple(s // 2 for s in grid_shape)
+    sensors = [
+        tuple(s // 3 for s in grid_shape),
+        (0,) + tuple(s // 3 for s in grid_shape[1:]),
+        tuple(s // 8 + 1 for s in grid_shape),
+        centre,
+        tuple(s - 2 for s in grid_shape),
+    ]
+    max_abs = 0.0
+    for record_step, steps in ((1, 40), (3, 61)):
+        stepped = make_sim(grid_shape)
+        recorded = make_sim(grid_shape)
+        ref = []
+        for step_idx in range(steps):
+            stepped.step()
+            if step_idx % record_step == 0:
+                ref.append([stepped.p[pos] for pos in sensors])
+        out = recorded.record(steps, sensors, record_step=record_step)
+        if out.shape != (len(ref), len(sensors)):
+            fail(f"{name}_RECORD", f"shape {out.shape} vs {(len(ref), len(sensors))}")
+        max_abs = max(max_abs, compare(f"{name}_RECORD", out, np.asarray(ref))[0])
+        compare(f"{name}_RECORD", recorded.p, stepped.p)
+        if recorded.time != stepped.time:
+            fail(f"{name}_RECORD", "clock mismatch")
+    print(f"CHECK_RUN_{name}_RECORD pass=true   max_abs={max_abs:.3e}  l2_rel=-  failure=-")
+
+
+def main() -> None:
+    run_pair("2D", (96, 96))
+    run_pair("3D", (32, 32, 32))
+    run_pair("1D", (256,))
+    record_pair("2D", (96, 96))
+    record_pair("3D", (32, 32, 32))
+    record_pair("1D", (256,))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,10 @@ loads the baseline snapshot, and asserts:
     CFL bound 1/sqrt(d) emits a RuntimeWarning containing 'CFL'
   * The public attribute set on Simulate is preserved
 
+``--memory-mode two_buffer`` runs the same gate against
+``Simulate(memory_mode="two_buffer")``, whose ``p`` / ``p_prev`` must
+honour the same contract.
+
 Prints exactly one line:
     CHECK pass=true|false  max_abs=<float>  l2_rel=<float>  failure=<str|->
 so the supervisor can grep the result.
@@ -17,6 +21,7 @@ so the supervisor can grep the result.
 
 from __future__ import annotations
 
+import argparse
 import sys
 import warnings
 from pathlib import Path
@@ -45,7 +50,7 @@ REQUIRED_ATTRS = (
 )
 
 
-def build_sim() -> Simulate:
+def build_sim(memory_mode: str = "three_buffer") -> Simulate:
     driver = Driver(
         position=(100, 100),
         waveform=RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0),
@@ -56,6 +61,7 @@ def build_sim() -> Simulate:
         wavespeed=1.0,
         gridstep=1.0,
         courant=0.5,
+        memory_mode=memory_mode,
     )
 
 
@@ -65,6 +71,12 @@ def fail(msg: str, max_abs: float = float("nan"), l2_rel: float = float("nan"))
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--memory-mode", choices=["three_buffer", "two_buffer"], default="three_buffer"
+    )
+    args = parser.parse_args()
+
     ref_path = Path(__file__).parent / "reference.npz"
     if not ref_path.exists():
         fail(f"reference snapshot missing: {ref_path}")
@@ -72,7 +84,7 @@ def main() -> None:
     p_base = ref["p"].astype(np.float32, copy=False)
 
     # 1. API surface
-    sim = build_sim()
+    sim = build_sim(args.memory_mode)
     for attr in REQUIRED_ATTRS:
         if not hasattr(sim, attr):
             fail(f"missing public attribute Simulate.{attr}")
@@ -93,7 +105,7 @@ def main() -> None:
     del bad
 
     # 3. reset() correctness
-    sim_reset = build_sim()
+    sim_reset = build_sim(args.memory_mode)
     for _ in range(20):
         sim_reset.step()
     sim_reset.reset()
@@ -11,10 +11,11 @@ documents:
 
 * an interior Ricker driver (the standard excitation),
 * a driver ON the boundary wall (must overwrite the Dirichlet zero),
-* an interior rectangular obstacle (masked scrub between stencil and
-  driver injection), uploaded via the bulk ``set_obstacle_mask`` path
-  on GPU and per-cell ``set_obstacle`` on CPU — so the two upload APIs
-  are checked for equivalence at the same time,
+* an interior rectangular obstacle, which both backends step with
+  their masked kernels: the stencil, then the obstacle cells zeroed,
+  then the drivers injected. The mask is uploaded with the bulk
+  ``set_obstacle_mask`` on the GPU and per-cell ``set_obstacle`` on
+  the CPU, so the two upload APIs are checked against each other too,
 * ``reset()`` mid-life, after which a re-run must reproduce the run
   from a fresh object.
 
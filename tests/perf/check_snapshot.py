@@ -0,0 +1,240 @@
+"""Correctness gate for ``Simulate.save_state`` / ``Simulate.load_state``.
+
+Five parts:
+
+1. Layout: the file starts with the magic and a header whose arrays sit
+   on page boundaries, and its size is that of the layout.
+2. Resume: saving mid-run, loading and stepping on reproduces the
+   uninterrupted run bit for bit, in 1D to 4D, in two-buffer mode,
+   with 16-bit storage, the active region, the Mur and PML boundaries
+   and the fourth-order stencil, with obstacles and drivers.
+3. Zero copy: a loaded CPU field is a map of the file, and stepping it
+   leaves the file unchanged.
+4. Other buffers: loading into slab workers, out-of-core files and
+   first-touched buffers, and onto the GPU when there is one
+   (within float32 tolerance), resumes the same run.
+5. Arguments: unsupported states, overridden settings and foreign files
+   raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_SNAPSHOT_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import sys
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation import calculate_gpu  # noqa: E402
+from acoustic_system.simulation.setup import Driver, Sensor  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import GaussianPulse, RickerWavelet  # noqa: E402
+
+SHAPE = (30, 24, 26)
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_SNAPSHOT_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_SNAPSHOT_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def build(shape: Tuple[int, ...] = SHAPE, **kwargs) -> Simulate:
+    sim = Simulate(
+        grid_shape=shape,
+        drivers=[
+            Driver(tuple(s // 3 for s in shape), RickerWavelet(1.0, 0.1, 15.0)),
+            Driver(tuple(s // 2 + 1 for s in shape), GaussianPulse(0.5, 0.3, 0.05)),
+        ],
+        sensors=[Sensor(tuple(s // 4 for s in shape))],
+        autotune=False,
+        **kwargs,
+    )
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(s // 2 - 2, s // 2) for s in shape)] = True
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def check_layout(directory: Path) -> None:
+    sim = build(boundary="pml", boundary_width=4)
+    sim.run(12)
+    path = directory / "layout.state"
+    sim.save_state(path)
+    raw = path.read_bytes()
+    if raw[:8] != b"ACSTATE1":
+        fail("LAYOUT", f"magic {raw[:8]!r}")
+    header = json.loads(raw[16 : 16 + int.from_bytes(raw[8:16], "little")])
+    names = sorted(header["arrays"])
+    if names[:3] != ["obstacle_mask", "p", "p_prev"] or len(names) != 9:
+        fail("LAYOUT", f"arrays {names}")
+    end = 0
+    for name, entry in header["arrays"].items():
+        if entry["offset"] % mmap.ALLOCATIONGRANULARITY or entry["offset"] < end:
+            fail("LAYOUT", f"{name} at offset {entry['offset']}")
+        end = entry["offset"] + entry["nbytes"]
+    if len(raw) < end or header["step_count"] != 12 or header["backend"] != "cpu":
+        fail("LAYOUT", f"file of {len(raw)} bytes, header {header['step_count']} steps")
+    ok("LAYOUT")
+
+
+def check_resume(
+    name: str, directory: Path, shape: Tuple[int, ...] = SHAPE, steps: int = 27, **kwargs
+) -> None:
+    plain = build(shape, **kwargs)
+    plain.run(steps)
+    path = directory / f"{name}.state"
+    plain.save_state(path)
+    sim = Simulate.load_state(path, autotune=False)
+    traces = []
+    for s in (plain, sim):
+        s.run(19)
+        for _ in range(4):
+            s.step()
+        traces.append(s.record(11, [tuple(n // 4 for n in shape)], record_step=2))
+    max_abs = max(
+        float(np.max(np.abs(sim.p_host() - plain.p_host()))),
+        float(np.max(np.abs(traces[1] - traces[0]))),
+    )
+    if max_abs != 0.0 or not np.any(plain.p_host()):
+        fail(name, "resumed run differs from the uninterrupted one", max_abs)
+    if sim.time != plain.time or sim.step_count != plain.step_count:
+        fail(name, f"clock {sim.time}/{sim.step_count} != {plain.time}/{plain.step_count}")
+    if sim.storage_dtype != plain.storage_dtype or sim.boundary != plain.boundary:
+        fail(name, "settings not restored")
+    ok(name, max_abs)
+
+
+def check_zero_copy(directory: Path) -> None:
+    plain = build()
+    plain.run(20)
+    path = directory / "zero_copy.state"
+    plain.save_state(path)
+    before = digest(path)
+    sim = Simulate.load_state(path, autotune=False)
+    for name in ("p", "p_prev"):
+        base = getattr(sim, name)
+        while base is not None and not isinstance(base, mmap.mmap):
+            base = base.base
+        if base is None:
+            fail("ZERO_COPY", f"loaded {name} is not a map of the file")
+    sim.run(10)
+    if digest(path) != before:
+        fail("ZERO_COPY", "stepping a loaded state wrote to the snapshot")
+    ok("ZERO_COPY")
+
+
+def check_into(name: str, directory: Path, **kwargs) -> None:
+    plain = build()
+    plain.run(25)
+    path = directory / f"{name}.state"
+    plain.save_state(path)
+    sim = Simulate.load_state(path, autotune=False, **kwargs)
+    for s in (plain, sim):
+        s.run(21)
+    max_abs = float(np.max(np.abs(sim.p_host() - plain.p_host())))
+    sim.close()
+    if max_abs != 0.0:
+        fail(name, "resumed run differs from the uninterrupted one", max_abs)
+    ok(name, max_abs)
+
+
+def check_gpu(directory: Path) -> None:
+    if not calculate_gpu.gpu_available():
+        print("CHECK_SNAPSHOT_GPU skipped  failure=no usable CUDA device")
+        return
+    plain = build()
+    plain.run(25)
+    path = directory / "gpu.state"
+    plain.save_state(path)
+    sim = Simulate.load_state(path, backend="gpu")
+    sim.run(21)
+    # And back: a GPU snapshot resumed on the CPU.
+    sim.save_state(directory / "back.state")
+    back = Simulate.load_state(directory / "back.state", backend="cpu", autotune=False)
+    plain.run(21)
+    max_abs = max(
+        float(np.max(np.abs(sim.p_host() - plain.p_host()))),
+        float(np.max(np.abs(back.p_host() - plain.p_host()))),
+    )
+    if max_abs > 1e-4 or back.step_count != plain.step_count:
+        fail("GPU", "GPU resume differs beyond float32 tolerance", max_abs)
+    ok("GPU", max_abs)
+
+
+def check_args(directory: Path) -> None:
+    path = directory / "args.state"
+    build().save_state(path)
+    sim = build()
+    sim.set_wall_reflection(0.5)
+    try:
+        sim.save_state(directory / "walls.state")
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "save_state accepted wall reflection")
+    try:
+        build(wavespeed_field=np.full(SHAPE, 0.5)).save_state(directory / "media.state")
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "save_state accepted a wavespeed field")
+    for kwargs in (dict(storage_dtype="float16"), dict(grid_shape=(10, 10))):
+        try:
+            Simulate.load_state(path, **kwargs)
+        except ValueError:
+            continue
+        fail("ARGS", f"load_state accepted {sorted(kwargs)}")
+    foreign = directory / "foreign.npy"
+    np.save(foreign, np.zeros(8))
+    try:
+        Simulate.load_state(foreign)
+    except ValueError:
+        pass
+    else:
+        fail("ARGS", "load_state accepted a file that is not a snapshot")
+    ok("ARGS")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        check_layout(directory)
+        check_resume("RESUME_1D", directory, (301,))
+        check_resume("RESUME_2D", directory, (64, 58))
+        check_resume("RESUME_3D", directory)
+        check_resume("RESUME_4D", directory, (12, 11, 10, 9))
+        check_resume("TWO_BUFFER", directory, memory_mode="two_buffer")
+        check_resume("FLOAT16", directory, (64, 58), storage_dtype="float16")
+        check_resume("ACTIVE", directory, (64, 58), steps=9, active_region=True)
+        check_resume("MUR", directory, (64, 58), boundary="mur")
+        check_resume("PML", directory, boundary="pml", boundary_width=4)
+        check_resume("FOURTH_ORDER", directory, (64, 58), stencil="fourth_order")
+        check_zero_copy(directory)
+        check_into("INTO_WORKERS", directory, workers=2)
+        check_into("INTO_OUT_OF_CORE", directory, out_of_core=str(directory / "ooc"))
+        check_into("INTO_FIRST_TOUCH", directory, first_touch=True)
+        check_gpu(directory)
+        check_args(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Correctness gate for the fluid-span (run-length) kernels.
+
+Three parts:
+
+1. ``fluid_spans`` against a brute-force per-row scan, on random masks
+   and on the all-fluid / all-solid extremes, both in one block and
+   split into row blocks of different table widths.
+2. Incremental maintenance: after a sequence of ``set_obstacle`` calls
+   (marking and clearing, including one that splits a span so the table
+   has to widen), ``Simulate``'s span table must equal a full rebuild
+   from the final mask.
+3. Numerics: a ``Simulate`` forced onto the span kernel must match one
+   forced onto the masked kernel to round-off (``ATOL``; the 3D loop
+   nests contract differently under fastmath), over a run that mutates
+   geometry mid-way and has a driver sitting inside an obstacle (the
+   one cell the span kernel relies on the caller to zero). 2D uses
+   ``generate_diverse_obstacles``, 3D a pair of boxes.
+
+Prints one grep-able line per scenario:
+
+    CHECK_SPANS_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation import calculate  # noqa: E402
+from acoustic_system.simulation.calculate import fluid_spans  # noqa: E402
+from acoustic_system.simulation.dataset import generate_diverse_obstacles  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+ATOL = 1e-5
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_SPANS_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_SPANS_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def brute_spans(row: np.ndarray) -> list:
+    spans, start = [], None
+    for j in range(1, row.size - 1):
+        if row[j] and start is None:
+            start = j
+        if not row[j] and start is not None:
+            spans.append((start, j))
+            start = None
+    if start is not None:
+        spans.append((start, row.size - 1))
+    return spans
+
+
+def decode(spans: np.ndarray, n_spans: np.ndarray, r: int) -> list:
+    return [tuple(int(c) for c in spans[r, s]) for s in range(int(n_spans[r]))]
+
+
+def check_encoder() -> None:
+    rng = np.random.default_rng(3)
+    masks = [rng.random((40, 57)) < q for q in (0.0, 0.1, 0.5, 0.9, 1.0)]
+    masks.append(np.vstack(masks))
+    block = calculate._SPAN_BLOCK_CELLS
+    for block_cells in (block, 57 * 7):
+        calculate._SPAN_BLOCK_CELLS = block_cells
+        for mask in masks:
+            fluid = (~mask).astype(np.uint8)
+            spans, n_spans = fluid_spans(fluid)
+            for r in range(fluid.shape[0]):
+                if decode(spans, n_spans, r) != brute_spans(fluid[r]):
+                    fail("ENCODER", f"row {r} differs (block of {block_cells} cells)")
+    calculate._SPAN_BLOCK_CELLS = block
+    ok("ENCODER")
+
+
+def check_incremental() -> None:
+    grid = (48, 48)
+    rng = np.random.default_rng(11)
+    sim = Simulate(grid_shape=grid, courant=0.5)
+    sim.set_obstacle_mask(generate_diverse_obstacles(grid, rng=rng))
+    sim.set_obstacle([(10, j) for j in range(5, 40)])
+    sim.set_obstacle([(10, j) for j in range(8, 36, 3)], value=False)  # widens the table
+    sim.set_obstacle([(30, 30), (31, 30), (2, 2)])
+    sim.set_obstacle([(31, 30)], value=False)
+    spans, n_spans = fluid_spans(sim._fluid.reshape(-1, grid[-1]))
+    for r in range(grid[0]):
+        if decode(sim._spans, sim._n_spans, r) != decode(spans, n_spans, r):
+            fail("INCREMENTAL", f"row {r} stale after set_obstacle")
+    ok("INCREMENTAL")
+
+
+def build(grid_shape: Tuple[int, ...], mask: np.ndarray, use_spans: bool) -> Simulate:
+    centre = tuple(s // 2 for s in grid_shape)
+    solid = tuple(int(c) for c in np.argwhere(mask)[len(np.argwhere(mask)) // 2])
+    sim = Simulate(
+        grid_shape=grid_shape,
+        drivers=[
+            Driver(centre, RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0)),
+            Driver(solid, RickerWavelet(amplitude=2.0, frequency=0.12, delay=12.0)),
+        ],
+        courant=0.5,
+    )
+    sim._MIN_MEAN_SPAN = 0 if use_spans else 1 << 30
+    sim.set_obstacle_mask(mask.copy())  # the mask is adopted, not copied
+    return sim
+
+
+def check_numerics(name: str, grid_shape: Tuple[int, ...], mask: np.ndarray) -> None:
+    spans, masked = build(grid_shape, mask, True), build(grid_shape, mask, False)
+    if not spans._use_spans or masked._use_spans:
+        fail(name, "kernel selection override did not take effect")
+    extra = [tuple(s // 3 for s in grid_shape), tuple(s // 3 + 1 for s in grid_shape)]
+    for n in (60, 1, 50):
+        for _ in range(n):
+            spans.step()
+            masked.step()
+        for sim in (spans, masked):
+            sim.set_obstacle(extra, value=not sim.obstacle_mask[extra[0]])
+    spans.run(40)
+    masked.run(40)
+    max_abs = max(
+        float(np.max(np.abs(spans.p - masked.p))),
+        float(np.max(np.abs(spans.p_prev - masked.p_prev))),
+    )
+    if not max_abs < ATOL:
+        fail(name, "span kernel diverges from masked kernel", max_abs)
+    ok(name, max_abs)
+
+
+def main() -> None:
+    check_encoder()
+    check_incremental()
+    grid2 = (96, 96)
+    check_numerics("2D", grid2, generate_diverse_obstacles(grid2, rng=np.random.default_rng(5)))
+    grid3 = (32, 32, 32)
+    mask3 = np.zeros(grid3, dtype=bool)
+    mask3[4:12, 6:20, 3:14] = True
+    mask3[20:28, 18:26, 15:30] = True
+    check_numerics("3D", grid3, mask3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Correctness gate for ``Simulate(stencil=...)``.
+
+Four parts:
+
+1. Limits: ``stencil_cfl_limit`` matches the closed forms (1/sqrt(d),
+   sqrt(3/(4d)) for fourth order, sqrt(3)/2 for the 9-point stencil) and
+   ``courant`` is clamped under the stencil's own limit.
+2. Stability: from a random field with obstacles, each stencil stays
+   bounded for 300 steps at 0.99x its limit and blows up (with the
+   ``CFL`` warning) at 1.03x.
+3. Dispersion: the phase-velocity error of standing eigenmodes, measured
+   from ``p[n+1] + p[n-1] = 2 cos(w dt) p[n]``. The fourth-order stencil
+   on a grid half as fine beats the second-order one at a small Courant
+   number; the isotropic stencils give the same error in every
+   direction (under 5% spread) and, each at 0.95x its own limit, a
+   smaller worst-direction error than the second-order stencil.
+4. Plumbing: ``run()`` and ``record()`` match a ``step()`` loop, drivers
+   and obstacles behave as in the default engine, and unsupported
+   combinations raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_STENCIL_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+import warnings
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.calculate import stencil_cfl_limit  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+LIMITS = {
+    "second_order": stencil_cfl_limit,
+    "fourth_order": lambda d: stencil_cfl_limit(d, 4),
+    "isotropic": lambda d: stencil_cfl_limit(d, 2, True),
+}
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_STENCIL_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_STENCIL_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_limits() -> None:
+    expected: Dict[Tuple[int, int, bool], float] = {}
+    for d in (1, 2, 3, 4):
+        expected[(d, 2, False)] = 1.0 / np.sqrt(d)
+    for d in (1, 2, 3):
+        expected[(d, 4, False)] = np.sqrt(3.0 / (4.0 * d))
+    expected[(2, 2, True)] = np.sqrt(3.0) / 2.0
+    max_abs = 0.0
+    for (d, order, iso), value in expected.items():
+        max_abs = max(max_abs, abs(stencil_cfl_limit(d, order, iso) - value))
+    if max_abs > 1e-12 or not 0.80 < stencil_cfl_limit(3, 2, True) < 0.81:
+        fail("LIMITS", "stencil_cfl_limit differs from the closed forms", max_abs)
+    for stencil, limit in LIMITS.items():
+        for shape in ((40, 40), (16, 16, 16)):
+            sim = Simulate(grid_shape=shape, stencil=stencil, courant=2.0)
+            if abs(sim.timestep - 0.95 * limit(len(shape))) > 1e-12:
+                fail("LIMITS", f"{stencil} courant not clamped under its own limit")
+    ok("LIMITS", max_abs)
+
+
+def noisy(shape: Tuple[int, ...], stencil: str, factor: float) -> Simulate:
+    dims = len(shape)
+    sim = Simulate(grid_shape=shape, stencil=stencil, timestep=factor * LIMITS[stencil](dims))
+    rng = np.random.default_rng(dims)
+    sim.p[...] = rng.uniform(-1.0, 1.0, shape).astype(np.float32)
+    sim.p_prev[...] = sim.p
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(n // 3, n // 3 + 3) for n in shape)] = True
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def check_stability(stencil: str, shape: Tuple[int, ...]) -> None:
+    name = f"STABILITY_{stencil.upper()}_{len(shape)}D"
+    stable = noisy(shape, stencil, 0.99)
+    stable.run(300)
+    peak = float(np.max(np.abs(stable.p)))
+    if not peak < 100.0:
+        fail(name, "unstable just under the CFL limit", peak)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        unstable = noisy(shape, stencil, 1.03)
+    if not any("CFL" in str(w.message) for w in caught):
+        fail(name, "no CFL warning above the limit")
+    with np.errstate(all="ignore"):
+        unstable.run(300)
+        blown = not np.all(np.abs(unstable.p) < 1e6)
+    if not blown:
+        fail(name, "still bounded above the CFL limit")
+    ok(name, peak)
+
+
+def phase_error(stencil: str, n: int, courant: float, mode: Sequence[int]) -> float:
+    """Relative phase-velocity error of the standing mode ``prod sin(a pi x)``."""
+    dx = 1.0 / (n - 1)
+    shape = (n,) * len(mode)
+    sim = Simulate(grid_shape=shape, gridstep=dx, courant=courant, stencil=stencil)
+    x = np.arange(n) * dx
+    k = np.pi * np.asarray(mode, dtype=np.float64)
+    field = np.prod(np.meshgrid(*[np.sin(ka * x) for ka in k], indexing="ij"), axis=0)
+    omega = float(np.linalg.norm(k))
+    sim.p[...] = field
+    sim.p_prev[...] = field * np.cos(omega * sim.timestep)
+    series = [sim.p.astype(np.float64).ravel()]
+    for _ in range(64):
+        sim.step()
+        series.append(sim.p.astype(np.float64).ravel())
+    s = np.asarray(series)
+    lhs, rhs = (s[2:] + s[:-2]).ravel(), 2.0 * s[1:-1].ravel()
+    cos_w_dt = float(lhs @ rhs / (rhs @ rhs))
+    return float(np.arccos(cos_w_dt) / (omega * sim.timestep) - 1.0)
+
+
+def check_fourth_order() -> None:
+    modes = ((5, 5), (7, 1))
+    fine = max(abs(phase_error("second_order", 65, 0.25, m)) for m in modes)
+    coarse = max(abs(phase_error("fourth_order", 33, 0.25, m)) for m in modes)
+    if not coarse < 0.5 * fine:
+        fail("DISPERSION_FOURTH_ORDER", f"33-cell error {coarse:.2e} vs 65-cell {fine:.2e}")
+    ok("DISPERSION_FOURTH_ORDER", coarse)
+
+
+def check_isotropic(n: int, modes: Tuple[Tuple[int, ...], ...]) -> None:
+    dims = len(modes[0])
+    name = f"DISPERSION_ISOTROPIC_{dims}D"
+    errors = {}
+    for stencil in ("second_order", "isotropic"):
+        courant = 0.95 * LIMITS[stencil](dims)
+        # Normalised by (k dx)^2, the leading-order scaling, so modes of
+        # slightly different wavenumber compare by direction alone.
+        errors[stencil] = [
+            phase_error(stencil, n, courant, m) / (np.pi * np.linalg.norm(m) / (n - 1)) ** 2
+            for m in modes
+        ]
+    iso = np.abs(errors["isotropic"])
+    spread = float((iso.max() - iso.min()) / iso.max())
+    if not spread < 0.05:
+        fail(name, f"isotropic error varies {spread:.1%} with direction", spread)
+    if not iso.max() < np.max(np.abs(errors["second_order"])):
+        fail(name, "worst-direction error not below the second-order stencil", iso.max())
+    ok(name, spread)
+
+
+def build(stencil: str, shape: Tuple[int, ...]) -> Simulate:
+    n = shape[0]
+    sim = Simulate(
+        grid_shape=shape,
+        drivers=[
+            Driver(tuple(s // 3 for s in shape), RickerWavelet(5.0, 0.1, 15.0)),
+            Driver((0,) + tuple(s // 2 for s in shape[1:]), RickerWavelet(1.0, 0.15, 10.0)),
+            Driver(tuple(s // 2 + 1 for s in shape), RickerWavelet(2.0, 0.12, 12.0)),
+        ],
+        stencil=stencil,
+    )
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(s // 2, s // 2 + max(3, n // 6)) for s in shape)] = True
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def check_plumbing(stencil: str, shape: Tuple[int, ...]) -> None:
+    name = f"PLUMBING_{stencil.upper()}_{len(shape)}D"
+    stepped = build(stencil, shape)
+    for _ in range(40):
+        stepped.step()
+    ran = build(stencil, shape)
+    ran.run(25)
+    sensors = [tuple(s // 4 for s in shape), tuple(s - 2 for s in shape)]
+    rec = ran.record(15, sensors, record_step=3)
+    max_abs = float(np.max(np.abs(ran.p - stepped.p)))
+    if max_abs != 0.0 or ran.step_count != 40:
+        fail(name, "run()/record() differ from a step() loop", max_abs)
+    replay = build(stencil, shape)
+    replay.run(25)
+    expected = []
+    for i in range(15):
+        replay.step()
+        if i % 3 == 0:
+            expected.append([replay.p[s] for s in sensors])
+    if not np.array_equal(rec, np.asarray(expected, dtype=np.float32)):
+        fail(name, "record() samples differ from the stepped field")
+    mask = stepped.obstacle_mask.copy()
+    mask[tuple(s // 2 + 1 for s in shape)] = False  # the driver sitting there
+    if np.any(stepped.p[mask]) or not np.any(stepped.p):
+        fail(name, "obstacle cells not held at zero, or no field at all")
+    if stencil == "fourth_order" and not np.any(stepped.p[(1,) + tuple(s // 2 for s in shape[1:])]):
+        fail(name, "field did not reach the band next to the wall")
+    ok(name, max_abs)
+
+
+def check_args() -> None:
+    bad = (
+        dict(grid_shape=(40, 40), stencil="sixth_order"),
+        dict(grid_shape=(40,), stencil="isotropic"),
+        dict(grid_shape=(40, 40, 40, 4), stencil="isotropic"),
+        dict(grid_shape=(40, 4), stencil="fourth_order"),
+        dict(grid_shape=(40, 40), stencil="fourth_order", active_region=True),
+        dict(grid_shape=(40, 40), stencil="isotropic", memory_mode="two_buffer"),
+        dict(grid_shape=(40, 40), stencil="fourth_order", storage_dtype="bfloat16"),
+    )
+    for kwargs in bad:
+        try:
+            Simulate(**kwargs)
+        except ValueError:
+            continue
+        fail("ARGS", f"Simulate({kwargs}) was accepted")
+    default = Simulate(grid_shape=(40, 40))
+    if default.stencil != "second_order" or default._run_kernel is None:
+        fail("ARGS", "default stencil lost its compiled run loop")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_limits()
+    for stencil in ("fourth_order", "isotropic"):
+        check_stability(stencil, (48, 48))
+        check_stability(stencil, (20, 20, 20))
+    check_stability("fourth_order", (301,))
+    check_fourth_order()
+    check_isotropic(33, ((5, 5), (7, 1)))
+    check_isotropic(33, ((5, 5, 5), (8, 1, 1)))
+    for stencil in ("fourth_order", "isotropic"):
+        check_plumbing(stencil, (48, 40))
+        check_plumbing(stencil, (20, 22, 18))
+    check_plumbing("fourth_order", (300,))
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
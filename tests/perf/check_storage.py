@@ -0,0 +1,155 @@
+"""Correctness gate for 16-bit field storage (``storage_dtype``).
+
+Three parts:
+
+1. Codec: the kernels' float32 -> float16 encoder must agree with
+   NumPy's ``astype(np.float16)`` bit for bit, on every finite half
+   value and on random float32 inputs spanning the subnormal, normal
+   and overflow ranges. The bfloat16 encoder must round to nearest
+   even, and both decode tables must invert their encoder.
+2. Plumbing: ``step()``, ``run()`` and ``record()`` must agree exactly
+   (odd and even lengths, obstacles, a driver on the wall and one on an
+   obstacle, ``reset()``, ``active_region=True``).
+3. Accuracy: after 150 steps the 16-bit field must stay within a loose
+   relative L2 distance (``L2_REL``) of the float32 one. The numbers
+   that matter are in ``bench_storage.py``; this only catches a broken
+   kernel.
+
+Prints one grep-able line per scenario:
+
+    CHECK_STORAGE_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.calculate import (  # noqa: E402
+    encode_storage,
+    storage_decode_table,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import RickerWavelet  # noqa: E402
+
+L2_REL = {"float16": 5e-3, "bfloat16": 5e-2}
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_STORAGE_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_STORAGE_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_codec() -> None:
+    bits = np.arange(1 << 16, dtype=np.uint32).astype(np.uint16)
+    for dtype in ("float16", "bfloat16"):
+        values = storage_decode_table(dtype)
+        finite = np.isfinite(values)
+        if not np.array_equal(encode_storage(values[finite], dtype), bits[finite]):
+            fail("CODEC", f"{dtype} encode(decode(bits)) != bits")
+
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(1 << 18) * 10.0 ** rng.uniform(-9.0, 6.0, 1 << 18)
+    x = np.concatenate([x, [0.0, -0.0, 65504.0, 65519.0, 65520.0, 2.0**-25, 2.0**-24]])
+    x = x.astype(np.float32)
+    with np.errstate(over="ignore"):
+        expected = x.astype(np.float16).view(np.uint16)
+    if not np.array_equal(encode_storage(x, "float16"), expected):
+        fail("CODEC", "float16 encoder differs from numpy astype")
+
+    b = x.view(np.uint32).astype(np.int64)
+    expected = ((b + 0x7FFF + ((b >> 16) & 1)) >> 16).astype(np.uint16)
+    if not np.array_equal(encode_storage(x, "bfloat16"), expected):
+        fail("CODEC", "bfloat16 encoder is not round-to-nearest-even")
+    ok("CODEC")
+
+
+def build(grid_shape: Tuple[int, ...], storage_dtype: str, active: bool = False) -> Simulate:
+    n = grid_shape[0]
+    drivers = [
+        Driver(tuple(n // 3 for _ in grid_shape), RickerWavelet(5.0, 0.1, 15.0)),
+        Driver((0,) + tuple(n // 2 for _ in grid_shape[1:]), RickerWavelet(1.0, 0.15, 10.0)),
+    ]
+    mask = np.zeros(grid_shape, dtype=bool)
+    mask[tuple(slice(n // 2, n // 2 + n // 6) for _ in grid_shape)] = True
+    if len(grid_shape) == 2:
+        drivers.append(Driver((n // 2 + 1, n // 2 + 1), RickerWavelet(2.0, 0.12, 12.0)))
+    sim = Simulate(
+        grid_shape=grid_shape,
+        drivers=drivers,
+        courant=0.5,
+        active_region=active,
+        storage_dtype=storage_dtype,
+    )
+    sim.set_obstacle_mask(mask)
+    return sim
+
+
+def check_plumbing(name: str, grid_shape: Tuple[int, ...], dtype: str, active: bool) -> None:
+    stepped, batched = build(grid_shape, dtype, active), build(grid_shape, dtype, active)
+    if stepped._p_next is not None:
+        fail(name, "16-bit storage allocated a third field buffer")
+    sensors = [tuple(s // 4 for s in grid_shape), tuple(s - 2 for s in grid_shape)]
+    for _ in range(21):
+        stepped.step()
+    batched.run(21)
+    for sim in (stepped, batched):
+        sim.set_obstacle([tuple(s // 3 + 2 for s in grid_shape)])
+    for _ in range(10):
+        stepped.step()
+    rec = batched.record(10, sensors, record_step=1)
+    flat = np.ravel_multi_index(tuple(np.asarray(sensors).T), grid_shape)
+    if not np.array_equal(rec[-1], stepped.p_host().ravel()[flat]):
+        fail(name, "record() samples differ from the stepped field")
+    for sim in (stepped, batched):
+        sim.reset()
+        sim.run(13)
+    if not (
+        np.array_equal(stepped.p.view(np.uint16), batched.p.view(np.uint16))
+        and np.array_equal(stepped.p_prev.view(np.uint16), batched.p_prev.view(np.uint16))
+        and stepped.p.dtype == (np.float16 if dtype == "float16" else np.uint16)
+    ):
+        fail(name, "step() and run() disagree")
+    ok(name)
+
+
+def check_accuracy(name: str, grid_shape: Tuple[int, ...], dtype: str) -> None:
+    ref, low = build(grid_shape, "float32"), build(grid_shape, dtype)
+    ref.run(150)
+    low.run(150)
+    a, b = ref.p_host(), low.p_host()
+    max_abs = float(np.max(np.abs(a - b)))
+    l2_rel = float(np.linalg.norm(a - b) / np.linalg.norm(a))
+    if not l2_rel < L2_REL[dtype]:
+        fail(name, f"l2_rel={l2_rel:.2e} over {L2_REL[dtype]:.0e}", max_abs)
+    ok(name, max_abs)
+
+
+def main() -> None:
+    check_codec()
+    for dtype, tag in (("float16", "F16"), ("bfloat16", "BF16")):
+        check_plumbing(f"{tag}_2D", (96, 96), dtype, active=False)
+        check_plumbing(f"{tag}_3D_ACTIVE", (36, 36, 36), dtype, active=True)
+        check_accuracy(f"{tag}_2D_ACCURACY", (96, 96), dtype)
+        check_accuracy(f"{tag}_3D_ACCURACY", (36, 36, 36), dtype)
+    try:
+        Simulate(grid_shape=(32, 32), storage_dtype="float16", memory_mode="three_buffer")
+    except ValueError:
+        ok("ARGS")
+    else:
+        fail("ARGS", "three_buffer with 16-bit storage was accepted")
+
+
+if __name__ == "__main__":
+    main()
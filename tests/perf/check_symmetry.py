@@ -0,0 +1,236 @@
+"""Correctness gate for D4 symmetry augmentation (simulation/dataset.py).
+
+Five parts:
+
+1. Maps: for all eight variants, on a non-square grid, the cell
+   ``d4_positions`` gives for ``(i, j)`` is where ``d4_mask`` moves
+   ``mask[i, j]``; the eight masks of an asymmetric room are distinct.
+2. Handedness: ``d4_channel_order`` keeps the sign of the stereo pair
+   seen from the driver (the cross product of mic 0 and mic 1 relative
+   to it) for every variant.
+3. Physics: a room with one and with three driver / stereo-pair
+   poses, simulated in all eight variants as one ``BatchSimulate``,
+   records the same signal in every variant within float32 rounding
+   (channels put back in the original order).
+4. Archive: ``generate_active_sensing.py --d4-augment`` (single- and
+   multi-pose) writes 8 samples per room; re-simulating every written
+   variant with ``BatchSimulate`` reproduces its ``sensor`` within
+   float32 rounding, and variant 0 equals the plain archive of the
+   same seed.
+5. Arguments: 3D masks and variants outside 0..7 raise ``ValueError``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_SYMMETRY_<name> pass=true|false  max_abs=<float>  failure=<str|->
+
+``max_abs`` is relative to the untransformed or re-simulated
+recording's peak.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.batch import BatchSimulate  # noqa: E402
+from acoustic_system.simulation.dataset import (  # noqa: E402
+    D4_VARIANTS,
+    d4_channel_order,
+    d4_mask,
+    d4_positions,
+    free_positions,
+    generate_random_obstacles,
+)
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.waveforms import AudioFileWaveform, RickerWavelet  # noqa: E402
+
+GENERATOR = ROOT / "scripts" / "generate_active_sensing.py"
+STEPS = 150
+TOLERANCE = 1e-5
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_SYMMETRY_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float = 0.0) -> None:
+    print(f"CHECK_SYMMETRY_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_maps() -> None:
+    shape = (5, 7)
+    for k in range(D4_VARIANTS):
+        for i in range(shape[0]):
+            for j in range(shape[1]):
+                one = np.zeros(shape, dtype=np.int8)
+                one[i, j] = 1
+                moved = d4_mask(one, k)
+                cell = tuple(int(c) for c in d4_positions((i, j), shape, k))
+                if moved[cell] != 1:
+                    fail("MAPS", f"variant {k}: ({i}, {j}) -> {cell}, mask moved elsewhere")
+    room = generate_random_obstacles((32, 32), 3, 3, 10, rng=np.random.default_rng(4))
+    if len({d4_mask(room, k).tobytes() for k in range(D4_VARIANTS)}) != D4_VARIANTS:
+        fail("MAPS", "the eight variants of an asymmetric room are not distinct")
+    ok("MAPS")
+
+
+def check_handedness() -> None:
+    shape = (40, 40)
+    driver = np.array([8, 11])
+    mics = np.array([[20, 25], [27, 18]])
+
+    def side(d: np.ndarray, m: np.ndarray) -> float:
+        a, b = m[0] - d, m[1] - d
+        return float(np.sign(a[0] * b[1] - a[1] * b[0]))
+
+    before = side(driver, mics)
+    for k in range(D4_VARIANTS):
+        order = d4_channel_order(2, k)
+        after = side(d4_positions(driver, shape, k), d4_positions(mics, shape, k)[order])
+        if after != before:
+            fail("HANDEDNESS", f"variant {k} flips the stereo pair")
+    if not np.array_equal(d4_channel_order(1, 5), [0]):
+        fail("HANDEDNESS", "a single mic was reordered")
+    ok("HANDEDNESS")
+
+
+def variants(mask: np.ndarray, drivers: np.ndarray, mics: np.ndarray) -> np.ndarray:
+    """All eight variants of one room simulated as one batch: ``(8, K, T, n_mics)``.
+
+    ``drivers`` is ``(K, 2)`` and ``mics`` ``(K, n_mics, 2)``; channels
+    come back in the original room's order.
+    """
+    shape = mask.shape
+    n_poses = len(drivers)
+    wave = RickerWavelet(amplitude=5.0, frequency=0.08, delay=15.0)
+    batch = BatchSimulate(shape, D4_VARIANTS * n_poses, courant=0.5, autotune=False)
+    orders = []
+    for k in range(D4_VARIANTS):
+        order = d4_channel_order(mics.shape[1], k)
+        orders.append(np.argsort(order))
+        moved_mics = d4_positions(mics, shape, k)[:, order]
+        for pose, driver in enumerate(d4_positions(drivers, shape, k)):
+            member = k * n_poses + pose
+            batch.set_obstacle_mask(member, d4_mask(mask, k))
+            batch.set_drivers(member, [Driver(tuple(int(c) for c in driver), wave)])
+            batch.set_sensors(member, [tuple(int(c) for c in m) for m in moved_mics[pose]])
+    rec = batch.run(STEPS).reshape(D4_VARIANTS, n_poses, STEPS, -1)
+    return np.stack([rec[k][..., orders[k]] for k in range(D4_VARIANTS)])
+
+
+def check_physics(name: str, seed: int, n_poses: int) -> None:
+    rng = np.random.default_rng(seed)
+    mask = generate_random_obstacles((48, 48), 3, 3, 12, rng=rng)
+    free = free_positions(mask.shape, mask, margin=3)
+    picks = rng.choice(len(free), size=3 * n_poses, replace=False)
+    cells = np.array([free[p] for p in picks]).reshape(n_poses, 3, 2)
+    rec = variants(mask, cells[:, 0], cells[:, 1:])
+    peak = float(np.max(np.abs(rec[0])))
+    if peak == 0.0:
+        fail(name, "the recording is silent")
+    worst = float(np.max(np.abs(rec - rec[0]))) / peak
+    if worst > TOLERANCE:
+        fail(name, "a transformed room records a different signal", worst)
+    ok(name, worst)
+
+
+def generate(path: Path, *extra: str) -> None:
+    args = [sys.executable, str(GENERATOR), "--output", str(path), "--num-samples", "2"]
+    args += ["--grid", "48", "--duration", "150", "--mic-spacing", "10", "--n-obstacles", "3"]
+    args += ["--obstacle-max", "12", "--seed", "5", *extra]
+    subprocess.run(args, check=True, capture_output=True)
+
+
+def resimulate(grp: h5py.Group) -> np.ndarray:
+    """Drive the group's own geometry with its own source: ``(K, T_rec, n_mics)``."""
+    mask = np.asarray(grp["obstacles"], dtype=bool)
+    waveform = AudioFileWaveform.from_samples(
+        samples=np.asarray(grp["source"]),
+        sample_rate=float(grp.attrs["audio_native_fs"]),
+        amplitude=float(grp.attrs["audio_amplitude"]),
+        delay=0.0,
+        sim_time_per_second=float(grp.attrs["sim_time_per_second"]),
+    )
+    if "poses_per_room" in grp.attrs:
+        drivers = grp.attrs["driver_positions"]
+        sensors = grp.attrs["sensor_positions"]
+    else:
+        drivers = [grp.attrs["driver_position"]]
+        sensors = [grp.attrs["sensor_positions"]]
+    batch = BatchSimulate(mask.shape, len(drivers), courant=float(grp.attrs["courant"]))
+    for member, (driver, mics) in enumerate(zip(drivers, sensors)):
+        batch.set_obstacle_mask(member, mask)
+        batch.set_drivers(member, [Driver(tuple(int(c) for c in driver), waveform)])
+        batch.set_sensors(member, [tuple(int(c) for c in m) for m in mics])
+    return batch.run(int(grp.attrs["sim_duration_steps"]), int(grp.attrs["record_step"]))
+
+
+def check_archive(name: str, directory: Path, *extra: str) -> None:
+    plain = directory / f"{name}_plain.h5"
+    augmented = directory / f"{name}_d4.h5"
+    generate(plain, *extra)
+    generate(augmented, "--d4-augment", *extra)
+    worst = 0.0
+    with h5py.File(plain, "r") as fp, h5py.File(augmented, "r") as fa:
+        if len(fa.keys()) != D4_VARIANTS * len(fp.keys()) or not fa.attrs["d4_augment"]:
+            fail(name, f"{len(fa.keys())} samples for {len(fp.keys())} rooms")
+        for key in sorted(fa.keys()):
+            grp = fa[key]
+            room, k = int(grp.attrs["d4_room"]), int(grp.attrs["d4_variant"])
+            if key != f"sample_{D4_VARIANTS * room + k:04d}":
+                fail(name, f"{key} holds room {room} variant {k}")
+            base = fp[f"sample_{room:04d}"]
+            if k == 0 and not np.array_equal(grp["sensor"], base["sensor"]):
+                fail(name, f"variant 0 of room {room} differs from the plain archive")
+            if not np.array_equal(grp["obstacles"], d4_mask(np.asarray(base["obstacles"]), k)):
+                fail(name, f"{key}: obstacles are not variant {k} of room {room}")
+            stored = np.asarray(grp["sensor"], dtype=np.float32)
+            direct = resimulate(grp).reshape(stored.shape)
+            peak = float(np.max(np.abs(direct)))
+            if peak == 0.0:
+                fail(name, f"{key}: the re-simulated recording is silent")
+            worst = max(worst, float(np.max(np.abs(stored - direct))) / peak)
+    if worst > TOLERANCE:
+        fail(name, "a written variant differs from its re-simulation", worst)
+    ok(name, worst)
+
+
+def check_args() -> None:
+    calls = (
+        lambda: d4_mask(np.zeros((4, 4, 4), dtype=bool), 1),
+        lambda: d4_mask(np.zeros((4, 4), dtype=bool), 8),
+        lambda: d4_positions([(1, 2)], (4, 4), -1),
+        lambda: d4_positions([(1, 2, 3)], (4, 4), 1),
+        lambda: d4_channel_order(2, 9),
+    )
+    for index, call in enumerate(calls):
+        try:
+            call()
+        except ValueError:
+            continue
+        fail("ARGS", f"call {index} did not raise ValueError")
+    ok("ARGS")
+
+
+def main() -> None:
+    check_maps()
+    check_handedness()
+    check_physics("PHYSICS_1POSE", 5, 1)
+    check_physics("PHYSICS_3POSE", 6, 3)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_archive("ARCHIVE_1POSE", Path(tmp))
+        check_archive("ARCHIVE_3POSE", Path(tmp), "--poses-per-room", "3")
+    check_args()
+
+
+if __name__ == "__main__":
+    main()
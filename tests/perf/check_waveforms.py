@@ -0,0 +1,166 @@
+"""Correctness gate for vectorised waveforms and ``step()`` source tables.
+
+Two parts:
+
+1. ``Waveform.sample(times)`` for every built-in family must equal the
+   scalar ``__call__`` path cast to float32, over a clock that covers
+   negative times, the audio support edges and a long tail. A subclass
+   that only implements ``__call__`` must still sample via the base-class
+   fallback.
+2. ``Simulate.step()`` (which injects from a precomputed source table)
+   must match a hand-rolled step loop that evaluates ``get_value(time)``
+   per step, across the events that invalidate the table: chunk
+   exhaustion, ``add_driver``, a direct ``drivers.append`` / ``remove``,
+   ``reset()`` and a manual write to ``time``.
+
+Prints one grep-able line per scenario:
+
+    CHECK_WAVEFORM_<name> pass=true|false  max_abs=<float>  failure=<str|->
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from acoustic_system.simulation.dataset import synthetic_chirp  # noqa: E402
+from acoustic_system.simulation.setup import Driver  # noqa: E402
+from acoustic_system.simulation.simulate import Simulate  # noqa: E402
+from acoustic_system.simulation.waveforms import (  # noqa: E402
+    AudioFileWaveform,
+    Cosine,
+    GaussianPulse,
+    RickerWavelet,
+    Waveform,
+)
+
+
+@dataclass
+class Ramp(Waveform):
+    """Scalar-only waveform: exercises the base-class ``sample`` fallback."""
+
+    slope: float = 0.01
+
+    def __call__(self, t: float) -> float:
+        return self.slope * t
+
+
+def fail(name: str, msg: str, max_abs: float = float("nan")) -> None:
+    print(f"CHECK_WAVEFORM_{name} pass=false  max_abs={max_abs:.3e}  failure={msg}")
+    sys.exit(1)
+
+
+def ok(name: str, max_abs: float) -> None:
+    print(f"CHECK_WAVEFORM_{name} pass=true   max_abs={max_abs:.3e}  failure=-")
+
+
+def check_sample() -> None:
+    times = np.cumsum(np.r_[-7.0, np.full(6000, 0.35355339)])
+    chirp = synthetic_chirp(1500, 20.0, 0.5, 3.0)
+    families = {
+        "COSINE": Cosine(frequency=0.05, amplitude=1.3),
+        "GAUSSIAN": GaussianPulse(amplitude=2.0, center_time=30.0, width=7.0),
+        "RICKER": RickerWavelet(amplitude=5.0, frequency=0.08, delay=15.0),
+        "AUDIO": AudioFileWaveform.from_samples(chirp, 20.0, amplitude=5.0, delay=3.3),
+        "AUDIO_EMPTY": AudioFileWaveform(),
+        "FALLBACK": Ramp(),
+    }
+    for name, wf in families.items():
+        ref = np.array([np.float32(wf(float(t))) for t in times], dtype=np.float32)
+        got = wf.sample(times)
+        if got.dtype != np.float32 or got.shape != times.shape:
+            fail(name, f"dtype/shape {got.dtype} {got.shape}")
+        max_abs = float(np.max(np.abs(got - ref)))
+        if not np.array_equal(got, ref):
+            fail(name, "sample() differs from __call__", max_abs)
+        ok(name, max_abs)
+
+
+def reference_step(sim: Simulate) -> None:
+    """One step with per-step scalar driver evaluation (pre-table semantics)."""
+    sim._kernel(sim.p, sim.p_prev, sim._p_next, sim._coeff)
+    p_next = sim._p_next
+    if sim._has_obstacles:
+        p_next[sim.obstacle_mask] = np.float32(0.0)
+    for driver in sim.drivers:
+        value = driver.get_value(sim.time)
+        if all(0 <= c < s for c, s in zip(driver.position, sim.grid_shape)):
+            p_next[tuple(driver.position)] += value
+    sim.p_prev, sim.p, sim._p_next = sim.p, p_next, sim.p_prev
+    sim.time = sim.time + sim.timestep
+    sim.step_count += 1
+
+
+def check_step_table() -> None:
+    grid = (64, 64)
+
+    def build() -> Simulate:
+        sim = Simulate(
+            grid_shape=grid,
+            drivers=[Driver((32, 20), RickerWavelet(amplitude=5.0, frequency=0.1, delay=20.0))],
+            courant=0.5,
+        )
+        mask = np.zeros(grid, dtype=bool)
+        mask[40:50, 40:50] = True
+        sim.set_obstacle_mask(mask)
+        return sim
+
+    fast, ref = build(), build()
+    extra = [
+        Driver((45, 45), Cosine(frequency=0.04, amplitude=0.5)),
+        Driver((99, 3), GaussianPulse(center_time=10.0, width=3.0)),
+    ]
+
+    def advance(n: int) -> None:
+        for _ in range(n):
+            fast.step()
+            reference_step(ref)
+
+    advance(300)  # crosses a table chunk boundary
+    for sim in (fast, ref):
+        for d in extra:
+            sim.add_driver(d)
+    advance(50)
+    # Direct edits of the public list, as main.py and generate.py make.
+    loose = Driver((20, 50), Cosine(frequency=0.06, amplitude=0.5))
+    for sim in (fast, ref):
+        sim.drivers.append(loose)
+    advance(30)
+    for sim in (fast, ref):
+        sim.drivers.remove(loose)
+    advance(30)
+    for sim in (fast, ref):
+        del sim.drivers[1:]
+    advance(30)
+    for sim in (fast, ref):
+        sim.drivers.append(loose)  # leaves the single-driver fast path
+    advance(30)
+    if not np.array_equal(fast.p, ref.p):
+        max_abs = float(np.max(np.abs(fast.p - ref.p)))
+        fail("STEP_TABLE", "step() ignores a direct edit of the driver list", max_abs)
+    for sim in (fast, ref):
+        sim.reset()
+    advance(20)
+    for sim in (fast, ref):
+        sim.time = 123.25
+    advance(20)
+
+    max_abs = float(np.max(np.abs(fast.p - ref.p)))
+    if fast.time != ref.time or not np.array_equal(fast.p, ref.p):
+        fail("STEP_TABLE", "table-driven step() diverges from scalar injection", max_abs)
+    ok("STEP_TABLE", max_abs)
+
+
+def main() -> None:
+    check_sample()
+    check_step_table()
+
+
+if __name__ == "__main__":
+    main()